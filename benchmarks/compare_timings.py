@@ -0,0 +1,67 @@
+'''Compares the stage timings of 2 runs written with `python main.py --timings timings.jsonl` (see cleaner/instrumentation.py).
+Prints every span with its total time in both runs and the ratio, and the counters that differ, like:
+
+    python benchmarks/compare_timings.py timings.jsonl                          (the last 2 runs of the file)
+    python benchmarks/compare_timings.py before.jsonl after.jsonl               (the last run of each file)
+    python benchmarks/compare_timings.py timings.jsonl --runs 2026-10-17T09:00:00 2026-10-17T09:05:12'''
+
+import argparse
+import json
+
+
+def read_batch_lines(timings_file_path) -> list:
+    '''OUTPUT: list of the batch lines (dicts) of a JSONL file, in the order of the runs'''
+
+    with open(timings_file_path) as timings_file:
+        list_of_lines = [json.loads(line) for line in timings_file if line.strip()]
+    return [line for line in list_of_lines if line['type'] == 'batch']
+
+
+def select_runs(list_of_timings_files: list, list_of_run_ids: list = None) -> tuple:
+    '''OUTPUT: batch lines of the (old, new) runs to compare'''
+
+    list_of_batch_lines = [batch_line for timings_file_path in list_of_timings_files for batch_line in read_batch_lines(timings_file_path)]
+    if list_of_run_ids:
+        batch_line_of_run = {batch_line['run']: batch_line for batch_line in list_of_batch_lines}
+        return batch_line_of_run[list_of_run_ids[0]], batch_line_of_run[list_of_run_ids[1]]
+    if len(list_of_timings_files) == 2:
+        return read_batch_lines(list_of_timings_files[0])[-1], read_batch_lines(list_of_timings_files[1])[-1]
+    if len(list_of_batch_lines) < 2:
+        raise SystemExit(f"Need 2 runs to compare, found {len(list_of_batch_lines)}")
+    return list_of_batch_lines[-2], list_of_batch_lines[-1]
+
+
+def compare_runs(old_run: dict, new_run: dict):
+    print(f"old run {old_run['run']}: {old_run['run_wall_s']:.2f}s, jobs {old_run['jobs']}, files per batch {old_run['files_per_batch']}, engine {old_run['engine']}")
+    print(f"new run {new_run['run']}: {new_run['run_wall_s']:.2f}s, jobs {new_run['jobs']}, files per batch {new_run['files_per_batch']}, engine {new_run['engine']}")
+    print()
+    print(f"{'span':<40} {'old [s]':>10} {'new [s]':>10} {'new/old':>8}")
+
+    list_of_span_names = list(old_run['spans']) + [span_name for span_name in new_run['spans'] if span_name not in old_run['spans']]
+    for span_name in list_of_span_names:
+        old_total_s = old_run['spans'].get(span_name, {}).get('total_s')
+        new_total_s = new_run['spans'].get(span_name, {}).get('total_s')
+        ratio       = f"{new_total_s/old_total_s:8.2f}" if old_total_s and new_total_s is not None else f"{'-':>8}"
+        print(f"{span_name:<40} {'-' if old_total_s is None else f'{old_total_s:.3f}':>10} {'-' if new_total_s is None else f'{new_total_s:.3f}':>10} {ratio}")
+
+    list_of_counter_names = sorted(set(old_run['counters']) | set(new_run['counters']))
+    changed_counters      = [(counter_name, old_run['counters'].get(counter_name, 0), new_run['counters'].get(counter_name, 0)) for counter_name in list_of_counter_names
+                             if old_run['counters'].get(counter_name, 0) != new_run['counters'].get(counter_name, 0)]
+    print()
+    if not changed_counters:
+        print('All counters are the same')
+    for counter_name, old_value, new_value in changed_counters:
+        print(f"{counter_name:<40} {old_value:>10} {new_value:>10}")
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description = 'Compare the stage timings of 2 runs of main.py --timings')
+    argument_parser.add_argument('timings_files', nargs = '+', help = 'JSONL file(s) written by main.py --timings')
+    argument_parser.add_argument('--runs', nargs = 2, metavar = ('OLD', 'NEW'), help = 'run ids to compare (default: the last 2 runs)')
+    arguments       = argument_parser.parse_args()
+
+    compare_runs(*select_runs(arguments.timings_files, arguments.runs))
+
+
+if __name__ == '__main__':
+    main()
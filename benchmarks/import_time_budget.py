@@ -0,0 +1,84 @@
+'''Benchmark that enforces the import-time budget of the calculator. Every measurement runs in a fresh interpreter, like a
+short-lived worker process does. Exits with code 1 if the budget is exceeded, so it can run in CI:
+
+    python benchmarks/import_time_budget.py --budget-s 2.0 --overhead-budget-s 0.3
+
+Measured:
+    - total: time to import the calculator modules (main, multi_file_maker, pipeline) in a fresh interpreter
+    - overhead: total minus the time to import the core dependencies only (numpy, pandas, scipy.signal), which is the part our own code adds
+    - heavy modules: modules that are only needed for plots/Excel files must NOT be imported by the calculator'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+CLEANER_LOCATION     = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cleaner')
+CALCULATOR_MODULES   = ['main', 'multi_file_maker', 'pipeline']
+CORE_MODULES         = ['numpy', 'pandas', 'scipy.signal']
+HEAVY_MODULES        = ['matplotlib', 'openpyxl', 'seaborn', 'sklearn', 'tensorflow', 'dask', 'sympy', 'geopy', 'numba']
+
+MEASURE_SNIPPET = '''
+import sys, time
+start = time.perf_counter()
+for module in {modules}:
+    __import__(module)
+print(time.perf_counter() - start)
+print(','.join(module for module in {heavy_modules} if module in sys.modules))
+'''
+
+
+def measure_import_time(modules: list):
+    '''Imports modules in a fresh interpreter
+    OUTPUT: import time [s], list of heavy modules that got imported'''
+
+    snippet = MEASURE_SNIPPET.format(modules = modules, heavy_modules = HEAVY_MODULES)
+    output  = subprocess.run([sys.executable, '-c', snippet], cwd = CLEANER_LOCATION, capture_output = True, text = True, check = True).stdout
+    import_time_s, imported_heavy_modules = output.split('\n')[-3:-1] # last 2 lines, the heavy modules line can be empty
+
+    return float(import_time_s), [module for module in imported_heavy_modules.split(',') if module]
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description = 'Measures the import time of the calculator and checks it against a budget')
+    argument_parser.add_argument('--budget-s', type = float, default = 2.0, help = 'max total import time [s] (default: 2.0)')
+    argument_parser.add_argument('--overhead-budget-s', type = float, default = 0.3, help = 'max import time on top of numpy/pandas/scipy [s] (default: 0.3)')
+    argument_parser.add_argument('--repeats', type = int, default = 5, help = '# of fresh interpreters per measurement, the median is used (default: 5)')
+    arguments       = argument_parser.parse_args()
+
+    list_of_core_times       = []
+    list_of_calculator_times = []
+    imported_heavy_modules   = set()
+    for _ in range(arguments.repeats): # interleaved, so both measurements see the same (disk cache) conditions
+        core_time_s, _                  = measure_import_time(CORE_MODULES)
+        calculator_time_s, heavy_modules= measure_import_time(CALCULATOR_MODULES)
+        list_of_core_times.append(core_time_s)
+        list_of_calculator_times.append(calculator_time_s)
+        imported_heavy_modules.update(heavy_modules)
+
+    core_time_s       = statistics.median(list_of_core_times)
+    calculator_time_s = statistics.median(list_of_calculator_times)
+    overhead_s        = calculator_time_s - core_time_s
+
+    print(f"Core dependencies: {core_time_s:.3f}s")
+    print(f"Calculator:        {calculator_time_s:.3f}s (budget {arguments.budget_s:.3f}s)")
+    print(f"Overhead:          {overhead_s:.3f}s (budget {arguments.overhead_budget_s:.3f}s)")
+
+    errors = []
+    if calculator_time_s > arguments.budget_s:
+        errors.append(f"import time {calculator_time_s:.3f}s is over the budget of {arguments.budget_s:.3f}s")
+    if overhead_s > arguments.overhead_budget_s:
+        errors.append(f"import overhead {overhead_s:.3f}s is over the budget of {arguments.overhead_budget_s:.3f}s")
+    if imported_heavy_modules:
+        errors.append(f"heavy modules imported by the calculator: {sorted(imported_heavy_modules)}")
+
+    for error in errors:
+        print(f"FAILED: {error}")
+    if errors:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
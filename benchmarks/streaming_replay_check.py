@@ -0,0 +1,211 @@
+'''Check that the online phases of StreamingPhaseDetector (see cleaner/streaming_phase_detector.py) are those of pipeline.process_file.
+Every input file is replayed in batches, like a robot logging every minute, and every phase of every cycle is compared with the
+offline one. Exits with code 1 if a phase is further than its bound from the offline one, or is not reported while the offline
+code finds it, so it can run in CI:
+
+    python benchmarks/streaming_replay_check.py input/ --config configuration.ini
+    python benchmarks/streaming_replay_check.py day_1_alkaline.csv day_2_acid.csv --batch-size 1
+    python benchmarks/streaming_replay_check.py --random-cycles 40 --seed 0
+
+Measured per phase: # of cycles compared, # of phases not reported online, max |online - offline| [s], and for the low-C zone and
+blowout their duration [s] too. Files the offline code cannot process are skipped. The fallbacks the offline code took (like the
+default pre-rinse) are listed, as the online code must take the same ones. --random-cycles adds synthetic cycles with random timing,
+hot rinse T and noise (see make_random_cycle), some of them without post-milk flush and pre-rinse, so the fallbacks are covered
+without recorded files that need them'''
+
+import argparse
+import datetime
+import logging
+import os
+import sys
+import tempfile
+
+CLEANER_LOCATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cleaner')
+sys.path.insert(0, CLEANER_LOCATION)
+
+import numpy as np
+import pandas as pd
+
+import config_info_obtainer as ci
+import instrumentation
+from logging_maker import logger
+import pipeline
+from streaming_phase_detector import StreamingPhaseDetector
+
+SECS_PER_DAY = 24 * 60 * 60
+
+# {phase: output column of process_file}, the times are wall-clock times of the day
+OFFLINE_TIME_COLUMNS  = {'post-milk flush': 'Start of post-milk flush [RT]',
+                         'low-C zone':      'Start of low-C zone [RT]',
+                         'pre-rinse':       'Start of pre-rinse [RT]',
+                         'hot rinse':       'Start of hot rinse [RT]',
+                         'T max':           'Time for max T [RT]',
+                         'post-rinse':      'Start of post-rinse [RT]', }
+OFFLINE_VALUE_COLUMNS = {'low-C zone duration': ('low-C zone', 'Duration of low-C zone [s]'),
+                         'blowout duration':    ('blowout',    'Blowout duration [s]'), }
+
+# max |online - offline| [s]: the online rules are the offline ones, so they are equal. Measured on 55 recorded cycles and on
+# --random-cycles 40 --seed 0, which takes the default pre-rinse, hot rinse and post-rinse end and the longest low-C zone fallbacks
+BOUNDS_S = {'post-milk flush': 0, 'low-C zone': 0, 'pre-rinse': 0, 'hot rinse': 0, 'T max': 0, 'post-rinse': 0,
+            'low-C zone duration': 0, 'blowout duration': 0, }
+
+
+def seconds_of_day(time) -> float:
+    '''OUTPUT: seconds since midnight of a datetime.time, pd.Timestamp or 'HH:MM:SS' string'''
+
+    if isinstance(time, str):
+        time = datetime.datetime.strptime(time, '%H:%M:%S').time()
+    return time.hour * 3600 + time.minute * 60 + time.second + time.microsecond/1e6
+
+
+def time_difference_s(online_time: pd.Timestamp, offline_time) -> float:
+    '''OUTPUT: online - offline [s], of the times of the day (a cycle can run over midnight). The offline time is rounded down to the
+    second if it is a 'HH:MM:SS' string, so the online one is too'''
+
+    online_s = seconds_of_day(online_time)
+    if isinstance(offline_time, str):
+        online_s = np.floor(online_s)
+    return (online_s - seconds_of_day(offline_time) + SECS_PER_DAY/2) % SECS_PER_DAY - SECS_PER_DAY/2
+
+
+def _smoothstep(t: np.ndarray, start, end) -> np.ndarray:
+    '''OUTPUT: smooth step from 0 (before start) to 1 (after end)'''
+
+    x = np.clip((t - start)/(end - start), 0, 1)
+    return x * x * (3 - 2*x)
+
+
+def make_random_cycle(rng: np.random.Generator, start_time: pd.Timestamp, number_of_samples: int = 1700) -> pd.DataFrame:
+    '''Makes a synthetic cleaning cycle, logged every second: a hot rinse (T up to 45-85 C, C up), post-rinse and blowout (F peaks),
+    with random timing and noise, and 1% NaN values. About 1 in 3 cycles has no post-milk flush and pre-rinse (no F peak or C drop
+    before the hot rinse), on some of these the offline code takes its default pre-rinse
+    OUTPUT: dataframe with the columns of the config file, as read from an input file'''
+
+    t           = np.arange(number_of_samples, dtype = float)
+    stretch     = rng.uniform(0.85, 1.15)
+    T_top       = rng.uniform(45, 85)
+    no_prerinse = rng.random() < 0.3
+
+    T_values = 20 + (T_top - 20)*_smoothstep(t, 550*stretch, rng.uniform(850, 1000)*stretch) - (T_top - 35)*_smoothstep(t, 1050*stretch, 1120*stretch)
+    C_values = 0.3 + 9.5*_smoothstep(t, 560*stretch, 640*stretch) - 9.4*_smoothstep(t, 1050*stretch, 1110*stretch)
+    F_values = 12*(1 + np.sin(t/15))*((560*stretch < t) & (t < 1040*stretch)) + 30*np.exp(-((t - 1060*stretch)/15)**2) \
+               + 60*np.exp(-((t - 1200*stretch)/12)**2)
+    if not no_prerinse:
+        C_values = C_values + rng.uniform(2, 6)*np.exp(-((t - rng.uniform(100, 160)*stretch)/25)**2)
+        F_values = F_values + rng.uniform(10, 25)*np.exp(-((t - 120*stretch)/15)**2) + rng.uniform(15, 35)*np.exp(-((t - rng.uniform(230, 300)*stretch)/20)**2)
+
+    df_cycle = pd.DataFrame({ci.Constants.time_column_name: (start_time + pd.to_timedelta(t, unit = 's')).strftime('%Y-%m-%d %H:%M:%S'),
+                             ci.Constants.T_column_name:    T_values + rng.normal(0, 0.2, number_of_samples),
+                             ci.Constants.C_column_name:    C_values + np.abs(rng.normal(0, 0.02, number_of_samples)),
+                             ci.Constants.F_column_name:    F_values + np.abs(rng.normal(0, 0.2, number_of_samples)), })
+    for column in df_cycle.columns[1:]:
+        nan_idx = rng.choice(np.arange(1, number_of_samples - 1), number_of_samples//100, replace = False)
+        df_cycle.loc[nan_idx, column] = np.nan
+
+    return df_cycle
+
+
+def write_random_cycles(folder, number_of_cycles: int, seed: int) -> list:
+    '''Writes number_of_cycles files of one make_random_cycle each, with the alkaline keyword in their names
+    OUTPUT: list of the file paths'''
+
+    rng           = np.random.default_rng(seed)
+    list_of_files = []
+    for i in range(number_of_cycles):
+        file_path = os.path.join(folder, f"random_{ci.Constants.alkaline_keyword}_{i}.csv")
+        make_random_cycle(rng, pd.Timestamp('2024-03-01 10:00:00')).to_csv(file_path, sep = ';', decimal = ',', index = False)
+        list_of_files.append(file_path)
+    return list_of_files
+
+
+def list_input_files(list_of_inputs: list) -> list:
+    '''OUTPUT: list of the csv files given, or in the folders given'''
+
+    list_of_files = []
+    for input_path in list_of_inputs:
+        if os.path.isdir(input_path):
+            list_of_files.extend(os.path.join(input_path, file_name) for file_name in sorted(os.listdir(input_path)) if file_name.lower().endswith('.csv'))
+        else:
+            list_of_files.append(input_path)
+    return list_of_files
+
+
+def compare_file(file_path, batch_size: int, differences: dict, missing: dict):
+    '''Replays a file and adds |online - offline| of every phase of its cycles to differences, and the phases not reported online
+    to missing, {phase: list of cycle names}'''
+
+    with instrumentation.recording(os.path.basename(file_path)): # counts the fallbacks the offline code takes
+        list_of_cycle_results = pipeline.process_file(file_path)
+    list_of_replayed_cycles = StreamingPhaseDetector.replay_file(file_path, batch_size = batch_size)
+
+    for cycle_result, (cycle_name, list_of_events) in zip(list_of_cycle_results, list_of_replayed_cycles):
+        offline_values = cycle_result.as_dict()
+        online_events  = {phase_event.phase: phase_event for phase_event in list_of_events}
+
+        for phase, column in OFFLINE_TIME_COLUMNS.items():
+            if phase not in online_events:
+                missing[phase].append(cycle_name)
+                continue
+            differences[phase].append(abs(time_difference_s(online_events[phase].time, offline_values[column])))
+
+        for value_name, (phase, column) in OFFLINE_VALUE_COLUMNS.items():
+            if pd.isna(offline_values[column]): # the offline code did not find it either
+                continue
+            if phase not in online_events:
+                missing[value_name].append(cycle_name)
+                continue
+            differences[value_name].append(abs(online_events[phase].value - offline_values[column]))
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description = 'Replays input files through StreamingPhaseDetector and checks its phases against process_file')
+    argument_parser.add_argument('inputs', nargs = '*', help = 'csv input files, or folders of them')
+    argument_parser.add_argument('--config', default = ci.DEFAULT_CONFIG_PATH, help = 'configuration.ini with the column names of the files (default: the one of the repo)')
+    argument_parser.add_argument('--batch-size', type = int, default = 60, help = '# of samples fed at once (default: 60)')
+    argument_parser.add_argument('--random-cycles', type = int, default = 0, help = '# of synthetic cycles to check too (default: 0)')
+    argument_parser.add_argument('--seed', type = int, default = 0, help = 'seed of the synthetic cycles (default: 0)')
+    arguments       = argument_parser.parse_args()
+    if not (arguments.inputs or arguments.random_cycles):
+        argument_parser.error('give input files/folders, or --random-cycles')
+
+    logger.setLevel(logging.ERROR) # the phase finders log every phase
+    ci.load_config(arguments.config)
+    instrumentation.enable()
+
+    differences   = {phase: [] for phase in BOUNDS_S}
+    missing       = {phase: [] for phase in BOUNDS_S}
+    skipped_files = []
+    with tempfile.TemporaryDirectory() as random_cycles_folder:
+        list_of_files = list_input_files(arguments.inputs) + write_random_cycles(random_cycles_folder, arguments.random_cycles, arguments.seed)
+        for file_path in list_of_files:
+            try:
+                compare_file(file_path, arguments.batch_size, differences, missing)
+            except Exception as error: # the offline code fails on this file, there is nothing to compare with
+                skipped_files.append(f"{os.path.basename(file_path)} ({type(error).__name__}: {error})")
+
+    print(f"{'phase':<22} {'cycles':>7} {'missing':>8} {'max diff [s]':>13} {'bound [s]':>10}")
+    errors = []
+    for phase, bound_s in BOUNDS_S.items():
+        max_difference_s = max(differences[phase], default = 0.0)
+        print(f"{phase:<22} {len(differences[phase]):>7} {len(missing[phase]):>8} {max_difference_s:>13.3f} {bound_s:>10}")
+        if max_difference_s > bound_s + 1e-6: # the durations are floats
+            errors.append(f"{phase} is {max_difference_s:.3f}s from the offline one, over the bound of {bound_s}s")
+        if missing[phase]:
+            errors.append(f"{phase} not reported online in {missing[phase]}")
+
+    fallback_counts = instrumentation.summarize(instrumentation.take_records())['counters']
+    print('Offline fallbacks: ' + (', '.join(f"{counter_name[len('fallback: '):]} {value}x" for counter_name, value in sorted(fallback_counts.items())
+                                               if counter_name.startswith('fallback: ')) or 'none'))
+    for skipped_file in skipped_files:
+        print(f"Skipped {skipped_file}")
+    if not any(differences.values()):
+        errors.append('no cycle to compare')
+    for error in errors:
+        print(f"FAILED: {error}")
+    if errors:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
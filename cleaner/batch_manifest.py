@@ -0,0 +1,101 @@
+'''Module containing the manifest of the incremental batch mode: a json file next to the output csv file that records which input
+files were processed, in which version, and which output rows they made. Files that did not change are skipped on the next run'''
+
+import json
+import os
+
+from logging_maker import logger
+from utils import FileFingerprint
+
+
+class ProcessedFilesManifest:
+    '''Class that keeps track of the processed input files
+    INPUT:
+        - manifest_path: path of the json file
+        - config_hash: hash of the settings that change the results, a file processed with other settings is processed again
+        - algorithm_version: version of the code that made the results, a file processed by another version is processed again
+    A file is up to date if its size+mtime are unchanged (cheap). If only the mtime changed (like a copied file), the content hash
+    decides, so unchanged contents are not processed again'''
+
+    MANIFEST_FORMAT_VERSION = 1
+
+    def __init__(self, manifest_path, config_hash: str, algorithm_version: int):
+        self.manifest_path     = manifest_path
+        self.config_hash       = config_hash
+        self.algorithm_version = algorithm_version
+        self.entries           = self.load()
+
+
+    def load(self) -> dict:
+        '''Reads the manifest, an unreadable manifest or one of another format counts as empty
+        OUTPUT: dict of {absolute file path: entry}'''
+
+        try:
+            with open(self.manifest_path, 'r') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get('manifest version') != self.MANIFEST_FORMAT_VERSION:
+            return {}
+
+        return manifest['files']
+
+
+    def save(self):
+        '''Writes the manifest to a temporary file that replaces the old one, so a crash never leaves a half-written manifest'''
+
+        manifest      = {'manifest version': self.MANIFEST_FORMAT_VERSION,
+                         'files':            self.entries, }
+        temp_location = f"{self.manifest_path}.tmp"
+
+        with open(temp_location, 'w') as file:
+            json.dump(manifest, file, indent = 1)
+        os.replace(temp_location, self.manifest_path)
+
+
+    def _get_key(file_path):
+        return os.path.abspath(file_path)
+
+
+    def get_entry(self, file_path):
+        '''OUTPUT: the entry of a file, or None if the file was never processed'''
+        return self.entries.get(ProcessedFilesManifest._get_key(file_path))
+
+
+    def is_up_to_date(self, file_path) -> bool:
+        '''Whether a file was processed before, with the same contents, config and algorithm version'''
+
+        entry = self.get_entry(file_path)
+        if entry is None:
+            return False
+
+        if (entry['config hash'] != self.config_hash) or (entry['algorithm version'] != self.algorithm_version):
+            return False
+
+        file_size, file_mtime_ns = FileFingerprint.get_size_and_mtime(file_path)
+        if (file_size, file_mtime_ns) == (entry['size [B]'], entry['mtime [ns]']):
+            return True
+
+        if (file_size == entry['size [B]']) and (FileFingerprint.get_content_hash(file_path) == entry['sha256']):
+            entry['mtime [ns]'] = file_mtime_ns # touched but unchanged, so the next run does not need to hash it
+            return True
+
+        return False
+
+
+    def record(self, file_path, list_of_cycle_names: list):
+        '''Records a processed file, with the names of its rows in the output file
+        INPUT:
+            - file_path: path of the input file
+            - list_of_cycle_names: 'File name' of every row the file made in the output file'''
+
+        file_size, file_mtime_ns = FileFingerprint.get_size_and_mtime(file_path)
+
+        self.entries[ProcessedFilesManifest._get_key(file_path)] = {'size [B]':          file_size,
+                                                                    'mtime [ns]':        file_mtime_ns,
+                                                                    'sha256':            FileFingerprint.get_content_hash(file_path),
+                                                                    'config hash':       self.config_hash,
+                                                                    'algorithm version': self.algorithm_version,
+                                                                    'cycle names':       list_of_cycle_names, }
+
@@ -0,0 +1,711 @@
+'''Module containing the batched phase identifying code: the phases of MANY cleaning cycles are found at once, on the signals of all
+cycles stacked into one ragged batch, instead of running the phase identifying classes once per cycle. The masks, the run-length
+encoding of the low-C zones, the event joins, the fallbacks and the blowout are each a few array operations on the whole batch.
+The results are those of ResultingPhases (see pipeline.py), only the means (KPIs, thresholds) are summed with np.add.reduceat
+instead of the pairwise sum of np.mean, so they can differ in the last digits. Cycles the batch cannot take (see
+BatchedPhaseIdentifier.is_batchable) or that make the single-cycle code fail are left to ResultingPhases, which gives the same
+result or raises the same error'''
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+import config_info_obtainer as ci
+from event_join import EventJoin
+import instrumentation
+from logging_maker import logger
+from time_grid import TimeGrid
+
+
+class CycleBatch:
+    '''Signals of many cleaning cycles as one ragged batch: the arrays of the cycles are concatenated, samples
+    offsets[c]:offsets[c + 1] belong to cycle # c. Values of one item per cycle (like T_max_idx) are arrays of number_of_cycles items,
+    and the relative extrema times of the cycles are concatenated per kind, with the cycle of every event in event_cycle
+    ATTRIBUTES:
+        - list_of_cycle_signals: the CycleSignals of the cycles, in batch order
+        - number_of_cycles, number_of_samples (per cycle), offsets: layout of the batch
+        - cycle_of_sample, local_idx: cycle and index in its cycle of every sample of the batch
+        - t_ns, has_time, T_values, C_values, F_values, dC_values: concatenated arrays of the cycles, see CycleSignals
+        - T_max_idx, T_max_t_ns, C_max, C_max_idx, C_mean: per-cycle arrays, see CycleSignals
+        - event_t_ns, event_cycle: dicts of {kind: concatenated array}, kinds of EVENT_KINDS like 'dT_relative_max'
+        - time_key_base, sorted_time_keys, sorted_sample, first_sorted_position, last_sorted_position: time -> sample lookups of the
+          batch, like TimeIndex: the time of every timed sample + the key base of its cycle is a key, unique to the cycle, and the
+          keys are sorted once'''
+
+    EVENT_KINDS = ('dT_relative_max', 'dT_relative_min', 'dC_relative_max', 'dC_relative_min', 'dF_relative_max', 'dF_relative_min')
+
+    def __init__(self, list_of_cycle_signals: list):
+        self.list_of_cycle_signals = list(list_of_cycle_signals)
+        self.number_of_cycles      = len(self.list_of_cycle_signals)
+        self.number_of_samples     = np.array([cycle_signals.number_of_samples for cycle_signals in self.list_of_cycle_signals], dtype = np.int64)
+        self.offsets               = np.concatenate(([0], np.cumsum(self.number_of_samples))).astype(np.int64)
+        self.cycle_of_sample       = np.repeat(np.arange(self.number_of_cycles), self.number_of_samples)
+        self.local_idx             = np.arange(self.offsets[-1]) - self.offsets[self.cycle_of_sample]
+
+        for signal_name in ('t_ns', 'has_time', 'T_values', 'C_values', 'F_values', 'dC_values'):
+            setattr(self, signal_name, self._concatenate([getattr(cycle_signals, signal_name) for cycle_signals in self.list_of_cycle_signals]))
+
+        for value_name in ('T_max_idx', 'T_max_t_ns', 'C_max_idx'):
+            setattr(self, value_name, np.array([getattr(cycle_signals, value_name) for cycle_signals in self.list_of_cycle_signals], dtype = np.int64))
+        for value_name in ('C_max', 'C_mean'):
+            setattr(self, value_name, np.array([getattr(cycle_signals, value_name) for cycle_signals in self.list_of_cycle_signals], dtype = np.float64))
+
+        self.event_t_ns : dict = {}
+        self.event_cycle: dict = {}
+        for kind in self.EVENT_KINDS:
+            list_of_event_t_ns     = [getattr(cycle_signals, f"{kind}_t_ns") for cycle_signals in self.list_of_cycle_signals]
+            self.event_t_ns[kind]  = self._concatenate(list_of_event_t_ns).astype(np.int64)
+            self.event_cycle[kind] = np.repeat(np.arange(self.number_of_cycles), [len(event_t_ns) for event_t_ns in list_of_event_t_ns])
+
+        self._make_time_keys()
+
+
+    @staticmethod
+    def _concatenate(list_of_arrays):
+        return np.concatenate(list_of_arrays) if list_of_arrays else np.empty(0)
+
+
+    def _make_time_keys(self):
+        '''Time keys of the timed samples: cycle # c gets the keys [key_start[c], key_start[c] + span[c]], after those of cycle # c - 1,
+        so a binary search in the sorted keys finds the samples of one cycle only. Every cycle must have a timed sample'''
+
+        starts        = self.offsets[:-1]
+        self.t_first  = np.minimum.reduceat(np.where(self.has_time, self.t_ns, np.iinfo(np.int64).max), starts) if self.number_of_cycles else np.empty(0, dtype = np.int64)
+        self.t_last   = np.maximum.reduceat(np.where(self.has_time, self.t_ns, np.iinfo(np.int64).min), starts) if self.number_of_cycles else np.empty(0, dtype = np.int64)
+        self.t_span   = self.t_last - self.t_first
+        key_start     = np.concatenate(([0], np.cumsum(self.t_span + 1)[:-1])).astype(np.int64)
+        self.time_key_base = key_start - self.t_first
+
+        timed_sample  = np.flatnonzero(self.has_time)
+        time_keys     = self.time_key_base[self.cycle_of_sample[timed_sample]] + self.t_ns[timed_sample]
+        if np.all(time_keys[1:] >= time_keys[:-1]): # already sorted, like regridded cycles
+            self.sorted_time_keys = time_keys
+            self.sorted_sample    = timed_sample
+        else:
+            sorted_order          = np.argsort(time_keys, kind = 'stable') # the 1st sample first when times are equal, like TimeIndex
+            self.sorted_time_keys = time_keys[sorted_order]
+            self.sorted_sample    = timed_sample[sorted_order]
+
+        number_of_timed           = np.bincount(self.cycle_of_sample[timed_sample], minlength = self.number_of_cycles)
+        self.first_sorted_position= np.cumsum(number_of_timed) - number_of_timed
+        self.last_sorted_position = np.cumsum(number_of_timed) - 1
+
+
+    def join_key_base(self, tolerance_ns: int) -> np.ndarray:
+        '''Key base of every cycle for event joins: the times of cycle # c + its base are more than tolerance_ns away from those of
+        the other cycles, so a band join on the keys only pairs events of the same cycle'''
+
+        key_start = np.concatenate(([0], np.cumsum(self.t_span + 2 * tolerance_ns + 1)[:-1])).astype(np.int64)
+        return key_start - self.t_first
+
+
+    def find_sample(self, cycle_of_query: np.ndarray, t_ns: np.ndarray) -> np.ndarray:
+        '''Position in the batch of the 1st sample at every time of t_ns in its cycle, -1 if no sample is at that time, see TimeIndex.find_idx
+        INPUT: arrays of the cycle and time [ns] of every query
+        OUTPUT: int64 array of batch positions'''
+
+        cycle_of_query = np.asarray(cycle_of_query, dtype = np.int64)
+        time_keys      = self.time_key_base[cycle_of_query] + np.asarray(t_ns, dtype = np.int64)
+        position       = np.searchsorted(self.sorted_time_keys, time_keys, side = 'left')
+        is_in_cycle    = (position >= self.first_sorted_position[cycle_of_query]) & (position <= self.last_sorted_position[cycle_of_query])
+        position       = np.where(is_in_cycle, position, 0)
+        is_found       = is_in_cycle & (self.sorted_time_keys[position] == time_keys)
+        return np.where(is_found, self.sorted_sample[position], -1)
+
+
+    def find_nearest_sample(self, cycle_of_query: np.ndarray, t_ns: np.ndarray) -> np.ndarray:
+        '''Position in the batch of the sample of its cycle closest to every time of t_ns, samples without time left out. If 2 samples
+        are as close, the 1st one, see TimeIndex.find_nearest_idx
+        OUTPUT: int64 array of batch positions'''
+
+        cycle_of_query = np.asarray(cycle_of_query, dtype = np.int64)
+        time_keys      = self.time_key_base[cycle_of_query] + np.asarray(t_ns, dtype = np.int64)
+        first_position = self.first_sorted_position[cycle_of_query]
+        last_position  = self.last_sorted_position[cycle_of_query]
+
+        position_above = np.clip(np.searchsorted(self.sorted_time_keys, time_keys, side = 'left'), first_position, last_position)
+        position_below = np.clip(np.searchsorted(self.sorted_time_keys, time_keys, side = 'right') - 1, first_position, last_position)
+        position_below = np.searchsorted(self.sorted_time_keys, self.sorted_time_keys[position_below], side = 'left') # 1st sample of that time
+        distance_above = np.abs(self.sorted_time_keys[position_above] - time_keys)
+        distance_below = np.abs(time_keys - self.sorted_time_keys[position_below])
+        sample_above   = self.sorted_sample[position_above]
+        sample_below   = self.sorted_sample[position_below]
+        is_above_closer= (distance_above < distance_below) | ((distance_above == distance_below) & (sample_above < sample_below))
+        return np.where(is_above_closer, sample_above, sample_below)
+
+
+    def padded(self, values: np.ndarray, fill_value = np.nan) -> np.ndarray:
+        '''Per-sample values of the batch as a 2-D array, one column per cycle, padded with fill_value below the shorter cycles
+        OUTPUT: array of shape (max # of samples, number_of_cycles)'''
+
+        padded_values = np.full((int(self.number_of_samples.max(initial = 0)), self.number_of_cycles), fill_value, dtype = np.float64)
+        padded_values[self.local_idx, self.cycle_of_sample] = values
+        return padded_values
+
+
+    @staticmethod
+    def first_per_cycle(mask: np.ndarray, cycle_of_item: np.ndarray, number_of_cycles: int) -> np.ndarray:
+        '''Position of the 1st True item of mask in every cycle, -1 for cycles without one. The items of a cycle must be contiguous
+        and the cycles in order, like the samples and events of the batch'''
+
+        true_position = np.flatnonzero(mask)
+        first_position= np.full(number_of_cycles, -1, dtype = np.int64)
+        cycles, first_of_cycle = np.unique(cycle_of_item[true_position], return_index = True)
+        first_position[cycles] = true_position[first_of_cycle]
+        return first_position
+
+
+    @staticmethod
+    def last_per_cycle(mask: np.ndarray, cycle_of_item: np.ndarray, number_of_cycles: int) -> np.ndarray:
+        '''Position of the last True item of mask in every cycle, -1 for cycles without one, see first_per_cycle'''
+
+        true_position = np.flatnonzero(mask)[::-1]
+        last_position = np.full(number_of_cycles, -1, dtype = np.int64)
+        cycles, last_of_cycle = np.unique(cycle_of_item[true_position], return_index = True)
+        last_position[cycles] = true_position[last_of_cycle]
+        return last_position
+
+
+    @staticmethod
+    def reduce_segments(ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray, empty_value = 0) -> np.ndarray:
+        '''ufunc.reduceat over the segments values[starts[i]:ends[i]], empty_value for empty segments. The segments can overlap and
+        be in any order'''
+
+        padded_values  = np.append(values, empty_value) # an end can be len(values), reduceat needs indices < len
+        segment_bounds = np.column_stack((starts, np.maximum(ends, starts))).ravel()
+        if segment_bounds.size == 0:
+            return np.empty(0, dtype = padded_values.dtype)
+        reduced_values = ufunc.reduceat(padded_values, segment_bounds)[::2]
+        return np.where(ends > starts, reduced_values, empty_value)
+
+
+
+class BatchedCyclePhases:
+    '''Phases of one cycle of a batch, with the attributes of ResultingPhases that the output (see
+    csvFileMaker.make_header_and_row_values) reads'''
+
+    def __init__(self, cycle_signals, **phases):
+        for phase_name, value in phases.items():
+            setattr(self, phase_name, value)
+
+        # the phases are found in integer time, only the output is in wall-clock time
+        self.low_C_zone_start_time = cycle_signals.to_time(self.low_C_zone_start_t_ns)
+        self.hot_rinse_time        = cycle_signals.to_time(self.hot_rinse_t_ns)
+        self.prerinse_time         = cycle_signals.to_time(self.prerinse_t_ns).strftime('%H:%M:%S')
+        self.post_milk_flush_time  = cycle_signals.to_time(self.post_milk_flush_t_ns)
+        self.postrinse_time        = cycle_signals.to_time(self.postrinse_t_ns)
+        self.post_rinse_end_time   = cycle_signals.to_time(self.post_rinse_end_t_ns)
+
+
+
+class BatchedPhaseIdentifier:
+    '''Finds the phases of all cycles of a CycleBatch at once, with the rules and settings of ResultingPhases. Every find_* method
+    returns arrays of one item per cycle, times [ns] and indices in the cycle like the phase identifying classes'''
+
+    NS_PER_S         = TimeGrid.NS_PER_S
+    SECS_PER_MINUTE  = 60
+    MIN_NUMBER_OF_SAMPLES = 5
+
+    def __init__(self, cycle_batch: CycleBatch, list_of_solution_types: list):
+        self.Batch                  = cycle_batch
+        self.list_of_solution_types = list(list_of_solution_types)
+        self.cycle_ids              = np.arange(cycle_batch.number_of_cycles)
+        self.is_left_to_single_cycle= np.zeros(cycle_batch.number_of_cycles, dtype = bool) # cycles the single-cycle code must redo
+        self.fallbacks              = {} # {fallback name: bool array of the cycles that take it}, counted by identify_phases
+
+
+    @staticmethod
+    def is_batchable(cycle_signals, solution_type) -> bool:
+        '''Cycles the batch can take: a few samples with time, no NaN values and a known solution type. The others go through
+        ResultingPhases, which handles (or fails on) them like before'''
+
+        known_solution_types = (ci.Constants.acid_keyword, ci.Constants.alkaline_keyword, ci.Constants.other_keyword)
+        has_NaN_values       = any(np.isnan(values).any() for values in (cycle_signals.T_values, cycle_signals.C_values, cycle_signals.F_values, cycle_signals.dC_values))
+        return (cycle_signals.number_of_samples >= BatchedPhaseIdentifier.MIN_NUMBER_OF_SAMPLES) and bool(cycle_signals.has_time.any()) \
+               and (not has_NaN_values) and (solution_type in known_solution_types)
+
+
+    def _cycle_values_at_times(self, values, cycle_of_event, t_ns) -> np.ndarray:
+        '''Values of the samples at the times of events of the batch, the last sample of the cycle if none is at that time, like
+        LowCZoneMaskHandler._values_at_times'''
+
+        sample = self.Batch.find_sample(cycle_of_event, t_ns)
+        return values[np.where(sample >= 0, sample, self.Batch.offsets[cycle_of_event + 1] - 1)]
+
+
+    def _idx_of_times(self, t_ns) -> np.ndarray:
+        '''Index in its cycle of the 1st sample at time t_ns of every cycle, -1 if none'''
+
+        sample = self.Batch.find_sample(self.cycle_ids, t_ns)
+        return np.where(sample >= 0, self.Batch.local_idx[np.maximum(sample, 0)], -1)
+
+
+    def _nearest_idx_of_times(self, t_ns) -> np.ndarray:
+        '''Index in its cycle of the sample closest to time t_ns of every cycle'''
+        return self.Batch.local_idx[self.Batch.find_nearest_sample(self.cycle_ids, t_ns)]
+
+
+    def _first_matches(self, left_kind, right_kind, tolerance_ns, left_mask = None, right_mask = None):
+        '''1st pair of events of every cycle with left - tolerance_ns < right < left + tolerance_ns, see EventJoin.first_match
+        OUTPUT: left_pos, right_pos: positions of the events in the batch arrays of their kind, -1 for cycles without a pair'''
+
+        join_key_base = self.Batch.join_key_base(tolerance_ns)
+        left_keys     = self.Batch.event_t_ns[left_kind]  + join_key_base[self.Batch.event_cycle[left_kind]]
+        right_keys    = self.Batch.event_t_ns[right_kind] + join_key_base[self.Batch.event_cycle[right_kind]]
+        left_pos, right_pos = EventJoin.band_join(left_keys, right_keys, tolerance_ns, left_mask, right_mask) # pairs in nested-loop order
+
+        first_left_pos  = np.full(self.Batch.number_of_cycles, -1, dtype = np.int64)
+        first_right_pos = np.full(self.Batch.number_of_cycles, -1, dtype = np.int64)
+        matched_cycles, first_pair = np.unique(self.Batch.event_cycle[left_kind][left_pos], return_index = True)
+        first_left_pos[matched_cycles]  = left_pos[first_pair]
+        first_right_pos[matched_cycles] = right_pos[first_pair]
+        return first_left_pos, first_right_pos
+
+
+    def make_low_C_mask(self, roll_window_size = 3, max_std_threshold_fraction = 0.1, percentile_crit = 40) -> np.ndarray:
+        '''Mask of the samples of the batch in low-C zones, the std, T_max and C percentile masks of LowCZoneMaskHandler in one go.
+        Sample # L of a cycle stands for the label L of the single-cycle mask: the rolling std of dC[L : L + roll_window_size]. The
+        rolling std runs on the padded 2-D dC (one column per cycle), so each cycle gets the exact values of its own pd.Series
+        OUTPUT: boolean array over the samples of the batch'''
+
+        number_of_samples = self.Batch.number_of_samples[self.Batch.cycle_of_sample]
+        local_idx         = self.Batch.local_idx
+        lag               = roll_window_size - 1
+        has_std_value     = (local_idx >= lag) & (local_idx <= number_of_samples - roll_window_size) # the last labels are NaN after the shift
+
+        dC_rolling_std    = pd.DataFrame(self.Batch.padded(self.Batch.dC_values)).rolling(roll_window_size).std().to_numpy()
+        std_row           = np.minimum(local_idx + lag, dC_rolling_std.shape[0] - 1)
+        dC_std_shifted    = np.where(has_std_value, dC_rolling_std[std_row, self.Batch.cycle_of_sample], np.nan)
+
+        max_std           = CycleBatch.reduce_segments(np.fmax, dC_std_shifted, self.Batch.offsets[:-1], self.Batch.offsets[1:], empty_value = np.nan)
+        std_threshold     = max_std_threshold_fraction * max_std
+        low_C_mask        = has_std_value & (dC_std_shifted < std_threshold[self.Batch.cycle_of_sample])
+
+        low_C_mask       &= local_idx <= self.Batch.T_max_idx[self.Batch.cycle_of_sample] # only before T_max
+
+        # C above the percentile at sample # L + lag sets label L to False, see apply_C_percentile_mask_on_dC
+        C_percentile_value= self._percentile_of_cycles(self.Batch.C_values, percentile_crit)
+        C_ahead           = self.Batch.C_values[np.minimum(np.arange(len(local_idx)) + lag, len(local_idx) - 1)]
+        low_C_mask       &= ~(has_std_value & (C_ahead > C_percentile_value[self.Batch.cycle_of_sample]))
+
+        return low_C_mask
+
+
+    def _percentile_of_cycles(self, values, percentile_crit) -> np.ndarray:
+        '''np.percentile of the values of every cycle (linear method), with one sort of the padded 2-D values: the padding is inf, so
+        it is sorted after the values of the cycle'''
+
+        sorted_values    = np.sort(self.Batch.padded(values, fill_value = np.inf).T, axis = 1)
+        quantile         = np.true_divide(percentile_crit, 100)
+        virtual_idx      = (self.Batch.number_of_samples - 1) * quantile
+        previous_idx     = np.floor(virtual_idx)
+        gamma            = virtual_idx - previous_idx
+        previous_position= previous_idx.astype(np.int64)
+        next_position    = np.minimum(previous_position + 1, self.Batch.number_of_samples - 1)
+
+        previous_values  = sorted_values[self.cycle_ids, previous_position]
+        next_values      = sorted_values[self.cycle_ids, next_position]
+        difference       = next_values - previous_values
+        return np.where(gamma >= 0.5, next_values - difference * (1 - gamma), previous_values + difference * gamma) # like np.percentile
+
+
+    def group_low_C_zones(self, low_C_mask):
+        '''Run-length encoding of the low-C mask of the batch, see LowCZoneAndHotrinseFinder.group_low_C_zones. The first samples of
+        every cycle are False, so no zone runs over 2 cycles, and the last ones too, so every zone ends in its cycle
+        OUTPUT: zone_cycle, zone_start_idx, zone_duration: arrays of one item per zone, zones in the order of the batch'''
+
+        mask_changes  = np.diff(np.concatenate(([False], low_C_mask, [False])).astype(np.int8))
+        zone_starts   = np.flatnonzero(mask_changes == 1)
+        zone_ends     = np.flatnonzero(mask_changes == -1)
+
+        zone_cycle    = self.Batch.cycle_of_sample[zone_starts]
+        zone_start_idx= self.Batch.local_idx[zone_starts]
+        zone_duration = zone_ends - zone_starts
+        return zone_cycle, zone_start_idx, zone_duration
+
+
+    def obtain_best_low_C_zone_candidates(self, zone_cycle, zone_start_idx, zone_duration, duration_threshold: int = 120, decreases_by: int = -10):
+        '''Best low-C zone of every cycle, see LowCZoneAndHotrinseFinder.obtain_best_low_C_zone_candidate: the 1st zone of the highest
+        duration criterion it meets, else the 1st of the longest zones. Cycles without zones are left to the single-cycle code
+        OUTPUT: low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s'''
+
+        number_of_cycles  = self.Batch.number_of_cycles
+        sorted_thresholds = np.sort(np.asarray(list(range(duration_threshold, 0, decreases_by)), dtype = np.int64))
+        criterion_ranks   = len(sorted_thresholds) - np.searchsorted(sorted_thresholds, zone_duration, side = 'right')
+
+        zone_offsets      = np.searchsorted(zone_cycle, np.arange(number_of_cycles + 1), side = 'left')
+        has_zones         = zone_offsets[1:] > zone_offsets[:-1]
+        min_rank          = CycleBatch.reduce_segments(np.minimum, criterion_ranks, zone_offsets[:-1], zone_offsets[1:], empty_value = len(sorted_thresholds))
+        max_duration      = CycleBatch.reduce_segments(np.maximum, zone_duration, zone_offsets[:-1], zone_offsets[1:], empty_value = -1)
+
+        first_of_min_rank = CycleBatch.first_per_cycle(criterion_ranks == min_rank[zone_cycle], zone_cycle, number_of_cycles)
+        first_longest     = CycleBatch.first_per_cycle(zone_duration == max_duration[zone_cycle], zone_cycle, number_of_cycles)
+        best_zone         = np.where(min_rank < len(sorted_thresholds), first_of_min_rank, first_longest)
+
+        self.is_left_to_single_cycle |= ~has_zones # ValueError of np.argmax on no zones
+        self.fallbacks['longest low-C zone'] = has_zones & (min_rank == len(sorted_thresholds))
+        best_zone            = np.maximum(best_zone, 0)
+        low_C_zone_start_idx = np.where(has_zones, zone_start_idx[best_zone] if len(zone_cycle) else 0, 0)
+        zone_duration_s      = np.where(has_zones, zone_duration[best_zone] if len(zone_cycle) else 0, 0)
+        low_C_zone_start_t_ns= self.Batch.t_ns[self.Batch.offsets[:-1] + low_C_zone_start_idx]
+
+        logger.info(f"Found low-C zones in {np.count_nonzero(has_zones)} of {number_of_cycles} cycles")
+        return low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s
+
+
+    def smoothen_large_C_peaks(self, large_C_search_time_fraction_threshold = 0.25):
+        '''C of the batch with the early C peaks squashed, see EarlyCmaxHandler: the C_max in the earliest fraction of its cycle is
+        scaled by C_mean/C_max from the last sample <= C_mean before it to the 1st one after it, then smoothed by a rolling mean of
+        2 samples (on the padded 2-D C of those zones). dC is only read by the masks, which come before, so it is not squashed
+        OUTPUT: is_there_early_large_C (0/1 per cycle), C_values of the batch'''
+
+        large_C_threshold_time_idx = (self.Batch.number_of_samples * large_C_search_time_fraction_threshold).astype(np.int64)
+        is_there_early_large_C     = (self.Batch.C_max_idx < large_C_threshold_time_idx).astype(int)
+        C_values                   = self.Batch.C_values.copy()
+        early_cycles               = np.flatnonzero(is_there_early_large_C)
+        if early_cycles.size == 0:
+            return is_there_early_large_C, C_values
+
+        C_max_sample     = self.Batch.offsets[:-1] + self.Batch.C_max_idx
+        is_below_mean    = self.Batch.C_values <= self.Batch.C_mean[self.Batch.cycle_of_sample]
+        first_below_right= CycleBatch.first_per_cycle(is_below_mean & (np.arange(len(C_values)) >= C_max_sample[self.Batch.cycle_of_sample]),
+                                                      self.Batch.cycle_of_sample, self.Batch.number_of_cycles)
+        last_below_left  = CycleBatch.last_per_cycle(is_below_mean & (np.arange(len(C_values)) <= C_max_sample[self.Batch.cycle_of_sample]),
+                                                     self.Batch.cycle_of_sample, self.Batch.number_of_cycles)
+        zone_starts      = np.where(last_below_left >= 0, last_below_left, C_max_sample)[early_cycles]      # np.argmax gives 0 if none
+        zone_ends        = np.where(first_below_right >= 0, first_below_right, C_max_sample)[early_cycles] + 1
+
+        zone_lengths     = zone_ends - zone_starts
+        zone_of_sample   = np.repeat(np.arange(len(early_cycles)), zone_lengths)
+        zone_samples     = np.arange(zone_lengths.sum()) - np.repeat(np.cumsum(zone_lengths) - zone_lengths, zone_lengths)
+        batch_samples    = zone_starts[zone_of_sample] + zone_samples
+
+        reduction_factor = self.Batch.C_mean[early_cycles]/self.Batch.C_max[early_cycles]
+        C_scaled         = np.full((int(zone_lengths.max()), len(early_cycles)), np.nan)
+        C_scaled[zone_samples, zone_of_sample] = self.Batch.C_values[batch_samples] * reduction_factor[zone_of_sample]
+        C_smoothed       = pd.DataFrame(C_scaled).rolling(window = 2).mean().to_numpy()
+        C_smoothed[0]    = C_scaled[0] # fill gaps between C_max zone and part before it
+
+        C_values[batch_samples] = C_smoothed[zone_samples, zone_of_sample]
+        logger.info(f"Early C_max in {len(early_cycles)} of {self.Batch.number_of_cycles} cycles, smoothened C")
+        return is_there_early_large_C, C_values
+
+
+    def get_low_C_zone_KPIs(self, C_values, low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s) -> dict:
+        '''Low-C zone KPIs of every cycle, see LowCZoneAndHotrinseFinder.get_low_C_zone_KPIs
+        OUTPUT: dict of the KPI arrays, with the keys of the single-cycle dict'''
+
+        low_C_zone_end_idx  = low_C_zone_start_idx + zone_duration_s
+        low_C_zone_end_t_ns = low_C_zone_start_t_ns + zone_duration_s * self.NS_PER_S
+        segment_starts      = self.Batch.offsets[:-1] + low_C_zone_start_idx
+        segment_ends        = self.Batch.offsets[:-1] + np.minimum(low_C_zone_end_idx + 1, self.Batch.number_of_samples)
+        segment_lengths     = segment_ends - segment_starts
+
+        C_recession_avg = self._means_of_segments(C_values, segment_starts, segment_ends)
+        C_deviations    = C_values - np.repeat(C_recession_avg, self.Batch.number_of_samples)
+        C_recession_std = np.sqrt(self._means_of_segments(C_deviations * C_deviations, segment_starts, segment_ends))
+        has_values      = segment_lengths > 0
+
+        return {'low-C zone start time [ns]':low_C_zone_start_t_ns,
+                'low-C zone end time [ns]':  low_C_zone_end_t_ns,
+                'low-C zone start idx [#]':  low_C_zone_start_idx,
+                'low-C zone end idx [#]':    low_C_zone_end_idx,
+                'low-C zone duration [s]':   zone_duration_s,
+                'C avg (water)':             np.where(has_values, C_recession_avg, 0),
+                'C min (water)':             np.minimum(CycleBatch.reduce_segments(np.minimum, C_values, segment_starts, segment_ends, empty_value = 0), 0),
+                'C max (water)':             np.maximum(CycleBatch.reduce_segments(np.maximum, C_values, segment_starts, segment_ends, empty_value = 0), 0),
+                'C std (water)':             np.where(has_values, C_recession_std, 0), }
+
+
+    @staticmethod
+    def _means_of_segments(values, segment_starts, segment_ends) -> np.ndarray:
+        '''Means of the segments values[starts[i]:ends[i]], NaN for empty segments'''
+
+        segment_lengths = segment_ends - segment_starts
+        segment_sums    = CycleBatch.reduce_segments(np.add, values, segment_starts, segment_ends)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return np.where(segment_lengths > 0, segment_sums / np.maximum(segment_lengths, 1), np.nan)
+
+
+    def _means_of_cycles(self, values) -> np.ndarray:
+        return self._means_of_segments(values, self.Batch.offsets[:-1], self.Batch.offsets[1:])
+
+
+    def find_hot_rinse_times(self, C_values, low_C_zone_end_t_ns, num_neighbors = 3, time_between_hotrinse_Tmax_in_min = 4):
+        '''Hot rinse of every cycle, see LowCZoneAndHotrinseFinder.find_hot_rinse_time: the dC peak of the 1st dT peak with a dC peak
+        within num_neighbors seconds, both between the low-C zone end and T_max and above their thresholds, else a default before T_max
+        OUTPUT: hotrinse_t_ns, hotrinse_idx'''
+
+        T_threshold = self._means_of_cycles(self.Batch.T_values) * 0.3
+        C_threshold = self._means_of_cycles(C_values) * 0.5
+
+        dT_cycle, dT_peaks_t_ns = self.Batch.event_cycle['dT_relative_max'], self.Batch.event_t_ns['dT_relative_max']
+        dC_cycle, dC_peaks_t_ns = self.Batch.event_cycle['dC_relative_max'], self.Batch.event_t_ns['dC_relative_max']
+        dT_peaks_mask = (low_C_zone_end_t_ns[dT_cycle] < dT_peaks_t_ns) & (dT_peaks_t_ns < self.Batch.T_max_t_ns[dT_cycle]) \
+                        & (self._cycle_values_at_times(self.Batch.T_values, dT_cycle, dT_peaks_t_ns) > T_threshold[dT_cycle])
+        dC_peaks_mask = (low_C_zone_end_t_ns[dC_cycle] < dC_peaks_t_ns) & (dC_peaks_t_ns < self.Batch.T_max_t_ns[dC_cycle]) \
+                        & (self._cycle_values_at_times(C_values, dC_cycle, dC_peaks_t_ns) > C_threshold[dC_cycle])
+
+        _, dC_pos     = self._first_matches('dT_relative_max', 'dC_relative_max', num_neighbors * self.NS_PER_S, dT_peaks_mask, dC_peaks_mask)
+        is_matched    = dC_pos >= 0
+        default_t_ns  = self.Batch.T_max_t_ns - self.SECS_PER_MINUTE * time_between_hotrinse_Tmax_in_min * self.NS_PER_S
+
+        hotrinse_t_ns = np.where(is_matched, dC_peaks_t_ns[np.maximum(dC_pos, 0)] if dC_peaks_t_ns.size else 0, default_t_ns)
+        hotrinse_idx  = np.where(is_matched, self._idx_of_times(hotrinse_t_ns), self._nearest_idx_of_times(hotrinse_t_ns))
+        self.fallbacks['default hot rinse'] = ~is_matched
+        logger.info(f"Found hot rinse in {np.count_nonzero(is_matched)} of {self.Batch.number_of_cycles} cycles, default value for the others")
+        return hotrinse_t_ns, hotrinse_idx
+
+
+    def find_prerinse_times(self, low_C_zone_start_t_ns, hotrinse_idx, time_between_prerinse_Tmax_in_min = 7, prerinse_hotrinse_limit_s = 200):
+        '''Pre-rinse of every cycle, see PrerinsePostmilkflushFinder.find_prerinse_time: the last dC drop before the low-C zone, else
+        the last dF peak before it, else a default before T_max. A pre-rinse more than prerinse_hotrinse_limit_s samples before hot
+        rinse is set to that limit, cycles where this is before their start are left to the single-cycle code (IndexError)
+        OUTPUT: prerinse_t_ns, prerinse_idx'''
+
+        dF_cycle, dF_peaks_t_ns = self.Batch.event_cycle['dF_relative_max'], self.Batch.event_t_ns['dF_relative_max']
+        dC_cycle, dC_drops_t_ns = self.Batch.event_cycle['dC_relative_min'], self.Batch.event_t_ns['dC_relative_min']
+        last_dF_peak = CycleBatch.last_per_cycle(dF_peaks_t_ns <= low_C_zone_start_t_ns[dF_cycle], dF_cycle, self.Batch.number_of_cycles)
+        last_dC_drop = CycleBatch.last_per_cycle(dC_drops_t_ns <= low_C_zone_start_t_ns[dC_cycle], dC_cycle, self.Batch.number_of_cycles)
+
+        is_default    = (last_dF_peak < 0) & (last_dC_drop < 0)
+        default_t_ns  = self.Batch.T_max_t_ns - self.SECS_PER_MINUTE * time_between_prerinse_Tmax_in_min * self.NS_PER_S
+        found_t_ns    = np.where(last_dC_drop >= 0, dC_drops_t_ns[np.maximum(last_dC_drop, 0)] if dC_drops_t_ns.size else 0,
+                                                    dF_peaks_t_ns[np.maximum(last_dF_peak, 0)] if dF_peaks_t_ns.size else 0)
+        prerinse_t_ns = np.where(is_default, default_t_ns, found_t_ns)
+        prerinse_idx  = np.where(is_default, self._nearest_idx_of_times(prerinse_t_ns), self._idx_of_times(prerinse_t_ns))
+
+        is_far_from_hotrinse = (~is_default) & ((hotrinse_idx - prerinse_idx) > prerinse_hotrinse_limit_s)
+        limited_idx          = hotrinse_idx - prerinse_hotrinse_limit_s
+        self.is_left_to_single_cycle |= is_far_from_hotrinse & (limited_idx < 0)
+        self.fallbacks['default pre-rinse']              = is_default
+        self.fallbacks['pre-rinse limited by hot rinse'] = is_far_from_hotrinse
+
+        prerinse_idx  = np.where(is_far_from_hotrinse, np.maximum(limited_idx, 0), prerinse_idx)
+        prerinse_t_ns = np.where(is_far_from_hotrinse, self.Batch.t_ns[self.Batch.offsets[:-1] + prerinse_idx], prerinse_t_ns)
+        return prerinse_t_ns, prerinse_idx
+
+
+    def find_postmilk_flush_times(self, C_values, is_there_early_large_C, low_C_zone_start_t_ns, prerinse_idx, num_neighbors = 8,
+                                  time_between_postmilk_Tmax_in_min = 12, C_crit_fraction = 0.01):
+        '''Postmilk flush of every cycle, see PrerinsePostmilkflushFinder.find_postmilk_flush_time_depending_on_early_sharp_C. Without
+        an early C peak: the 1st dC peak before pre-rinse above the C threshold. With one: the dF peak of the 1st dC peak (above the
+        C and F thresholds) with a dF peak within num_neighbors seconds, both before the low-C zone. Else a default before T_max
+        OUTPUT: post_milk_flush_t_ns, post_milk_flush_idx'''
+
+        C_threshold = self._means_of_cycles(C_values) * C_crit_fraction
+        F_threshold = C_threshold # the single-cycle code compares F with the C mean too
+
+        dC_cycle, dC_peaks_t_ns = self.Batch.event_cycle['dC_relative_max'], self.Batch.event_t_ns['dC_relative_max']
+        dF_cycle, dF_peaks_t_ns = self.Batch.event_cycle['dF_relative_max'], self.Batch.event_t_ns['dF_relative_max']
+        dC_peaks_sample = self.Batch.find_sample(dC_cycle, dC_peaks_t_ns)
+        dC_peaks_C      = self._cycle_values_at_times(C_values, dC_cycle, dC_peaks_t_ns)
+        is_early        = is_there_early_large_C.astype(bool)
+
+        # no early C peak
+        dC_peaks_mask   = (self.Batch.local_idx[np.maximum(dC_peaks_sample, 0)] < prerinse_idx[dC_cycle]) & (dC_peaks_C > C_threshold[dC_cycle])
+        first_dC_peak   = CycleBatch.first_per_cycle(dC_peaks_mask & ~is_early[dC_cycle], dC_cycle, self.Batch.number_of_cycles)
+
+        # early C peak
+        dC_peaks_mask_early = (dC_peaks_t_ns < low_C_zone_start_t_ns[dC_cycle]) & (dC_peaks_C > C_threshold[dC_cycle]) \
+                              & (self._cycle_values_at_times(self.Batch.F_values, dC_cycle, dC_peaks_t_ns) > F_threshold[dC_cycle]) & is_early[dC_cycle]
+        dF_peaks_mask_early = (dF_peaks_t_ns < low_C_zone_start_t_ns[dF_cycle]) & is_early[dF_cycle]
+        _, dF_pos           = self._first_matches('dC_relative_max', 'dF_relative_max', num_neighbors * self.NS_PER_S, dC_peaks_mask_early, dF_peaks_mask_early)
+
+        found_t_ns   = np.where(is_early, dF_peaks_t_ns[np.maximum(dF_pos, 0)] if dF_peaks_t_ns.size else 0,
+                                          dC_peaks_t_ns[np.maximum(first_dC_peak, 0)] if dC_peaks_t_ns.size else 0)
+        is_found     = np.where(is_early, dF_pos >= 0, first_dC_peak >= 0)
+        default_t_ns = self.Batch.T_max_t_ns - self.SECS_PER_MINUTE * time_between_postmilk_Tmax_in_min * self.NS_PER_S
+
+        post_milk_flush_t_ns = np.where(is_found, found_t_ns, default_t_ns)
+        post_milk_flush_idx  = np.where(is_found, self._idx_of_times(post_milk_flush_t_ns), self._nearest_idx_of_times(post_milk_flush_t_ns))
+        self.fallbacks['default post-milk flush'] = ~is_found
+        logger.info(f"Found post-milk flush in {np.count_nonzero(is_found)} of {self.Batch.number_of_cycles} cycles, default value for the others")
+        return post_milk_flush_t_ns, post_milk_flush_idx
+
+
+    def find_post_rinse_start_times(self, num_neighbors = 8, Tmax_postrinse_timeout_s = 60):
+        '''Post-rinse start of every cycle, see PostRinseFinder.find_post_rinse_start_time: the later of the 1st dT drop after T_max
+        and its 1st dC drop within num_neighbors seconds, the 1st dT drop after T_max if that is more than Tmax_postrinse_timeout_s
+        after T_max, else T_max
+        OUTPUT: postrinse_t_ns, postrinse_idx'''
+
+        dT_cycle, dT_drops_t_ns = self.Batch.event_cycle['dT_relative_min'], self.Batch.event_t_ns['dT_relative_min']
+        dC_drops_t_ns           = self.Batch.event_t_ns['dC_relative_min']
+        dT_drops_mask           = dT_drops_t_ns > self.Batch.T_max_t_ns[dT_cycle]
+
+        dT_pos, dC_pos = self._first_matches('dT_relative_min', 'dC_relative_min', num_neighbors * self.NS_PER_S, dT_drops_mask)
+        is_matched     = dT_pos >= 0
+        matched_t_ns   = np.maximum(dT_drops_t_ns[np.maximum(dT_pos, 0)] if dT_drops_t_ns.size else 0,
+                                    dC_drops_t_ns[np.maximum(dC_pos, 0)] if dC_drops_t_ns.size else 0)
+        is_too_late    = is_matched & ((matched_t_ns - self.Batch.T_max_t_ns)/self.NS_PER_S > Tmax_postrinse_timeout_s)
+        first_dT_drop  = CycleBatch.first_per_cycle(dT_drops_mask, dT_cycle, self.Batch.number_of_cycles)
+        matched_t_ns   = np.where(is_too_late, dT_drops_t_ns[np.maximum(first_dT_drop, 0)] if dT_drops_t_ns.size else 0, matched_t_ns)
+
+        postrinse_t_ns = np.where(is_matched, matched_t_ns, self.Batch.T_max_t_ns)
+        postrinse_idx  = np.where(is_matched, self._idx_of_times(postrinse_t_ns), self.Batch.T_max_idx)
+        self.fallbacks['post-rinse start at 1st T drop'] = is_too_late
+        self.fallbacks['post-rinse start at T_max']      = ~is_matched
+        return postrinse_t_ns, postrinse_idx
+
+
+    def find_post_rinse_end_times(self, postrinse_t_ns, num_neighbors = 8, postrinse_duration_limit_s = 90, postrinse_default_duration_s = 60):
+        '''Post-rinse end of every cycle, see PostRinseFinder.find_post_rinse_end_time: the 1st dT peak after post-rinse (or the dC
+        peak within num_neighbors seconds of it), else the 1st dC peak after post-rinse, each if post-rinse lasts less than
+        postrinse_duration_limit_s, else postrinse_default_duration_s after post-rinse
+        OUTPUT: post_rinse_end_t_ns, postrinse_end_idx'''
+
+        dT_cycle, dT_peaks_t_ns = self.Batch.event_cycle['dT_relative_max'], self.Batch.event_t_ns['dT_relative_max']
+        dC_cycle, dC_peaks_t_ns = self.Batch.event_cycle['dC_relative_max'], self.Batch.event_t_ns['dC_relative_max']
+        dT_peaks_after_mask     = dT_peaks_t_ns > postrinse_t_ns[dT_cycle]
+        dC_peaks_after_mask     = dC_peaks_t_ns > postrinse_t_ns[dC_cycle]
+        first_dT_peak           = CycleBatch.first_per_cycle(dT_peaks_after_mask, dT_cycle, self.Batch.number_of_cycles)
+        first_dC_peak           = CycleBatch.first_per_cycle(dC_peaks_after_mask, dC_cycle, self.Batch.number_of_cycles)
+
+        is_first_dT_peak = np.zeros(len(dT_peaks_t_ns), dtype = bool)
+        is_first_dT_peak[first_dT_peak[first_dT_peak >= 0]] = True
+        _, dC_pos        = self._first_matches('dT_relative_max', 'dC_relative_max', num_neighbors * self.NS_PER_S, is_first_dT_peak, dC_peaks_after_mask)
+
+        T_method_t_ns = np.where(dC_pos >= 0, dC_peaks_t_ns[np.maximum(dC_pos, 0)] if dC_peaks_t_ns.size else 0,
+                                              dT_peaks_t_ns[np.maximum(first_dT_peak, 0)] if dT_peaks_t_ns.size else 0)
+        C_method_t_ns = dC_peaks_t_ns[np.maximum(first_dC_peak, 0)] if dC_peaks_t_ns.size else np.zeros_like(postrinse_t_ns)
+        is_T_method   = (first_dT_peak >= 0) & ((T_method_t_ns - postrinse_t_ns)/self.NS_PER_S < postrinse_duration_limit_s)
+        is_C_method   = (~is_T_method) & (first_dC_peak >= 0) & ((C_method_t_ns - postrinse_t_ns)/self.NS_PER_S < postrinse_duration_limit_s)
+        is_default    = ~(is_T_method | is_C_method)
+
+        post_rinse_end_t_ns = np.where(is_T_method, T_method_t_ns, np.where(is_C_method, C_method_t_ns, postrinse_t_ns + postrinse_default_duration_s * self.NS_PER_S))
+        postrinse_end_idx   = np.where(is_default, self._nearest_idx_of_times(post_rinse_end_t_ns), self._idx_of_times(post_rinse_end_t_ns))
+        self.fallbacks['post-rinse end by C method'] = is_C_method
+        self.fallbacks['default post-rinse end']     = is_default
+        return post_rinse_end_t_ns, postrinse_end_idx
+
+
+    def collect_rinse_KPIs(self, C_values, hot_rinse_idx, post_rinse_idx, low_C_zone_KPIs) -> dict:
+        '''Mean C of hot rinse of every cycle, without the C of water, see PostRinseFinder.collect_rinse_KPIs
+        OUTPUT: dict of the KPI arrays, with the keys of the single-cycle dict'''
+
+        C_mean_hot_rinse          = self._means_of_segments(C_values, self.Batch.offsets[:-1] + hot_rinse_idx,
+                                                            self.Batch.offsets[:-1] + np.maximum(post_rinse_idx, hot_rinse_idx))
+        C_mean_hot_rinse_no_water = C_mean_hot_rinse - low_C_zone_KPIs['C avg (water)']
+
+        sigma_of_solution_type = {ci.Constants.acid_keyword:     ci.Constants.sigma_acid,
+                                  ci.Constants.alkaline_keyword: ci.Constants.sigma_alkaline,
+                                  ci.Constants.other_keyword:    ci.Constants.sigma_other}
+        sigmas = np.array([sigma_of_solution_type[solution_type] for solution_type in self.list_of_solution_types], dtype = np.float64)
+
+        return {'C_avg hot rinse [mS/cm]':           C_mean_hot_rinse,
+                'C_avg hot rinse, no water [mS/cm]': C_mean_hot_rinse_no_water,
+                'C_avg hot rinse, no water [%]':     C_mean_hot_rinse_no_water/sigmas}
+
+
+    def find_blowout_durations(self, F_fraction = 30, blowout_threshold = 50) -> np.ndarray:
+        '''Blowout duration of every cycle, see Blowout.find_blowout_duration_s: one find_peaks call on the F of all cycles, with an
+        inf sample between the cycles. The inf samples are peaks themselves and are left out, no sample next to them can be a peak,
+        and the steps to and from them stop the rise and the fall around a blowout at the ends of its cycle, like the single-cycle code
+        OUTPUT: float array of durations [s], NaN if the start or stop has no time, -1 for cycles without blowout (0 in the output)'''
+
+        number_of_cycles = self.Batch.number_of_cycles
+        F_threshold      = CycleBatch.reduce_segments(np.fmax, self.Batch.F_values, self.Batch.offsets[:-1], self.Batch.offsets[1:], empty_value = np.nan) / F_fraction
+
+        separated_position = np.arange(len(self.Batch.F_values)) + self.Batch.cycle_of_sample + 1 # position of every sample among the separators
+        F_separated        = np.full(len(self.Batch.F_values) + number_of_cycles + 1, np.inf)
+        F_separated[separated_position] = self.Batch.F_values
+        height_separated   = np.zeros(len(F_separated))
+        height_separated[separated_position] = F_threshold[self.Batch.cycle_of_sample]
+
+        F_peaks, _         = find_peaks(F_separated, height = height_separated)
+        F_peaks            = F_peaks[np.isfinite(F_separated[F_peaks])]
+        peak_sample        = self._batch_sample_of_separated(F_peaks, separated_position)
+        peak_cycle         = self.Batch.cycle_of_sample[peak_sample]
+        is_after_T_max     = self.Batch.local_idx[peak_sample] > self.Batch.T_max_idx[peak_cycle]
+
+        first_peak         = CycleBatch.first_per_cycle(is_after_T_max, peak_cycle, number_of_cycles)
+        first_large_peak   = CycleBatch.first_per_cycle(is_after_T_max & (self.Batch.F_values[peak_sample] > blowout_threshold), peak_cycle, number_of_cycles)
+        blowout_peak       = np.where(first_large_peak >= 0, first_large_peak, first_peak)
+        has_blowout        = blowout_peak >= 0
+        blowout_peak       = F_peaks[np.maximum(blowout_peak, 0)] if F_peaks.size else np.zeros(number_of_cycles, dtype = np.int64)
+
+        dF_steps           = np.diff(F_separated)
+        not_rising_idx     = np.flatnonzero(~(dF_steps > 0))
+        not_falling_idx    = np.flatnonzero(~(dF_steps < 0))
+        blowout_start      = not_rising_idx[np.maximum(np.searchsorted(not_rising_idx, blowout_peak, side = 'left') - 1, 0)] + 1
+        blowout_stop       = not_falling_idx[np.minimum(np.searchsorted(not_falling_idx, blowout_peak, side = 'left'), len(not_falling_idx) - 1)]
+        blowout_start      = self._batch_sample_of_separated(blowout_start, separated_position)
+        blowout_stop       = self._batch_sample_of_separated(blowout_stop, separated_position)
+
+        has_times          = self.Batch.has_time[blowout_start] & self.Batch.has_time[blowout_stop]
+        blowout_duration_s = np.where(has_times, (self.Batch.t_ns[blowout_stop] - self.Batch.t_ns[blowout_start])/self.NS_PER_S, np.nan)
+        self.fallbacks['no blowout'] = ~has_blowout
+        logger.info(f"Found blowout in {np.count_nonzero(has_blowout)} of {number_of_cycles} cycles")
+        return np.where(has_blowout, blowout_duration_s, -1)
+
+
+    @staticmethod
+    def _batch_sample_of_separated(position, separated_position) -> np.ndarray:
+        '''Batch position of the samples at position among the separators, see find_blowout_durations'''
+        return np.clip(np.searchsorted(separated_position, position, side = 'left'), 0, len(separated_position) - 1)
+
+
+    def identify_phases(self) -> list:
+        '''Finds the phases of all cycles, in the order of ResultingPhases
+        OUTPUT: list of BatchedCyclePhases, one per cycle of the batch, None for the cycles the single-cycle code must redo'''
+
+        with instrumentation.span('low-C masks'):
+            low_C_mask = self.make_low_C_mask(roll_window_size = 3, max_std_threshold_fraction = 0.1, percentile_crit = 40)
+        with instrumentation.span('early C peak'):
+            is_there_early_large_C, C_values = self.smoothen_large_C_peaks(large_C_search_time_fraction_threshold = 0.25)
+
+        with instrumentation.span('low-C zone'):
+            low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s = self.obtain_best_low_C_zone_candidates(*self.group_low_C_zones(low_C_mask))
+            low_C_zone_KPIs = self.get_low_C_zone_KPIs(C_values, low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s)
+        with instrumentation.span('hot rinse'):
+            hot_rinse_t_ns, hot_rinse_idx = self.find_hot_rinse_times(C_values, low_C_zone_KPIs['low-C zone end time [ns]'], num_neighbors = 3, time_between_hotrinse_Tmax_in_min = 4)
+
+        with instrumentation.span('pre-rinse'):
+            prerinse_t_ns, prerinse_idx = self.find_prerinse_times(low_C_zone_start_t_ns, hot_rinse_idx, time_between_prerinse_Tmax_in_min = 7, prerinse_hotrinse_limit_s = 200)
+        with instrumentation.span('post-milk flush'):
+            post_milk_flush_t_ns, post_milk_flush_idx = self.find_postmilk_flush_times(C_values, is_there_early_large_C, low_C_zone_start_t_ns, prerinse_idx)
+
+        with instrumentation.span('post-rinse'):
+            postrinse_t_ns, postrinse_idx          = self.find_post_rinse_start_times(num_neighbors = 8, Tmax_postrinse_timeout_s = 60)
+            post_rinse_end_t_ns, postrinse_end_idx = self.find_post_rinse_end_times(postrinse_t_ns, num_neighbors = 8)
+        with instrumentation.span('rinse KPIs'):
+            rinse_KPIs                             = self.collect_rinse_KPIs(C_values, hot_rinse_idx, postrinse_idx, low_C_zone_KPIs)
+        with instrumentation.span('blowout'):
+            blowout_duration                       = self.find_blowout_durations()
+
+        # the cycles left to the single-cycle code are counted there
+        is_batched = ~self.is_left_to_single_cycle
+        instrumentation.count('early C peaks', int(np.count_nonzero(is_there_early_large_C.astype(bool) & is_batched)))
+        for fallback_name, is_taken in self.fallbacks.items():
+            instrumentation.count(f"fallback: {fallback_name}", int(np.count_nonzero(is_taken & is_batched)))
+        instrumentation.count('fallback: cycles left to the single-cycle code', int(np.count_nonzero(self.is_left_to_single_cycle)))
+
+        list_of_cycle_phases = []
+        for cycle_id, cycle_signals in enumerate(self.Batch.list_of_cycle_signals):
+            if self.is_left_to_single_cycle[cycle_id]:
+                list_of_cycle_phases.append(None)
+                continue
+
+            list_of_cycle_phases.append(BatchedCyclePhases(cycle_signals,
+                                        is_there_early_large_C= int(is_there_early_large_C[cycle_id]),
+                                        low_C_zone_start_t_ns = low_C_zone_start_t_ns[cycle_id],
+                                        low_C_zone_start_idx  = int(low_C_zone_start_idx[cycle_id]),
+                                        zone_duration_s       = int(zone_duration_s[cycle_id]),
+                                        low_C_zone_KPIs       = {key: values[cycle_id] for key, values in low_C_zone_KPIs.items()},
+                                        hot_rinse_t_ns        = hot_rinse_t_ns[cycle_id],
+                                        hot_rinse_idx         = int(hot_rinse_idx[cycle_id]),
+                                        prerinse_t_ns         = prerinse_t_ns[cycle_id],
+                                        prerinse_idx          = int(prerinse_idx[cycle_id]),
+                                        post_milk_flush_t_ns  = post_milk_flush_t_ns[cycle_id],
+                                        post_milk_flush_idx   = int(post_milk_flush_idx[cycle_id]),
+                                        postrinse_t_ns        = postrinse_t_ns[cycle_id],
+                                        postrinse_idx         = int(postrinse_idx[cycle_id]),
+                                        post_rinse_end_t_ns   = post_rinse_end_t_ns[cycle_id],
+                                        postrinse_end_idx     = int(postrinse_end_idx[cycle_id]),
+                                        rinse_KPIs            = {**{key: values[cycle_id] for key, values in rinse_KPIs.items()},
+                                                                 'Solution type': self.list_of_solution_types[cycle_id]},
+                                        blowout_duration      = 0 if blowout_duration[cycle_id] == -1 else blowout_duration[cycle_id]))
+
+        logger.info(f"Identified the phases of {self.Batch.number_of_cycles} cycles as a batch, {np.count_nonzero(self.is_left_to_single_cycle)} left to the single-cycle code")
+        return list_of_cycle_phases
@@ -1,4 +1,6 @@
-'''Module that reads info from config file and converts it into a class. It runs the functions/classes, then logs the contents of the config file'''
+'''Module that reads info from config file and converts it into a class, then logs the contents of the config file.
+Nothing is read when importing this module: the config file is read the first time 'Constants' or 'config_info' is used,
+or when load_config() is called. Worker processes can get an already loaded config with set_config()'''
 
 import ast
 import configparser
@@ -6,22 +8,21 @@ import os
 
 from logging_maker import logger
 
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'configuration.ini')
+
+
 class ConfigFileReader():
     '''This class gets info from config file and turns it into string type, stored in a dict'''
 
-    def obtain_info_from_config(self):
-        '''Get info from config.ini file'''
+    def __init__(self, config_path = DEFAULT_CONFIG_PATH):
+        self.config_path = config_path
 
-        code_path = r'C:\consumables_cleaning\new_structure'
-        os.chdir(code_path)
 
-        list_of_files        = os.listdir()
-        config_file_extension= '.ini'
+    def obtain_info_from_config(self):
+        '''Get info from config.ini file'''
 
-        config_file_list = [item for item in list_of_files if config_file_extension in item]
-        config_file      = ''.join(config_file_list)
         config_parser    = configparser.ConfigParser()
-        config_parser.read(config_file)
+        config_parser.read(self.config_path)
 
         # Extract info from config file AS STRING
         file_section           = 'File'
@@ -47,6 +48,17 @@ class ConfigFileReader():
         sigma_other_str        = config_parser.get(constants_section, 'sigma_other')
         t_cond_water_str       = config_parser.get(constants_section, 't_cond_water')
 
+        cache_section          = 'Cache'
+        use_parse_cache_str    = config_parser.get(cache_section, 'use_parse_cache')
+        max_cache_size_mb_str  = config_parser.get(cache_section, 'max_cache_size_mb')
+
+        engine_section         = 'Engine'
+        data_cleaning_engine_str= config_parser.get(engine_section, 'data_cleaning_engine', fallback = "'pandas'") # older config files have no Engine section
+        csv_engine_str         = config_parser.get(engine_section, 'csv_engine', fallback = "'c'")
+
+        sampling_section       = 'Sampling'
+        regrid_to_1_s_str      = config_parser.get(sampling_section, 'regrid_to_1_s', fallback = 'True') # older config files have no Sampling section
+
         logger.info("Successfully obtained info from config.ini file")
 
         config_info_str = { 
@@ -65,6 +77,11 @@ class ConfigFileReader():
                           'sigma_acid_str':          sigma_acid_str,
                           'sigma_other_str':         sigma_other_str,
                           't_cond_water_str':        t_cond_water_str,
+                          'use_parse_cache_str':     use_parse_cache_str,
+                          'max_cache_size_mb_str':   max_cache_size_mb_str,
+                          'data_cleaning_engine_str':data_cleaning_engine_str,
+                          'csv_engine_str':          csv_engine_str,
+                          'regrid_to_1_s_str':       regrid_to_1_s_str,
                           }
 
         return config_info_str
@@ -91,6 +108,11 @@ class ConfigFileReader():
             sigma_acid          = ast.literal_eval(config_info_str['sigma_acid_str'])
             sigma_other         = ast.literal_eval(config_info_str['sigma_other_str'])
             t_cond_water        = ast.literal_eval(config_info_str['t_cond_water_str'])
+            use_parse_cache     = ast.literal_eval(config_info_str['use_parse_cache_str'])
+            max_cache_size_mb   = ast.literal_eval(config_info_str['max_cache_size_mb_str'])
+            data_cleaning_engine= ast.literal_eval(config_info_str['data_cleaning_engine_str'])
+            csv_engine          = ast.literal_eval(config_info_str['csv_engine_str'])
+            regrid_to_1_s       = ast.literal_eval(config_info_str['regrid_to_1_s_str'])
 
             logger.info("Successfully turned config file into string type")
 
@@ -110,6 +132,11 @@ class ConfigFileReader():
             sigma_acid          = 7.24
             sigma_other         = 30
             t_cond_water        = 20
+            use_parse_cache     = True
+            max_cache_size_mb   = 500
+            data_cleaning_engine= 'pandas'
+            csv_engine          = 'c'
+            regrid_to_1_s       = True
 
             logger.error("Cannot access .ini file, using manual input")
             logger.error("Make sure there is NO single %% sign at once")
@@ -130,6 +157,11 @@ class ConfigFileReader():
                       'sigma_acid':       sigma_acid,
                       'sigma_other':      sigma_other,
                       't_cond_water':     t_cond_water,
+                      'use_parse_cache':  use_parse_cache,
+                      'max_cache_size_mb':max_cache_size_mb,
+                      'data_cleaning_engine':data_cleaning_engine,
+                      'csv_engine':       csv_engine,
+                      'regrid_to_1_s':    regrid_to_1_s,
                       }
         
         return config_info
@@ -142,16 +174,24 @@ class Dict2ClassConverter:
         self.__dict__.update(dictionary)
 
 
-def run_config_file_reader():
+def run_config_file_reader(config_path = DEFAULT_CONFIG_PATH):
     '''Run the code about extracting info from config file'''
     
-    config_file_reader = ConfigFileReader()
+    config_file_reader = ConfigFileReader(config_path)
     config_info        = config_file_reader.revert_config_info_type_from_str()
 
+    Constants, list_of_config_variables = make_constants(config_info)
+    return Constants, list_of_config_variables, config_info
+
+
+def make_constants(config_info):
+    '''Turns the config_info dict into the Constants class
+    OUTPUT: Constants class, list_of_config_variables (list of variables)'''
+
     Constants               = Dict2ClassConverter(config_info)
     list_of_config_variables= [name for name in dir(Constants) if not callable(getattr(Constants, name)) and not name.startswith('__')]
 
-    return Constants, list_of_config_variables, config_info
+    return Constants, list_of_config_variables
 
 
 def log_config_info(Constants, list_of_config_variables):
@@ -169,7 +209,44 @@ def log_config_info(Constants, list_of_config_variables):
     logger.info(f"t crit [s]: {Constants.time_interval}")
     logger.info(f"Sigma [mS/cm]: {Constants.sigma_alkaline} (alkaline), {Constants.sigma_acid} (acid), {Constants.sigma_other} (other)")
     logger.info(f"Time crit water [s]: {Constants.t_cond_water}")
+    logger.info(f"Parse cache: {Constants.use_parse_cache} (max {Constants.max_cache_size_mb} MB)")
+    logger.info(f"Data cleaning engine: {Constants.data_cleaning_engine}")
+    logger.info(f"csv engine: {Constants.csv_engine}")
+    logger.info(f"Regrid to 1 s: {Constants.regrid_to_1_s}")
+
+
+_loaded_config: dict = {} # holds 'Constants' and 'config_info' once loaded
+
+def load_config(config_path = DEFAULT_CONFIG_PATH):
+    '''Reads the config file and makes it the config used by all modules
+    OUTPUT: Constants class, config_info dict'''
+
+    Constants, list_of_config_variables, config_info = run_config_file_reader(config_path)
+    log_config_info(Constants, list_of_config_variables)
+
+    _loaded_config['Constants']  = Constants
+    _loaded_config['config_info']= config_info
+    return Constants, config_info
+
+
+def set_config(config_info):
+    '''Makes an already loaded config_info dict the config used by all modules, without reading the config file.
+    Used by worker processes, which get the config of the main process
+    OUTPUT: Constants class'''
+
+    Constants, _ = make_constants(config_info)
+
+    _loaded_config['Constants']  = Constants
+    _loaded_config['config_info']= config_info
+    return Constants
+
+
+def __getattr__(name):
+    '''Module attributes 'Constants' and 'config_info' are loaded on first use (PEP 562), so importing this module does no I/O'''
 
+    if name in ('Constants', 'config_info'):
+        if not _loaded_config:
+            load_config()
+        return _loaded_config[name]
 
-Constants, list_of_config_variables, config_info = run_config_file_reader()
-log_config_info(Constants, list_of_config_variables)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -1,9 +1,9 @@
 '''Module containing class that converts csv to usable DataFrame'''
 
 import os
+import numpy as np
 import pandas as pd
 
-from config_info_obtainer import Constants
 from constants import DfConstants
 from logging_maker import logger
 
@@ -34,13 +34,12 @@ class csvToDataframeMaker:
         return input_dataframe
 
 
-    def make_dataframe_of_relevant_columns(self, input_dataframe) -> pd.core.frame.DataFrame:
-        '''Makes new DataFrame of the relevant columns
-        Input:  dataframe of the input csv file, contains all data
-        Output: dataframe of the input csv file, contains relevant data only (time, T, C, F)'''
+    @staticmethod
+    def _get_relevant_and_new_column_names():
+        '''Returns the list of csv columns we care about (time, T, C, F) and the dict that renames them to the df column names'''
 
         relevant_columns   = [DfConstants.excel_time_column,
-                              DfConstants.excel_temperature_column, 
+                              DfConstants.excel_temperature_column,
                               DfConstants.excel_conductivity_column,
                               DfConstants.excel_flow_column]
 
@@ -49,6 +48,106 @@ class csvToDataframeMaker:
                               DfConstants.excel_conductivity_column: DfConstants.df_conductivity_column,
                               DfConstants.excel_flow_column:         DfConstants.df_flow_column}
 
+        return relevant_columns, new_column_names
+
+
+    def save_relevant_data_in_dataframe(self, file_location, time_format: str = None, engine: str = 'c', float_dtype = 'float64',
+                                        float_precision: str = None) -> pd.core.frame.DataFrame:
+        '''Faster alternative to save_data_in_dataframe + make_dataframe_of_relevant_columns. Only the time/T/C/F columns are read,
+        the time column is parsed in one vectorized call instead of once per cell, and the result already has the df column names
+        INPUT:
+            - file_location: folder containing the csv file
+            - time_format: strftime format of the time column (like '%Y-%m-%d %H:%M:%S'), if None it is inferred from the first row
+            - engine: csv parser used by pandas, 'c' (default) or 'pyarrow' (multithreaded, needs the pyarrow package)
+            - float_dtype: dtype of the T/C/F columns, 'float64' gives the same output as save_data_in_dataframe with engine 'c'
+            - float_precision: float converter of the 'c' engine, None (pandas default, like save_data_in_dataframe) or 'round_trip'
+        The 'pyarrow' engine converts the values exactly (correctly rounded), so it gives the values of the 'c' engine with
+        float_precision = 'round_trip'. The default converter of the 'c' engine is faster but not exact: some values differ from
+        these in the last digit of the float, so 'pyarrow' output is not bit-identical to that of save_data_in_dataframe
+        OUTPUT: dataframe of the input csv file, contains relevant data only (time, T, C, F)'''
+
+        file_path                          = os.path.join(file_location, self.filename) # no chdir, so the working directory is left alone
+        relevant_columns, new_column_names = self._get_relevant_and_new_column_names()
+        value_columns                      = relevant_columns[1:]
+
+        if engine == 'pyarrow':
+            # the pyarrow engine does not support decimal = ",", so values come in as strings and are converted below
+            df = pd.read_csv(file_path,
+                             sep      = ";",
+                             quotechar= "\"",
+                             usecols  = relevant_columns,
+                             dtype    = {DfConstants.excel_time_column: str},
+                             engine   = 'pyarrow')
+
+            for column in value_columns:
+                if not pd.api.types.is_numeric_dtype(df[column]):
+                    df[column] = df[column].str.replace(",", ".", regex = False)
+                df[column] = df[column].astype(float_dtype)
+        else:
+            df = pd.read_csv(file_path,
+                             sep      = ";",
+                             decimal  = ",",
+                             quotechar= "\"",
+                             usecols  = relevant_columns,
+                             dtype    = {column: float_dtype for column in value_columns},
+                             engine   = engine,
+                             float_precision = float_precision)
+
+        df[DfConstants.excel_time_column] = pd.to_datetime(df[DfConstants.excel_time_column], format = time_format)
+
+        output_dataframe = df[relevant_columns].rename(columns = new_column_names) # usecols does not keep the order of relevant_columns
+        return output_dataframe
+
+
+    def iterate_relevant_data_in_chunks(self, file_location, chunk_size: int = 100_000, time_format: str = None):
+        '''Streaming version of save_relevant_data_in_dataframe, for files too large to load at once (like a week of logging).
+        Yields the relevant columns chunk by chunk, so memory use depends on chunk_size and not on the file length.
+        The index keeps counting across chunks, like it would for the whole file
+        INPUT:
+            - file_location: folder containing the csv file
+            - chunk_size: # of rows per chunk
+            - time_format: strftime format of the time column, if None it is inferred from the first row of each chunk
+        OUTPUT: generator of dataframes of relevant columns (time, T, C, F)'''
+
+        file_path                          = os.path.join(file_location, self.filename) # no chdir, so the working directory is left alone
+        relevant_columns, new_column_names = self._get_relevant_and_new_column_names()
+        value_columns                      = relevant_columns[1:]
+
+        with pd.read_csv(file_path,
+                         sep      = ";",
+                         decimal  = ",",
+                         quotechar= "\"",
+                         usecols  = relevant_columns,
+                         dtype    = {column: 'float64' for column in value_columns},
+                         chunksize= chunk_size) as csv_reader:
+
+            for chunk in csv_reader:
+                chunk[DfConstants.excel_time_column] = pd.to_datetime(chunk[DfConstants.excel_time_column], format = time_format)
+                yield chunk[relevant_columns].rename(columns = new_column_names)
+
+
+    @staticmethod
+    def convert_dataframe_to_arrays(df_relevant: pd.core.frame.DataFrame, float_dtype = np.float32) -> dict:
+        '''Turns the relevant (time, T, C, F) dataframe into plain numpy arrays, handy for code that does not need pandas
+        INPUT: dataframe of relevant columns, as made by save_relevant_data_in_dataframe
+        OUTPUT: dict of {df column name: array}, time is int64 (ns since epoch), T/C/F are float_dtype'''
+
+        time_values   = df_relevant[DfConstants.df_time_column].values.astype('datetime64[ns]').view(np.int64)
+        arrays_dict   = {DfConstants.df_time_column: time_values}
+
+        for column in df_relevant.columns.drop(DfConstants.df_time_column):
+            arrays_dict[column] = df_relevant[column].to_numpy(dtype = float_dtype)
+
+        return arrays_dict
+
+
+    def make_dataframe_of_relevant_columns(self, input_dataframe) -> pd.core.frame.DataFrame:
+        '''Makes new DataFrame of the relevant columns
+        Input:  dataframe of the input csv file, contains all data
+        Output: dataframe of the input csv file, contains relevant data only (time, T, C, F)'''
+
+        relevant_columns, new_column_names = self._get_relevant_and_new_column_names()
+
         relevant_dataframe = input_dataframe[relevant_columns]
         output_dataframe   = relevant_dataframe.rename(columns = new_column_names)
 
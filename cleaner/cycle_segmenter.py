@@ -0,0 +1,147 @@
+'''Module that splits a long recording (like a full day or week of a robot) into its separate cleaning cycles, so that every cycle
+can go through the cleaning and phase identification on its own. The rest of the code assumes one dataframe = one cleaning cycle'''
+
+import numpy as np
+import pandas as pd
+
+from constants import DfConstants
+from logging_maker import logger
+
+
+class CleaningCycleSegmenter:
+    '''Class that finds the cleaning cycles in a recording, in one linear pass over T and F.
+    A cleaning cycle is a stretch of flow activity (post-milk flush, pre-rinse, hot rinse, post-rinse, blowout) with a rise in T
+    (the hot rinse). Between cycles there is a long stretch without flow.
+    INPUT:
+        - df: dataframe containing [time, T, C, F] data, may hold one or many cycles
+        - F_active_fraction: F above this fraction of the (99th percentile) F counts as flow activity
+        - max_idle_gap_s: activity separated by less than this # of samples (s) belongs to the same cycle
+        - min_T_rise: a group of activity only is a cycle if its T rises by at least this many C above the T before the group. Each
+          group is judged on its own rise, so a warm (acid) cycle next to hot (alkaline) ones is still a cycle
+        - padding_s: # of quiet samples (s) kept before/after the activity of each cycle, the trimming in DataCleaner needs some,
+          the T before a group is the min T of its padding_s samples before it'''
+
+    F_PERCENTILE = 99 # ignores single spikes when finding the typical F of the recording
+
+    def __init__(self, df: pd.core.frame.DataFrame, F_active_fraction: float = 0.05, max_idle_gap_s: int = 600, min_T_rise: float = 10.0, padding_s: int = 120):
+        self.df                = df
+        self.F_active_fraction = F_active_fraction
+        self.max_idle_gap_s    = max_idle_gap_s
+        self.min_T_rise        = min_T_rise
+        self.padding_s         = padding_s
+
+
+    @staticmethod
+    def _find_true_runs(mask: np.ndarray):
+        '''Run-length encoding of a boolean array
+        INPUT: boolean array
+        OUTPUT: start indices and (exclusive) end indices of the stretches of True values'''
+
+        mask_padded  = np.concatenate(([False], mask, [False])).astype(np.int8)
+        mask_changes = np.diff(mask_padded)
+        run_starts   = np.where(mask_changes == 1)[0]
+        run_ends     = np.where(mask_changes == -1)[0]
+
+        return run_starts, run_ends
+
+
+    def find_activity_groups(self):
+        '''Groups the flow activity: stretches of F above threshold that are less than max_idle_gap_s apart are merged
+        OUTPUT: start indices and (exclusive) end indices of the groups of activity'''
+
+        F_values    = self.df[DfConstants.df_flow_column].to_numpy(dtype = float)
+        F_typical   = np.nanpercentile(F_values, self.F_PERCENTILE)
+        F_threshold = self.F_active_fraction * F_typical
+        is_active   = np.nan_to_num(F_values, nan = 0.0) > F_threshold
+
+        run_starts, run_ends = self._find_true_runs(is_active)
+        if run_starts.size == 0:
+            return run_starts, run_ends
+
+        idle_gaps        = run_starts[1:] - run_ends[:-1]
+        is_new_group     = np.concatenate(([True], idle_gaps >= self.max_idle_gap_s))
+        group_starts     = run_starts[is_new_group]
+        is_end_of_group  = np.concatenate((is_new_group[1:], [True]))
+        group_ends       = run_ends[is_end_of_group]
+
+        return group_starts, group_ends
+
+
+    @staticmethod
+    def _get_max_of_each_group(values: np.ndarray, group_starts: np.ndarray, group_ends: np.ndarray, reduce_function = np.fmax) -> np.ndarray:
+        '''Max (or min with reduce_function = np.fmin) of values[start:end] for every group, in one pass. The groups must be sorted
+        and must not overlap. The start/end indices are interleaved so reduceat gives [group, gap, group, gap, ...] maxima, of which
+        every other one is kept. NaN values are ignored'''
+
+        interleaved_idx = np.column_stack((group_starts, group_ends)).ravel()
+        interleaved_idx = interleaved_idx[interleaved_idx < len(values)] # a group that runs until the end has no gap after it
+        max_of_segments = reduce_function.reduceat(values, interleaved_idx)
+
+        return max_of_segments[::2]
+
+
+    def get_T_rise_of_each_group(self, group_starts: np.ndarray, group_ends: np.ndarray) -> np.ndarray:
+        '''T rise of every group of activity: its max T minus the min T of the padding_s samples before it (not earlier than the end
+        of the previous group, and including the first sample of the group). If these T are all NaN, the min T of the group is used
+        OUTPUT: array of the T rise [C] of every group'''
+
+        T_values        = self.df[DfConstants.df_temperature_column].to_numpy(dtype = float)
+        previous_ends   = np.concatenate(([0], group_ends[:-1]))
+        baseline_starts = np.maximum(group_starts - self.padding_s, previous_ends)
+
+        T_max_of_groups = self._get_max_of_each_group(T_values, group_starts, group_ends)
+        T_baselines     = self._get_max_of_each_group(T_values, baseline_starts, group_starts + 1, reduce_function = np.fmin)
+        T_min_of_groups = self._get_max_of_each_group(T_values, group_starts, group_ends, reduce_function = np.fmin)
+        T_baselines     = np.where(np.isnan(T_baselines), T_min_of_groups, T_baselines)
+
+        return T_max_of_groups - T_baselines
+
+
+    def find_cycle_boundaries(self) -> list:
+        '''Finds the cleaning cycles. Groups of activity with a T rise below min_T_rise (like a flush without hot rinse) are not cycles,
+        they are logged.
+        Every cycle keeps padding_s quiet points before/after its activity, but never more than half of the idle stretch to the next cycle.
+        If there is only one cycle, the whole recording is returned, so single-cycle files are handled as before
+        OUTPUT: list of tuples shaped like: [(start_idx_1, end_idx_1), (start_idx_2, end_idx_2), ...], end_idx is exclusive'''
+
+        number_of_rows           = len(self.df)
+        group_starts, group_ends = self.find_activity_groups()
+
+        if group_starts.size == 0:
+            logger.warning("Found no flow activity, handling the recording as one cycle")
+            return [(0, number_of_rows)]
+
+        T_rises        = self.get_T_rise_of_each_group(group_starts, group_ends)
+        is_cycle       = T_rises >= self.min_T_rise # a NaN rise (no T values at all) is not a cycle
+
+        time_values    = self.df[DfConstants.df_time_column]
+        for group_start, group_end, T_rise in zip(group_starts[~is_cycle], group_ends[~is_cycle], T_rises[~is_cycle]):
+            logger.warning(f"Activity @ idx {group_start}-{group_end} ({time_values.iloc[group_start]} - {time_values.iloc[group_end - 1]}) is not a "
+                           f"cleaning cycle: T rises by {T_rise:.1f} C, less than {self.min_T_rise} C")
+
+        cycle_starts   = group_starts[is_cycle]
+        cycle_ends     = group_ends[is_cycle]
+
+        if cycle_starts.size <= 1:
+            logger.info(f"Found {cycle_starts.size} cleaning cycle(s), handling the recording as one cycle")
+            return [(0, number_of_rows)]
+
+        split_points       = (cycle_ends[:-1] + cycle_starts[1:]) // 2 # middle of the idle stretch between cycles
+        lower_limits       = np.concatenate(([0], split_points))
+        upper_limits       = np.concatenate((split_points, [number_of_rows]))
+        boundaries_starts  = np.maximum(cycle_starts - self.padding_s, lower_limits)
+        boundaries_ends    = np.minimum(cycle_ends + self.padding_s, upper_limits)
+        cycle_boundaries   = list(zip(boundaries_starts.tolist(), boundaries_ends.tolist()))
+
+        logger.info(f"Found {len(cycle_boundaries)} cleaning cycles @ idx {cycle_boundaries}")
+        return cycle_boundaries
+
+
+    def split_into_cycles(self) -> list:
+        '''Splits the recording into one dataframe per cleaning cycle, each with an index starting at 0
+        OUTPUT: list of dataframes'''
+
+        cycle_boundaries = self.find_cycle_boundaries()
+        list_of_cycle_dfs = [self.df.iloc[start:end].reset_index(drop = True) for start, end in cycle_boundaries]
+
+        return list_of_cycle_dfs
@@ -0,0 +1,131 @@
+'''Module containing the signals of ONE cleaning cycle as the phase identifying classes read them: contiguous numpy arrays of t/T/C/F
+and of their derivatives, the times of the relative extrema of the derivatives and the maxima. The container is built once per cycle
+from the CycleSignalBundle, uses __slots__ and read-only arrays, and is shared by all phase identifying classes. Code that changes
+values (like EarlyCmaxHandler, which squashes an early C peak) gets a new container with replace'''
+
+import numpy as np
+
+from time_grid import TimeGrid, TimeIndex
+
+
+class CycleSignals:
+    '''Read-only signals of one cleaning cycle. Its attributes cannot be reassigned and its arrays cannot be written to
+    ATTRIBUTES:
+        - number_of_samples: # of samples of the cycle
+        - cycle_start_time, t_ns, has_time, time_index: integer time of the samples, see TimeGrid.to_ns_since_start and TimeIndex
+        - T_values, C_values, F_values: float64 arrays of the cleaned data
+        - dT_values, dC_values, dF_values: float64 arrays of the 1st derivatives
+        - dT/dC/dF_relative_max_t_ns, dT/dC/dF_relative_min_t_ns: int64 arrays of the times [ns] of the relative extrema of the derivatives
+        - T_max, T_max_idx, T_max_time, T_max_t_ns: max of T, its index, its wall-clock time and its time [ns]
+        - C_max, C_max_idx, C_mean, F_max, dC_max_val: maxima and mean of the data'''
+
+    __slots__ = ('number_of_samples', 'cycle_start_time', 't_ns', 'has_time', 'time_index',
+                 'T_values', 'C_values', 'F_values', 'dT_values', 'dC_values', 'dF_values',
+                 'dT_relative_max_t_ns', 'dT_relative_min_t_ns', 'dC_relative_max_t_ns', 'dC_relative_min_t_ns',
+                 'dF_relative_max_t_ns', 'dF_relative_min_t_ns',
+                 'T_max', 'T_max_idx', 'T_max_time', 'T_max_t_ns', 'C_max', 'C_max_idx', 'C_mean', 'F_max', 'dC_max_val')
+
+    def __init__(self, **values):
+        missing_attributes = set(self.__slots__) - set(values)
+        if missing_attributes:
+            raise TypeError(f"Missing CycleSignals attributes: {sorted(missing_attributes)}")
+
+        for attribute_name, value in values.items():
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                value.setflags(write = False)
+            object.__setattr__(self, attribute_name, value) # raises AttributeError for names that are not in __slots__
+
+
+    def __setattr__(self, attribute_name, value):
+        raise AttributeError(f"CycleSignals is read-only, use replace to change '{attribute_name}'")
+
+
+    def replace(self, **changes):
+        '''Copy of the container with some attributes changed, the other arrays are shared, not copied
+        OUTPUT: CycleSignals'''
+
+        values = {attribute_name: getattr(self, attribute_name) for attribute_name in self.__slots__}
+        values.update(changes)
+        return CycleSignals(**values)
+
+
+    def number_of_relative_extrema(self) -> int:
+        '''# of relative extrema of dT, dC and dF, see instrumentation'''
+        return sum(getattr(self, f"d{Y}_relative_{extremum}_t_ns").size for Y in 'TCF' for extremum in ['max', 'min'])
+
+
+    def to_time(self, t_ns):
+        '''Wall-clock time of t_ns [ns since the start of the cycle], to output results'''
+        return TimeGrid.ns_to_time(self.cycle_start_time, t_ns)
+
+
+    @staticmethod
+    def relative_extrema_t_ns(df_relative_extrema, index_column_idx, t_ns, has_time) -> np.ndarray:
+        '''Times [ns since cycle start] of the relative extrema of one column of dY_relative_extrema, as an int64 array. The dataframe
+        pads the shorter of its min/max columns with 0 (index 0 is never an extremum), the padding and the extrema without time are left out'''
+
+        relative_extrema_idx = df_relative_extrema.iloc[:, index_column_idx].to_numpy()
+        relative_extrema_idx = relative_extrema_idx[relative_extrema_idx != 0].astype(np.int64)
+        relative_extrema_idx = relative_extrema_idx[has_time[relative_extrema_idx]]
+        return t_ns[relative_extrema_idx]
+
+
+    @staticmethod
+    def from_signal_bundle(signal_bundle):
+        '''Makes the CycleSignals of one cleaning cycle from its CycleSignalBundle
+        OUTPUT: CycleSignals'''
+
+        t_column_index = 0
+        T_column_index = 1
+        C_column_index = 2
+        F_column_index = 3
+
+        dT_idx = 0 #index of dY temperature column in array
+        dC_idx = 1 #index of dY conductivity column in array
+        dF_idx = 2 #index of dY flow column in array
+
+        relative_min_index_idx= 0
+        relative_max_index_idx= 3
+
+        df                  = signal_bundle.df_clean
+        dYdx                = signal_bundle.df_diff
+        temp_abs_extrema    = signal_bundle.temp_abs_extrema
+        dY_absolute_extrema = signal_bundle.dY_absolute_extrema
+        dY_relative_extrema = signal_bundle.dY_relative_extrema
+
+        C_values  = df.iloc[:, C_column_index].to_numpy(dtype = np.float64)
+        F_values  = df.iloc[:, F_column_index].to_numpy(dtype = np.float64)
+        dC_values = dYdx.iloc[:, C_column_index].to_numpy(dtype = np.float64)
+
+        # integer time, which the phase identifying code works with: ns since the start of the cycle, see TimeGrid.to_ns_since_start
+        cycle_start_time, t_ns, has_time = TimeGrid.to_ns_since_start(df.iloc[:, t_column_index])
+        T_max_idx = temp_abs_extrema['T_max idx [#]']
+        C_max     = np.nanmax(C_values)
+
+        return CycleSignals(number_of_samples   = len(df),
+                            cycle_start_time    = cycle_start_time,
+                            t_ns                = t_ns,
+                            has_time            = has_time,
+                            time_index          = TimeIndex(t_ns, has_time), # time -> idx lookups of the phase identifying classes
+                            T_values            = df.iloc[:, T_column_index].to_numpy(dtype = np.float64),
+                            C_values            = C_values,
+                            F_values            = F_values,
+                            dT_values           = dYdx.iloc[:, T_column_index].to_numpy(dtype = np.float64),
+                            dC_values           = dC_values,
+                            dF_values           = dYdx.iloc[:, F_column_index].to_numpy(dtype = np.float64),
+                            dT_relative_max_t_ns= CycleSignals.relative_extrema_t_ns(dY_relative_extrema[dT_idx], relative_max_index_idx, t_ns, has_time),
+                            dT_relative_min_t_ns= CycleSignals.relative_extrema_t_ns(dY_relative_extrema[dT_idx], relative_min_index_idx, t_ns, has_time),
+                            dC_relative_max_t_ns= CycleSignals.relative_extrema_t_ns(dY_relative_extrema[dC_idx], relative_max_index_idx, t_ns, has_time),
+                            dC_relative_min_t_ns= CycleSignals.relative_extrema_t_ns(dY_relative_extrema[dC_idx], relative_min_index_idx, t_ns, has_time),
+                            dF_relative_max_t_ns= CycleSignals.relative_extrema_t_ns(dY_relative_extrema[dF_idx], relative_max_index_idx, t_ns, has_time),
+                            dF_relative_min_t_ns= CycleSignals.relative_extrema_t_ns(dY_relative_extrema[dF_idx], relative_min_index_idx, t_ns, has_time),
+                            T_max               = temp_abs_extrema['T_max [C]'],
+                            T_max_idx           = T_max_idx,
+                            T_max_time          = temp_abs_extrema['T_max time [s]'],
+                            T_max_t_ns          = t_ns[T_max_idx],
+                            C_max               = C_max,
+                            C_max_idx           = np.where(C_values == C_max)[0][0],
+                            C_mean              = np.nanmean(C_values),
+                            F_max               = np.nanmax(F_values),
+                            dC_max_val          = dC_values[dY_absolute_extrema[dC_idx]['dY_max idx [#]']], )
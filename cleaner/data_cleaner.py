@@ -4,8 +4,6 @@ import numpy as np
 import pandas as pd
 from scipy.signal import find_peaks
 
-import matplotlib.pyplot as plt
-
 from constants import DfConstants
 
 
@@ -51,7 +49,7 @@ class DataCleaner:
 
         for i in range(time_column_id + 1, number_of_columns):
             df_smooth.iloc[:, i] = df.iloc[:, i].rolling(window_size, min_periods = 1).mean()
-            df_smooth_shifted    = df_smooth.shift(1 - window_size) # to counter the shift from rolling
+        df_smooth_shifted = df_smooth.shift(1 - window_size) # to counter the shift from rolling, once for all columns
 
         return df_smooth_shifted
 
@@ -154,6 +152,187 @@ class DataCleaner:
 
 
 
+class StreamingDataCleaner:
+    '''Chunk-by-chunk version of DataCleaner.fill_data_gaps and DataCleaner.smoothen_data, for files too large to load at once.
+    The state needed across chunk boundaries is carried over, so concatenating the output chunks gives the same result as running
+    the DataCleaner functions on the whole file (up to floating point rounding of the rolling mean)
+    INPUT: generator of dataframes containing [time, T, C, F] data, like csvToDataframeMaker.iterate_relevant_data_in_chunks
+    OUTPUT: generator of cleaned dataframes'''
+
+    @staticmethod
+    def fill_data_gaps(chunks):
+        '''Streaming DataCleaner.fill_data_gaps. Back-filling needs the NEXT valid value, so rows at the end of a chunk that still
+        have a NaN in some column are held back until a later chunk fills them. The last row of the file gets the last valid value,
+        which is tracked per column
+        NOTE: a column that stays NaN for a long stretch makes the held back rows grow, memory is bounded by the longest gap'''
+
+        held_rows         = None
+        last_valid_values = {}
+
+        for chunk in chunks:
+            buffer         = chunk if held_rows is None else pd.concat([held_rows, chunk])
+            time_column_id = buffer.columns.get_loc(DfConstants.df_time_column)
+            value_columns  = buffer.columns[time_column_id + 1:]
+
+            is_valid       = buffer[value_columns].notna().to_numpy()
+            has_valid      = is_valid.any(axis = 0)
+            last_valid_pos = np.where(has_valid, len(buffer) - 1 - np.argmax(is_valid[::-1], axis = 0), -1)
+
+            for column, pos in zip(value_columns, last_valid_pos):
+                if pos >= 0:
+                    last_valid_values[column] = buffer[column].iloc[pos]
+
+            num_rows_ready = last_valid_pos.min() + 1 # rows before this have a valid value later on in every column
+            if num_rows_ready > 0:
+                buffer_filled                = buffer.copy()
+                buffer_filled[value_columns] = buffer[value_columns].bfill()
+                yield buffer_filled.iloc[:num_rows_ready]
+
+            held_rows = buffer.iloc[num_rows_ready:]
+
+        if (held_rows is not None) and len(held_rows):
+            held_rows_filled = held_rows.copy()
+            time_column_id   = held_rows.columns.get_loc(DfConstants.df_time_column)
+
+            for i in range(time_column_id + 1, held_rows.shape[1]):
+                held_rows_filled.iloc[:, i] = held_rows.iloc[:, i].bfill()
+
+                # Handling NaN of a column's LAST value, like DataCleaner.fill_data_gaps:
+                if pd.isna(held_rows_filled.iloc[-1, i]):
+                    held_rows_filled.iloc[-1, i] = last_valid_values[held_rows.columns[i]]
+
+            yield held_rows_filled
+
+
+    @staticmethod
+    def smoothen_data(chunks, window_size: int = 5):
+        '''Streaming DataCleaner.smoothen_data. Each output row is the mean of the window that starts at it, so the last
+        (window_size - 1) rows of every chunk are carried over to the next one, where their window is complete.
+        At the end of the file these rows become NaN, like in DataCleaner.smoothen_data'''
+
+        carried_rows = None
+
+        for chunk in chunks:
+            buffer         = chunk if carried_rows is None else pd.concat([carried_rows, chunk])
+            num_rows_ready = len(buffer) - (window_size - 1)
+
+            if num_rows_ready > 0:
+                buffer_smooth = DataCleaner.smoothen_data(buffer, window_size)
+                yield buffer_smooth.iloc[:num_rows_ready]
+
+            carried_rows = buffer.iloc[max(num_rows_ready, 0):]
+
+        if (carried_rows is not None) and len(carried_rows):
+            yield DataCleaner.smoothen_data(carried_rows, window_size) # windows run past the end of the file, so all NaN
+
+
+    @staticmethod
+    def clean_data(chunks, window_size: int = 5):
+        '''Runs fill_data_gaps then smoothen_data on a stream of chunks, same steps as the start of the whole-file pipeline'''
+
+        return StreamingDataCleaner.smoothen_data(StreamingDataCleaner.fill_data_gaps(chunks), window_size)
+
+
+
+class MatrixDataCleaner:
+    '''Alternative engine of DataCleaner/DerivativeMaker, selected with data_cleaning_engine = 'matrix' in configuration.ini.
+    The T/C/F channels are one contiguous 2-D float array of shape (# of rows, # of channels), and every step works on the whole
+    array at once: no loop over the columns, no copy of the dataframe, at most one new array per step.
+    Results are the same as the pandas engine, except for floating point rounding of the rolling mean (~1e-14)'''
+
+    @staticmethod
+    def df_to_matrix(df: pd.core.frame.DataFrame):
+        '''OUTPUT: contiguous float64 array of the columns after the time column, list of these column names'''
+
+        time_column_id = df.columns.get_loc(DfConstants.df_time_column)
+        value_columns  = df.columns[time_column_id + 1:]
+        values         = np.ascontiguousarray(df[value_columns].to_numpy(dtype = np.float64))
+
+        return values, value_columns
+
+
+    @staticmethod
+    def matrix_to_df(df: pd.core.frame.DataFrame, values: np.ndarray, window_size: int = 1) -> pd.core.frame.DataFrame:
+        '''Dataframe with the columns up to the time column of df, and values as the other columns
+        INPUT: window_size: window of smoothen_data if values are smoothed. DataCleaner.smoothen_data shifts all columns, the time
+        column too, so the time column is shifted the same way here'''
+
+        time_column_id = df.columns.get_loc(DfConstants.df_time_column)
+        df_values      = pd.DataFrame(values, columns = df.columns[time_column_id + 1:], index = df.index)
+        df_time        = df.iloc[:, :time_column_id + 1]
+        if window_size > 1:
+            df_time    = df_time.shift(1 - window_size)
+
+        return pd.concat([df_time, df_values], axis = 1)
+
+
+    @staticmethod
+    def fill_data_gaps(values: np.ndarray) -> np.ndarray:
+        '''Same as DataCleaner.fill_data_gaps: every NaN gets the next valid value of its column (back-fill), and a NaN in the last
+        row gets the last valid value. The index of the next valid value is found for all columns at once, by a reversed
+        minimum.accumulate of the indices of the valid values'''
+
+        number_of_rows = values.shape[0]
+        row_idx        = np.arange(number_of_rows)[:, None]
+        is_valid       = ~np.isnan(values)
+
+        valid_idx      = np.where(is_valid, row_idx, number_of_rows) # number_of_rows = no valid value
+        next_valid_idx = np.minimum.accumulate(valid_idx[::-1], axis = 0)[::-1]
+
+        last_valid_idx = np.where(is_valid, row_idx, -1).max(axis = 0) # -1 = column without any valid value
+        next_valid_idx[-1] = np.where(is_valid[-1] | (last_valid_idx < 0), next_valid_idx[-1], last_valid_idx)
+
+        values_with_nan_row = np.vstack((values, np.full((1, values.shape[1]), np.nan))) # row number_of_rows gives NaN
+        return np.take_along_axis(values_with_nan_row, next_valid_idx, axis = 0)
+
+
+    @staticmethod
+    def smoothen_data(values: np.ndarray, window_size: int = 5) -> np.ndarray:
+        '''Same as DataCleaner.smoothen_data: row i is the mean of rows [i, i + window_size), NaN values are left out of the mean,
+        and the last (window_size - 1) rows are NaN. The window sums are sums of window_size shifted slices of the array'''
+
+        number_of_rows = values.shape[0]
+        number_of_means= max(number_of_rows - window_size + 1, 0)
+        is_valid       = ~np.isnan(values)
+        values_no_nan  = np.where(is_valid, values, 0.0)
+
+        window_sums    = np.zeros((number_of_means, values.shape[1]))
+        window_counts  = np.zeros((number_of_means, values.shape[1]))
+        for shift in range(window_size): # loop over the window, not over the columns/rows
+            window_sums   += values_no_nan[shift : shift + number_of_means]
+            window_counts += is_valid[shift : shift + number_of_means]
+
+        smooth_values = np.full(values.shape, np.nan)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'): # windows without valid values give NaN
+            smooth_values[:number_of_means] = window_sums/window_counts
+
+        return smooth_values
+
+
+    @staticmethod
+    def make_derivatives(values: np.ndarray, dx: int = 1):
+        '''Same as DerivativeMaker.make_derivatives, on all columns at once
+        OUTPUT: arrays of the 1st and 2nd derivative'''
+
+        coeff_to_offset_diff = -4 # offsets differentiation
+
+        diff_values  = np.gradient(values, dx, axis = 0)
+        diff2_values = np.gradient(diff_values, dx, axis = 0)
+
+        return np.roll(diff_values, coeff_to_offset_diff, axis = 0), np.roll(diff2_values, coeff_to_offset_diff, axis = 0)
+
+
+    @staticmethod
+    def clip_derivatives(diff_values: np.ndarray, criterion: float = 0.005) -> np.ndarray:
+        '''Same as DerivativeMaker.clip_derivatives: positive values below criterion * (max of their column) are made negative'''
+
+        dY_max_values = np.nanmax(diff_values, axis = 0)
+        mask          = (diff_values < criterion * dY_max_values) & (diff_values > 0)
+
+        return np.where(mask, -diff_values, diff_values)
+
+
+
 class DerivativeMaker:
     '''Class that makes derivatives of data and clips these derivatives'''
 
@@ -166,20 +345,20 @@ class DerivativeMaker:
         OUTPUT: 2 Dataframes with derived values, one for the 1st derivative, one for the 2nd derivative,
         having columns [time, temp, cond, flow]'''
 
-        df_diff  = df.copy() # 1st derivative
-        df_diff2 = df.copy() # 2nd derivative
-
         time_column_id       = df.columns.get_loc(DfConstants.df_time_column)
-        number_of_columns    = df_diff.shape[1]
+        value_columns        = df.columns[time_column_id + 1:]
         coeff_to_offset_diff = -4 # offsets differentiation
 
-        for i in range(time_column_id + 1, number_of_columns):
-            df_diff.iloc[:, i]  = np.gradient(df.iloc[:, i], dx) # 1st derivative
-            df_diff2.iloc[:, i] = np.gradient(df_diff.iloc[:, i], dx) # 2nd derivative
+        # all columns at once, along the rows, instead of one column at a time
+        values      = df[value_columns].to_numpy(dtype = float)
+        diff_values = np.gradient(values, dx, axis = 0)      # 1st derivative
+        diff2_values= np.gradient(diff_values, dx, axis = 0) # 2nd derivative
 
-            # Every instance of differentiation causes an offset. Should be countered
-            df_diff.iloc[:, i]  = np.roll(df_diff.iloc[:, i], coeff_to_offset_diff)
-            df_diff2.iloc[:, i] = np.roll(df_diff2.iloc[:, i], coeff_to_offset_diff)
+        # Every instance of differentiation causes an offset. Should be countered
+        df_diff                = df.copy() # 1st derivative
+        df_diff2               = df.copy() # 2nd derivative
+        df_diff[value_columns] = np.roll(diff_values, coeff_to_offset_diff, axis = 0)
+        df_diff2[value_columns]= np.roll(diff2_values, coeff_to_offset_diff, axis = 0)
 
         return df_diff, df_diff2
 
@@ -2,25 +2,27 @@
 
 import numpy as np
 import pandas as pd
-from scipy.signal import argrelextrema
 
 from constants import DfConstants
 from data_cleaner import DataCleaner, DerivativeMaker
+from relative_extrema import RelativeExtremaFinder
 from utils import ColumnFinder
 
 
 class FindDerivativePeaks():
     '''Class that gets the peaks given a dataframe of the data
     INPUT:
-        - input_array: array of the desired property
+        - df: dataframe of the data
+        - dYdx_df: 1st derivative of df, if already made (like in CycleSignalBundle), otherwise it is made once here
         - comparison_order: how many points before/after a point do we use to determine it is a local min/max? 30 is a nice value
     OUTPUT:
         - dY_relative_max_idx: index of local maxima
         - dY_relative_min_idx: index of local minima
         - dY_max_idx: index of absolute maximum'''
 
-    def __init__(self, df: pd.core.frame.DataFrame):
-        self.df = df
+    def __init__(self, df: pd.core.frame.DataFrame, dYdx_df: pd.core.frame.DataFrame = None):
+        self.df      = df
+        self.dYdx_df = dYdx_df if dYdx_df is not None else DerivativeMaker.make_derivatives(df)[0] # made once, for all methods
 
     # remove below function if not used
     def setup(self):
@@ -41,7 +43,7 @@ class FindDerivativePeaks():
         input: -
         output: properties_df, which is a list of dictionaries, each dictionary dealing with a parameter'''
 
-        dYdx_df, _                     = DerivativeMaker.make_derivatives(self.df) # Get derivatives
+        dYdx_df                        = self.dYdx_df
         time_column_idx, usable_columns= ColumnFinder.df_column_finder(dYdx_df) #FindDerivativePeaks.setup(self)
         list_of_properties_dict: list  = [] # List to store dicts for each parameter
 
@@ -68,19 +70,37 @@ class FindDerivativePeaks():
         return list_of_properties_dict
 
 
-    def find_dY_relative_extrema(self, comparison_order: int = 30) -> list:
+    def make_dY_extrema_order_index(self):
+        '''Extrema order index of dT, dC, dF, to get the relative extrema of many comparison_order values at the cost of one
+        OUTPUT: ExtremaOrderIndex, see extrema_order_index'''
+
+        from extrema_order_index import ExtremaOrderIndex # imported here, it is only needed to try many comparison_order values
+        _, usable_columns = ColumnFinder.df_column_finder(self.dYdx_df)
+        return ExtremaOrderIndex.from_values(self.dYdx_df.iloc[:, usable_columns].to_numpy(dtype = np.float64))
+
+
+    def find_dY_relative_extrema(self, comparison_order: int = 30, extrema_order_index = None) -> list:
         '''This function aims to get the RELATIVE extrema points from the derivative (dY) dataframe, for each parameter (T, C, F)
-        INPUT: comparison_order, which is the # of neighboring points we compare to when deciding if we have a relative min/max
+        INPUT:
+            - comparison_order, which is the # of neighboring points we compare to when deciding if we have a relative min/max
+            - extrema_order_index: made by make_dY_extrema_order_index, if given the extrema are read from it
         OUTPUT: list_of_properties_df, a list of dictionaries, where each dictionary deals with a parameter'''
 
-        dYdx_df, _                     = DerivativeMaker.make_derivatives(self.df) # Get derivatives
+        dYdx_df                        = self.dYdx_df
         time_column_idx, usable_columns= ColumnFinder.df_column_finder(dYdx_df)
         list_of_properties_df: list    = []  # List to store the dataframes
 
-        for _, val in enumerate(usable_columns):
+        # minima and maxima of all parameters at once, same as argrelextrema with np.less/np.greater
+        if extrema_order_index is not None:
+            is_relative_min, is_relative_max = extrema_order_index.find_relative_extrema(comparison_order)
+        else:
+            is_relative_min, is_relative_max = RelativeExtremaFinder.find_relative_extrema(dYdx_df.iloc[:, usable_columns].to_numpy(dtype = np.float64),
+                                                                                           comparison_order)
+
+        for column_number, val in enumerate(usable_columns):
             # When does the normal curve begin to drastically change? When its derivative changes
-            dY_relative_max_idx     = argrelextrema(dYdx_df.iloc[:, val].values, np.greater, order = comparison_order)[0]  #it is offset due to differentiation
-            dY_relative_min_idx     = argrelextrema(dYdx_df.iloc[:, val].values, np.less,    order = comparison_order)[0]
+            dY_relative_max_idx     = np.nonzero(is_relative_max[:, column_number])[0]  #it is offset due to differentiation
+            dY_relative_min_idx     = np.nonzero(is_relative_min[:, column_number])[0]
 
             dY_relative_max_time    = self.df.iloc[dY_relative_max_idx, time_column_idx] #df.index[dY_relative_max_idx]
             dY_relative_min_time    = self.df.iloc[dY_relative_min_idx, time_column_idx]
@@ -0,0 +1,50 @@
+'''Module containing the event join of the phase identifying code. Phases are found where events of 2 signals happen close in time,
+like a peak in dT with a peak in dC within num_neighbors seconds. Instead of a loop over the events of one signal inside a loop over
+those of the other (O(m*k) per rule), the events of the 2nd signal are sorted once and the events of the 1st look up their window
+with a binary search (searchsorted), a band join in O((m + k) log k) plus the # of matched pairs'''
+
+import numpy as np
+
+
+class EventJoin:
+    '''Class containing the functions to join 2 event streams on time'''
+
+    @staticmethod
+    def band_join(left_t_ns: np.ndarray, right_t_ns: np.ndarray, tolerance_ns: int, left_mask: np.ndarray = None, right_mask: np.ndarray = None):
+        '''All pairs of events (left, right) with left - tolerance_ns < right < left + tolerance_ns, the bounds excluded
+        INPUT:
+            - left_t_ns, right_t_ns: int64 arrays of event times [ns], see CycleSignals
+            - tolerance_ns: half width of the window around the left events [ns]
+            - left_mask, right_mask: events to keep (like peaks above a threshold, or before a time), all events if None
+        OUTPUT: left_pos, right_pos: int64 arrays of the positions of the events of every pair in left_t_ns and right_t_ns, ordered
+        like nested loops over left_t_ns then right_t_ns'''
+
+        left_t_ns  = np.asarray(left_t_ns,  dtype = np.int64)
+        right_t_ns = np.asarray(right_t_ns, dtype = np.int64)
+        left_kept  = np.flatnonzero(left_mask)  if left_mask  is not None else np.arange(len(left_t_ns))
+        right_kept = np.flatnonzero(right_mask) if right_mask is not None else np.arange(len(right_t_ns))
+
+        right_order       = right_kept[np.argsort(right_t_ns[right_kept], kind = 'stable')]
+        right_sorted_t_ns = right_t_ns[right_order]
+        window_starts     = np.searchsorted(right_sorted_t_ns, left_t_ns[left_kept] - tolerance_ns, side = 'right')
+        window_ends       = np.searchsorted(right_sorted_t_ns, left_t_ns[left_kept] + tolerance_ns, side = 'left')
+        number_of_matches = np.maximum(window_ends - window_starts, 0)
+
+        # one row per pair: the left event repeated for each match, the right events read from the windows
+        left_pos        = np.repeat(left_kept, number_of_matches)
+        offset_in_window= np.arange(number_of_matches.sum()) - np.repeat(np.cumsum(number_of_matches) - number_of_matches, number_of_matches)
+        right_pos       = right_order[np.repeat(window_starts, number_of_matches) + offset_in_window]
+
+        pair_order = np.lexsort((right_pos, left_pos))
+        return left_pos[pair_order], right_pos[pair_order]
+
+
+    @staticmethod
+    def first_match(left_t_ns: np.ndarray, right_t_ns: np.ndarray, tolerance_ns: int, left_mask: np.ndarray = None, right_mask: np.ndarray = None):
+        '''1st pair of band_join, the one nested loops that stop at the 1st match would find
+        OUTPUT: (left_pos, right_pos), or None if no events match'''
+
+        left_pos, right_pos = EventJoin.band_join(left_t_ns, right_t_ns, tolerance_ns, left_mask, right_mask)
+        if left_pos.size == 0:
+            return None
+        return int(left_pos[0]), int(right_pos[0])
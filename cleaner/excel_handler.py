@@ -1,9 +1,8 @@
 '''Module that manages the Excel sheet: creating, filling, saving...'''
 
-import openpyxl
 import os
 
-from config_info_obtainer import Constants
+import config_info_obtainer as ci
 from logging_maker import logger
 # from run_tempKPI_derivative import temp_abs_extrema, solution_type
 from multi_file_maker import temp_abs_extrema, solution_type
@@ -45,8 +44,8 @@ class ExcelSheetMaker:
                               'Time for max T [RT]',
                               'Start of post-rinse [RT]',
                               'Max T [C]',
-                              f"Avg. T of {Constants.time_interval}s interval with highest T [C]",
-                              f"Duration for which T>{Constants.T_crit}C [s]",
+                              f"Avg. T of {ci.Constants.time_interval}s interval with highest T [C]",
+                              f"Duration for which T>{ci.Constants.T_crit}C [s]",
                               'Avg. C for hot rinse (with water) [mS/cm]', 
                               'Avg. C for hot rinse (no water) [mS/cm]',
                               'Avg. C for hot rinse (no water) [%]',
@@ -71,7 +70,7 @@ class ExcelSheetMaker:
     def find_existing_excel_files(self):
         '''Find Excel files in directory'''
 
-        os.chdir(Constants.output_location)
+        os.chdir(ci.Constants.output_location)
         list_of_files_in_dir = os.listdir()
 
         excel_files_in_dir = []
@@ -96,6 +95,7 @@ class ExcelSheetMaker:
     def create_new_excel_file(self):
         '''Create new Excel file'''
 
+        import openpyxl # imported here, it is slow to import and only needed when making Excel files
         self.open_workbook   = openpyxl.Workbook() # create workbook
         self.active_worksheet= self.open_workbook.active # select active worksheet
         logger.info("Created new Excel file")
@@ -106,6 +106,7 @@ class ExcelSheetMaker:
         '''Load existing Excel file in directory'''
 
         if excel_files_in_dir:
+            import openpyxl # imported here, it is slow to import and only needed when making Excel files
             excel_file           = excel_files_in_dir[0] #take the first file
             self.open_workbook   = openpyxl.load_workbook(excel_file)
             self.active_worksheet= self.open_workbook.active #select active worksheet
@@ -211,7 +212,7 @@ class ExcelSheetMaker:
     #     INPUT: workbook name
     #     OUTPUT: workbook values, to create a workbook out of'''
 
-    #     workbook_values = [('A1', 'File name',                                   'A2', Constants.filename),
+    #     workbook_values = [('A1', 'File name',                                   'A2', ci.Constants.filename),
     #                        ('B1', 'Day of measurement',                          'B2', self.post_milk_flush_time.strftime('%Y-%m-%d')),
     #                        ('C1', 'Start of post-milk flush [RT]',               'C2', self.post_milk_flush_time.time()),
     #                        ('D1', 'Start of pre-rinse [RT]',                     'D2', self.prerinse_time.time()),
@@ -219,9 +220,9 @@ class ExcelSheetMaker:
     #                        ('F1', 'Time for max T [RT]',                         'F2', Variables.T_max_time.time()),
     #                        ('G1', 'Start of post-rinse [RT]',                 'G2', self.post_rinse_time.time()),
     #                        ('H1', 'Max T [C]',                                   'H2', Variables.T_max),
-    #                        ('I1', f"Avg. T of {Constants.time_interval}s interval with highest T [C]",\
+    #                        ('I1', f"Avg. T of {ci.Constants.time_interval}s interval with highest T [C]",\
     #                                                                              'I2', temp_abs_extrema['T of max time interval [C]']),
-    #                        ('J1', f"Duration for which T>{Constants.T_crit}C [s]",'J2', temp_abs_extrema['Duration for which T > T_crit [s]']),
+    #                        ('J1', f"Duration for which T>{ci.Constants.T_crit}C [s]",'J2', temp_abs_extrema['Duration for which T > T_crit [s]']),
     #                        ('K1', 'Avg. C for hot rinse (with water) [mS/cm]',   'K2', self.rinse_KPIs['C_avg hot rinse [mS/cm]']),
     #                        ('L1', 'Avg. C for hot rinse (no water) [mS/cm]',     'L2', self.rinse_KPIs['C_avg hot rinse, no water [mS/cm]']),
     #                        ('M1', 'Avg. C for hot rinse (no water) [%]',         'M2', self.rinse_KPIs['C_avg hot rinse, no water [%]']),
@@ -0,0 +1,144 @@
+'''Module containing the extrema order index: for every point, the largest comparison_order for which it is still a strict relative
+min/max (see relative_extrema). The relative extrema of ANY comparison_order are then read back with one comparison, so trying
+several comparison_order values (see pipeline.sweep_comparison_orders) costs about the same as one run. The index is made with a
+monotonic stack, in one pass per column, compiled with numba if it is installed (see utils.optional_njit)'''
+
+import numpy as np
+import pandas as pd
+
+from relative_extrema import RelativeExtremaFinder
+from utils import optional_njit
+
+UNLIMITED_ORDER = np.iinfo(np.int64).max # a point higher (lower) than all points of its column is an extremum for any order
+
+
+@optional_njit
+def _largest_orders(values, is_invalid, find_minima, largest_orders):
+    '''Monotonic stack pass over every column. A point's "barriers" are the closest points on its left and right that are not
+    strictly lower (for a max, higher for a min) or are invalid. It stays a strict extremum as long as the order is below the
+    distance to both barriers'''
+
+    number_of_rows, number_of_columns = values.shape
+    stack            = np.empty(number_of_rows, dtype = np.int64)
+    previous_barrier = np.empty(number_of_rows, dtype = np.int64)
+    next_barrier     = np.empty(number_of_rows, dtype = np.int64)
+
+    for j in range(number_of_columns):
+        stack_size = 0
+        for i in range(number_of_rows):
+            previous_barrier[i] = -1
+            next_barrier[i]     = -1
+
+            if is_invalid[i, j]: # barrier of every point before and after it
+                for k in range(stack_size):
+                    next_barrier[stack[k]] = i
+                stack[0]   = i
+                stack_size = 1
+                continue
+
+            while stack_size > 0:
+                top = stack[stack_size - 1]
+                if is_invalid[top, j]:
+                    previous_barrier[i] = top
+                    break
+                is_top_beaten = (values[top, j] >= values[i, j]) if find_minima else (values[top, j] <= values[i, j])
+                is_top_equal  = values[top, j] == values[i, j]
+
+                if not is_top_beaten: # the stack is strictly monotonic, so top is the closest barrier on the left
+                    previous_barrier[i] = top
+                    break
+                next_barrier[top] = i
+                stack_size       -= 1
+                if is_top_equal: # an equal point is a barrier both ways, and the points below it on the stack are further
+                    previous_barrier[i] = top
+                    break
+
+            stack[stack_size] = i
+            stack_size       += 1
+
+        for i in range(number_of_rows):
+            if (i == 0) or (i == number_of_rows - 1) or is_invalid[i, j]: # endpoints are compared with themselves
+                largest_orders[i, j] = 0
+            elif (previous_barrier[i] < 0) and (next_barrier[i] < 0):
+                largest_orders[i, j] = UNLIMITED_ORDER
+            elif previous_barrier[i] < 0:
+                largest_orders[i, j] = next_barrier[i] - i - 1
+            elif next_barrier[i] < 0:
+                largest_orders[i, j] = i - previous_barrier[i] - 1
+            else:
+                largest_orders[i, j] = min(i - previous_barrier[i], next_barrier[i] - i) - 1
+
+
+class ExtremaOrderIndex:
+    '''Largest comparison_order of every point as a relative min and as a relative max, column by column. Made with from_values or from_df
+    ATTRIBUTES:
+        - largest_order_of_min, largest_order_of_max: 2-D int64 arrays (# of rows, # of channels), 0 = never an extremum
+        - shape: shape of the values, the extrema masks have this shape'''
+
+    def __init__(self, largest_order_of_min: np.ndarray, largest_order_of_max: np.ndarray, shape: tuple):
+        self.largest_order_of_min = largest_order_of_min
+        self.largest_order_of_max = largest_order_of_max
+        self.shape                = shape
+
+
+    @staticmethod
+    def from_values(values: np.ndarray, is_invalid: np.ndarray = None):
+        '''INPUT:
+            - values: 1-D or 2-D array (# of rows, # of channels) of floats or integers
+            - is_invalid: for integer values, mask of values that are not comparable (like NaT), they behave like NaN
+        OUTPUT: ExtremaOrderIndex'''
+
+        values        = np.asarray(values)
+        values_2d     = np.ascontiguousarray(values[:, None] if values.ndim == 1 else values)
+        is_invalid_2d = np.isnan(values_2d) if np.issubdtype(values_2d.dtype, np.floating) else np.zeros(values_2d.shape, dtype = bool)
+        if is_invalid is not None:
+            is_invalid_2d = is_invalid_2d | np.asarray(is_invalid).reshape(values_2d.shape)
+
+        largest_order_of_min = np.zeros(values_2d.shape, dtype = np.int64)
+        largest_order_of_max = np.zeros(values_2d.shape, dtype = np.int64)
+        _largest_orders(values_2d, is_invalid_2d, True,  largest_order_of_min)
+        _largest_orders(values_2d, is_invalid_2d, False, largest_order_of_max)
+
+        return ExtremaOrderIndex(largest_order_of_min, largest_order_of_max, values.shape)
+
+
+    @staticmethod
+    def from_df(df: pd.core.frame.DataFrame):
+        '''Index of all columns of a dataframe whose columns have different types, like [time, T] (see
+        RelativeExtremaFinder.find_relative_extrema_idx_of_df). Datetime columns are compared as integers, NaT behaving like NaN
+        OUTPUT: ExtremaOrderIndex'''
+
+        list_of_column_indices = []
+        for column_name in df.columns:
+            column_values, is_invalid = RelativeExtremaFinder.column_to_comparable_values(df[column_name])
+            if column_values is None:
+                raise TypeError(f"Column '{column_name}' of type {df[column_name].dtype} cannot be compared as numbers")
+            list_of_column_indices.append(ExtremaOrderIndex.from_values(column_values, is_invalid))
+
+        largest_order_of_min = np.column_stack([column_index.largest_order_of_min for column_index in list_of_column_indices])
+        largest_order_of_max = np.column_stack([column_index.largest_order_of_max for column_index in list_of_column_indices])
+        return ExtremaOrderIndex(largest_order_of_min, largest_order_of_max, df.shape)
+
+
+    def find_relative_extrema(self, comparison_order: int = 30):
+        '''Same output as RelativeExtremaFinder.find_relative_extrema(values, comparison_order)
+        OUTPUT: is_relative_min, is_relative_max: boolean arrays of the shape of values'''
+
+        if (int(comparison_order) != comparison_order) or (comparison_order < 1):
+            raise ValueError('Order must be an int >= 1')
+
+        is_relative_min = self.largest_order_of_min >= comparison_order # one comparison, whatever the order
+        is_relative_max = self.largest_order_of_max >= comparison_order
+        return is_relative_min.reshape(self.shape), is_relative_max.reshape(self.shape)
+
+
+    def find_relative_extrema_idx(self, comparison_order: int = 30):
+        '''Same output as RelativeExtremaFinder.find_relative_extrema_idx_of_df(df, comparison_order)
+        OUTPUT: relative_min_idx, relative_max_idx'''
+
+        if (int(comparison_order) != comparison_order) or (comparison_order < 1):
+            raise ValueError('Order must be an int >= 1')
+
+        relative_min_idx = np.nonzero(self.largest_order_of_min >= comparison_order)[0] # row-major, like argrelextrema on the 2-D array
+        relative_max_idx = np.nonzero(self.largest_order_of_max >= comparison_order)[0]
+        return relative_min_idx, relative_max_idx
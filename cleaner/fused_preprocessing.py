@@ -0,0 +1,227 @@
+'''Module containing the fused preprocessing kernel, selected with data_cleaning_engine = 'fused' in configuration.ini.
+It does what DataCleaner/DerivativeMaker do in run_data_cleaning_temperature_and_derivative_classes_on_df (fill gaps, smoothen, trim
+before the first T/C peak and after the first F peak since T_max, differentiate, smoothen and clip the derivatives) in two passes over
+the T/C/F array, writing into preallocated arrays instead of making a dataframe per step. The kernels are compiled with numba if it
+is installed, see utils.optional_njit'''
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from constants import DfConstants
+from data_cleaner import MatrixDataCleaner
+from utils import ColumnFinder, optional_njit
+
+
+@optional_njit
+def _fill_and_smooth(values, window_size, smooth_values):
+    '''1st pass, backwards over the rows of every column: back-fills the NaN values (a NaN in the last row gets the last valid value,
+    like DataCleaner.fill_data_gaps) and writes the mean of rows [i, i + window_size) of the filled values to smooth_values, leaving
+    NaN values out of the mean. The last (window_size - 1) rows are NaN, like DataCleaner.smoothen_data'''
+
+    number_of_rows, number_of_columns = values.shape
+    window                            = np.empty(window_size)
+
+    for j in range(number_of_columns):
+        last_value = values[number_of_rows - 1, j]
+        if np.isnan(last_value):
+            for i in range(number_of_rows - 2, -1, -1):
+                if not np.isnan(values[i, j]):
+                    last_value = values[i, j]
+                    break
+
+        next_valid_value = np.nan # bfill happens before the last row gets its value, so NaN rows just before it stay NaN
+        for i in range(number_of_rows - 1, -1, -1):
+            if not np.isnan(values[i, j]):
+                next_valid_value = values[i, j]
+            filled_value            = last_value if i == number_of_rows - 1 else next_valid_value
+            window[i % window_size] = filled_value
+
+            if i > number_of_rows - window_size:
+                smooth_values[i, j] = np.nan
+                continue
+            window_sum   = 0.0
+            window_count = 0
+            for k in range(window_size): # same order as MatrixDataCleaner.smoothen_data, so both engines give the same rounding
+                if not np.isnan(window[(i + k) % window_size]):
+                    window_sum   += window[(i + k) % window_size]
+                    window_count += 1
+            smooth_values[i, j] = window_sum/window_count if window_count > 0 else np.nan
+
+
+@optional_njit
+def _smooth_columns(values, window_size, smooth_values):
+    '''Mean of rows [i, i + window_size) of every column, NaN values left out of the mean, like DataCleaner.smoothen_data'''
+
+    number_of_rows, number_of_columns = values.shape
+
+    for j in range(number_of_columns):
+        for i in range(number_of_rows):
+            if i > number_of_rows - window_size:
+                smooth_values[i, j] = np.nan
+                continue
+            window_sum   = 0.0
+            window_count = 0
+            for k in range(window_size):
+                if not np.isnan(values[i + k, j]):
+                    window_sum   += values[i + k, j]
+                    window_count += 1
+            smooth_values[i, j] = window_sum/window_count if window_count > 0 else np.nan
+
+
+@optional_njit
+def _first_peak_after(x, offset, height, start_idx):
+    '''Index of the first peak of (x - offset) after start_idx whose height is at least height, -1 if there is none.
+    Peaks are found like scipy.signal.find_peaks: a point higher than both neighbors, and for a flat peak (plateau) the middle
+    point, rounded down. The endpoints and NaN values are never peaks'''
+
+    i     = 1
+    i_max = x.shape[0] - 1
+
+    while i < i_max:
+        if (x[i - 1] - offset) < (x[i] - offset):
+            i_ahead = i + 1
+            while (i_ahead < i_max) and ((x[i_ahead] - offset) == (x[i] - offset)):
+                i_ahead += 1
+
+            if (x[i_ahead] - offset) < (x[i] - offset):
+                peak_idx = (i + i_ahead - 1) // 2
+                if (peak_idx > start_idx) and (height <= (x[peak_idx] - offset)):
+                    return peak_idx
+                i = i_ahead
+        i += 1
+
+    return -1
+
+
+@optional_njit
+def _differentiate_smooth_and_clip(values, dx, window_size, clip_criterion, diff_values, diff2_values, diff_smooth_values,
+                                   diff2_smooth_values, diff_clipped_values):
+    '''2nd pass, over the trimmed rows: 1st and 2nd derivative like np.gradient (central differences, one-sided at the edges),
+    rolled by -4 rows like DerivativeMaker.make_derivatives, then smoothed and clipped like DerivativeMaker.clip_derivatives'''
+
+    number_of_rows, number_of_columns = values.shape
+    coeff_to_offset_diff              = -4 # offsets differentiation
+
+    for j in range(number_of_columns):
+        # diff_values[i] is the derivative of row (i - coeff_to_offset_diff) % number_of_rows
+        for row in range(number_of_rows):
+            if row == 0:
+                derivative = (values[1, j] - values[0, j])/dx
+            elif row == number_of_rows - 1:
+                derivative = (values[row, j] - values[row - 1, j])/dx
+            else:
+                derivative = (values[row + 1, j] - values[row - 1, j])/(2.0 * dx)
+            diff_values[(row + coeff_to_offset_diff) % number_of_rows, j] = derivative
+
+        for row in range(number_of_rows):
+            rolled_row      = (row + coeff_to_offset_diff) % number_of_rows
+            rolled_row_up   = (row + 1 + coeff_to_offset_diff) % number_of_rows
+            rolled_row_down = (row - 1 + coeff_to_offset_diff) % number_of_rows
+            if row == 0:
+                derivative = (diff_values[rolled_row_up, j] - diff_values[rolled_row, j])/dx
+            elif row == number_of_rows - 1:
+                derivative = (diff_values[rolled_row, j] - diff_values[rolled_row_down, j])/dx
+            else:
+                derivative = (diff_values[rolled_row_up, j] - diff_values[rolled_row_down, j])/(2.0 * dx)
+            diff2_values[rolled_row, j] = derivative
+
+        dY_max_value = np.nan
+        for row in range(number_of_rows):
+            if (not np.isnan(diff_values[row, j])) and (np.isnan(dY_max_value) or (diff_values[row, j] > dY_max_value)):
+                dY_max_value = diff_values[row, j]
+        for row in range(number_of_rows):
+            derivative = diff_values[row, j]
+            if (derivative < clip_criterion * dY_max_value) and (derivative > 0): # if derivative is +ve AND below X% of the max
+                diff_clipped_values[row, j] = -derivative
+            else:
+                diff_clipped_values[row, j] = derivative
+
+    _smooth_columns(diff_values,  window_size, diff_smooth_values)
+    _smooth_columns(diff2_values, window_size, diff2_smooth_values)
+
+
+@dataclass
+class FusedPreprocessingResult:
+    '''Output of FusedPreprocessor.run
+    ATTRIBUTES:
+        - df_clean: cleaned and trimmed dataframe [time, T, C, F]
+        - df_diff, df_diff2, df_diff_smooth, df_diff2_smooth, df_diff_clipped: like in CycleSignalBundle
+        - first_row, last_row: the cleaned data are rows [first_row, last_row) of the smoothed data, the trim offsets'''
+
+    df_clean       : pd.core.frame.DataFrame
+    df_diff        : pd.core.frame.DataFrame
+    df_diff2       : pd.core.frame.DataFrame
+    df_diff_smooth : pd.core.frame.DataFrame
+    df_diff2_smooth: pd.core.frame.DataFrame
+    df_diff_clipped: pd.core.frame.DataFrame
+    first_row      : int
+    last_row       : int
+
+
+class FusedPreprocessor:
+    '''Class running the fused kernel on the relevant dataframe [time, T, C, F] of one cleaning cycle. The settings have the same
+    names and defaults as the DataCleaner/DerivativeMaker functions that are run with the pandas engine'''
+
+    @staticmethod
+    def find_trim_rows(smooth_values, T_column, C_column, F_column, points_after_last_F_peak_to_keep = 30, F_fraction_threshold = 40,
+                       points_before_first_peak_to_keep = 20, fraction_threshold = 30):
+        '''Same rows as DataCleaner.remove_points_after_last_F_peak followed by DataCleaner.remove_initial_points, without
+        making the dataframes in between
+        OUTPUT: first_row, last_row, the rows to keep are [first_row, last_row)'''
+
+        T_values, C_values, F_values = smooth_values[:, T_column], smooth_values[:, C_column], smooth_values[:, F_column]
+
+        T_max_idx            = np.nanargmax(T_values) # 1st occurrence, like np.where(T == T_max)[0][0]
+        first_F_peak_idx     = _first_peak_after(F_values, 0.0, np.nanmax(F_values)/F_fraction_threshold, T_max_idx)
+        if first_F_peak_idx < 0:
+            raise IndexError("No F peak after T_max, cannot remove the points after the last F peak")
+        last_row             = min(first_F_peak_idx + points_after_last_F_peak_to_keep, len(smooth_values))
+
+        T_values, C_values, F_values = T_values[:last_row], C_values[:last_row], F_values[:last_row]
+        T_min_value          = np.nanmin(T_values)
+        first_T_peak         = _first_peak_after(T_values, T_min_value, (np.nanmax(T_values) - T_min_value)/fraction_threshold, -1)
+        first_C_peak         = _first_peak_after(C_values, 0.0, np.nanmax(C_values)/fraction_threshold, -1)
+        first_F_peak         = _first_peak_after(F_values, 0.0, np.nanmax(F_values)/fraction_threshold, -1)
+        if min(first_T_peak, first_C_peak, first_F_peak) < 0:
+            raise IndexError("No first T/C/F peak, cannot remove the initial points")
+        first_row            = max(min(first_T_peak, first_C_peak) - points_before_first_peak_to_keep, 0) #ensures the answer is >0
+
+        return first_row, last_row
+
+
+    @staticmethod
+    def run(df: pd.core.frame.DataFrame, window_size: int = 5, dx: int = 1, clip_criterion: float = 0.005) -> FusedPreprocessingResult:
+        '''Cleans, trims and differentiates the relevant dataframe of one cycle
+        INPUT: df: relevant dataframe [time, T, C, F], not cleaned
+        OUTPUT: FusedPreprocessingResult'''
+
+        time_column_id   = df.columns.get_loc(DfConstants.df_time_column)
+        value_columns    = df.columns[time_column_id + 1:]
+        values           = np.ascontiguousarray(df[value_columns].to_numpy(dtype = np.float64))
+        _, usable_columns= ColumnFinder.df_column_finder(df)
+        T_column, C_column, F_column = [column - (time_column_id + 1) for column in usable_columns]
+
+        smooth_values    = np.empty_like(values)
+        _fill_and_smooth(values, window_size, smooth_values)
+        first_row, last_row = FusedPreprocessor.find_trim_rows(smooth_values, T_column, C_column, F_column)
+
+        clean_values     = np.ascontiguousarray(smooth_values[first_row:last_row])
+        if len(clean_values) < 2:
+            raise ValueError(f"Only {len(clean_values)} row(s) left after trimming, at least 2 are needed to differentiate")
+        diff_values, diff2_values, diff_smooth_values, diff2_smooth_values, diff_clipped_values = [np.empty_like(clean_values) for _ in range(5)]
+        _differentiate_smooth_and_clip(clean_values, dx, window_size, clip_criterion, diff_values, diff2_values, diff_smooth_values,
+                                       diff2_smooth_values, diff_clipped_values)
+
+        # the smoothing shifts the time column too, see DataCleaner.smoothen_data
+        df_time          = df.iloc[:, :time_column_id + 1].shift(1 - window_size).iloc[first_row:last_row].reset_index(drop = True)
+        df_clean         = pd.concat([df_time, pd.DataFrame(clean_values, columns = value_columns)], axis = 1)
+
+        return FusedPreprocessingResult(df_clean,
+                                        MatrixDataCleaner.matrix_to_df(df_clean, diff_values),
+                                        MatrixDataCleaner.matrix_to_df(df_clean, diff2_values),
+                                        MatrixDataCleaner.matrix_to_df(df_clean, diff_smooth_values, window_size),
+                                        MatrixDataCleaner.matrix_to_df(df_clean, diff2_smooth_values, window_size),
+                                        MatrixDataCleaner.matrix_to_df(df_clean, diff_clipped_values),
+                                        first_row, last_row)
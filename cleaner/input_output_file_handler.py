@@ -2,7 +2,6 @@
 import csv
 from dataclasses import dataclass
 import os
-import openpyxl
 
 import config_info_obtainer as ci
 from logging_maker import logger
@@ -93,6 +92,7 @@ class ExcelSheetMaker:
     def create_new_excel_file(self):
         '''Create new Excel file'''
 
+        import openpyxl # imported here, it is slow to import and only needed when making Excel files
         self.open_workbook   = openpyxl.Workbook() # create workbook
         self.active_worksheet= self.open_workbook.active # select active worksheet
         logger.info("Created new Excel file")
@@ -102,6 +102,7 @@ class ExcelSheetMaker:
         '''Load existing Excel file in directory'''
 
         if excel_files_in_dir:
+            import openpyxl # imported here, it is slow to import and only needed when making Excel files
             excel_file           = excel_files_in_dir[0] #take the first file
             self.open_workbook   = openpyxl.load_workbook(excel_file)
             self.active_worksheet= self.open_workbook.active #select active worksheet
@@ -196,78 +197,73 @@ class ExcelSheetMaker:
 
 
 class csvFileMaker:
-    '''Class that makes the CSV output file'''
+    '''Class that makes the CSV output file
+    INPUT:
+        - output_file_name: name of the csv file in the output_location of the config file
+        - header_values, row_values: made by make_header_and_row_values, not needed to remove rows'''
 
     csv_extension = '.csv'
 
-    # def __init__(self, output_file_name, resulting_phases, filename):
-    def __init__(self, output_file_name, resulting_phases, input_filename, temp_abs_extrema, var_instance, solution_type):
+    def __init__(self, output_file_name, header_values = None, row_values = None):
 
         self.output_file_name: str= output_file_name
-        self.filename        : str= input_filename
-
-        self.post_milk_flush_time = resulting_phases.post_milk_flush_time #this is from main
-        self.prerinse_time        = resulting_phases.prerinse_time
-        self.prerinse_idx         = resulting_phases.prerinse_idx
-        self.low_C_zone_KPIs      = resulting_phases.low_C_zone_KPIs
-        self.hot_rinse_time       = resulting_phases.hot_rinse_time
-        self.hot_rinse_idx        = resulting_phases.hot_rinse_idx
-        self.post_rinse_time      = resulting_phases.postrinse_time
-        self.post_rinse_idx       = resulting_phases.postrinse_idx
-        self.rinse_KPIs           = resulting_phases.rinse_KPIs
-        self.blowout_duration     = resulting_phases.blowout_duration
-        self.low_C_zone_start_time= resulting_phases.low_C_zone_start_time
-        self.zone_duration_s      = resulting_phases.zone_duration_s
-
-
-        self.header_values = ['File name',
-                              'Day of measurement',
-                              'Start of post-milk flush [RT]',
-                              'Start of pre-rinse [RT]',
-                              'Start of hot rinse [RT]',
-                              'Time for max T [RT]',
-                              'Start of post-rinse [RT]',
-                              'Start of low-C zone [RT]',
-                              'Duration of low-C zone [s]',
-                              'Max T [C]',
-                              f"Avg. T of {ci.Constants.time_interval}s interval with highest T [C]",
-                              f"Duration for which T>{ci.Constants.T_crit}C [s]",
-                              'Avg. C for hot rinse (with water) [mS/cm]', 
-                              'Avg. C for hot rinse (no water) [mS/cm]',
-                              'Avg. C for hot rinse (no water) [%]',
-                              'Blowout duration [s]',
-                              'Solution type',]
-
-        self.row_values = [self.filename,
-                           self.post_milk_flush_time.strftime('%Y-%m-%d'),
-                           self.post_milk_flush_time.time(),
-                           self.prerinse_time,
-                           self.hot_rinse_time.time(),
-                           var_instance.T_max_time.time(),
-                           self.post_rinse_time.time(),
-                           resulting_phases.low_C_zone_start_time.time(),
-                           resulting_phases.zone_duration_s,
-                           var_instance.T_max,
-                           temp_abs_extrema['T of max time interval [C]'],
-                           temp_abs_extrema['Duration for which T > T_crit [s]'],
-                           self.rinse_KPIs['C_avg hot rinse [mS/cm]'],
-                           self.rinse_KPIs['C_avg hot rinse, no water [mS/cm]'],
-                           self.rinse_KPIs['C_avg hot rinse, no water [%]'],
-                           self.blowout_duration,
-                           solution_type,]
+        self.output_file_path: str= os.path.join(ci.Constants.output_location, output_file_name) # no chdir, so the working directory is left alone
+        self.header_values        = header_values
+        self.row_values           = row_values
+
+
+    @staticmethod
+    def make_header_and_row_values(resulting_phases, input_filename, temp_abs_extrema, cycle_signals, solution_type):
+        '''Makes the header and the row of results of one cleaning cycle, without writing anything
+        OUTPUT: header_values (list of str), row_values (list)'''
+
+        header_values = ['File name',
+                         'Day of measurement',
+                         'Start of post-milk flush [RT]',
+                         'Start of pre-rinse [RT]',
+                         'Start of hot rinse [RT]',
+                         'Time for max T [RT]',
+                         'Start of post-rinse [RT]',
+                         'Start of low-C zone [RT]',
+                         'Duration of low-C zone [s]',
+                         'Max T [C]',
+                         f"Avg. T of {ci.Constants.time_interval}s interval with highest T [C]",
+                         f"Duration for which T>{ci.Constants.T_crit}C [s]",
+                         'Avg. C for hot rinse (with water) [mS/cm]', 
+                         'Avg. C for hot rinse (no water) [mS/cm]',
+                         'Avg. C for hot rinse (no water) [%]',
+                         'Blowout duration [s]',
+                         'Solution type',]
+
+        row_values = [input_filename,
+                      resulting_phases.post_milk_flush_time.strftime('%Y-%m-%d'),
+                      resulting_phases.post_milk_flush_time.time(),
+                      resulting_phases.prerinse_time,
+                      resulting_phases.hot_rinse_time.time(),
+                      cycle_signals.T_max_time.time(),
+                      resulting_phases.postrinse_time.time(),
+                      resulting_phases.low_C_zone_start_time.time(),
+                      resulting_phases.zone_duration_s,
+                      cycle_signals.T_max,
+                      temp_abs_extrema['T of max time interval [C]'],
+                      temp_abs_extrema['Duration for which T > T_crit [s]'],
+                      resulting_phases.rinse_KPIs['C_avg hot rinse [mS/cm]'],
+                      resulting_phases.rinse_KPIs['C_avg hot rinse, no water [mS/cm]'],
+                      resulting_phases.rinse_KPIs['C_avg hot rinse, no water [%]'],
+                      resulting_phases.blowout_duration,
+                      solution_type,]
+
+        return header_values, row_values
 
 
     def create_empty_csv_if_nonexistent(self):
         '''Find CSV files in directory'''
 
-        os.chdir(ci.Constants.output_location)
-        list_of_files_in_dir = os.listdir()
-
-        if self.output_file_name in list_of_files_in_dir:
+        if os.path.exists(self.output_file_path):
             logger.info(f"Found existing CSV file of same name")
         else:
             logger.info(f"Did not find CSV file of same name, creating one...")
-            with open(self.output_file_name, 'w', newline='') as file:
+            with open(self.output_file_path, 'w', newline='') as file:
                 pass # to create a file without creating an empty row
 
 
@@ -275,7 +271,7 @@ class csvFileMaker:
         '''Looking if there exists a header row
            Judging whether the header exists based on whether item 1 of the header exists in the csv file'''
         
-        with open(self.output_file_name, 'r') as file:
+        with open(self.output_file_path, 'r') as file:
             if self.header_values[0] in file.read():
                 logger.info("Header exists")
                 self.header_exists = 1
@@ -288,7 +284,7 @@ class csvFileMaker:
         '''Fill header row with values'''
 
         if self.header_exists == 0:
-            with open(self.output_file_name, 'a', newline = '') as csvfile:
+            with open(self.output_file_path, 'a', newline = '') as csvfile:
                 writer = csv.writer(csvfile, delimiter = ';')
                 writer.writerow(self.header_values)
             logger.info(f"Created header")
@@ -296,8 +292,35 @@ class csvFileMaker:
             logger.info(f"Header exists, will not fill it")
 
 
+    def remove_rows_of_cycles(self, list_of_cycle_names, list_of_input_filenames = ()):
+        '''Removes the rows of cycles from the csv file in one rewrite, like old results of input files that are processed again
+        INPUT:
+            - list_of_cycle_names: 'File name' values of the rows to remove
+            - list_of_input_filenames: the rows of all cycles of these input files are removed too, whatever their # of cycles'''
+
+        if not os.path.exists(self.output_file_path):
+            return
+
+        with open(self.output_file_path, 'r', newline = '') as csvfile:
+            rows = list(csv.reader(csvfile, delimiter = ';'))
+
+        cycle_names_to_remove = set(list_of_cycle_names) | set(list_of_input_filenames)
+        cycle_name_prefixes   = tuple(f"{input_filename} [cycle " for input_filename in list_of_input_filenames) # see pipeline.read_cycles
+        kept_rows = [row for row in rows if not (row and ((row[0] in cycle_names_to_remove) or row[0].startswith(cycle_name_prefixes)))]
+        if len(kept_rows) == len(rows):
+            return
+
+        temp_file_path = f"{self.output_file_path}.tmp"
+        with open(temp_file_path, 'w', newline = '') as csvfile:
+            writer = csv.writer(csvfile, delimiter = ';')
+            writer.writerows(kept_rows)
+        os.replace(temp_file_path, self.output_file_path)
+
+        logger.info(f"Removed {len(rows) - len(kept_rows)} old row(s) of {len(cycle_names_to_remove)} cycle(s)/file(s)")
+
+
     def write_to_csv_file(self):
-        with open(self.output_file_name, 'a', newline = '') as csvfile:
+        with open(self.output_file_path, 'a', newline = '') as csvfile:
             writer = csv.writer(csvfile, delimiter = ';')
             writer.writerow(self.row_values) # Write the specified data to the CSV file
 
@@ -310,9 +333,8 @@ class InputCSVFilesSolutionObtainer:
     def obtain_input_file_names(extension = '.csv'):
         '''Counts the number of csv files'''
         
-        input_file_location = ci.Constants.input_location
-        os.chdir(input_file_location)
-        list_of_files_in_dir = os.listdir()
+        input_file_location  = ci.Constants.input_location
+        list_of_files_in_dir = os.listdir(input_file_location)
 
         list_of_input_files = []
         for file in list_of_files_in_dir:
@@ -0,0 +1,218 @@
+'''Module containing the instrumentation of the cleaning code: named spans around the stages of the pipeline (parsing, cleaning,
+derivatives, extrema, every phase finder, writing) and counters (rows read, cycles, extrema found, fallbacks taken). The spans and
+counters of one input file go into one record (see recording), the records of a run are summed per batch (see summarize) and
+written as JSON lines (see write_jsonl) to compare runs. The instrumentation is off by default: span then returns one shared no-op
+context manager and count returns at once, so the calls in the hot path cost about one function call each. Its state is per process,
+worker processes send their records back with their results (see multi_file_maker)'''
+
+from contextlib import nullcontext
+from datetime import datetime
+import json
+import os
+import time
+
+import numpy as np
+
+_is_enabled       = False
+_NO_SPAN          = nullcontext() # shared by all spans when the instrumentation is off, nullcontext can be entered many times
+_span_path        = []            # names of the open spans, nested spans are named like 'clean/smoothen'
+_open_records     = []            # records being recorded, spans and counters go to the innermost one
+_finished_records = []
+
+
+class InstrumentationRecord:
+    '''Spans and counters of one input file, or of one batch of cycles whose phases are found at once
+    ATTRIBUTES:
+        - name, kind: like 'day_1_alkaline.csv', 'file'
+        - spans: dict of {span name: [# of calls, total time [s], max time [s]]}
+        - counters: dict of {counter name: value}
+        - wall_s: time [s] between the start and the end of the record
+        - error: 'ErrorType: message' if the record ended with an error, else None'''
+
+    def __init__(self, name, kind = 'file'):
+        self.name    = name
+        self.kind    = kind
+        self.spans   = {}
+        self.counters= {}
+        self.wall_s  = 0.0
+        self.error   = None
+
+
+    def add_span(self, span_name, duration_s):
+        span_stats = self.spans.get(span_name)
+        if span_stats is None:
+            self.spans[span_name] = [1, duration_s, duration_s]
+            return
+        span_stats[0] += 1
+        span_stats[1] += duration_s
+        span_stats[2]  = max(span_stats[2], duration_s)
+
+
+    def add_count(self, counter_name, value):
+        self.counters[counter_name] = self.counters.get(counter_name, 0) + value
+
+
+    def as_dict(self) -> dict:
+        '''OUTPUT: dict of the record, as written to the JSONL file and sent back by worker processes'''
+
+        return {'name':     self.name,
+                'kind':     self.kind,
+                'wall_s':   self.wall_s,
+                'error':    self.error,
+                'spans':    {span_name: {'calls': calls, 'total_s': total_s, 'max_s': max_s} for span_name, (calls, total_s, max_s) in self.spans.items()},
+                'counters': dict(self.counters), }
+
+
+class _Span:
+    '''Context manager that times one span and adds it to the innermost open record, see span'''
+
+    __slots__ = ('span_name', 'start_time')
+
+    def __init__(self, span_name):
+        self.span_name = span_name
+
+
+    def __enter__(self):
+        _span_path.append(self.span_name)
+        self.start_time = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exception_info):
+        duration_s = time.perf_counter() - self.start_time
+        span_name  = '/'.join(_span_path)
+        _span_path.pop()
+        if _open_records:
+            _open_records[-1].add_span(span_name, duration_s)
+        return False
+
+
+def enable():
+    global _is_enabled
+    _is_enabled = True
+
+
+def disable():
+    global _is_enabled
+    _is_enabled = False
+
+
+def is_enabled() -> bool:
+    return _is_enabled
+
+
+def span(span_name):
+    '''Times the code of a with block, like: with instrumentation.span('smoothen'): ... Spans opened inside a span are named after
+    both, like 'clean/smoothen'. Spans outside a record (see recording) are not kept'''
+
+    if not _is_enabled:
+        return _NO_SPAN
+    return _Span(span_name)
+
+
+def count(counter_name, value = 1):
+    '''Adds value to a counter of the innermost open record, like count('rows read', len(df))'''
+
+    if _is_enabled and _open_records:
+        _open_records[-1].add_count(counter_name, value)
+
+
+class _Recording:
+    '''Context manager that records the spans and counters of one input file (or batch of cycles), see recording'''
+
+    def __init__(self, name, kind):
+        self.record = InstrumentationRecord(name, kind)
+
+
+    def __enter__(self):
+        _open_records.append(self.record)
+        self.start_time = time.perf_counter()
+        return self.record
+
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.record.wall_s = time.perf_counter() - self.start_time
+        if exception is not None:
+            self.record.error = f"{exception_type.__name__}: {exception}"
+        _open_records.remove(self.record)
+        _finished_records.append(self.record.as_dict())
+        return False
+
+
+def recording(name, kind = 'file'):
+    '''Records the spans and counters of a with block into an InstrumentationRecord, like: with instrumentation.recording(file_name): ...
+    The record is kept until take_records. An error is written in the record and raised again'''
+
+    if not _is_enabled:
+        return _NO_SPAN
+    return _Recording(name, kind)
+
+
+def take_records() -> list:
+    '''OUTPUT: list of the dicts of the finished records, which are removed from this process'''
+
+    list_of_records = list(_finished_records)
+    _finished_records.clear()
+    return list_of_records
+
+
+def add_records(list_of_records: list):
+    '''Adds records made by another process, like a worker process of the pool'''
+    _finished_records.extend(list_of_records)
+
+
+def summarize(list_of_records: list) -> dict:
+    '''Sums the records of a batch: the calls and time of every span, its share of the summed wall time of the records and the median/
+    95th percentile/max of its time per record, and the summed counters
+    OUTPUT: dict of the batch stats'''
+
+    total_wall_s = sum(record['wall_s'] for record in list_of_records)
+    span_totals  = {} # {span name: list of the total time of the span in every record that has it}
+    span_calls   = {}
+    span_max_s   = {}
+    counters     = {}
+    for record in list_of_records:
+        for span_name, span_stats in record['spans'].items():
+            span_totals.setdefault(span_name, []).append(span_stats['total_s'])
+            span_calls[span_name] = span_calls.get(span_name, 0) + span_stats['calls']
+            span_max_s[span_name] = max(span_max_s.get(span_name, 0.0), span_stats['max_s'])
+        for counter_name, value in record['counters'].items():
+            counters[counter_name] = counters.get(counter_name, 0) + value
+
+    spans = {}
+    for span_name, list_of_totals_s in sorted(span_totals.items(), key = lambda item: -sum(item[1])):
+        spans[span_name] = {'calls':           span_calls[span_name],
+                            'total_s':         sum(list_of_totals_s),
+                            'share':           sum(list_of_totals_s)/total_wall_s if total_wall_s > 0 else None,
+                            'p50_per_record_s':float(np.percentile(list_of_totals_s, 50)),
+                            'p95_per_record_s':float(np.percentile(list_of_totals_s, 95)),
+                            'max_call_s':      span_max_s[span_name], }
+
+    records_per_kind = {}
+    for record in list_of_records:
+        records_per_kind[record['kind']] = records_per_kind.get(record['kind'], 0) + 1
+
+    return {'records':        records_per_kind,
+            'failed records': sum(record['error'] is not None for record in list_of_records),
+            'wall_s':         total_wall_s,
+            'spans':          spans,
+            'counters':       counters, }
+
+
+def write_jsonl(file_path, list_of_records: list, run_info: dict = None) -> dict:
+    '''Appends one JSON line per record ("type": "file"/"phase batch") and one line of the batch stats ("type": "batch", see
+    summarize) to a JSONL file. All lines of a run share its "run" id, the start time of the run, so many runs can go in one file
+    INPUT: run_info: dict of settings of the run written in the batch line, like the # of jobs
+    OUTPUT: dict of the batch stats'''
+
+    run_id       = datetime.now().isoformat(timespec = 'seconds')
+    batch_stats  = {'type': 'batch', 'run': run_id, **(run_info or {}), **summarize(list_of_records)}
+
+    if os.path.dirname(file_path):
+        os.makedirs(os.path.dirname(file_path), exist_ok = True)
+    with open(file_path, 'a') as jsonl_file:
+        for record in list_of_records:
+            jsonl_file.write(json.dumps({'type': record['kind'], 'run': run_id, **record}) + '\n')
+        jsonl_file.write(json.dumps(batch_stats) + '\n')
+
+    return batch_stats
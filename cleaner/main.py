@@ -1,25 +1,94 @@
-'''Run everything'''
+'''Run everything. Command line entry point, like: python main.py --config path/to/configuration.ini --jobs 4'''
 
-import os
+import argparse
+import time
 import pandas as pd
 
-os.system('cls')
-pd.set_option('future.no_silent_downcasting', True) # prevents issues with future pd versions
-
 # %% #1 - Extracting info from config file
-
-# removed below, it is already used in multi_file_maker
-# import config_info_obtainer
+import config_info_obtainer as ci
 
 # %% #2 - temperature-KPIs AND derivative peaks
-
+import instrumentation
+from logging_maker import logger
 import multi_file_maker as mfm
+from pipeline import ALGORITHM_VERSION
+import watch_daemon
+
+
+def make_run_settings(arguments) -> dict:
+    '''OUTPUT: dict of the settings of the run that are written with its timings'''
+
+    run_settings = {'jobs':             arguments.jobs,
+                    'files_per_batch':  arguments.files_per_batch,
+                    'engine':           ci.Constants.data_cleaning_engine,
+                    'csv_engine':       ci.Constants.csv_engine,
+                    'algorithm_version':ALGORITHM_VERSION, }
+    return run_settings
+
+
+def write_timings(timings_file_path, arguments, failed_files: dict, run_wall_s: float):
+    '''Appends the instrumentation records of the run and its batch stats to a JSONL file (see instrumentation.write_jsonl), and logs
+    the stages that took the most time'''
+
+    run_info = {'run_wall_s':       run_wall_s,
+                **make_run_settings(arguments),
+                'failed_files':     len(failed_files), }
+    batch_stats = instrumentation.write_jsonl(timings_file_path, instrumentation.take_records(), run_info)
+
+    list_of_span_lines = [f"{span_name}: {span_stats['total_s']:.3f}s in {span_stats['calls']} call(s)" for span_name, span_stats in list(batch_stats['spans'].items())[:10]]
+    logger.info(f"Timings written to '{timings_file_path}', run took {run_wall_s:.2f}s, slowest stages:\n  " + '\n  '.join(list_of_span_lines))
+
+
+def main(argv = None):
+    '''Reads the config file and processes the input files, by default all csv files in the input location of the config file.
+    With --watch it keeps running and processes new files as they arrive (see watch_daemon)
+    OUTPUT: dict of failed files {input_filename: error}'''
+
+    argument_parser = argparse.ArgumentParser(description = 'Process csv files of cleaning cycles and write their results to output.csv')
+    argument_parser.add_argument('files', nargs = '*', help = 'input files (default: all csv files in the input location of the config file)')
+    argument_parser.add_argument('--config', default = ci.DEFAULT_CONFIG_PATH, help = 'path of the config file (default: configuration.ini of the repo)')
+    argument_parser.add_argument('--jobs', type = int, default = 1, help = '# of worker processes (default: 1)')
+    argument_parser.add_argument('--incremental', action = 'store_true', help = 'only process new/changed files, replacing the old rows of changed files')
+    argument_parser.add_argument('--watch', action = 'store_true', help = 'keep running and process new csv files in the input location as they arrive')
+    argument_parser.add_argument('--poll-interval-s', type = float, default = 2.0, help = 'with --watch: max # of seconds between polls (default: 2)')
+    argument_parser.add_argument('--settle-time-s', type = float, default = 5.0, help = 'with --watch: # of seconds a file must be unchanged before it is processed (default: 5)')
+    argument_parser.add_argument('--files-per-batch', type = int, help = 'find the phases of the cycles of this many files at once, on stacked arrays (default: one file at a time)')
+    argument_parser.add_argument('--comparison-orders', type = int, nargs = '+', help = 'try these comparison orders (# of neighbors of a relative min/max), writing output_order<N>.csv for each')
+    argument_parser.add_argument('--T-crit-grid', type = float, nargs = '+', help = 'write the temperature KPIs of every cycle for these T_crit values [C] to temperature_KPI_grid.csv (default: T_crit of the config file)')
+    argument_parser.add_argument('--time-interval-grid', type = int, nargs = '+', help = 'time intervals [s] of the KPI grid (default: time_interval of the config file)')
+    argument_parser.add_argument('--timings', metavar = 'PATH', help = 'time every stage of the pipeline and append the per-file and batch timings to this JSONL file (with --watch: every 60 s and when stopped)')
+    arguments       = argument_parser.parse_args(argv)
+
+    pd.set_option('future.no_silent_downcasting', True) # prevents issues with future pd versions
+    ci.load_config(arguments.config)
+
+    if arguments.timings:
+        instrumentation.enable()
+
+    if arguments.watch:
+        watch_daemon.run_daemon(jobs = arguments.jobs, poll_interval_s = arguments.poll_interval_s, settle_time_s = arguments.settle_time_s,
+                                timings_file_path = arguments.timings, run_settings = make_run_settings(arguments))
+        return {}
+
+    start_time          = time.perf_counter()
+
+    list_of_input_files = arguments.files or mfm.InputCSVFilesSolutionObtainer.obtain_input_file_names()
+    if arguments.T_crit_grid or arguments.time_interval_grid:
+        list_of_T_crits        = arguments.T_crit_grid or [ci.Constants.T_crit]
+        list_of_time_intervals = arguments.time_interval_grid or [ci.Constants.time_interval]
+        failed_files           = mfm.run_temperature_KPI_grid(list_of_input_files, list_of_T_crits, list_of_time_intervals, jobs = arguments.jobs)
+    elif arguments.comparison_orders:
+        failed_files = mfm.run_comparison_order_sweep(list_of_input_files, arguments.comparison_orders, jobs = arguments.jobs)
+    else:
+        failed_files = mfm.run_batch(list_of_input_files, jobs = arguments.jobs, incremental = arguments.incremental, files_per_batch = arguments.files_per_batch)
+
+    if arguments.timings:
+        write_timings(arguments.timings, arguments, failed_files, time.perf_counter() - start_time)
+    return failed_files
 
-list_of_input_files = mfm.InputCSVFilesSolutionObtainer.obtain_input_file_names()
 
-for file in list_of_input_files:
-    filename = file
-    # put the rest of the stuff here
+if __name__ == '__main__': # worker processes of the pool import this module again, they should not start a batch themselves
+    failed_files = main()
 
 # %% #3 - Phase identifying class
 # from phase_identifier_results import ResultingPhases
@@ -31,7 +100,7 @@ for file in list_of_input_files:
 # import run_excel_and_plot
 
 # below line is not in use
-from excel_handler import ExcelSheetMaker
+# from excel_handler import ExcelSheetMaker
 
 
 # %% #5 - Plot
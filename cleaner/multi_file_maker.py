@@ -1,143 +1,23 @@
+'''Module that runs the pipeline (see pipeline.py) on a batch of input files, optionally on a pool of worker processes,
+and writes the results to the output csv file'''
 
-import csv
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 import os
-import openpyxl
-import numpy as np
-from sys import exit
+import pandas as pd
 
 import config_info_obtainer as ci
-from data_cleaner import DataCleaner, DerivativeMaker
+from batch_manifest import ProcessedFilesManifest
+import instrumentation
 from input_output_file_handler import ExcelSheetMaker, csvFileMaker, InputCSVFilesSolutionObtainer
 from logging_maker import logger
-from phase_identifier import PrerinsePostmilkflushFinder, Blowout, PostRinseFinder, LowCZoneMaskHandler, EarlyCmaxHandler, LowCZoneAndHotrinseFinder
-# from phase_identifier_results import ResultingPhases
-from run_tempKPI_derivative import run_data_cleaning_temperature_and_derivative_classes
-from utils import ColumnFinder
-
-
-list_of_input_file_names = InputCSVFilesSolutionObtainer.obtain_input_file_names()
-
-
-for input_filename in list_of_input_file_names:
-    solution_type = InputCSVFilesSolutionObtainer.obtain_solution_type_from_filename(input_filename, ci.config_info)
-    
-    df_removed_first_pt, df_diff_smooth, df_diff2_smooth, df_diff_clipped, \
-    df_temp_rel_extrema, temp_abs_extrema, dY_absolute_extrema, dY_relative_extrema = run_data_cleaning_temperature_and_derivative_classes(input_filename)
-    
-    logger.info(f"File is called: {input_filename.upper()}")
-    
-    @dataclass
-    class Variables():
-        '''Place to store variables to use throughout the code'''
-        
-        df      = df_removed_first_pt.copy()
-        dYdx, _ = DerivativeMaker.make_derivatives(df) # Get derivatives
-        time_column_idx, usable_columns= ColumnFinder.df_column_finder(dYdx)
-        
-        t_column_index = 0
-        T_column_index = 1
-        C_column_index = 2
-        F_column_index = 3
-        
-        df_indices= df.index.to_series()
-        t_values  = df.iloc[:, t_column_index]
-        T_values  = df.iloc[:, T_column_index]
-        C_values  = df.iloc[:, C_column_index]
-        F_values  = df.iloc[:, F_column_index]
-        
-        parameters_dict = {'t': t_values, \
-                           'T': T_values, \
-                           'C': C_values, \
-                           'F': F_values, }
-        
-        dT_values = dYdx.iloc[:, T_column_index]
-        dC_values = dYdx.iloc[:, C_column_index]
-        dF_values = dYdx.iloc[:, F_column_index]
-        
-        dT_idx = 0 #index of dY temperature column in array
-        dC_idx = 1 #index of dY conductivity column in array
-        dF_idx = 2 #index of dY flow column in array
-        
-        relative_min_index_idx= 0
-        relative_min_time_idx = 1
-        relative_max_index_idx= 3
-        relative_max_time_idx = 4
-        
-        dT_rel_max_idx = dY_relative_extrema[dT_idx].iloc[:, relative_max_index_idx]
-        dT_rel_min_idx = dY_relative_extrema[dT_idx].iloc[:, relative_min_index_idx]
-        dT_max_idx     = dY_absolute_extrema[dT_idx]['dY_max idx [#]']
-        
-        dC_rel_max_idx = dY_relative_extrema[dC_idx].iloc[:, relative_max_index_idx]
-        dC_max_idx     = dY_absolute_extrema[dC_idx]['dY_max idx [#]']
-        dC_max_val     = dC_values[dC_max_idx]
-        
-        dF_rel_max_idx = dY_relative_extrema[dF_idx].iloc[:, relative_max_index_idx]
-        dF_max_idx     = dY_absolute_extrema[dF_idx]['dY_max idx [#]']
-        
-        dT_relative_max_time = dY_relative_extrema[dT_idx].iloc[:, relative_max_time_idx]
-        dT_relative_min_time = dY_relative_extrema[dT_idx].iloc[:, relative_min_time_idx]
-        
-        dC_relative_max_time = dY_relative_extrema[dC_idx].iloc[:, relative_max_time_idx]
-        dC_relative_min_time = dY_relative_extrema[dC_idx].iloc[:, relative_min_time_idx]
-        
-        dF_relative_max_time = dY_relative_extrema[dF_idx].iloc[:, relative_max_time_idx]
-        dF_relative_min_time = dY_relative_extrema[dF_idx].iloc[:, relative_min_time_idx]
-        
-        dT_max_value = dY_absolute_extrema[dT_idx]['dY_max value']
-        dT_max_time  = dY_absolute_extrema[dT_idx]['dY_max time [s]']
-        
-        T_max        = temp_abs_extrema['T_max [C]']
-        T_max_time   = temp_abs_extrema['T_max time [s]']
-        T_max_idx    = temp_abs_extrema['T_max idx [#]']
-        
-        C_max        = np.amax(C_values)
-        C_max_idx    = np.where(C_values == C_max)[0][0]
-        C_max_time   = t_values[C_max_idx]
-        C_mean       = C_values.mean()
-
-        F_max        = np.amax(F_values)
-
-    var_instance = Variables()
-
-
-    class ResultingPhases():
-    
-        def __init__(self, solution_type):
-
-            low_C_hot_rinse_finder   = LowCZoneMaskHandler(var_instance)
-            self.dC_mask_low_std     = low_C_hot_rinse_finder.apply_std_mask_on_dC(roll_window_size = 3, max_std_threshold_fraction = 0.1)
-            self.dC_mask_T_max       = low_C_hot_rinse_finder.apply_T_max_mask_on_dC(self.dC_mask_low_std)
-            self.dC_mask_C_percentile= low_C_hot_rinse_finder.apply_C_percentile_mask_on_dC(self.dC_mask_T_max, percentile_crit = 40)
-            
-            early_C_max_handler        = EarlyCmaxHandler(var_instance)
-            self.is_there_early_large_C= early_C_max_handler.detect_if_early_C_max_exists(large_C_search_time_fraction_threshold = 0.25)
-            early_C_max_handler.smoothen_large_C_peak_values_if_it_exists(self.is_there_early_large_C)
-
-            low_C_zone_finder    = LowCZoneAndHotrinseFinder(var_instance)
-            self.low_C_zones     = low_C_zone_finder.group_low_C_zones(self.dC_mask_C_percentile)
-            self.low_C_zone_start_time, self.low_C_zone_start_idx, self.zone_duration_s \
-                                 = low_C_zone_finder.obtain_best_low_C_zone_candidate(self.low_C_zones)
-            self.low_C_zone_KPIs = low_C_zone_finder.get_low_C_zone_KPIs(self.low_C_zone_start_time, self.low_C_zone_start_idx, self.zone_duration_s)
-            self.hot_rinse_time, self.hot_rinse_idx \
-                                 = low_C_zone_finder.find_hot_rinse_time(self.low_C_zone_KPIs, num_neighbors = 3, time_between_hotrinse_Tmax_in_min = 4)
-
-            prerinse_postmilk_finder              = PrerinsePostmilkflushFinder(var_instance)
-            self.prerinse_time, self.prerinse_idx = prerinse_postmilk_finder.find_prerinse_time(self.low_C_zone_start_time, self.hot_rinse_idx, time_between_prerinse_Tmax_in_min = 7, prerinse_hotrinse_limit_s = 200)
-            self.post_milk_flush_time, self.post_milk_flush_idx= prerinse_postmilk_finder.find_postmilk_flush_time_depending_on_early_sharp_C(self.is_there_early_large_C, self.low_C_zone_start_time, self.hot_rinse_idx)
-
-            postrinse                                       = PostRinseFinder(var_instance)
-            self.postrinse_time, self.postrinse_idx         = postrinse.find_post_rinse_start_time(num_neighbors = 8, Tmax_postrinse_timeout_s = 60)
-            self.post_rinse_end_time, self.postrinse_end_idx= postrinse.find_post_rinse_end_time(self.postrinse_time, num_neighbors = 8)
-            self.rinse_KPIs                                 = postrinse.collect_rinse_KPIs(self.hot_rinse_idx, self.postrinse_idx, self.low_C_zone_KPIs, solution_type)
-
-            blowout               = Blowout(var_instance)
-            self.blowout_duration = blowout.find_blowout_duration()
-
-    resulting_phases = ResultingPhases(solution_type)
-    
-    
-    '''Send the data to csv/Excel files'''
+from parse_cache import ParsedCSVCache
+from pipeline import process_file, process_files_batched, sweep_comparison_orders, calculate_temperature_KPI_grid, ALGORITHM_VERSION
+from utils import FileFingerprint
+
+FILES_PER_MANIFEST_SAVE = 50 # the manifest of the incremental mode is saved every this many files, and at the end of the batch
+
+def write_cycle_results(cycle_result, output_file_name = 'output.csv'):
+    '''Send the data of one CycleResult to csv/Excel files'''
 
     # print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
     # output_file_name  = 'output.xlsx'
@@ -151,12 +31,311 @@ for input_filename in list_of_input_file_names:
     # excel_sheet_maker.fill_row_with_values(free_row_number)
     # excel_sheet_maker.make_excel_workbook(excel_file)
     print("+++++++++++++++++++++++++++++++++++++")
-    output_file_name = 'output.csv'
-    # csv_file_maker   = csvFileMaker(output_file_name, resulting_phases, input_filename)
-    csv_file_maker   = csvFileMaker(output_file_name, resulting_phases, input_filename, temp_abs_extrema, var_instance, solution_type)
+    csv_file_maker = csvFileMaker(output_file_name, cycle_result.header_values, cycle_result.row_values)
     csv_file_maker.create_empty_csv_if_nonexistent()
     csv_file_maker.check_if_header_row_filled()
     csv_file_maker.fill_header()
     csv_file_maker.write_to_csv_file()
     print("=======================================")
 
+
+def make_parse_cache():
+    '''Makes the parse cache set in configuration.ini, or returns None if it is turned off'''
+
+    if not ci.Constants.use_parse_cache:
+        return None
+
+    parse_cache_location = os.path.join(ci.Constants.input_location, '.parse_cache')
+    column_mapping       = {key: ci.config_info[key] for key in ['time_column_name', 'T_column_name', 'C_column_name', 'F_column_name', 'csv_engine']}
+    parse_cache          = ParsedCSVCache(parse_cache_location, column_mapping, max_cache_size_mb = ci.Constants.max_cache_size_mb)
+    return parse_cache
+
+
+worker_parse_cache = None # set per worker process by initialize_worker
+
+def initialize_worker(config_info, is_instrumentation_enabled: bool = False):
+    '''Runs once in every worker process of the pool. The worker gets the config loaded by the main process, so it does not read
+    the config file again, and makes its parse cache once instead of for every file'''
+
+    global worker_parse_cache
+    pd.set_option('future.no_silent_downcasting', True) # same as main.py, worker processes do not run main.py
+    ci.set_config(config_info)
+    worker_parse_cache = make_parse_cache()
+    if is_instrumentation_enabled:
+        instrumentation.enable()
+
+
+def _run_in_worker(function, *args, **kwargs):
+    '''Runs a task in a worker process
+    OUTPUT: result of the task, and the instrumentation records it made, which the main process adds with instrumentation.add_records.
+    The records of a failed task are sent back with its error, in error.instrumentation_records'''
+
+    try:
+        return function(*args, **kwargs), instrumentation.take_records()
+    except Exception as error:
+        error.instrumentation_records = instrumentation.take_records()
+        raise
+
+
+def get_worker_result(future):
+    '''OUTPUT: result of a task run by _run_in_worker, its instrumentation records are added to this process'''
+
+    try:
+        result, list_of_records = future.result()
+    except Exception as error:
+        instrumentation.add_records(getattr(error, 'instrumentation_records', []))
+        raise
+    instrumentation.add_records(list_of_records)
+    return result
+
+
+def process_input_file_in_worker(input_filename, **task_options):
+    return _run_in_worker(process_input_file, input_filename, worker_parse_cache, **task_options)
+
+
+def process_input_file(input_filename, parse_cache = None, list_of_comparison_orders = None, temperature_KPI_grid = None):
+    '''OUTPUT: list of CycleResult, or with list_of_comparison_orders a dict of {comparison_order: list of CycleResult}, or with
+    temperature_KPI_grid = (list_of_T_crits, list_of_time_intervals) the DataFrame of pipeline.calculate_temperature_KPI_grid'''
+
+    with instrumentation.recording(os.path.basename(input_filename)):
+        if temperature_KPI_grid is not None:
+            return calculate_temperature_KPI_grid(input_filename, *temperature_KPI_grid, parse_cache = parse_cache)
+        if list_of_comparison_orders is not None:
+            return sweep_comparison_orders(input_filename, list_of_comparison_orders, parse_cache = parse_cache)
+        return process_file(input_filename, parse_cache = parse_cache)
+
+
+def process_input_files_in_worker(list_of_input_filenames):
+    return _run_in_worker(process_files_batched, list_of_input_filenames, parse_cache = worker_parse_cache)
+
+
+def _iterate_batched_results_in_input_order(list_of_input_file_names, jobs, files_per_batch: int):
+    '''Same as _iterate_results_in_input_order, with the phases of the cycles of files_per_batch files found at once, see
+    pipeline.process_files_batched. Every batch of files is one task of the pool
+    OUTPUT: generator of (input_filename, list of CycleResult or None, error or None)'''
+
+    list_of_file_batches = [list_of_input_file_names[first_file: first_file + files_per_batch]
+                            for first_file in range(0, len(list_of_input_file_names), files_per_batch)]
+
+    def yield_batch_results(file_batch, get_batch_results):
+        try:
+            batch_results = get_batch_results()
+        except Exception as error: # the whole batch failed, like a worker process that died
+            logger.error(f"Failed to process a batch of {len(file_batch)} files: {type(error).__name__}: {error}")
+            batch_results = [(None, error)] * len(file_batch)
+
+        for input_filename, (list_of_cycle_results, error) in zip(file_batch, batch_results):
+            if error is not None:
+                logger.error(f"Failed to process '{input_filename}': {type(error).__name__}: {error}")
+            yield input_filename, list_of_cycle_results, error
+
+    if jobs <= 1:
+        parse_cache = make_parse_cache()
+        for file_batch in list_of_file_batches:
+            yield from yield_batch_results(file_batch, lambda: process_files_batched(file_batch, parse_cache = parse_cache))
+        return
+
+    with ProcessPoolExecutor(max_workers = jobs, initializer = initialize_worker, initargs = (ci.config_info, instrumentation.is_enabled())) as executor:
+        futures = [executor.submit(process_input_files_in_worker, file_batch) for file_batch in list_of_file_batches]
+        for file_batch, future in zip(list_of_file_batches, futures):
+            yield from yield_batch_results(file_batch, lambda: get_worker_result(future))
+
+
+def _iterate_results_in_input_order(list_of_input_file_names, jobs, files_per_batch: int = None, **task_options):
+    '''Processes the input files, on a pool of "jobs" processes if jobs > 1, and yields the results in the order of the input files.
+    A file that fails does not stop the others, its error is yielded instead. task_options are passed to process_input_file. With
+    files_per_batch, the phases of that many files are found at once, see _iterate_batched_results_in_input_order
+    OUTPUT: generator of (input_filename, results of process_input_file or None, error or None)'''
+
+    if files_per_batch:
+        yield from _iterate_batched_results_in_input_order(list_of_input_file_names, jobs, files_per_batch)
+        return
+
+    if jobs <= 1:
+        parse_cache = make_parse_cache()
+        for input_filename in list_of_input_file_names:
+            try:
+                yield input_filename, process_input_file(input_filename, parse_cache, **task_options), None
+            except Exception as error:
+                logger.exception(f"Failed to process '{input_filename}'")
+                yield input_filename, None, error
+        return
+
+    with ProcessPoolExecutor(max_workers = jobs, initializer = initialize_worker, initargs = (ci.config_info, instrumentation.is_enabled())) as executor:
+        futures = [executor.submit(process_input_file_in_worker, input_filename, **task_options) for input_filename in list_of_input_file_names]
+
+        for input_filename, future in zip(list_of_input_file_names, futures):
+            try:
+                yield input_filename, get_worker_result(future), None
+            except Exception as error:
+                logger.error(f"Failed to process '{input_filename}': {type(error).__name__}: {error}")
+                yield input_filename, None, error
+
+
+def make_manifest(output_file_name = 'output.csv'):
+    '''Makes the manifest of the incremental mode, kept next to the output file. Settings that do not change the results (locations,
+    parse cache) are not part of the config hash'''
+
+    settings_not_in_hash = ['input_location', 'output_location', 'use_parse_cache', 'max_cache_size_mb']
+    config_hash          = FileFingerprint.get_dict_hash({key: value for key, value in ci.config_info.items() if key not in settings_not_in_hash})
+    manifest_path        = os.path.join(ci.Constants.output_location, f"{os.path.splitext(output_file_name)[0]}_manifest.json")
+
+    manifest = ProcessedFilesManifest(manifest_path, config_hash, ALGORITHM_VERSION)
+    if not os.path.exists(os.path.join(ci.Constants.output_location, output_file_name)): # output removed, so its rows must be made again
+        manifest.entries = {}
+
+    return manifest
+
+
+def get_input_file_path(input_filename):
+    return os.path.join(ci.Constants.input_location, input_filename) # a full path in input_filename is kept as it is
+
+
+def remove_old_rows_of_files(list_of_input_filenames, manifest, output_file_name = 'output.csv'):
+    '''Removes the rows of input files that are about to be processed (again) from the output file, in one rewrite: the rows recorded
+    in the manifest for changed files, and any row of a file that is not in the saved manifest yet (like rows written after the last
+    manifest save of a run that was interrupted), so processing them does not add duplicates'''
+
+    list_of_cycle_names = []
+    for input_filename in list_of_input_filenames:
+        old_entry = manifest.get_entry(get_input_file_path(input_filename))
+        if old_entry is not None:
+            list_of_cycle_names.extend(old_entry['cycle names'])
+
+    list_of_input_basenames = [os.path.basename(input_filename) for input_filename in list_of_input_filenames]
+    csvFileMaker(output_file_name).remove_rows_of_cycles(list_of_cycle_names, list_of_input_basenames)
+
+
+def write_file_results(input_filename, list_of_cycle_results, manifest = None, output_file_name = 'output.csv', remove_old_rows: bool = True):
+    '''Writes the rows of all cycles of one input file. With a manifest (incremental mode), the old rows of the file are replaced
+    (unless remove_old_rows is False, when they were removed for the whole batch by remove_old_rows_of_files) and the file is
+    recorded in the manifest. The manifest is not saved here, the caller saves it every few files'''
+
+    input_file_path = get_input_file_path(input_filename)
+
+    if (manifest is not None) and remove_old_rows:
+        old_entry = manifest.get_entry(input_file_path)
+        if old_entry is not None: # changed file, replace its rows
+            csvFileMaker(output_file_name).remove_rows_of_cycles(old_entry['cycle names'])
+
+    with instrumentation.span('write output'):
+        for cycle_result in list_of_cycle_results:
+            write_cycle_results(cycle_result, output_file_name)
+
+    if manifest is not None:
+        manifest.record(input_file_path, [cycle_result.cycle_name for cycle_result in list_of_cycle_results])
+
+
+def run_batch(list_of_input_file_names, jobs: int = 1, incremental: bool = False, output_file_name = 'output.csv', files_per_batch: int = None) -> dict:
+    '''Processes all input files and writes one output row per cleaning cycle, in the (sorted) order of the input files,
+    whatever the number of jobs
+    INPUT:
+        - list_of_input_file_names: names of the csv files in the input location
+        - jobs: # of worker processes, 1 runs everything in this process
+        - incremental: if True only new/changed files are processed (see batch_manifest), the old rows of changed files are removed
+          before the batch starts, and the manifest is saved every FILES_PER_MANIFEST_SAVE files and when the batch stops
+        - output_file_name: name of the csv file in the output location
+        - files_per_batch: if set, the phases of the cycles of that many files are found at once (see pipeline.process_files_batched)
+    OUTPUT: dict of failed files {input_filename: error}'''
+
+    list_of_input_file_names = sorted(list_of_input_file_names)
+
+    manifest = None
+    if incremental:
+        manifest                 = make_manifest(output_file_name)
+        number_of_input_files    = len(list_of_input_file_names)
+        list_of_input_file_names = [name for name in list_of_input_file_names if not manifest.is_up_to_date(get_input_file_path(name))]
+        logger.info(f"Incremental run: {len(list_of_input_file_names)} new/changed files, {number_of_input_files - len(list_of_input_file_names)} up to date")
+        remove_old_rows_of_files(list_of_input_file_names, manifest, output_file_name)
+
+    logger.info(f"Processing {len(list_of_input_file_names)} files with {jobs} job(s)")
+
+    failed_files: dict = {}
+    number_of_written_files = 0
+    try:
+        for input_filename, list_of_cycle_results, error in _iterate_results_in_input_order(list_of_input_file_names, jobs, files_per_batch):
+            if error is not None:
+                failed_files[input_filename] = error
+                continue
+
+            with instrumentation.recording(input_filename, kind = 'output'):
+                write_file_results(input_filename, list_of_cycle_results, manifest, output_file_name, remove_old_rows = False)
+            number_of_written_files += 1
+            if (manifest is not None) and (number_of_written_files % FILES_PER_MANIFEST_SAVE == 0):
+                manifest.save()
+    finally: # an interrupted run keeps the progress of the files written so far
+        if manifest is not None:
+            manifest.save()
+
+    if failed_files:
+        logger.error(f"{len(failed_files)} of {len(list_of_input_file_names)} files failed: {list(failed_files)}")
+    else:
+        logger.info(f"All {len(list_of_input_file_names)} files processed")
+
+    return failed_files
+
+
+def get_output_file_name_of_order(comparison_order, output_file_name = 'output.csv'):
+    output_file_stem, output_file_extension = os.path.splitext(output_file_name)
+    return f"{output_file_stem}_order{comparison_order}{output_file_extension}"
+
+
+def run_comparison_order_sweep(list_of_input_file_names, list_of_comparison_orders: list, jobs: int = 1, output_file_name = 'output.csv') -> dict:
+    '''Processes all input files once for several comparison_order values (see pipeline.sweep_comparison_orders), and writes the rows
+    of every comparison_order to its own csv file, like output_order30.csv
+    INPUT: same as run_batch, + list_of_comparison_orders: the comparison_order values to try
+    OUTPUT: dict of failed files {input_filename: error}'''
+
+    list_of_input_file_names = sorted(list_of_input_file_names)
+    logger.info(f"Processing {len(list_of_input_file_names)} files with {jobs} job(s) for comparison orders {list_of_comparison_orders}")
+
+    failed_files: dict = {}
+    for input_filename, cycle_results_per_order, error in _iterate_results_in_input_order(list_of_input_file_names, jobs, list_of_comparison_orders = list_of_comparison_orders):
+        if error is not None:
+            failed_files[input_filename] = error
+            continue
+
+        with instrumentation.recording(input_filename, kind = 'output'):
+            for comparison_order, list_of_cycle_results in cycle_results_per_order.items():
+                write_file_results(input_filename, list_of_cycle_results, output_file_name = get_output_file_name_of_order(comparison_order, output_file_name))
+
+    if failed_files:
+        logger.error(f"{len(failed_files)} of {len(list_of_input_file_names)} files failed: {list(failed_files)}")
+    else:
+        logger.info(f"All {len(list_of_input_file_names)} files processed")
+
+    return failed_files
+
+
+def run_temperature_KPI_grid(list_of_input_file_names, list_of_T_crits: list, list_of_time_intervals: list, jobs: int = 1,
+                             output_file_name = 'temperature_KPI_grid.csv') -> dict:
+    '''Computes the temperature KPIs of all cycles of all input files for a grid of T_crit and time interval values (see
+    pipeline.calculate_temperature_KPI_grid), and writes them to one csv file in the output location, one row per (cycle, T_crit,
+    time interval), in the (sorted) order of the input files
+    INPUT: same as run_batch, + list_of_T_crits [C] and list_of_time_intervals [s]
+    OUTPUT: dict of failed files {input_filename: error}'''
+
+    list_of_input_file_names = sorted(list_of_input_file_names)
+    logger.info(f"Temperature KPIs of {len(list_of_input_file_names)} files with {jobs} job(s) for T_crit {list_of_T_crits} and time intervals {list_of_time_intervals}")
+
+    failed_files: dict    = {}
+    list_of_file_KPI_grids= []
+    for input_filename, df_file_KPI_grid, error in _iterate_results_in_input_order(list_of_input_file_names, jobs,
+                                                                                  temperature_KPI_grid = (list_of_T_crits, list_of_time_intervals)):
+        if error is not None:
+            failed_files[input_filename] = error
+            continue
+        list_of_file_KPI_grids.append(df_file_KPI_grid)
+
+    if list_of_file_KPI_grids:
+        output_file_path = os.path.join(ci.Constants.output_location, output_file_name)
+        with instrumentation.recording(output_file_name, kind = 'output'), instrumentation.span('write output'):
+            pd.concat(list_of_file_KPI_grids, ignore_index = True).to_csv(output_file_path, sep = ';', index = False)
+        logger.info(f"Temperature KPI grid written to '{output_file_path}'")
+
+    if failed_files:
+        logger.error(f"{len(failed_files)} of {len(list_of_input_file_names)} files failed: {list(failed_files)}")
+    else:
+        logger.info(f"All {len(list_of_input_file_names)} files processed")
+
+    return failed_files
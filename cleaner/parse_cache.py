@@ -0,0 +1,227 @@
+'''Module containing a cache of parsed csv files. Each parsed, column-pruned input file is saved as uncompressed .npy sidecar files
+(one per column), so re-runs memory-map the cached columns instead of parsing the csv again with pd.read_csv'''
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from constants import DfConstants
+from logging_maker import logger
+from utils import FileFingerprint
+
+
+class ParsedCSVCache:
+    '''Class that saves/loads the relevant (time, T, C, F) columns of parsed csv files to/from a sidecar folder
+    INPUT:
+        - cache_location: folder where the cache lives, like a hidden folder in the input folder
+        - column_mapping: dict of the columns we read (from configuration.ini), part of the cache key so changing columns invalidates the cache
+        - max_cache_size_mb: the cache is trimmed to this size by removing the least recently used entries
+        - use_content_hash: if True the key uses the file contents (exact, reads whole file), if False it uses size+mtime (cheap)
+    Invalidation rules:
+        - a changed file (size/mtime or contents) or a changed column mapping gives a new key, the old entry of that file is removed
+        - entries written with another CACHE_FORMAT_VERSION are never loaded
+        - incomplete entries (no meta file, e.g. a crash while writing) are never loaded and get removed when trimming
+    The entry folder names start with a hash of the file name, so the entries of a file are found from the folder names, without
+    reading any meta file. The size of the cache is counted once, then kept up to date by save, and the cache is only scanned and
+    trimmed when that size goes over max_cache_size_mb. Each process counts its own saves only, so with several worker processes
+    the cache can go over max_cache_size_mb by the entries the other processes saved since the last scan'''
+
+    CACHE_FORMAT_VERSION = 1
+    BYTES_PER_MB         = 1024 * 1024
+    meta_file_name       = 'meta.json'
+    column_file_extension= '.npy'
+
+    def __init__(self, cache_location, column_mapping: dict, max_cache_size_mb: float = 500, use_content_hash: bool = False):
+        self.cache_location   = cache_location
+        self.column_mapping   = column_mapping
+        self.max_cache_size_b = max_cache_size_mb * self.BYTES_PER_MB
+        self.use_content_hash = use_content_hash
+        self.column_map_hash  = FileFingerprint.get_dict_hash(column_mapping)
+        self.cache_size_b     = None # unknown until the first scan of the cache, see trim_to_max_size
+
+        os.makedirs(self.cache_location, exist_ok = True)
+
+
+    @staticmethod
+    def get_file_name_prefix(file_name) -> str:
+        '''OUTPUT: start of the keys of all entries of a file name, a hash so any file name gives a valid folder name'''
+        return FileFingerprint.get_dict_hash({'file name': file_name})[:12] + '-'
+
+
+    def make_cache_key(self, file_path) -> str:
+        '''Makes the key of a file: name + identity of its contents + column mapping + cache version
+        INPUT: path of the csv file
+        OUTPUT: key, also used as folder name of the cache entry, starts with get_file_name_prefix'''
+
+        if self.use_content_hash:
+            file_identity = FileFingerprint.get_content_hash(file_path)
+        else:
+            file_identity = FileFingerprint.get_size_and_mtime(file_path)
+
+        key_info = {'file name':      os.path.basename(file_path),
+                    'file identity':  file_identity,
+                    'column mapping': self.column_map_hash,
+                    'cache version':  self.CACHE_FORMAT_VERSION, }
+
+        return self.get_file_name_prefix(os.path.basename(file_path)) + FileFingerprint.get_dict_hash(key_info)[:32]
+
+
+    def _get_entry_location(self, cache_key):
+        return os.path.join(self.cache_location, cache_key)
+
+
+    def _read_meta(self, entry_location):
+        '''Returns the meta dict of an entry, or None if the entry is incomplete/unreadable'''
+
+        meta_path = os.path.join(entry_location, self.meta_file_name)
+        try:
+            with open(meta_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+
+    def load(self, file_path):
+        '''Loads the cached columns of a file, memory-mapped
+        INPUT: path of the csv file
+        OUTPUT: dataframe of relevant columns (time, T, C, F), or None if the file is not (validly) cached'''
+
+        cache_key      = self.make_cache_key(file_path)
+        entry_location = self._get_entry_location(cache_key)
+        meta           = self._read_meta(entry_location)
+
+        if (meta is None) or (meta.get('cache version') != self.CACHE_FORMAT_VERSION):
+            return None
+
+        columns_dict = {}
+        try:
+            for i, column in enumerate(meta['columns']):
+                column_path          = os.path.join(entry_location, f"{i}{self.column_file_extension}")
+                columns_dict[column] = np.load(column_path, mmap_mode = 'r')
+        except (OSError, ValueError):
+            logger.warning(f"Cache entry of '{os.path.basename(file_path)}' is damaged, will parse the csv again")
+            return None
+
+        time_values = columns_dict[DfConstants.df_time_column]
+        columns_dict[DfConstants.df_time_column] = time_values.view('datetime64[ns]')
+        df_relevant = pd.DataFrame(columns_dict, columns = meta['columns'], copy = False) # keeps the memory-mapped columns, no copy
+
+        os.utime(os.path.join(entry_location, self.meta_file_name)) # meta mtime = last access, used when trimming
+        logger.info(f"Loaded '{os.path.basename(file_path)}' from parse cache")
+        return df_relevant
+
+
+    def save(self, file_path, df_relevant: pd.core.frame.DataFrame):
+        '''Saves the relevant columns of a parsed file. Columns are written to a temporary folder which is renamed at the end,
+        so a crash never leaves a half-written entry behind
+        INPUT:
+            - file_path: path of the csv file
+            - df_relevant: dataframe of relevant columns (time, T, C, F)'''
+
+        cache_key      = self.make_cache_key(file_path)
+        entry_location = self._get_entry_location(cache_key)
+        temp_location  = f"{entry_location}.tmp{os.getpid()}"
+        shutil.rmtree(temp_location, ignore_errors = True)
+        os.makedirs(temp_location)
+
+        entry_size_b = 0
+        for i, column in enumerate(df_relevant.columns):
+            column_values = df_relevant[column].values
+            if column == DfConstants.df_time_column:
+                column_values = column_values.astype('datetime64[ns]').view(np.int64)
+            np.save(os.path.join(temp_location, f"{i}{self.column_file_extension}"), np.ascontiguousarray(column_values))
+            entry_size_b += column_values.nbytes
+
+        meta = {'file name':     os.path.basename(file_path),
+                'columns':       df_relevant.columns.tolist(),
+                'size [B]':      entry_size_b,
+                'created':       time.time(),
+                'cache version': self.CACHE_FORMAT_VERSION, }
+
+        with open(os.path.join(temp_location, self.meta_file_name), 'w') as file:
+            json.dump(meta, file)
+
+        removed_size_b = self.remove_entries_of_file(os.path.basename(file_path))
+        os.replace(temp_location, entry_location)
+        logger.info(f"Saved '{os.path.basename(file_path)}' in parse cache ({entry_size_b/self.BYTES_PER_MB:.1f} MB)")
+
+        if self.cache_size_b is None: # first save of this process
+            self.trim_to_max_size()
+            return
+        self.cache_size_b += entry_size_b - removed_size_b
+        if self.cache_size_b > self.max_cache_size_b:
+            self.trim_to_max_size()
+
+
+    def remove_entries_of_file(self, file_name) -> int:
+        '''Removes all entries that belong to a file name, used before saving a new version of that file. The entries are found from
+        their folder names, only their own meta files are read
+        OUTPUT: # of bytes removed'''
+
+        file_name_prefix = self.get_file_name_prefix(file_name)
+        removed_size_b   = 0
+        for entry_name in os.listdir(self.cache_location):
+            if (not entry_name.startswith(file_name_prefix)) or ('.tmp' in entry_name): # tmp: entries that are still being written
+                continue
+            entry_location = self._get_entry_location(entry_name)
+            meta           = self._read_meta(entry_location)
+            shutil.rmtree(entry_location, ignore_errors = True)
+            if meta is not None:
+                removed_size_b += meta['size [B]']
+                logger.info(f"Removed outdated parse cache entry of '{file_name}'")
+
+        return removed_size_b
+
+
+    def trim_to_max_size(self):
+        '''Size-bounded eviction: removes incomplete entries, then removes the least recently used entries until the cache fits in
+        max_cache_size_mb. Reads the meta file of every entry, and sets the size of the cache counted by save'''
+
+        entries = []
+        for entry_name in os.listdir(self.cache_location):
+            if '.tmp' in entry_name: # a tmp folder may belong to a worker that is still writing
+                continue
+            entry_location = self._get_entry_location(entry_name)
+            meta           = self._read_meta(entry_location)
+            if meta is None:
+                shutil.rmtree(entry_location, ignore_errors = True)
+                continue
+            try:
+                last_access_time = os.stat(os.path.join(entry_location, self.meta_file_name)).st_mtime
+            except OSError: # removed meanwhile by another process
+                continue
+            entries.append((last_access_time, meta['size [B]'], entry_location))
+
+        entries.sort() # oldest access first
+        cache_size_b = sum(entry[1] for entry in entries)
+
+        for _, entry_size_b, entry_location in entries:
+            if cache_size_b <= self.max_cache_size_b:
+                break
+            shutil.rmtree(entry_location, ignore_errors = True)
+            cache_size_b -= entry_size_b
+            logger.info(f"Evicted '{os.path.basename(entry_location)}' from parse cache")
+
+        self.cache_size_b = cache_size_b
+
+
+    def get_or_parse(self, file_path, parse_function):
+        '''Returns the cached dataframe of a file, or parses it with parse_function and caches the result
+        INPUT:
+            - file_path: path of the csv file
+            - parse_function: function without arguments that returns the dataframe of relevant columns
+        OUTPUT: dataframe of relevant columns (time, T, C, F)'''
+
+        df_relevant = self.load(file_path)
+        if df_relevant is None:
+            df_relevant = parse_function()
+            try:
+                self.save(file_path, df_relevant)
+            except OSError as error:
+                logger.warning(f"Could not write parse cache: {error}")
+
+        return df_relevant
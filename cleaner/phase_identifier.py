@@ -4,15 +4,17 @@ which should occur in the 'prerinse' phase. This low-C period gives us the condu
 the C of hot rinse (end goal), we can simply subtract the C of water to get the C of milk. Every feature this module looks for can be
 attributed to a peak/drop in either temperature T, conductivity C, or flow F, or a combination thereof'''
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 from sys import exit
 from scipy.signal import find_peaks
 
-from config_info_obtainer import Constants
+import config_info_obtainer as ci
+from event_join import EventJoin
+import instrumentation
 from logging_maker import logger
+from time_grid import TimeGrid
 import logging
 
 logging.getLogger('matplotlib').setLevel(logging.ERROR)
@@ -21,17 +23,37 @@ logging.getLogger('PIL').setLevel(logging.ERROR)
 
 
 class LowCZoneMaskHandler():
-    '''Class that tries to find the low-C zone and hot rinse phase'''
+    '''Class that tries to find the low-C zone and hot rinse phase.
+    NOTE: all the phase identifying classes work with integer time, ns since the start of the cycle (Signals.t_ns and the
+    d*_relative_m*_t_ns arrays, see CycleSignals), and return times like that. They are turned into wall-clock times
+    by ResultingPhases, when the results are output'''
 
-    def __init__(self, var_instance):
-        self.Variables = var_instance
-        self.Variables.dT_relative_min_time = self.Variables.dT_relative_min_time[self.Variables.dT_relative_min_time != 0] # removes 0s (type int), which breaks loops
-        self.Variables.dC_relative_min_time = self.Variables.dC_relative_min_time[self.Variables.dC_relative_min_time != 0] # removes 0s (type int), which breaks loops
-        self.Variables.dF_relative_min_time = self.Variables.dF_relative_min_time[self.Variables.dF_relative_min_time != 0] # removes 0s (type int), which breaks loops
+    NS_PER_S = TimeGrid.NS_PER_S
 
-        self.Variables.dT_relative_max_time = self.Variables.dT_relative_max_time[self.Variables.dT_relative_max_time != 0] # removes 0s (type int), which breaks loops
-        self.Variables.dC_relative_max_time = self.Variables.dC_relative_max_time[self.Variables.dC_relative_max_time != 0] # removes 0s (type int), which breaks loops
-        self.Variables.dF_relative_max_time = self.Variables.dF_relative_max_time[self.Variables.dF_relative_max_time != 0] # removes 0s (type int), which breaks loops
+    def __init__(self, cycle_signals):
+        self.Signals = cycle_signals # read-only, shared by all phase identifying classes of the cycle
+
+
+    def _idx_of_time(self, t_ns) -> int:
+        '''Index of the 1st sample at time t_ns, see TimeIndex'''
+        return self.Signals.time_index.idx_of_time(t_ns)
+
+
+    def _nearest_idx_of_time(self, t_ns) -> int:
+        '''Index of the sample closest to time t_ns, samples without time left out, see TimeIndex'''
+        return self.Signals.time_index.nearest_idx_of_time(t_ns)
+
+
+    def _values_at_times(self, values, t_ns) -> np.ndarray:
+        '''Values (like T_values) of the samples at the times of t_ns, an array of event times, see TimeIndex'''
+        return values[self.Signals.time_index.find_idx(t_ns)]
+
+
+    def _time_of_idx(self, idx) -> int:
+        '''Time [ns] of sample # idx, which must be >= 0 like for the t_values series'''
+        if idx < 0:
+            raise IndexError(f"Index {idx} is before the start of the cycle")
+        return self.Signals.t_ns[idx]
 
 
     def apply_std_mask_on_dC(self, roll_window_size = 3, max_std_threshold_fraction = 0.2) -> pd.core.series.Series:
@@ -41,21 +63,21 @@ class LowCZoneMaskHandler():
             - std_threshold_fraction: fraction of the maximum std below which we want to stay
         OUTPUT: array of True/False values for when dC values are small'''
 
-        dC_rolling_std: pd.core.series.Series = self.Variables.dC_values.rolling(roll_window_size).std().dropna() # dropna because first few samples do not fit in window, so set to NA
+        dC_rolling_std: pd.core.series.Series = pd.Series(self.Signals.dC_values).rolling(roll_window_size).std().dropna() # dropna because first few samples do not fit in window, so set to NA
         dC_rolling_std_shifted = dC_rolling_std.shift(1 - roll_window_size) # to counter the shift from rolling
 
         max_std          = np.amax(dC_rolling_std_shifted)
         min_std          = np.amin(dC_rolling_std_shifted) # sometimes has negative value
         min_std_positive = np.abs(min_std)
         min_std_idx      = np.where(dC_rolling_std_shifted == min_std)[0]
-        min_std_time     = self.Variables.t_values[min_std_idx]
         std_threshold    = max_std_threshold_fraction * max_std # we look for values with st_dev below this threshold
         dC_mask_low_std  = dC_rolling_std_shifted < std_threshold # array of True/False based on whether values respect the threshold
 
-        # plt.plot(self.Variables.T_values)
-        # plt.plot(self.Variables.C_values)
-        # plt.plot(self.Variables.F_values)
-        # plt.plot(self.Variables.dF_values)
+        # import matplotlib.pyplot as plt # only imported when debugging, it is slow to import
+        # plt.plot(self.Signals.T_values)
+        # plt.plot(self.Signals.C_values)
+        # plt.plot(self.Signals.F_values)
+        # plt.plot(self.Signals.dF_values)
         # plt.show()
         # exit()
 
@@ -67,7 +89,7 @@ class LowCZoneMaskHandler():
         INPUT: stdev mask of dC values
         OUTPUT: mask of dC values, with values after T_max marked as False'''
 
-        dC_mask_low_std[dC_mask_low_std.index > self.Variables.T_max_idx] = False # only consider values before T_max
+        dC_mask_low_std[dC_mask_low_std.index > self.Signals.T_max_idx] = False # only consider values before T_max
         dC_mask_T_max: pd.core.series.Series = dC_mask_low_std
 
         return dC_mask_T_max
@@ -82,8 +104,8 @@ class LowCZoneMaskHandler():
             - percentile_crit: percentile above which we want to reject values, so if %ile=40, then 40% data is above it, so 40% of data is False
         OUTPUT: mask of dC values, with C values above a certain percentile marked as False'''
 
-        C_percentile_value            = np.percentile(self.Variables.C_values, percentile_crit)
-        C_values_above_percentile_mask= self.Variables.C_values.values > C_percentile_value # finds values > C percentile
+        C_percentile_value            = np.percentile(self.Signals.C_values, percentile_crit)
+        C_values_above_percentile_mask= self.Signals.C_values > C_percentile_value # finds values > C percentile
         C_values_above_percentile_idx = np.where(C_values_above_percentile_mask)[0]
 
         array_mismatch_len_due_to_diff= len(C_values_above_percentile_mask) - len(dC_mask_T_max) # array mismatch between C and dC due to differentiation
@@ -100,8 +122,8 @@ class EarlyCmaxHandler(LowCZoneMaskHandler):
     '''Class that tries to find the early C-max, a feature that affects some files. This is characterized by a very large peak in C
     in the initial phases. This class aims to find it and remove its'''
 
-    def __init__(self, var_instance):
-        super().__init__(var_instance)
+    def __init__(self, cycle_signals):
+        super().__init__(cycle_signals)
 
 
     # maybe good idea to do additional check: if 1st peak is higher than 2nd peak then we have an early C_max
@@ -115,24 +137,17 @@ class EarlyCmaxHandler(LowCZoneMaskHandler):
 
         PERCENT = 100
         is_there_early_large_C: int= 0
-        number_of_items_in_series  = len(self.Variables.df_indices.values)
+        number_of_items_in_series  = self.Signals.number_of_samples
         large_C_threshold_time_idx = int(number_of_items_in_series * large_C_search_time_fraction_threshold)
-        
-        try:
-            large_C_threshold_time = np.where(self.Variables.t_values == large_C_threshold_time_idx)
-        except:
-            large_C_threshold_time = np.argmin(np.abs(self.Variables.t_values - large_C_threshold_time)) #estimates nearest index to our time
-        finally:
-            time_fraction_int      = int(large_C_search_time_fraction_threshold * PERCENT)
-            large_C_threshold_time = self.Variables.t_values[time_fraction_int]
-
-        if self.Variables.C_max_idx < large_C_threshold_time_idx:
-            logger.warning(f"C max (idx {self.Variables.C_max_idx}) is within {large_C_search_time_fraction_threshold*PERCENT}% of time (idx {large_C_threshold_time_idx})")
+
+        if self.Signals.C_max_idx < large_C_threshold_time_idx:
+            logger.warning(f"C max (idx {self.Signals.C_max_idx}) is within {large_C_search_time_fraction_threshold*PERCENT}% of time (idx {large_C_threshold_time_idx})")
             is_there_early_large_C = 1
+            instrumentation.count('early C peaks')
         else:
-            logger.info(f"C max (idx {self.Variables.C_max_idx}) is outside {large_C_search_time_fraction_threshold*PERCENT}% of time (idx {large_C_threshold_time_idx})")
+            logger.info(f"C max (idx {self.Signals.C_max_idx}) is outside {large_C_search_time_fraction_threshold*PERCENT}% of time (idx {large_C_threshold_time_idx})")
         
-        # dC_peaks_values  = self.Variables.dC_values[self.Variables.dC_rel_max_idx.values]
+        # dC_peaks_values  = self.Signals.dC_values[self.Signals.dC_rel_max_idx.values]
         # sorted_dC_array  = np.sort(dC_peaks_values)
         # first_largest_dC = sorted_dC_array[-1]
         # second_largest_dC= sorted_dC_array[-2]
@@ -148,8 +163,8 @@ class EarlyCmaxHandler(LowCZoneMaskHandler):
             - first_idx_below_mean_right: first index that is below mean when going from C_max downward to the RIGHT
             - first_idx_below_mean_left: first index that is below mean when going from C_max downward to the LEFT'''
 
-        first_C_max_idx_below_mean_right = self.Variables.C_max_idx + np.argmax(self.Variables.C_values[self.Variables.C_max_idx:] <= self.Variables.C_mean) # start from C_max and walk forward
-        first_C_max_idx_below_mean_left  = self.Variables.C_max_idx - np.argmax(self.Variables.C_values[self.Variables.C_max_idx::-1] <= self.Variables.C_mean) # start from C_max and walk backward
+        first_C_max_idx_below_mean_right = self.Signals.C_max_idx + np.argmax(self.Signals.C_values[self.Signals.C_max_idx:] <= self.Signals.C_mean) # start from C_max and walk forward
+        first_C_max_idx_below_mean_left  = self.Signals.C_max_idx - np.argmax(self.Signals.C_values[self.Signals.C_max_idx::-1] <= self.Signals.C_mean) # start from C_max and walk backward
 
         logger.info(f"Early C_max starts at idx {first_C_max_idx_below_mean_left} and ends at idx {first_C_max_idx_below_mean_right}")
         return first_C_max_idx_below_mean_right, first_C_max_idx_below_mean_left
@@ -158,26 +173,31 @@ class EarlyCmaxHandler(LowCZoneMaskHandler):
     def smoothen_large_C_peak_values_if_it_exists(self, is_there_early_large_C):
         '''This function reduces the zone of early C peak by first squashing C and dC then smoothening both
         INPUT: is_there_early_large_C: whether there is an early large C peak (0=False, 1=True)
-        No output as this writes to self'''
+        OUTPUT: CycleSignals with the squashed C and dC, for the phase identifying classes made after this one. The signals are
+        read-only, so the input signals are returned if there is no early large C peak, else a copy with new C and dC arrays'''
 
         if is_there_early_large_C:
             first_C_max_idx_below_mean_right, first_C_max_idx_below_mean_left = self._find_indices_of_start_and_end_of_large_C_peak()
+            large_C_peak_zone  = slice(first_C_max_idx_below_mean_left, first_C_max_idx_below_mean_right + 1)
 
-            C_large_peak_copy  = self.Variables.C_values[first_C_max_idx_below_mean_left : first_C_max_idx_below_mean_right + 1].copy()
-            C_large_peak_copy  = C_large_peak_copy.astype('float64')
-            reduction_factor   = self.Variables.C_mean/self.Variables.C_max
+            C_large_peak_copy  = pd.Series(self.Signals.C_values[large_C_peak_zone].copy())
+            reduction_factor   = self.Signals.C_mean/self.Signals.C_max
             C_large_peak_copy *= reduction_factor
             smoothed_part      = C_large_peak_copy.rolling(window = 2).mean()
             smoothed_part.fillna(C_large_peak_copy, inplace = True) # fill gaps between C_max zone and part before it
-            self.Variables.C_values.values[first_C_max_idx_below_mean_left : first_C_max_idx_below_mean_right + 1] = smoothed_part.values
+            C_values           = self.Signals.C_values.copy()
+            C_values[large_C_peak_zone] = smoothed_part.values
 
-            dC_mean            = self.Variables.dC_values.mean()
-            reduction_factor2  = dC_mean/self.Variables.dC_max_val
-            self.Variables.dC_values.values[first_C_max_idx_below_mean_left : first_C_max_idx_below_mean_right + 1] *= reduction_factor2
+            dC_mean            = pd.Series(self.Signals.dC_values).mean()
+            reduction_factor2  = dC_mean/self.Signals.dC_max_val
+            dC_values          = self.Signals.dC_values.copy()
+            dC_values[large_C_peak_zone] *= reduction_factor2
         
             logger.info(f"Just smoothened C and dC by {reduction_factor} and {reduction_factor2} times respectively")
+            return self.Signals.replace(C_values = C_values, dC_values = dC_values)
         else:
             logger.info(f"Did NOT smoothen C and dC")
+            return self.Signals
 
 
 
@@ -186,82 +206,86 @@ class LowCZoneAndHotrinseFinder(LowCZoneMaskHandler):
     that there is only water in the system. It usually occurs during the pre-rinse phase'''
 
     SECS_PER_MINUTE = 60
+    LOW_C_ZONE_DTYPE= np.dtype([('start_idx', np.int64), ('duration', np.int64)])
     
-    def __init__(self, var_instance):
-        super().__init__(var_instance)
+    def __init__(self, cycle_signals):
+        super().__init__(cycle_signals)
 
 
-    def group_low_C_zones(self, dC_mask_C_percentile: pd.core.series.Series):
-        '''We have a pd series of True/False values. This function groups them into a list of True zones (True = low-C)
+    def group_low_C_zones(self, dC_mask_C_percentile: pd.core.series.Series) -> np.ndarray:
+        '''We have a pd series of True/False values. This function groups them into True zones (True = low-C), with a run-length
+        encoding of the mask: the zones start where the mask goes from False to True and end where it goes back to False
         NOTE: this function's input is a mask applied to dC, where the condition is 'is this value higher than the %ile of C values?'
         INPUT: dC_mask_C_percentile: pre-existing mask of True/False values applied to dC
-        OUTPUT: low_C_zones: list of tuples shaped like: [(start_idx_1, duration_1), (start_idx_2, duration_2), ...] '''
-
-        low_C_zones_list: list = []
-        current_start_index    = None
-
-        for idx, value in dC_mask_C_percentile.items():
-            if value and (current_start_index is None):
-                current_start_index = idx
-            elif (not value) and (current_start_index is not None):
-                duration = idx - current_start_index
-                low_C_zones_list.append((current_start_index, duration))
-                # low_C_zones_list.append({'start_idx': current_start_index, 'duration': idx - current_start_index})
-                current_start_index = None
-        if (current_start_index is not None):
-            duration = len(dC_mask_C_percentile) - current_start_index
-            low_C_zones_list.append((current_start_index, duration))
-            # low_C_zones_list.append({'start_idx': current_start_index, 'duration': len(dC_mask_C_percentile) - current_start_index})
-
-        logger.info(f"Found {len(low_C_zones_list)} low-C zones")
-        return low_C_zones_list
-
-
-    def obtain_best_low_C_zone_candidate(self, low_C_zones: list, duration_threshold: int = 120, decreases_by: int = -10):
-        '''We have a list of low-C zones, with their start index and duration. This function aims to find the real low-C zone by:
-        spotting the first zone that exceeds a certain duration criterion. If no zone exceeds the duration criterion, we lower it and try again
+        OUTPUT: low_C_zones: structured array of LOW_C_ZONE_DTYPE, one (start_idx, duration) per zone, in the order of the mask.
+        start_idx is the index label of the mask, a zone that lasts until the end of the mask ends at len(dC_mask_C_percentile)'''
+
+        mask_labels = dC_mask_C_percentile.index.to_numpy()
+        mask_values = dC_mask_C_percentile.to_numpy(dtype = bool)
+
+        mask_changes = np.diff(np.concatenate(([False], mask_values, [False])).astype(np.int8))
+        zone_starts  = np.flatnonzero(mask_changes == 1)  # 1st True of every zone
+        zone_ends    = np.flatnonzero(mask_changes == -1) # 1st False after every zone, len(mask_values) for a zone at the end
+
+        low_C_zones              = np.empty(len(zone_starts), dtype = self.LOW_C_ZONE_DTYPE)
+        low_C_zones['start_idx'] = mask_labels[zone_starts]
+        end_labels               = mask_labels[np.minimum(zone_ends, len(mask_values) - 1)]
+        low_C_zones['duration']  = np.where(zone_ends < len(mask_values), end_labels, len(mask_values)) - low_C_zones['start_idx']
+
+        logger.info(f"Found {len(low_C_zones)} low-C zones")
+        return low_C_zones
+
+
+    def obtain_best_low_C_zone_candidate(self, low_C_zones: np.ndarray, duration_threshold: int = 120, decreases_by: int = -10):
+        '''We have the low-C zones, with their start index and duration. This function aims to find the real low-C zone by:
+        spotting the first zone that exceeds a certain duration criterion. If no zone exceeds the duration criterion, we lower it and try again.
+        This is done in one pass: every zone gets the highest criterion it meets, and the first zone with the highest one wins
         INPUT:
             - duration_threshold: duration threshold which tells us we have a low-C zone
             - decreases_by: how much to decrease the duration_threshold at every loop if we cannot find a low-C zone candidate
-            - low_C_zones: list of tuples shaped like: [(start_idx_1, duration_1), (start_idx_2, duration_2), ...]
-        OUTPUT: low_C_zone_start_time, low_C_zone_start_idx, zone_duration_s'''
+            - low_C_zones: structured array of (start_idx, duration), see group_low_C_zones
+        OUTPUT: low_C_zone_start_t_ns (time [ns] since the start of the cycle), low_C_zone_start_idx, zone_duration_s'''
 
         list_of_duration_thresholds: list = list(range(duration_threshold, 0, decreases_by))
+        zone_durations_s  = low_C_zones['duration']
+
+        # rank of the highest criterion every zone meets in list_of_duration_thresholds = # of criteria above its duration
+        sorted_thresholds = np.sort(np.asarray(list_of_duration_thresholds, dtype = np.int64))
+        criterion_ranks   = len(sorted_thresholds) - np.searchsorted(sorted_thresholds, zone_durations_s, side = 'right')
+
+        if (len(low_C_zones) > 0) and (np.min(criterion_ranks) < len(sorted_thresholds)):
+            best_zone            = low_C_zones[np.argmin(criterion_ranks)] # 1st zone of the highest criterion
+            zone_duration_s      = int(best_zone['duration'])
+            low_C_zone_start_idx = int(best_zone['start_idx'])
+            low_C_zone_start_t_ns= self._time_of_idx(low_C_zone_start_idx)
+            logger.info(f"Low-C zone lasts {zone_duration_s}s, starts @ {self.Signals.to_time(low_C_zone_start_t_ns)}, idx {low_C_zone_start_idx}")
 
-        for duration_crit in list_of_duration_thresholds:
-            for zone in low_C_zones:
-                zone_duration_s = zone[1]
-                if zone_duration_s >= duration_crit:
-                    low_C_zone_start_idx = zone[0]
-                    low_C_zone_start_time= self.Variables.t_values[low_C_zone_start_idx]
-                    logger.info(f"Low-C zone lasts {zone_duration_s}s, starts @ {low_C_zone_start_time}, idx {low_C_zone_start_idx}")
-                    
-                    return low_C_zone_start_time, low_C_zone_start_idx, zone_duration_s
+            return low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s
 
         logger.warning(f"Cannot find zone that meets duration threshold, using longest one instead")
+        instrumentation.count('fallback: longest low-C zone')
 
-        zone_with_longest_duration= max(low_C_zones, key = lambda x: x[1])
-        low_C_zone_start_idx      = zone_with_longest_duration[0]
-        low_C_zone_start_time     = self.Variables.t_values[low_C_zone_start_idx]
-        zone_duration_s           = zone_with_longest_duration[1]
-        logger.info(f"Low C lasts {zone_duration_s}s, starts @ {low_C_zone_start_time}, idx {low_C_zone_start_idx}")
-        return low_C_zone_start_time, low_C_zone_start_idx, zone_duration_s
+        zone_with_longest_duration= low_C_zones[np.argmax(zone_durations_s)] # 1st of the longest zones, ValueError if there are no zones
+        low_C_zone_start_idx      = int(zone_with_longest_duration['start_idx'])
+        low_C_zone_start_t_ns     = self._time_of_idx(low_C_zone_start_idx)
+        zone_duration_s           = int(zone_with_longest_duration['duration'])
+        logger.info(f"Low C lasts {zone_duration_s}s, starts @ {self.Signals.to_time(low_C_zone_start_t_ns)}, idx {low_C_zone_start_idx}")
+        return low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s
 
 
-    def get_low_C_zone_KPIs(self, low_C_zone_start_time, low_C_zone_start_idx, zone_duration_s):
+    def get_low_C_zone_KPIs(self, low_C_zone_start_t_ns, low_C_zone_start_idx, zone_duration_s):
         '''Look for end of low-C period. Use dC to spot the period of stillness. NOTE: low-C period consists of WATER ONLY
         Pre-rinse must occur before C_max (which happens during hot rinse)
         INPUT: 
-            - low_C_zone_start_time: start time of low-C zone
+            - low_C_zone_start_t_ns: start time [ns] of low-C zone
             - low_C_zone_start_idx: start index of low-C zone
             - zone_duration_s: duration of low-C zone in s
         OUTPUT: low_C_zone_KPIs'''
 
         '''Don't forget to add the offset time'''
         low_C_zone_end_idx  = low_C_zone_start_idx + zone_duration_s
-        zone_duration_td    = zone_duration_s * pd.Timedelta(seconds = 1)
-        low_C_zone_end_time = low_C_zone_start_time + zone_duration_td
-        low_C_zone_values   = self.Variables.C_values[low_C_zone_start_idx : low_C_zone_end_idx + 1].values # this is water
+        low_C_zone_end_t_ns = low_C_zone_start_t_ns + zone_duration_s * self.NS_PER_S
+        low_C_zone_values   = self.Signals.C_values[low_C_zone_start_idx : low_C_zone_end_idx + 1] # this is water
 
         if low_C_zone_values.size > 0:
             C_recession_std = np.std(low_C_zone_values)
@@ -275,8 +299,8 @@ class LowCZoneAndHotrinseFinder(LowCZoneMaskHandler):
         low_C_zone_max  = np.max(low_C_zone_values, initial=0)
 
         low_C_zone_KPIs = {# 'longest recession idx':            max_recession_idx,
-                           'low-C zone start time [s]': low_C_zone_start_time,
-                           'low-C zone end time [s]':   low_C_zone_end_time,
+                           'low-C zone start time [ns]':low_C_zone_start_t_ns,
+                           'low-C zone end time [ns]':  low_C_zone_end_t_ns,
                            'low-C zone start idx [#]':  low_C_zone_start_idx,
                            'low-C zone end idx [#]':    low_C_zone_end_idx,
                            'low-C zone duration [s]':   zone_duration_s,
@@ -285,7 +309,7 @@ class LowCZoneAndHotrinseFinder(LowCZoneMaskHandler):
                            'C max (water)':             low_C_zone_max,
                            'C std (water)':             C_recession_std, }
 
-        logger.info(f"Low-C zone @ [{low_C_zone_start_time}-{low_C_zone_end_time}], idx #[{low_C_zone_start_idx}-{low_C_zone_end_idx}]")
+        logger.info(f"Low-C zone @ [{self.Signals.to_time(low_C_zone_start_t_ns)}-{self.Signals.to_time(low_C_zone_end_t_ns)}], idx #[{low_C_zone_start_idx}-{low_C_zone_end_idx}]")
         return low_C_zone_KPIs
 
 
@@ -299,42 +323,40 @@ class LowCZoneAndHotrinseFinder(LowCZoneMaskHandler):
             - time_between_hotrinse_Tmax_in_min: fallback value if we cannot find hot rinse. Default is based on data which shows
               that hot rinse occurs about 4 min before T_max
         OUTPUT:
-            - hotrinse_time: time at which hot rinse occurs
+            - hotrinse_t_ns: time [ns] at which hot rinse occurs
             - hotrinse_idx: index at which hot rinse occurs'''
 
         T_crit_fraction = 0.3
-        T_threshold     = self.Variables.T_values.values.mean() * T_crit_fraction # ignore values <T_threshold (ie small peaks)
+        T_threshold     = self.Signals.T_values.mean() * T_crit_fraction # ignore values <T_threshold (ie small peaks)
 
         C_crit_fraction = 0.5
-        C_threshold     = self.Variables.C_values.values.mean() * C_crit_fraction # ignore values <C_threshold (ie small peaks)
-
-        neighbors_duration = num_neighbors * pd.Timedelta(seconds = 1)
-
-        for time in self.Variables.dT_relative_max_time:
-            if (low_C_zone_KPIs['low-C zone end time [s]'] < time < self.Variables.T_max_time):
-                idx = np.where(self.Variables.t_values == time)[0][0] 
-                if self.Variables.T_values[idx] > T_threshold: # ignore small T peaks
-                    neighbors_start = time - neighbors_duration
-                    neighbors_end   = time + neighbors_duration
-
-                    for time2 in self.Variables.dC_relative_max_time:
-                        if isinstance(time2, pd.Timestamp): # safeguard that loop doesnt break when time_value = 0 (type int) by enforcing type 'pd.Timestamp'
-                            idx2 = np.where(self.Variables.t_values == time2)[0][0]
-                            if self.Variables.C_values[idx2] > C_threshold: # ignore small C peaks
-                                if (low_C_zone_KPIs['low-C zone end time [s]'] < time2 < self.Variables.T_max_time):
-                                    if neighbors_start < time2 < neighbors_end:
-                                        hotrinse_time = time2
-                                        hotrinse_idx  = np.where(self.Variables.t_values == hotrinse_time)[0][0]
-                                        logger.info(f"Hot rinse @ {hotrinse_time}, idx #{hotrinse_idx}")
-                                        return hotrinse_time, hotrinse_idx
+        C_threshold     = self.Signals.C_values.mean() * C_crit_fraction # ignore values <C_threshold (ie small peaks)
+
+        neighbors_duration = num_neighbors * self.NS_PER_S
+        low_C_zone_end_t_ns= low_C_zone_KPIs['low-C zone end time [ns]']
+
+        dT_peaks_t_ns = self.Signals.dT_relative_max_t_ns
+        dC_peaks_t_ns = self.Signals.dC_relative_max_t_ns
+        dT_peaks_mask = (low_C_zone_end_t_ns < dT_peaks_t_ns) & (dT_peaks_t_ns < self.Signals.T_max_t_ns) \
+                        & (self._values_at_times(self.Signals.T_values, dT_peaks_t_ns) > T_threshold) # ignore small T peaks
+        dC_peaks_mask = (low_C_zone_end_t_ns < dC_peaks_t_ns) & (dC_peaks_t_ns < self.Signals.T_max_t_ns) \
+                        & (self._values_at_times(self.Signals.C_values, dC_peaks_t_ns) > C_threshold) # ignore small C peaks
+
+        # 1st dT peak with a dC peak within its neighbors, the dC peak is hot rinse
+        matched_peaks = EventJoin.first_match(dT_peaks_t_ns, dC_peaks_t_ns, neighbors_duration, dT_peaks_mask, dC_peaks_mask)
+        if matched_peaks is not None:
+            hotrinse_t_ns = dC_peaks_t_ns[matched_peaks[1]]
+            hotrinse_idx  = self._idx_of_time(hotrinse_t_ns)
+            logger.info(f"Hot rinse @ {self.Signals.to_time(hotrinse_t_ns)}, idx #{hotrinse_idx}")
+            return hotrinse_t_ns, hotrinse_idx
 
         time_before_Tmax_in_s = self.SECS_PER_MINUTE * time_between_hotrinse_Tmax_in_min
-        time_buffer_td        = pd.Timedelta(time_before_Tmax_in_s, unit = 's')
-        hotrinse_time         = self.Variables.T_max_time - time_buffer_td
-        hotrinse_idx          = np.argmin(np.abs(self.Variables.t_values - hotrinse_time)) # estimates nearest index to our time
+        hotrinse_t_ns         = self.Signals.T_max_t_ns - time_before_Tmax_in_s * self.NS_PER_S
+        hotrinse_idx          = self._nearest_idx_of_time(hotrinse_t_ns)
         logger.warning(f"Could not find hot-rinse, setting it {time_between_hotrinse_Tmax_in_min}min before Tmax")
-        logger.info(f"Hot rinse @ {hotrinse_time}, idx #{hotrinse_idx}")
-        return hotrinse_time, hotrinse_idx
+        instrumentation.count('fallback: default hot rinse')
+        logger.info(f"Hot rinse @ {self.Signals.to_time(hotrinse_t_ns)}, idx #{hotrinse_idx}")
+        return hotrinse_t_ns, hotrinse_idx
 
 
 
@@ -343,20 +365,22 @@ class PrerinsePostmilkflushFinder(LowCZoneMaskHandler):
 
     SECS_PER_MINUTE = 60
     
-    def __init__(self, var_instance):
-        super().__init__(var_instance)
+    def __init__(self, cycle_signals):
+        super().__init__(cycle_signals)
+        self.prerinse_fallback = None # fallback taken by the last find_prerinse_time, see instrumentation
 
 
     def _set_default_prerinse_time_if_far_from_hotrinse(self, hotrinse_idx, prerinse_hotrinse_limit_s):
         '''This funciton implements the prerinse-hotrinse limit set by Nienke of 200s'''
 
         prerinse_idx  = hotrinse_idx - prerinse_hotrinse_limit_s
-        prerinse_time = self.Variables.t_values[prerinse_idx]
-        logger.warning(f"Exceeded the prerinse-hotrinse limit of {prerinse_hotrinse_limit_s}s! Defaulting prerinse @ {prerinse_time}, idx #{prerinse_idx}")
-        return prerinse_time, prerinse_idx
+        prerinse_t_ns = self._time_of_idx(prerinse_idx)
+        logger.warning(f"Exceeded the prerinse-hotrinse limit of {prerinse_hotrinse_limit_s}s! Defaulting prerinse @ {self.Signals.to_time(prerinse_t_ns)}, idx #{prerinse_idx}")
+        self.prerinse_fallback = 'pre-rinse limited by hot rinse'
+        return prerinse_t_ns, prerinse_idx
 
 
-    def find_prerinse_time(self, low_C_zone_start_time, hotrinse_idx, time_between_prerinse_Tmax_in_min = 7, prerinse_hotrinse_limit_s = 200):
+    def find_prerinse_time(self, low_C_zone_start_t_ns, hotrinse_idx, time_between_prerinse_Tmax_in_min = 7, prerinse_hotrinse_limit_s = 200):
         '''Pre-rinse = 1st large peak in F, AND drop in C, before low-C zone. The code checks if dF_peaks and dC_drops are empty before low-C zone.
         If one of them is empty, then code takes the last peak/drop in the other as prerinse time. If both are non-empty, it takes the
         last dC drop before low-C zone. If both are empty, it assumes the low-C zone is wrongly made and sets prerinse to the default value
@@ -367,45 +391,40 @@ class PrerinsePostmilkflushFinder(LowCZoneMaskHandler):
             - time_between_prerinse_Tmax_in_min: fallback value if we cannot find prerinse. Data shows that prerinse occurs 
               about 10 before Tmax, so it is defaulted to 2 min
         OUTPUT: 
-            - prerinse_time: time at which pre-rinse occurs
+            - prerinse_t_ns: time [ns] at which pre-rinse occurs
             - prerinse_idx: index at which pre-rinse occurs'''
 
-        dF_peaks_before_low_C = self.Variables.dF_relative_max_time[self.Variables.dF_relative_max_time <= low_C_zone_start_time]
-        dC_drops_before_low_C = self.Variables.dC_relative_min_time[self.Variables.dC_relative_min_time <= low_C_zone_start_time]
+        self.prerinse_fallback = None
+        dF_peaks_before_low_C = self.Signals.dF_relative_max_t_ns[self.Signals.dF_relative_max_t_ns <= low_C_zone_start_t_ns]
+        dC_drops_before_low_C = self.Signals.dC_relative_min_t_ns[self.Signals.dC_relative_min_t_ns <= low_C_zone_start_t_ns]
 
-        if (dF_peaks_before_low_C.empty) and (dC_drops_before_low_C.empty):
+        if (dF_peaks_before_low_C.size == 0) and (dC_drops_before_low_C.size == 0):
             logger.warning(f"Both dC drops and dF peaks before low-C zone are empty, low-C zone is probably wrong")
             logger.info(f"Setting dC drops and dF peaks to default values of {time_between_prerinse_Tmax_in_min} min before T_max")
             time_before_Tmax_in_s = self.SECS_PER_MINUTE * time_between_prerinse_Tmax_in_min
-            time_buffer_td        = pd.Timedelta(time_before_Tmax_in_s, unit = 's')
-            prerinse_time         = self.Variables.T_max_time - time_buffer_td
-            prerinse_idx          = np.argmin(np.abs(self.Variables.t_values - prerinse_time)) #estimates nearest index to our time
+            prerinse_t_ns         = self.Signals.T_max_t_ns - time_before_Tmax_in_s * self.NS_PER_S
+            prerinse_idx          = self._nearest_idx_of_time(prerinse_t_ns)
             logger.warning(f"Could not find pre-rinse, setting it {time_between_prerinse_Tmax_in_min} min before T_max")
-            logger.info(f"Pre rinse @ {prerinse_time}, idx #{prerinse_idx}")
-            
-            prerinse_time_pd = pd.to_datetime(prerinse_time)
-            prerinse_time    = prerinse_time_pd.strftime('%H:%M:%S')
-            return prerinse_time, prerinse_idx
+            self.prerinse_fallback = 'default pre-rinse'
+            logger.info(f"Pre rinse @ {self.Signals.to_time(prerinse_t_ns)}, idx #{prerinse_idx}")
+            return prerinse_t_ns, prerinse_idx
         else:
-            if dF_peaks_before_low_C.empty:
+            if dF_peaks_before_low_C.size == 0:
                 logger.warning(f"There are no dF peaks before low_C_zone_start_time")
-                prerinse_time = dC_drops_before_low_C.values[-1]
-            elif dC_drops_before_low_C.empty:
+                prerinse_t_ns = dC_drops_before_low_C[-1]
+            elif dC_drops_before_low_C.size == 0:
                 logger.warning(f"There are no dC drops before low_C_zone_start_time")
-                prerinse_time = dF_peaks_before_low_C.values[-1]
+                prerinse_t_ns = dF_peaks_before_low_C[-1]
             else:
-                prerinse_time = dC_drops_before_low_C.values[-1]
+                prerinse_t_ns = dC_drops_before_low_C[-1]
 
-        prerinse_idx    = np.where(self.Variables.t_values == prerinse_time)[0][0]
-        prerinse_time_pd= pd.to_datetime(prerinse_time)
-        prerinse_time   = prerinse_time_pd.strftime('%H:%M:%S')
-        logger.info(f"Pre rinse @ {prerinse_time}, idx #{prerinse_idx}")
+        prerinse_idx    = self._idx_of_time(prerinse_t_ns)
+        logger.info(f"Pre rinse @ {self.Signals.to_time(prerinse_t_ns)}, idx #{prerinse_idx}")
 
         if (hotrinse_idx - prerinse_idx) > prerinse_hotrinse_limit_s:
-            prerinse_time, prerinse_idx = self._set_default_prerinse_time_if_far_from_hotrinse(hotrinse_idx, prerinse_hotrinse_limit_s)
-            prerinse_time = prerinse_time.strftime('%H:%M:%S')
+            prerinse_t_ns, prerinse_idx = self._set_default_prerinse_time_if_far_from_hotrinse(hotrinse_idx, prerinse_hotrinse_limit_s)
 
-        return prerinse_time, prerinse_idx
+        return prerinse_t_ns, prerinse_idx
 
 
     # # remove this function when the alternate prerinse finder works
@@ -424,34 +443,34 @@ class PrerinsePostmilkflushFinder(LowCZoneMaskHandler):
     #         - prerinse_time: time at which pre-rinse occurs
     #         - prerinse_idx: index at which pre-rinse occurs'''
 
-    #     F_threshold         = self.Variables.F_values.values.mean() * F_crit_fraction # ignore anything below F_threshold (ie small peaks)
+    #     F_threshold         = self.Signals.F_values.values.mean() * F_crit_fraction # ignore anything below F_threshold (ie small peaks)
     #     neighbors_duration  = num_neighbors * pd.Timedelta(seconds = 1)
 
-    #     for time in (self.Variables.dF_relative_max_time):
-    #         if (post_milk_flush_time < time < self.Variables.T_max_time):
-    #             F_idx = np.where(self.Variables.t_values == time)[0][0] 
-    #             if self.Variables.F_values[F_idx] > F_threshold: # ignore small F peaks
+    #     for time in (self.Signals.dF_relative_max_time):
+    #         if (post_milk_flush_time < time < self.Signals.T_max_time):
+    #             F_idx = np.where(self.Signals.t_values == time)[0][0] 
+    #             if self.Signals.F_values[F_idx] > F_threshold: # ignore small F peaks
     #                 neighbors_start    = time - neighbors_duration
     #                 neighbors_end      = time + neighbors_duration
 
-    #                 for time_value in self.Variables.dC_relative_min_time:
-    #                     if (post_milk_flush_time < time_value < self.Variables.T_max_time):
+    #                 for time_value in self.Signals.dC_relative_min_time:
+    #                     if (post_milk_flush_time < time_value < self.Signals.T_max_time):
     #                         if neighbors_start < time_value < neighbors_end:
     #                             prerinse_time = time_value
-    #                             prerinse_idx  = np.where(self.Variables.t_values == prerinse_time)[0][0]
+    #                             prerinse_idx  = np.where(self.Signals.t_values == prerinse_time)[0][0]
     #                             logger.info(f"Pre rinse @ {prerinse_time}, idx #{prerinse_idx}")
     #                             return prerinse_time, prerinse_idx
 
     #     time_after_postmilk_in_s= self.SECS_PER_MINUTE * time_between_postmilk_prerinse_in_min
     #     time_buffer_td          = pd.Timedelta(time_after_postmilk_in_s, unit = 's')
     #     prerinse_time           = post_milk_flush_time + time_buffer_td
-    #     prerinse_idx            = np.argmin(np.abs(self.Variables.t_values - prerinse_time)) #estimates nearest index to our time
+    #     prerinse_idx            = np.argmin(np.abs(self.Signals.t_values - prerinse_time)) #estimates nearest index to our time
     #     logger.warning(f"Could not find pre-rinse, setting it {time_between_postmilk_prerinse_in_min} min after postmilk flush")
     #     logger.info(f"Pre rinse @ {prerinse_time}, idx #{prerinse_idx}")
     #     return prerinse_time, prerinse_idx
 
 
-    def _find_postmilk_time_when_no_early_sharp_C(self, low_C_zone_start_time, hotrinse_idx, time_between_postmilk_Tmax_in_min: int = 12, C_crit_fraction = 0.1):
+    def _find_postmilk_time_when_no_early_sharp_C(self, low_C_zone_start_t_ns, hotrinse_idx, time_between_postmilk_Tmax_in_min: int = 12, C_crit_fraction = 0.1):
         '''Post-milk = 1st positive peak in C. If this method fails to find the post-milk flush, we fallback onto a hardcoded
         time value of postmilk flush, measured from T_max.
         INPUT: 
@@ -459,98 +478,96 @@ class PrerinsePostmilkflushFinder(LowCZoneMaskHandler):
               that postmilk occurs about 12 min before T_max
             - C_crit_fraction: threshold fraction below which we ignore everything
             OUTPUT:
-            - post_milk_flush_time: time at which postmilk flush occurs
+            - post_milk_flush_t_ns: time [ns] at which postmilk flush occurs
             - post_milk_flush_idx: index at which postmilk flush occurs'''
 
-        _, prerinse_idx = self.find_prerinse_time(low_C_zone_start_time, hotrinse_idx)
+        _, prerinse_idx = self.find_prerinse_time(low_C_zone_start_t_ns, hotrinse_idx)
 
-        C_threshold = self.Variables.C_values.values.mean() * C_crit_fraction # ignore anything below C_threshold (ie small peaks)
+        C_threshold = self.Signals.C_values.mean() * C_crit_fraction # ignore anything below C_threshold (ie small peaks)
 
-        for post_milk_flush_time in self.Variables.dC_relative_max_time:
-            post_milk_flush_idx = np.where(self.Variables.t_values == post_milk_flush_time)[0][0]
+        for post_milk_flush_t_ns in self.Signals.dC_relative_max_t_ns:
+            post_milk_flush_idx = self._idx_of_time(post_milk_flush_t_ns)
             if post_milk_flush_idx < prerinse_idx:
-                if self.Variables.C_values[post_milk_flush_idx] > C_threshold:
-                    logger.info(f"Post-milk flush @ {post_milk_flush_time}, idx #{post_milk_flush_idx}")
-                    return post_milk_flush_time, post_milk_flush_idx
+                if self.Signals.C_values[post_milk_flush_idx] > C_threshold:
+                    logger.info(f"Post-milk flush @ {self.Signals.to_time(post_milk_flush_t_ns)}, idx #{post_milk_flush_idx}")
+                    return post_milk_flush_t_ns, post_milk_flush_idx
         
         time_before_T_max_in_s= self.SECS_PER_MINUTE * time_between_postmilk_Tmax_in_min
-        time_buffer_td        = pd.Timedelta(time_before_T_max_in_s, unit = 's')
-        post_milk_flush_time  = self.Variables.T_max_time - time_buffer_td
-        post_milk_flush_idx   = np.argmin(np.abs(self.Variables.t_values - post_milk_flush_time)) #estimates nearest index to our time
+        post_milk_flush_t_ns  = self.Signals.T_max_t_ns - time_before_T_max_in_s * self.NS_PER_S
+        post_milk_flush_idx   = self._nearest_idx_of_time(post_milk_flush_t_ns)
         
         logger.warning(f"Could not find post-milk flush, using the default value, {time_between_postmilk_Tmax_in_min} min before T_max")
-        logger.info(f"Post-milk flush @ {post_milk_flush_time}, idx #{post_milk_flush_idx}")
-        return post_milk_flush_time, post_milk_flush_idx
+        instrumentation.count('fallback: default post-milk flush')
+        logger.info(f"Post-milk flush @ {self.Signals.to_time(post_milk_flush_t_ns)}, idx #{post_milk_flush_idx}")
+        return post_milk_flush_t_ns, post_milk_flush_idx
 
 
     # consider having an additional function that finds postmilk using C and T, if C and F doesnt work well
-    def _find_postmilk_time_when_early_sharp_C(self, low_C_zone_start_time, num_neighbors = 8, time_between_postmilk_Tmax_in_min: int = 12, C_crit_fraction = 0.01):
+    def _find_postmilk_time_when_early_sharp_C(self, low_C_zone_start_t_ns, num_neighbors = 8, time_between_postmilk_Tmax_in_min: int = 12, C_crit_fraction = 0.01):
         '''If there is early C peak, then C is not reliable to determine postmilk flush on its own, so this function looks for increase in C AND F
         In the event of failure, we fall back to a default time value of postmilk flush, measured from T_max.
         INPUT:
             - time_between_postmilk_Tmax_in_min: fallback value if we cannot get a postmilkflush value. Default is based on data which shows
               that postmilk occurs about 12 min before T_max
         OUTPUT:
-            - post_milk_flush_time: time at which postmilk flush occurs
+            - post_milk_flush_t_ns: time [ns] at which postmilk flush occurs
             - post_milk_flush_idx: index at which postmilk flush occurs'''
 
-        neighbors_duration= num_neighbors * pd.Timedelta(seconds = 1)
-        C_threshold       = self.Variables.C_values.values.mean() * C_crit_fraction # ignore anything below C_threshold (ie small peaks
+        neighbors_duration= num_neighbors * self.NS_PER_S
+        C_threshold       = self.Signals.C_values.mean() * C_crit_fraction # ignore anything below C_threshold (ie small peaks
 
         F_crit_fraction= C_crit_fraction
-        F_threshold    = self.Variables.C_values.values.mean() * F_crit_fraction # ignore anything below C_threshold (ie small peaks
-
-        for time in (self.Variables.dC_relative_max_time):
-            if (time < low_C_zone_start_time):
-                C_idx = np.where(self.Variables.t_values == time)[0][0] 
-                if self.Variables.C_values[C_idx] > C_threshold: # ignore small C peaks
-                    neighbors_start = time - neighbors_duration
-                    neighbors_end   = time + neighbors_duration
-
-                    for time_value in self.Variables.dF_relative_max_time:
-                        if (time_value < low_C_zone_start_time):
-                            F_idx = np.where(self.Variables.t_values == time)[0][0] 
-                            if self.Variables.F_values[F_idx] > F_threshold: # ignore small C peaks
-                                if neighbors_start < time_value < neighbors_end:
-                                    postmilkflush_time = time_value
-                                    postmilkflush_idx  = np.where(self.Variables.t_values == postmilkflush_time)[0][0]
-                                    logger.info(f"Pre rinse @ {postmilkflush_time}, idx #{postmilkflush_idx}")
-                                    return postmilkflush_time, postmilkflush_idx
+        F_threshold    = self.Signals.C_values.mean() * F_crit_fraction # ignore anything below C_threshold (ie small peaks
+
+        dC_peaks_t_ns = self.Signals.dC_relative_max_t_ns
+        dF_peaks_t_ns = self.Signals.dF_relative_max_t_ns
+        dC_peaks_mask = (dC_peaks_t_ns < low_C_zone_start_t_ns) \
+                        & (self._values_at_times(self.Signals.C_values, dC_peaks_t_ns) > C_threshold) \
+                        & (self._values_at_times(self.Signals.F_values, dC_peaks_t_ns) > F_threshold) # ignore small C peaks, F is read at the C peak
+        dF_peaks_mask = dF_peaks_t_ns < low_C_zone_start_t_ns
+
+        # 1st dC peak with a dF peak within its neighbors, the dF peak is postmilk flush
+        matched_peaks = EventJoin.first_match(dC_peaks_t_ns, dF_peaks_t_ns, neighbors_duration, dC_peaks_mask, dF_peaks_mask)
+        if matched_peaks is not None:
+            postmilkflush_t_ns = dF_peaks_t_ns[matched_peaks[1]]
+            postmilkflush_idx  = self._idx_of_time(postmilkflush_t_ns)
+            logger.info(f"Pre rinse @ {self.Signals.to_time(postmilkflush_t_ns)}, idx #{postmilkflush_idx}")
+            return postmilkflush_t_ns, postmilkflush_idx
 
         time_before_T_max_in_s= self.SECS_PER_MINUTE * time_between_postmilk_Tmax_in_min
-        time_buffer_td        = pd.Timedelta(time_before_T_max_in_s, unit = 's')
-        post_milk_flush_time  = self.Variables.T_max_time - time_buffer_td
-        post_milk_flush_idx   = np.argmin(np.abs(self.Variables.t_values - post_milk_flush_time)) #estimates nearest index to our time
+        post_milk_flush_t_ns  = self.Signals.T_max_t_ns - time_before_T_max_in_s * self.NS_PER_S
+        post_milk_flush_idx   = self._nearest_idx_of_time(post_milk_flush_t_ns)
         
         logger.warning(f"Could not find post-milk flush, using the default value, {time_between_postmilk_Tmax_in_min} min before T_max")
-        logger.info(f"Post-milk flush @ {post_milk_flush_time}, idx #{post_milk_flush_idx}")
-        return post_milk_flush_time, post_milk_flush_idx
+        instrumentation.count('fallback: default post-milk flush')
+        logger.info(f"Post-milk flush @ {self.Signals.to_time(post_milk_flush_t_ns)}, idx #{post_milk_flush_idx}")
+        return post_milk_flush_t_ns, post_milk_flush_idx
 
 
-    def find_postmilk_flush_time_depending_on_early_sharp_C(self, is_there_early_large_C, low_C_zone_start_time, hotrinse_idx):
+    def find_postmilk_flush_time_depending_on_early_sharp_C(self, is_there_early_large_C, low_C_zone_start_t_ns, hotrinse_idx):
         '''Run the helper functions. If there is an early large C, then run the function for it. If there isn't a large early C, then run
         the normal function to detect postmilk flush
         INPUT:
             - is_there_early_large_C: True/False value indicating whether there is an early large C
-            - low_C_zone_start_time: start time of the low-C zone
+            - low_C_zone_start_t_ns: start time [ns] of the low-C zone
         OUTPUT:
-            - post_milk_flush_time: start time of postmilk flush
+            - post_milk_flush_t_ns: start time [ns] of postmilk flush
             - post_milk_flush_idx: start idx of postmilk flush'''
 
         if is_there_early_large_C:
-            post_milk_flush_time, post_milk_flush_idx = self._find_postmilk_time_when_early_sharp_C(low_C_zone_start_time, num_neighbors = 8, time_between_postmilk_Tmax_in_min = 12, C_crit_fraction = 0.01)
+            post_milk_flush_t_ns, post_milk_flush_idx = self._find_postmilk_time_when_early_sharp_C(low_C_zone_start_t_ns, num_neighbors = 8, time_between_postmilk_Tmax_in_min = 12, C_crit_fraction = 0.01)
         else:
-            post_milk_flush_time, post_milk_flush_idx = self._find_postmilk_time_when_no_early_sharp_C(low_C_zone_start_time, hotrinse_idx, time_between_postmilk_Tmax_in_min = 12, C_crit_fraction = 0.01)
+            post_milk_flush_t_ns, post_milk_flush_idx = self._find_postmilk_time_when_no_early_sharp_C(low_C_zone_start_t_ns, hotrinse_idx, time_between_postmilk_Tmax_in_min = 12, C_crit_fraction = 0.01)
 
-        return post_milk_flush_time, post_milk_flush_idx
+        return post_milk_flush_t_ns, post_milk_flush_idx
 
 
 
 class PostRinseFinder(LowCZoneMaskHandler):
     '''Class dealing with postrinse phase, inherits from LowCZoneMaskHandler'''
 
-    def __init__(self, var_instance):
-        super().__init__(var_instance)
+    def __init__(self, cycle_signals):
+        super().__init__(cycle_signals)
 
 
     def find_post_rinse_start_time(self, num_neighbors = 8, Tmax_postrinse_timeout_s = 60):
@@ -565,137 +582,139 @@ class PostRinseFinder(LowCZoneMaskHandler):
               then we look for C_peak in [10:10; 10:30]. Not recommended to go below 6s
             - Tmax_postrinse_timeout: time between Tmax and postrinse that cannot be exceeded
         OUTPUT:
-            - postrinse_time: time at which postrinse occurs
+            - postrinse_t_ns: time [ns] at which postrinse occurs
             - postrinse_idx: index at which postrinse occurs'''
 
-        logger.info(f"T_max @ {self.Variables.T_max_time}")
-        neighbors_duration = num_neighbors * pd.Timedelta(seconds = 1)
-
-        for time in self.Variables.dT_relative_min_time:
-            if time > self.Variables.T_max_time:
-                neighbors_start = time - neighbors_duration
-                neighbors_end   = time + neighbors_duration
-
-                for time_value in self.Variables.dC_relative_min_time:
-                    if neighbors_start < time_value < neighbors_end:
-                        postrinse_time = max(time, time_value)
-                        time_diff_in_s = (postrinse_time - self.Variables.T_max_time).total_seconds()
-                        if time_diff_in_s > Tmax_postrinse_timeout_s:
-                            logger.warning(f"Postrinse takes too long to occur (>{Tmax_postrinse_timeout_s}s since T_max), will take the 1st peak in T since T_max instead")
-                            postrinse_time_list = [x for x in self.Variables.dT_relative_min_time if x > self.Variables.T_max_time]
-                            postrinse_time2 = postrinse_time_list[0] #take 1st value of list of peak
-                            postrinse_idx2  = np.where(self.Variables.t_values == postrinse_time2)[0][0]
-                            logger.info(f"Post rinse starts @ {postrinse_time2}, idx #{postrinse_idx2}")
-                            return postrinse_time2, postrinse_idx2
-                        else:
-                            postrinse_idx = np.where(self.Variables.t_values == postrinse_time)[0][0]
-                            logger.info(f"Post rinse starts @ {postrinse_time}, idx #{postrinse_idx}")
-                            return postrinse_time, postrinse_idx
+        logger.info(f"T_max @ {self.Signals.T_max_time}")
+        neighbors_duration = num_neighbors * self.NS_PER_S
+        T_max_t_ns         = self.Signals.T_max_t_ns
+
+        dT_drops_t_ns = self.Signals.dT_relative_min_t_ns
+        dC_drops_t_ns = self.Signals.dC_relative_min_t_ns
+        dT_drops_mask = dT_drops_t_ns > T_max_t_ns
+
+        # 1st dT drop after T_max with a dC drop within its neighbors, postrinse is the later of the 2
+        matched_drops = EventJoin.first_match(dT_drops_t_ns, dC_drops_t_ns, neighbors_duration, dT_drops_mask)
+        if matched_drops is not None:
+            postrinse_t_ns = max(dT_drops_t_ns[matched_drops[0]], dC_drops_t_ns[matched_drops[1]])
+            time_diff_in_s = (postrinse_t_ns - T_max_t_ns)/self.NS_PER_S
+            if time_diff_in_s > Tmax_postrinse_timeout_s:
+                logger.warning(f"Postrinse takes too long to occur (>{Tmax_postrinse_timeout_s}s since T_max), will take the 1st peak in T since T_max instead")
+                instrumentation.count('fallback: post-rinse start at 1st T drop')
+                postrinse_t_ns2 = dT_drops_t_ns[dT_drops_mask][0] #take 1st peak
+                postrinse_idx2  = self._idx_of_time(postrinse_t_ns2)
+                logger.info(f"Post rinse starts @ {self.Signals.to_time(postrinse_t_ns2)}, idx #{postrinse_idx2}")
+                return postrinse_t_ns2, postrinse_idx2
+            else:
+                postrinse_idx = self._idx_of_time(postrinse_t_ns)
+                logger.info(f"Post rinse starts @ {self.Signals.to_time(postrinse_t_ns)}, idx #{postrinse_idx}")
+                return postrinse_t_ns, postrinse_idx
 
         logger.warning(f"Could not find post-rinse start, setting it to T_max")
-        logger.info(f"Post rinse @ {self.Variables.T_max_time}, idx #{self.Variables.T_max_idx}")
-        return self.Variables.T_max_time, self.Variables.T_max_idx
+        instrumentation.count('fallback: post-rinse start at T_max')
+        logger.info(f"Post rinse @ {self.Signals.T_max_time}, idx #{self.Signals.T_max_idx}")
+        return T_max_t_ns, self.Signals.T_max_idx
 
 
-    def _find_postrinse_end_using_T(self, num_neighbors, dT_max_after_postrinse_series, dC_max_after_postrinse_series):
+    def _find_postrinse_end_using_T(self, num_neighbors, dT_max_after_postrinse_t_ns, dC_max_after_postrinse_t_ns):
         '''Helper function that finds end of postrinse using the T variable. First, gets time of first dT peak after postrinse start,
         then applies a range of neighbors to this dT value to see if dC peaks match with it. If neighbors match,
         then we found postrinse end time. If not, then just return first dT peak'''
 
-        if len(dT_max_after_postrinse_series) > 0: # dT array sometimes empty, so ensure it has values by len() > 0
+        if len(dT_max_after_postrinse_t_ns) > 0: # dT array sometimes empty, so ensure it has values by len() > 0
 
-            first_peak_after_postrinse_time = dT_max_after_postrinse_series.iloc[0]
-            neighbors_duration= num_neighbors * pd.Timedelta(seconds = 1)
-            neighbors_start   = first_peak_after_postrinse_time - neighbors_duration
-            neighbors_end     = first_peak_after_postrinse_time + neighbors_duration
+            first_peak_after_postrinse_t_ns = dT_max_after_postrinse_t_ns[0]
+            neighbors_duration= num_neighbors * self.NS_PER_S
 
-            for time in dC_max_after_postrinse_series: #using dC here as neighbors are defined by T
-                if neighbors_start < time < neighbors_end:
-                    postrinse_end_time = time
-                    postrinse_end_idx  = np.where(self.Variables.t_values == postrinse_end_time)[0][0]
-                    logger.info(f"Post rinse ends @ {postrinse_end_time}, idx #{postrinse_end_idx}, using T method")
-                    return postrinse_end_time, postrinse_end_idx
+            matched_peaks = EventJoin.first_match(dT_max_after_postrinse_t_ns[:1], dC_max_after_postrinse_t_ns, neighbors_duration) #using dC here as neighbors are defined by T
+            if matched_peaks is not None:
+                postrinse_end_t_ns = dC_max_after_postrinse_t_ns[matched_peaks[1]]
+                postrinse_end_idx  = self._idx_of_time(postrinse_end_t_ns)
+                logger.info(f"Post rinse ends @ {self.Signals.to_time(postrinse_end_t_ns)}, idx #{postrinse_end_idx}, using T method")
+                return postrinse_end_t_ns, postrinse_end_idx
 
-            postrinse_end_idx = np.where(self.Variables.t_values == first_peak_after_postrinse_time)[0][0]
+            postrinse_end_idx = self._idx_of_time(first_peak_after_postrinse_t_ns)
             logger.warning(f"Could not find end of postrinse, setting it to 1st peak in T since T_max")
-            logger.info(f"Post rinse ends @ {first_peak_after_postrinse_time}, idx #{postrinse_end_idx}, using T method")
-            return first_peak_after_postrinse_time, postrinse_end_idx
+            logger.info(f"Post rinse ends @ {self.Signals.to_time(first_peak_after_postrinse_t_ns)}, idx #{postrinse_end_idx}, using T method")
+            return first_peak_after_postrinse_t_ns, postrinse_end_idx
         else:
             logger.warning("Array of dT peaks after postrinse start is of size 0")
             return None
 
 
-    def _find_postrinse_end_using_C(self, dC_max_after_postrinse_series):
+    def _find_postrinse_end_using_C(self, dC_max_after_postrinse_t_ns):
         '''Helper function that finds end of postrinse using the C variable. This is used when methods using T fail.
         Finds the first peak in dC since postrinse start and sets it as postrinse end time'''
 
-        if len(dC_max_after_postrinse_series) > 0:
+        if len(dC_max_after_postrinse_t_ns) > 0:
             logger.info(f"Using C method instead, less stable, so results might be less accurate")
-            postrinse_end_time = dC_max_after_postrinse_series.iloc[0] # take first value
-            postrinse_end_idx  = np.where(self.Variables.t_values == postrinse_end_time)[0][0]
-            logger.info(f"Post rinse ends @ {postrinse_end_time}, idx #{postrinse_end_idx}, using C method")
-            return postrinse_end_time, postrinse_end_idx
+            postrinse_end_t_ns = dC_max_after_postrinse_t_ns[0] # take first value
+            postrinse_end_idx  = self._idx_of_time(postrinse_end_t_ns)
+            logger.info(f"Post rinse ends @ {self.Signals.to_time(postrinse_end_t_ns)}, idx #{postrinse_end_idx}, using C method")
+            return postrinse_end_t_ns, postrinse_end_idx
         else:
             logger.warning("Array of dC peaks after postrinse start is of size 0")
             return None
 
     
-    def _find_postrinse_end_using_backup(self, postrinse_time, postrinse_default_duration_s = 60):
+    def _find_postrinse_end_using_backup(self, postrinse_t_ns, postrinse_default_duration_s = 60):
         '''Helper function to be used when both T and C cannot be used. This function uses default values
         to get the postrinse end time'''
 
         logger.warning(f"Cannot find peaks in either T or C after T_max, using the criterion of {postrinse_default_duration_s}s")
-        time_buffer_td     = pd.Timedelta(postrinse_default_duration_s, unit = 's')
-        postrinse_end_time = postrinse_time + time_buffer_td
-        postrinse_end_idx  = np.argmin(np.abs(self.Variables.t_values - postrinse_end_time)) #estimates nearest index to our time
+        postrinse_end_t_ns = postrinse_t_ns + postrinse_default_duration_s * self.NS_PER_S
+        postrinse_end_idx  = self._nearest_idx_of_time(postrinse_end_t_ns)
         logger.warning(f"Could not find postrinse end, setting it {postrinse_default_duration_s}s after postrinse start")
-        logger.info(f"Postrinse @ {postrinse_end_time}, idx #{postrinse_end_idx}")
-        return postrinse_end_time, postrinse_end_idx
+        instrumentation.count('fallback: default post-rinse end')
+        logger.info(f"Postrinse @ {self.Signals.to_time(postrinse_end_t_ns)}, idx #{postrinse_end_idx}")
+        return postrinse_end_t_ns, postrinse_end_idx
 
 
-    def find_post_rinse_end_time(self, postrinse_time, num_neighbors = 8, postrinse_duration_limit_s = 90):
+    def find_post_rinse_end_time(self, postrinse_t_ns, num_neighbors = 8, postrinse_duration_limit_s = 90):
         '''Post-rinse ends when T and C start to increase. So will detect it when dC and dT each has a maximum that occurs after postrinse.
         First, find when T begins to increase (= dT_max) after postrinse, then see if it is close to another dC_max, up to #_neighbors.
         dC fluctuates more than dT, so will mainly work with dT, then compare with dC. If we find a dC value within neighbors range, we take
         the time of this dC value
         If dT_rel_max values has no peaks after postrinse, then try with dC_rel_max. If not working, then use default value
         INPUT:
-            - postrinse_time
+            - postrinse_t_ns: postrinse start time [ns]
             - num_neighbors
             - postrinse_duration_s: default duration of postrinse period in case everything fails. Default to 1.5 min
         OUTPUT: '''
 
-        dT_max_after_postrinse_series = self.Variables.dT_relative_max_time[self.Variables.dT_relative_max_time > postrinse_time]
-        dC_max_after_postrinse_series = self.Variables.dC_relative_max_time[self.Variables.dC_relative_max_time > postrinse_time]
+        dT_max_after_postrinse_t_ns = self.Signals.dT_relative_max_t_ns[self.Signals.dT_relative_max_t_ns > postrinse_t_ns]
+        dC_max_after_postrinse_t_ns = self.Signals.dC_relative_max_t_ns[self.Signals.dC_relative_max_t_ns > postrinse_t_ns]
 
-        postrinse_results_from_T_method = self._find_postrinse_end_using_T(num_neighbors, dT_max_after_postrinse_series, dC_max_after_postrinse_series)
+        postrinse_results_from_T_method = self._find_postrinse_end_using_T(num_neighbors, dT_max_after_postrinse_t_ns, dC_max_after_postrinse_t_ns)
         if postrinse_results_from_T_method is not None:
-            postrinse_end_time, _ = postrinse_results_from_T_method
-            postrinse_duration_s  = (postrinse_end_time - postrinse_time).total_seconds()
+            postrinse_end_t_ns, _ = postrinse_results_from_T_method
+            postrinse_duration_s  = (postrinse_end_t_ns - postrinse_t_ns)/self.NS_PER_S
             if postrinse_duration_s < postrinse_duration_limit_s:
                 logger.info(f"Postrinse lasts {postrinse_duration_s}s, less than {postrinse_duration_limit_s}s (default)")
                 return postrinse_results_from_T_method
             else:
                 logger.warning(f"Postrinse lasts more than {postrinse_duration_limit_s}s, will try C method")
 
-        postrinse_results_from_C_method = self._find_postrinse_end_using_C(dC_max_after_postrinse_series)
+        postrinse_results_from_C_method = self._find_postrinse_end_using_C(dC_max_after_postrinse_t_ns)
         if postrinse_results_from_C_method is not None:
-            postrinse_end_time, _ = postrinse_results_from_C_method
-            postrinse_duration_s  = (postrinse_end_time - postrinse_time).total_seconds()
+            postrinse_end_t_ns, _ = postrinse_results_from_C_method
+            postrinse_duration_s  = (postrinse_end_t_ns - postrinse_t_ns)/self.NS_PER_S
             if postrinse_duration_s < postrinse_duration_limit_s:
                 logger.info(f"Postrinse lasts {postrinse_duration_s}s, less than {postrinse_duration_limit_s}s (default)")
+                instrumentation.count('fallback: post-rinse end by C method')
                 return postrinse_results_from_C_method
             else:
                 logger.warning(f"Postrinse lasts more than {postrinse_duration_limit_s}s, will use default value instead")
 
         logger.warning("Using default values")
-        return self._find_postrinse_end_using_backup(postrinse_time, 60)
+        return self._find_postrinse_end_using_backup(postrinse_t_ns, 60)
 
 
     def collect_rinse_KPIs(self, hot_rinse_idx, post_rinse_idx, low_C_zone_KPIs, solution_type):
         '''This function gets the C of the hot rinse'''
         
-        C_mean_hot_rinse = self.Variables.C_values[hot_rinse_idx: post_rinse_idx].mean()
+        C_hot_rinse      = self.Signals.C_values[hot_rinse_idx: post_rinse_idx]
+        C_mean_hot_rinse = np.nanmean(C_hot_rinse) if np.any(~np.isnan(C_hot_rinse)) else np.nan
         logger.info(f"C_hotrinse = {C_mean_hot_rinse}")
 
         C_water = low_C_zone_KPIs['C avg (water)']
@@ -704,12 +723,12 @@ class PostRinseFinder(LowCZoneMaskHandler):
 
         logger.info(f"Reminder: the solution is {solution_type.upper()}")
 
-        if solution_type == Constants.acid_keyword:
-            C_mean_hot_rinse_no_water_percent = C_mean_hot_rinse_no_water/Constants.sigma_acid
-        elif solution_type == Constants.alkaline_keyword:
-            C_mean_hot_rinse_no_water_percent = C_mean_hot_rinse_no_water/Constants.sigma_alkaline
-        elif solution_type == Constants.other_keyword:
-            C_mean_hot_rinse_no_water_percent = C_mean_hot_rinse_no_water/Constants.sigma_other
+        if solution_type == ci.Constants.acid_keyword:
+            C_mean_hot_rinse_no_water_percent = C_mean_hot_rinse_no_water/ci.Constants.sigma_acid
+        elif solution_type == ci.Constants.alkaline_keyword:
+            C_mean_hot_rinse_no_water_percent = C_mean_hot_rinse_no_water/ci.Constants.sigma_alkaline
+        elif solution_type == ci.Constants.other_keyword:
+            C_mean_hot_rinse_no_water_percent = C_mean_hot_rinse_no_water/ci.Constants.sigma_other
 
         logger.info(f"C_hotrinse (no water) = {C_mean_hot_rinse_no_water_percent} %")
 
@@ -724,170 +743,111 @@ class PostRinseFinder(LowCZoneMaskHandler):
 
 
 class Blowout(LowCZoneMaskHandler):
-    '''Class dealing with blowout phase, the last peak in F'''
+    '''Class dealing with blowout phase, the last peak in F. The blowout is found with a few array operations per cycle: one
+    find_peaks call for its peak, and a binary search (searchsorted) in the sign changes of dF for the ends of the rise and fall
+    around the peak. The staticmethods work on plain arrays, so find_blowout_durations_s can run on many cycles without CycleSignals'''
 
-    def __init__(self, var_instance):
-        super().__init__(var_instance)
+    def __init__(self, cycle_signals):
+        super().__init__(cycle_signals)
 
 
-    def _find_blowout_peak(self, F_fraction = 30, blowout_threshold = 50):
+    @staticmethod
+    def find_blowout_peak_idx(F_values: np.ndarray, T_max_idx: int, F_fraction = 30, blowout_threshold = 50):
         '''We define blowout as the first F peak after T_max. So, the peak of blowout is determined by seeing if
         there is a peak in F (not dF) after T_max is done. If F_peak after T_max > 50 (by Nienke), then we have blowout. 
         If not, then take the first F peak after T_max
         INPUT:
+            - F_values: array of F of one cycle
             - F_fraction: fraction of F above which we consider a peak
-        OUTPUT:
-            - blowout_peak_time: time of blowout peak
-            - blowout_peak_idx: idx of blowout peak
-            - is_there_blowout_peak: 0/1 value'''
-
-        F_threshold         = self.Variables.F_max / F_fraction
-        F_peaks_idx, _      = find_peaks(self.Variables.F_values, height = F_threshold)
-        F_peaks_after_T_max = F_peaks_idx[F_peaks_idx > self.Variables.T_max_idx]
-
-        if F_peaks_after_T_max.size:
-            F_peaks_val_after_T_max = self.Variables.F_values[F_peaks_after_T_max]
-            F_peaks_above_threshold = F_peaks_val_after_T_max[F_peaks_val_after_T_max.values > blowout_threshold]
-            
-            if F_peaks_above_threshold.size:
-                blowout_peak_idx      = F_peaks_above_threshold.index[0]
-                is_there_blowout_peak = 1
-            else:
-                blowout_peak_idx      = F_peaks_after_T_max[0] # 1st peak after T_max is blowout
-                is_there_blowout_peak = 1
+        OUTPUT: blowout_peak_idx: idx of blowout peak, None if there is no F peak after T_max'''
 
-            blowout_peak_time = self.Variables.t_values[blowout_peak_idx]
-            logger.info(f"Blowout exists, peak is @ {blowout_peak_time}, idx {blowout_peak_idx}")
-            return blowout_peak_time, blowout_peak_idx, is_there_blowout_peak
-        else:
-            logger.warning("Cannot find blowout peak")
-            return None, None, is_there_blowout_peak
+        F_threshold         = np.nanmax(F_values) / F_fraction
+        F_peaks_idx, _      = find_peaks(F_values, height = F_threshold)
+        F_peaks_after_T_max = F_peaks_idx[np.searchsorted(F_peaks_idx, T_max_idx, side = 'right'):] # find_peaks gives sorted idx
 
+        if F_peaks_after_T_max.size == 0:
+            return None
 
-    def _find_blowout_start_and_stop(self, blowout_peak_idx):
-    # def _find_blowout_start(self):
-        '''Blowout is the large peak in F after T_max
-        This function first sees if there are dF peaks after postrinse and takes the fist one as blowout. If not, then it sees if there are
-        dF peaks during postrinse and takes the first as blowout. If not, then it checks if the last dF peak occurs before end of postrinse,
-        and if it does, then it returns None
-        INPUT: -
-        OUTPUT:
-            - blowout_start_time: start time of blowout phase
-            - blowout_start_idx: start idx of blowout phase
-            - is_there_blowout: 0/1 value to denote whether blowout was detected'''
+        F_peaks_above_threshold = F_peaks_after_T_max[F_values[F_peaks_after_T_max] > blowout_threshold]
+        if F_peaks_above_threshold.size:
+            return int(F_peaks_above_threshold[0])
+        return int(F_peaks_after_T_max[0]) # 1st peak after T_max is blowout
 
-        left_stop_index  = blowout_peak_idx
-        right_stop_index = blowout_peak_idx
 
-        while (left_stop_index > 0) and self.Variables.F_values[left_stop_index] > self.Variables.F_values[left_stop_index - 1]:
-            left_stop_index -= 1
-        while (right_stop_index < len(self.Variables.F_values) - 1) and self.Variables.F_values[right_stop_index] > self.Variables.F_values[right_stop_index + 1]:
-            right_stop_index += 1
-        
-        blowout_start_idx  = left_stop_index
-        blowout_stop_idx   = right_stop_index
-        blowout_start_time = self.Variables.t_values[blowout_start_idx]
-        blowout_stop_time  = self.Variables.t_values[blowout_stop_idx]
-        logger.info(f"Blowout starts @ {blowout_start_time}, idx {blowout_start_idx}, ends @ {blowout_stop_time}, idx {blowout_stop_idx}")
+    @staticmethod
+    def find_blowout_start_and_stop_idx(F_values: np.ndarray, blowout_peak_idx: int):
+        '''Blowout is the large peak in F after T_max. It starts where F stops rising before the peak and stops where F stops falling
+        after it. The samples where F does not rise (does not fall) are found once with np.diff, and the closest ones to the peak
+        with searchsorted, instead of walking from the peak one sample at a time
+        OUTPUT: blowout_start_idx, blowout_stop_idx'''
 
-        return blowout_start_time, blowout_start_idx, blowout_stop_time, blowout_stop_idx
-    
-        # ==============
-        # dF_max_after_T_max = self.Variables.dF_relative_max_time[self.Variables.dF_relative_max_time > self.Variables.T_max]
-        # dF_max_after_postrinse_end   = self.Variables.dF_relative_max_time[self.Variables.dF_relative_max_time >= self.Variables.T_max]
-        # is_there_blowout: int        = 0
-
-        # if len(dF_max_after_T_max):
-        #     blowout_start_time = dF_max_after_T_max.values[0] # first value
-        #     logger.info("Last dF peak is after end of postrinse, so can detect blowout")
-        #     is_there_blowout = 1
-        # elif len(dF_max_after_T_max):
-        #     blowout_start_time = dF_max_after_T_max.values[0] # first value
-        #     logger.info("Cannot find dF peaks after end of postrinse, but can find after start of postrinse")
-        #     is_there_blowout = 1 # unsure about this
-        #     # maybe see if blowout peak is after this blowout_start_time and if so, then we have blowout, but if not then no blowout
-        # else:
-        #     # !!! unsure if the following block should exist!!!
-        #     # the following line gives errors because: IndexError: index -1 is out of bounds for axis 0 with size 0
-
-        #     # if self.Variables.dF_relative_max_time.values[-1] < postrinse_end_time:
-        #     #     logger.warning("Last dF peak is before end of postrinse, so cannot detect blowout")
-        #     #     is_there_blowout = 0
-        #     return postrinse_end_time, postrinse_end_idx, is_there_blowout
-
-        # if blowout_start_time:
-        #     blowout_start_idx = np.where(self.Variables.t_values == blowout_start_time)[0][0]
-        #     logger.info(f"Blowout is @ {blowout_start_time}, idx {blowout_start_idx}")
-
-        # return blowout_start_time, blowout_start_idx, is_there_blowout
-
-
-    # remove when the substitute method works
-    def _find_blowout_end(self, postrinse_time, postrinse_end_time, postrinse_end_idx, blowout_start_time):
-        '''This function deals with finding the end of the blowout period, which is the little peak in F after the postrinse is fully completed
-        The blowout is an increase in F (dF peak), which reaches a maximum (dF=0) then decreases (dF drop).
-        So the end of blowout is characterized by a drop in dF'''
-
-        blowout_start_time, blowout_start_idx, is_there_blowout   = self._find_blowout_start(postrinse_time, postrinse_end_time, postrinse_end_idx)
-        blowout_peak_time, blowout_peak_idx, is_there_blowout_peak= self._find_blowout_peak(F_fraction = 30, blowout_threshold = 50)
-
-        if is_there_blowout:
-            dF_min_after_blowout_start = self.Variables.dF_relative_min_time[self.Variables.dF_relative_min_time > blowout_start_time]
-            logger.debug(dF_min_after_blowout_start)
-
-            if len(dF_min_after_blowout_start):
-                blowout_end_time = dF_min_after_blowout_start.values[0] #first DROP since blowout
-                blowout_end_idx  = np.where(self.Variables.t_values == blowout_end_time)[0][0]
-                logger.info(f'Blowout end @ {blowout_end_time}, idx{blowout_end_idx}')
-                return blowout_end_time, blowout_end_idx
-            else:
-                if is_there_blowout_peak == 0:
-                    logger.debug('Cannot find end AND peak of blowout, so it does not exist')
-                    return None, None
-                else:
-                    logger.info('Peak exists, but cannot find the end of blowout, so will calculate it')
-                    blowout_duration = 2*(blowout_peak_time - blowout_start_time)
-                    blowout_end_time = blowout_start_time + blowout_duration
-                    blowout_end_idx  = np.where(self.Variables.t_values == blowout_end_time)[0][0]
-                    logger.info(f'Blowout end @ {blowout_end_time}, idx{blowout_end_idx}')
-                    return blowout_end_time, blowout_end_idx
-        else:
-            return None, None
+        dF_steps         = np.diff(F_values)
+        not_rising_idx   = np.flatnonzero(~(dF_steps > 0)) # step i goes from sample i to i + 1, NaN steps stop the blowout
+        not_falling_idx  = np.flatnonzero(~(dF_steps < 0))
 
+        last_not_rising  = np.searchsorted(not_rising_idx, blowout_peak_idx, side = 'left') - 1 # last step before the peak
+        blowout_start_idx= int(not_rising_idx[last_not_rising]) + 1 if last_not_rising >= 0 else 0
 
-    # def find_blowout_duration(self, postrinse_time, postrinse_end_time, postrinse_end_idx):
-    def find_blowout_duration(self):
-        '''If we have blowout start and end, then get its duration by subtracting the two values
-        INPUT: -
-        OUTPUT: blowout_duration'''
+        first_not_falling= np.searchsorted(not_falling_idx, blowout_peak_idx, side = 'left')    # 1st step from the peak on
+        blowout_stop_idx = int(not_falling_idx[first_not_falling]) if first_not_falling < len(not_falling_idx) else len(F_values) - 1
 
-        # blowout_peak_time, blowout_peak_idx, is_there_blowout_peak = self._find_blowout_peak(F_fraction = 30, blowout_threshold = 50)
-        # blowout_start_time, blowout_idx, is_there_blowout = self._find_blowout_start(postrinse_time, postrinse_end_time, postrinse_end_idx)
-        # blowout_end_time, blowout_end_idx                 = self._find_blowout_end(postrinse_time, postrinse_end_time, postrinse_end_idx, blowout_start_time)
+        return blowout_start_idx, blowout_stop_idx
 
-        _, blowout_peak_idx, is_there_blowout_peak = self._find_blowout_peak(30, 50)
-        
-        if is_there_blowout_peak:
-            blowout_start_time, blowout_start_idx, blowout_stop_time, blowout_stop_idx = self._find_blowout_start_and_stop(blowout_peak_idx)
-        else:
-            logger.debug(f'Cannot find blowout, returning 0')
+
+    @staticmethod
+    def find_blowout_duration_s(F_values: np.ndarray, T_max_idx: int, t_ns: np.ndarray, has_time: np.ndarray, F_fraction = 30, blowout_threshold = 50):
+        '''Blowout duration of one cycle, from arrays
+        INPUT:
+            - F_values: array of F
+            - T_max_idx: index of T_max
+            - t_ns, has_time: integer time of the samples, see TimeGrid.to_ns_since_start
+        OUTPUT: blowout_duration_s: 0 if there is no blowout, NaN if its start or stop has no time'''
+
+        F_values         = np.asarray(F_values, dtype = np.float64)
+        blowout_peak_idx = Blowout.find_blowout_peak_idx(F_values, T_max_idx, F_fraction, blowout_threshold)
+        if blowout_peak_idx is None:
             return 0
 
-        blowout_duration_s = (blowout_stop_time - blowout_start_time).total_seconds()
-        logger.debug(f'Blowout lasts {blowout_duration_s}s')
-        return blowout_duration_s
+        blowout_start_idx, blowout_stop_idx = Blowout.find_blowout_start_and_stop_idx(F_values, blowout_peak_idx)
+        return Blowout._time_between_s(t_ns, has_time, blowout_start_idx, blowout_stop_idx)
 
-        if is_there_blowout and is_there_blowout_peak:
-            logger.debug(f"{blowout_start_time}, {type(blowout_start_time)}")
-            logger.debug(f"{blowout_end_time}, {type(blowout_end_time)}")
-            blowout_duration = blowout_end_time - blowout_start_time
 
-            logger.debug(f"{blowout_duration}, {type(blowout_duration)}")
+    @staticmethod
+    def _time_between_s(t_ns: np.ndarray, has_time: np.ndarray, start_idx: int, stop_idx: int) -> float:
+        '''Time [s] from sample # start_idx to sample # stop_idx, NaN if one of them has no time'''
 
-            blowout_duration_s = pd.to_timedelta(blowout_duration).total_seconds()
-            logger.debug(f'Blowout lasts {blowout_duration_s}s')
-            return blowout_duration_s
-        else:
+        if not (has_time[start_idx] and has_time[stop_idx]):
+            return np.nan
+        return (t_ns[stop_idx] - t_ns[start_idx])/TimeGrid.NS_PER_S
+
+
+    @staticmethod
+    def find_blowout_durations_s(list_of_F_values: list, list_of_T_max_idx: list, list_of_t_ns: list, list_of_has_time: list, F_fraction = 30, blowout_threshold = 50) -> np.ndarray:
+        '''Blowout durations of many cycles at once, see find_blowout_duration_s. The lists have one item per cycle
+        OUTPUT: float array, one duration [s] per cycle'''
+
+        return np.array([Blowout.find_blowout_duration_s(F_values, T_max_idx, t_ns, has_time, F_fraction, blowout_threshold)
+                         for F_values, T_max_idx, t_ns, has_time in zip(list_of_F_values, list_of_T_max_idx, list_of_t_ns, list_of_has_time)],
+                        dtype = np.float64)
+
+
+    def find_blowout_duration(self, F_fraction = 30, blowout_threshold = 50):
+        '''If we have blowout start and end, then get its duration by subtracting the two values
+        INPUT: -
+        OUTPUT: blowout_duration'''
+
+        F_values         = self.Signals.F_values
+        blowout_peak_idx = self.find_blowout_peak_idx(F_values, self.Signals.T_max_idx, F_fraction, blowout_threshold)
+        if blowout_peak_idx is None:
+            logger.warning("Cannot find blowout peak")
+            instrumentation.count('fallback: no blowout')
             logger.debug(f'Cannot find blowout, returning 0')
             return 0
+        logger.info(f"Blowout exists, peak is @ {self.Signals.to_time(self.Signals.t_ns[blowout_peak_idx])}, idx {blowout_peak_idx}")
 
+        blowout_start_idx, blowout_stop_idx = self.find_blowout_start_and_stop_idx(F_values, blowout_peak_idx)
+        logger.info(f"Blowout starts @ idx {blowout_start_idx}, ends @ idx {blowout_stop_idx}")
+
+        blowout_duration_s = self._time_between_s(self.Signals.t_ns, self.Signals.has_time, blowout_start_idx, blowout_stop_idx)
+        logger.debug(f'Blowout lasts {blowout_duration_s}s')
+        return blowout_duration_s
@@ -0,0 +1,279 @@
+'''Module containing the function-level API of the cleaning code: process_file(path) runs everything on ONE input file and returns
+its results, without writing anything. Importing this module does no I/O and runs no computation, the config file is only read
+when it is needed (see config_info_obtainer), so the API can be used from other code and from worker processes'''
+
+from dataclasses import dataclass
+import os
+import pandas as pd
+
+import config_info_obtainer as ci
+from batched_phase_identifier import CycleBatch, BatchedPhaseIdentifier
+from cycle_segmenter import CleaningCycleSegmenter
+from cycle_signals import CycleSignals
+from derivative_peaks_finder import FindDerivativePeaks
+from input_output_file_handler import csvFileMaker, InputCSVFilesSolutionObtainer
+import instrumentation
+from logging_maker import logger
+from phase_identifier import PrerinsePostmilkflushFinder, Blowout, PostRinseFinder, LowCZoneMaskHandler, EarlyCmaxHandler, LowCZoneAndHotrinseFinder
+from run_tempKPI_derivative import read_relevant_dataframe, run_data_cleaning_temperature_and_derivative_classes_on_df
+from tempKPIs import TemperatureKPIObtainer
+
+ALGORITHM_VERSION = 1 # increase when a change in the code changes the results, so incremental runs process all files again
+
+
+@dataclass
+class CycleResult:
+    '''Results of one cleaning cycle: the header and the row that go into the output csv file'''
+
+    cycle_name   : str  # file name, + cycle number if the file holds many cycles
+    solution_type: str
+    header_values: list
+    row_values   : list
+
+    def as_dict(self) -> dict:
+        '''OUTPUT: dict of {header: value}'''
+        return dict(zip(self.header_values, self.row_values))
+
+
+class ResultingPhases():
+    '''Runs the phase identifying classes on the CycleSignals of one cleaning cycle and keeps their results. The signals are read-only,
+    the classes made after EarlyCmaxHandler get the signals it returns, with the early C peak squashed if there is one'''
+
+    def __init__(self, cycle_signals, solution_type):
+
+        with instrumentation.span('low-C masks'):
+            low_C_hot_rinse_finder   = LowCZoneMaskHandler(cycle_signals)
+            self.dC_mask_low_std     = low_C_hot_rinse_finder.apply_std_mask_on_dC(roll_window_size = 3, max_std_threshold_fraction = 0.1)
+            self.dC_mask_T_max       = low_C_hot_rinse_finder.apply_T_max_mask_on_dC(self.dC_mask_low_std)
+            self.dC_mask_C_percentile= low_C_hot_rinse_finder.apply_C_percentile_mask_on_dC(self.dC_mask_T_max, percentile_crit = 40)
+
+        with instrumentation.span('early C peak'):
+            early_C_max_handler        = EarlyCmaxHandler(cycle_signals)
+            self.is_there_early_large_C= early_C_max_handler.detect_if_early_C_max_exists(large_C_search_time_fraction_threshold = 0.25)
+            cycle_signals              = early_C_max_handler.smoothen_large_C_peak_values_if_it_exists(self.is_there_early_large_C)
+
+        low_C_zone_finder = LowCZoneAndHotrinseFinder(cycle_signals)
+        with instrumentation.span('low-C zone'):
+            self.low_C_zones     = low_C_zone_finder.group_low_C_zones(self.dC_mask_C_percentile)
+            self.low_C_zone_start_t_ns, self.low_C_zone_start_idx, self.zone_duration_s \
+                                 = low_C_zone_finder.obtain_best_low_C_zone_candidate(self.low_C_zones)
+            self.low_C_zone_KPIs = low_C_zone_finder.get_low_C_zone_KPIs(self.low_C_zone_start_t_ns, self.low_C_zone_start_idx, self.zone_duration_s)
+        with instrumentation.span('hot rinse'):
+            self.hot_rinse_t_ns, self.hot_rinse_idx \
+                                 = low_C_zone_finder.find_hot_rinse_time(self.low_C_zone_KPIs, num_neighbors = 3, time_between_hotrinse_Tmax_in_min = 4)
+
+        prerinse_postmilk_finder = PrerinsePostmilkflushFinder(cycle_signals)
+        with instrumentation.span('pre-rinse'):
+            self.prerinse_t_ns, self.prerinse_idx = prerinse_postmilk_finder.find_prerinse_time(self.low_C_zone_start_t_ns, self.hot_rinse_idx, time_between_prerinse_Tmax_in_min = 7, prerinse_hotrinse_limit_s = 200)
+        if prerinse_postmilk_finder.prerinse_fallback is not None: # counted here, the post-milk flush finder looks for pre-rinse again
+            instrumentation.count(f"fallback: {prerinse_postmilk_finder.prerinse_fallback}")
+        with instrumentation.span('post-milk flush'):
+            self.post_milk_flush_t_ns, self.post_milk_flush_idx= prerinse_postmilk_finder.find_postmilk_flush_time_depending_on_early_sharp_C(self.is_there_early_large_C, self.low_C_zone_start_t_ns, self.hot_rinse_idx)
+
+        postrinse = PostRinseFinder(cycle_signals)
+        with instrumentation.span('post-rinse'):
+            self.postrinse_t_ns, self.postrinse_idx         = postrinse.find_post_rinse_start_time(num_neighbors = 8, Tmax_postrinse_timeout_s = 60)
+            self.post_rinse_end_t_ns, self.postrinse_end_idx= postrinse.find_post_rinse_end_time(self.postrinse_t_ns, num_neighbors = 8)
+        with instrumentation.span('rinse KPIs'):
+            self.rinse_KPIs                                 = postrinse.collect_rinse_KPIs(self.hot_rinse_idx, self.postrinse_idx, self.low_C_zone_KPIs, solution_type)
+
+        with instrumentation.span('blowout'):
+            blowout               = Blowout(cycle_signals)
+            self.blowout_duration = blowout.find_blowout_duration()
+
+        # the phases are found in integer time, only the output is in wall-clock time
+        self.low_C_zone_start_time = cycle_signals.to_time(self.low_C_zone_start_t_ns)
+        self.hot_rinse_time        = cycle_signals.to_time(self.hot_rinse_t_ns)
+        self.prerinse_time         = cycle_signals.to_time(self.prerinse_t_ns).strftime('%H:%M:%S')
+        self.post_milk_flush_time  = cycle_signals.to_time(self.post_milk_flush_t_ns)
+        self.postrinse_time        = cycle_signals.to_time(self.postrinse_t_ns)
+        self.post_rinse_end_time   = cycle_signals.to_time(self.post_rinse_end_t_ns)
+
+
+def process_signal_bundle(signal_bundle, cycle_name, solution_type):
+    '''Runs the phase identifying code on the CycleSignalBundle of ONE cleaning cycle
+    OUTPUT: CycleResult of this cycle'''
+
+    logger.info(f"File is called: {cycle_name.upper()}")
+
+    with instrumentation.span('cycle signals'):
+        cycle_signals = CycleSignals.from_signal_bundle(signal_bundle)
+    instrumentation.count('derivative extrema found', cycle_signals.number_of_relative_extrema())
+
+    with instrumentation.span('phases'):
+        resulting_phases = ResultingPhases(cycle_signals, solution_type)
+
+    with instrumentation.span('output row'):
+        header_values, row_values = csvFileMaker.make_header_and_row_values(resulting_phases, cycle_name, signal_bundle.temp_abs_extrema, cycle_signals, solution_type)
+    return CycleResult(cycle_name, solution_type, header_values, row_values)
+
+
+def process_cycle(df_cycle, cycle_name, solution_type):
+    '''Runs the cleaning, KPI and phase identifying code on the dataframe of ONE cleaning cycle
+    INPUT:
+        - df_cycle: dataframe of relevant columns (time, T, C, F) of one cycle
+        - cycle_name: name written in the output, the file name (+ cycle number if the file holds many cycles)
+        - solution_type: alkaline/acid/other
+    OUTPUT: CycleResult of this cycle'''
+
+    signal_bundle = run_data_cleaning_temperature_and_derivative_classes_on_df(df_cycle)
+    return process_signal_bundle(signal_bundle, cycle_name, solution_type)
+
+
+def read_cycles(file_path, config_info: dict = None, parse_cache = None):
+    '''Reads an input file and splits it into its cleaning cycles (usually just one)
+    OUTPUT: solution_type, list of (cycle_name, dataframe of the cycle)'''
+
+    pd.set_option('future.no_silent_downcasting', True) # prevents issues with future pd versions
+    if config_info is not None:
+        ci.set_config(config_info)
+
+    input_filename = os.path.basename(file_path)
+    solution_type  = InputCSVFilesSolutionObtainer.obtain_solution_type_from_filename(input_filename, ci.config_info)
+    with instrumentation.span('read'):
+        df_relevant = read_relevant_dataframe(file_path, parse_cache)
+
+    with instrumentation.span('segment cycles'):
+        cycle_segmenter   = CleaningCycleSegmenter(df_relevant, F_active_fraction = 0.05, max_idle_gap_s = 600, min_T_rise = 10.0, padding_s = 120)
+        list_of_cycle_dfs = cycle_segmenter.split_into_cycles()
+    number_of_cycles  = len(list_of_cycle_dfs)
+    instrumentation.count('cycles', number_of_cycles)
+
+    list_of_named_cycles = []
+    for cycle_number, df_cycle in enumerate(list_of_cycle_dfs, start = 1):
+        cycle_name = input_filename if number_of_cycles == 1 else f"{input_filename} [cycle {cycle_number}/{number_of_cycles}]"
+        list_of_named_cycles.append((cycle_name, df_cycle))
+
+    return solution_type, list_of_named_cycles
+
+
+def process_file(file_path, config_info: dict = None, parse_cache = None) -> list:
+    '''Reads an input file, splits it into its cleaning cycles (usually just one) and processes every cycle. Nothing is written
+    INPUT:
+        - file_path: path of the csv file, or its name in the input_location of the config file
+        - config_info: dict of an already loaded config (see config_info_obtainer.load_config), if None the loaded config is used
+        - parse_cache: ParsedCSVCache to load the file from, if None the csv file is parsed
+    OUTPUT: list of CycleResult, one per cycle'''
+
+    solution_type, list_of_named_cycles = read_cycles(file_path, config_info, parse_cache)
+    return [process_cycle(df_cycle, cycle_name, solution_type) for cycle_name, df_cycle in list_of_named_cycles]
+
+
+def process_signal_bundles_batched(list_of_named_signal_bundles: list) -> list:
+    '''Runs the phase identifying code on the CycleSignalBundles of many cleaning cycles at once, see batched_phase_identifier. The
+    cycles the batch cannot take, or that make the single-cycle code fail, go through ResultingPhases one by one
+    INPUT: list of (signal_bundle, cycle_name, solution_type)
+    OUTPUT: list of the CycleResult of every cycle, or of the error it raised, in the order of the input'''
+
+    list_of_cycle_signals = []
+    for signal_bundle, cycle_name, _ in list_of_named_signal_bundles:
+        try:
+            with instrumentation.span('cycle signals'):
+                cycle_signals = CycleSignals.from_signal_bundle(signal_bundle)
+            instrumentation.count('derivative extrema found', cycle_signals.number_of_relative_extrema())
+            list_of_cycle_signals.append(cycle_signals)
+        except Exception as error:
+            list_of_cycle_signals.append(error)
+
+    batched_cycle_ids = [cycle_id for cycle_id, (cycle_signals, (_, _, solution_type)) in enumerate(zip(list_of_cycle_signals, list_of_named_signal_bundles))
+                         if (not isinstance(cycle_signals, Exception)) and BatchedPhaseIdentifier.is_batchable(cycle_signals, solution_type)]
+    list_of_cycle_phases = [None] * len(list_of_named_signal_bundles)
+    if batched_cycle_ids:
+        cycle_batch            = CycleBatch([list_of_cycle_signals[cycle_id] for cycle_id in batched_cycle_ids])
+        list_of_solution_types = [list_of_named_signal_bundles[cycle_id][2] for cycle_id in batched_cycle_ids]
+        with instrumentation.span('batched phases'):
+            list_of_batched_phases = BatchedPhaseIdentifier(cycle_batch, list_of_solution_types).identify_phases()
+        for cycle_id, cycle_phases in zip(batched_cycle_ids, list_of_batched_phases):
+            list_of_cycle_phases[cycle_id] = cycle_phases
+    instrumentation.count('cycles not batchable', len(list_of_named_signal_bundles) - len(batched_cycle_ids))
+
+    list_of_cycle_results = []
+    for (signal_bundle, cycle_name, solution_type), cycle_signals, cycle_phases in zip(list_of_named_signal_bundles, list_of_cycle_signals, list_of_cycle_phases):
+        if isinstance(cycle_signals, Exception):
+            list_of_cycle_results.append(cycle_signals)
+            continue
+        try:
+            if cycle_phases is None:
+                logger.info(f"File is called: {cycle_name.upper()}")
+                with instrumentation.span('phases'):
+                    cycle_phases = ResultingPhases(cycle_signals, solution_type)
+            with instrumentation.span('output row'):
+                header_values, row_values = csvFileMaker.make_header_and_row_values(cycle_phases, cycle_name, signal_bundle.temp_abs_extrema, cycle_signals, solution_type)
+            list_of_cycle_results.append(CycleResult(cycle_name, solution_type, header_values, row_values))
+        except Exception as error:
+            list_of_cycle_results.append(error)
+
+    return list_of_cycle_results
+
+
+def process_files_batched(list_of_file_paths: list, config_info: dict = None, parse_cache = None) -> list:
+    '''Same as process_file for many input files: every file is read, split into its cycles and cleaned, then the phases of the cycles
+    of all files are found at once, see process_signal_bundles_batched. A file that fails does not stop the others. Nothing is written.
+    With the instrumentation on, every file gets a record of its reading and cleaning, and the phase step a record of its own
+    OUTPUT: list of (list of CycleResult or None, error or None), one per file, in the order of list_of_file_paths'''
+
+    list_of_file_errors          = [None] * len(list_of_file_paths)
+    list_of_named_signal_bundles = []
+    file_of_cycle                = []
+    for file_number, file_path in enumerate(list_of_file_paths):
+        try:
+            with instrumentation.recording(os.path.basename(file_path)):
+                solution_type, list_of_named_cycles = read_cycles(file_path, config_info, parse_cache)
+                named_signal_bundles = [(run_data_cleaning_temperature_and_derivative_classes_on_df(df_cycle), cycle_name, solution_type)
+                                        for cycle_name, df_cycle in list_of_named_cycles]
+        except Exception as error:
+            list_of_file_errors[file_number] = error
+            continue
+        list_of_named_signal_bundles.extend(named_signal_bundles)
+        file_of_cycle.extend([file_number] * len(named_signal_bundles))
+
+    with instrumentation.recording(f"{len(list_of_named_signal_bundles)} cycles of {len(list_of_file_paths)} files", kind = 'phase batch'):
+        list_of_cycle_results = process_signal_bundles_batched(list_of_named_signal_bundles)
+
+    list_of_file_results = [[] for _ in list_of_file_paths]
+    for file_number, cycle_result in zip(file_of_cycle, list_of_cycle_results):
+        if not isinstance(cycle_result, Exception):
+            list_of_file_results[file_number].append(cycle_result)
+        elif list_of_file_errors[file_number] is None: # the 1st failing cycle fails the file, like process_file
+            list_of_file_errors[file_number] = cycle_result
+
+    return [(None, error) if error is not None else (list_of_cycle_results, None) for list_of_cycle_results, error in zip(list_of_file_results, list_of_file_errors)]
+
+
+def sweep_comparison_orders(file_path, list_of_comparison_orders: list, config_info: dict = None, parse_cache = None) -> dict:
+    '''Same as process_file for several comparison_order values (# of neighbors on each side of a relative min/max). The data are
+    cleaned and differentiated once, and the relative extrema of every comparison_order are read from extrema order indices
+    (see extrema_order_index), so only the phase identifying code runs once per comparison_order. Nothing is written
+    OUTPUT: dict of {comparison_order: list of CycleResult, one per cycle}'''
+
+    solution_type, list_of_named_cycles = read_cycles(file_path, config_info, parse_cache)
+    cycle_results_per_order = {comparison_order: [] for comparison_order in list_of_comparison_orders}
+
+    for cycle_name, df_cycle in list_of_named_cycles:
+        signal_bundle            = run_data_cleaning_temperature_and_derivative_classes_on_df(df_cycle)
+        temp_extrema_order_index = TemperatureKPIObtainer(signal_bundle.df_clean).make_temperature_extrema_order_index()
+        dY_extrema_order_index   = FindDerivativePeaks(signal_bundle.df_clean, signal_bundle.df_diff).make_dY_extrema_order_index()
+
+        for comparison_order in list_of_comparison_orders:
+            signal_bundle_of_order = signal_bundle.with_comparison_order(comparison_order, temp_extrema_order_index, dY_extrema_order_index)
+            cycle_results_per_order[comparison_order].append(process_signal_bundle(signal_bundle_of_order, cycle_name, solution_type))
+
+    return cycle_results_per_order
+
+
+def calculate_temperature_KPI_grid(file_path, list_of_T_crits: list, list_of_time_intervals: list, config_info: dict = None,
+                                   parse_cache = None) -> pd.core.frame.DataFrame:
+    '''Temperature KPIs of every cycle of an input file for a grid of T_crit and time interval values, see
+    TemperatureKPIObtainer.calculate_temperature_KPI_grid. Only the data cleaning runs, not the phase identifying code. Nothing is written
+    OUTPUT: DataFrame with one row per (cycle, T_crit, time interval)'''
+
+    _, list_of_named_cycles = read_cycles(file_path, config_info, parse_cache)
+
+    list_of_cycle_KPI_grids = []
+    for cycle_name, df_cycle in list_of_named_cycles:
+        signal_bundle   = run_data_cleaning_temperature_and_derivative_classes_on_df(df_cycle)
+        df_cycle_grid   = TemperatureKPIObtainer(signal_bundle.df_clean).calculate_temperature_KPI_grid(list_of_T_crits, list_of_time_intervals)
+        df_cycle_grid.insert(0, 'Cycle', cycle_name)
+        list_of_cycle_KPI_grids.append(df_cycle_grid)
+
+    return pd.concat(list_of_cycle_KPI_grids, ignore_index = True)
@@ -5,9 +5,8 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
 import numpy as np
 
-from config_info_obtainer import Constants
+import config_info_obtainer as ci
 import phase_identifier_results as rpi
-from run_tempKPI_derivative import df_diff_smooth, df_diff2_smooth
 # from variables import Variables
 
 logging.getLogger('matplotlib').setLevel(logging.ERROR)
@@ -34,17 +33,17 @@ class PlotTemporaryGraphs():
     COMPARISON_ORDER = 15 #comparing neighbors to find local min/max points
     WINDOW_SIZE      = 3  #window for smoothing using pandas roll() method
 
-    def __init__(self, param_initial: str):
+    def __init__(self, param_initial: str, signal_bundle):
         self.plot_properties= plot_properties
-        self.filename       = Constants.filename
+        self.filename       = ci.Constants.filename
         self.param_initial  = param_initial
         self.param_to_plot  = which_param_to_plot[param_initial]
         # ===========================
         self.property_1st_letter= None
-        self.time_index  = Variables.t_values
-        self.Y           = Variables.parameters_dict[param_initial]
-        self.dY          = df_diff_smooth.iloc[:, self.param_to_plot]
-        self.d2Y         = df_diff2_smooth.iloc[:, self.param_to_plot]
+        self.time_index  = signal_bundle.df_clean.iloc[:, 0] # everything comes from the CycleSignalBundle, nothing is computed again
+        self.Y           = signal_bundle.df_clean.iloc[:, self.param_to_plot]
+        self.dY          = signal_bundle.df_diff_smooth.iloc[:, self.param_to_plot]
+        self.d2Y         = signal_bundle.df_diff2_smooth.iloc[:, self.param_to_plot]
         # ===========================
         self.fig, self.ax= plt.subplots()   #culprit for why a blank graph is made
 
@@ -93,7 +92,7 @@ class PlotTemporaryGraphs():
     def plot_T_crit_line(self) -> None:
         # self.ax.axhline(y = 0, color = '#FBF1CF', linestyle = '-')  # horizontal 0 line
         if self.property_1st_letter == 'T':
-            self.ax.axhline(y = Constants.T_crit, color = '#ffb6c1', linestyle = '-') # horizontal line for T=72, only if plotting T
+            self.ax.axhline(y = ci.Constants.T_crit, color = '#ffb6c1', linestyle = '-') # horizontal line for T=72, only if plotting T
 
     def plot_vertical_lines(self, dY_relative_max_idx: np.ndarray, dY_relative_min_idx: np.ndarray, dY_max_idx: np.int64) -> None:
         '''Plots vertical lines for plot, such as maximum T and maxima in derivatives'''
@@ -114,7 +113,7 @@ class PlotTemporaryGraphs():
         y_caption_note    = 0.03
         y_caption_filename= 0.05
         self.fig.text(x_caption, y_caption_note,     "Not to scale",     fontsize = 10)
-        self.fig.text(x_caption, y_caption_filename, Constants.filename, fontsize = 10)
+        self.fig.text(x_caption, y_caption_filename, ci.Constants.filename, fontsize = 10)
 
         self.ax.axvline(x = rpi.post_milk_flush_time, color = 'k',       linestyle = '-')
         self.ax.axvline(x = rpi.prerinse_time,        color = 'g',       linestyle = '-')
@@ -150,15 +149,15 @@ class GraphsPlotter():
                           'F': 3, '3': '1'}
 
 
-    def __init__(self, param_initial: str):
+    def __init__(self, param_initial: str, signal_bundle):
         self.plot_properties= GraphsPlotter.PLOT_PROPERTIES
-        self.filename       = Constants.filename
+        self.filename       = ci.Constants.filename
         self.param_initial  = param_initial
         self.param_to_plot  = GraphsPlotter.WHICH_PARAM_TO_PLOT[param_initial]
         # ===========================
         self.property_1st_letter= None
-        self.time_index  = Variables.t_values
-        self.Y           = Variables.parameters_dict[param_initial]
+        self.time_index  = signal_bundle.df_clean.iloc[:, 0]
+        self.Y           = signal_bundle.df_clean.iloc[:, self.param_to_plot]
         # ===========================
         self.fig, self.ax= plt.subplots()   #culprit for why a blank graph is made
 
@@ -210,7 +209,7 @@ class GraphsPlotter():
 
     def plot_T_crit_line(self) -> None:
         if self.property_1st_letter == 'T':
-            self.ax.axhline(y = Constants.T_crit, color = '#ffb6c1', linestyle = '-') # horizontal line for T=72, only if plotting T
+            self.ax.axhline(y = ci.Constants.T_crit, color = '#ffb6c1', linestyle = '-') # horizontal line for T=72, only if plotting T
 
     def plot_rectangles(self) -> None:
         '''Adds rectangles corresponding to each phase into the plot'''
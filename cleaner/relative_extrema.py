@@ -0,0 +1,142 @@
+'''Module containing the relative extrema finder that replaces scipy.signal.argrelextrema. A point is a relative max (min) when it is
+strictly greater (smaller) than the comparison_order points on each side of it, with the same edge handling as argrelextrema
+(mode = 'clip'): the first and last points are never extrema, neither are NaN values or points with a NaN within comparison_order.
+The max/min of the neighbors is a sliding window max/min (van Herk/Gil-Werman), so the cost is O(n) whatever the comparison_order,
+instead of O(n * comparison_order), and all channels are done at once'''
+
+import numpy as np
+import pandas as pd
+
+
+class RelativeExtremaFinder:
+    '''Class containing the functions of the sliding window extrema engine'''
+
+    @staticmethod
+    def sliding_window_extremum(values: np.ndarray, window_size: int, ufunc = np.maximum) -> np.ndarray:
+        '''Max (ufunc = np.maximum) or min (ufunc = np.minimum) of every window of window_size rows, for all columns at once.
+        The rows are split in blocks of window_size rows, and a window is made of the end of one block and the start of the next,
+        so its extremum is that of a running extremum from the end of the 1st block and one from the start of the 2nd
+        INPUT: values: 2-D array (# of rows, # of channels), NaN values propagate
+        OUTPUT: array of (# of rows - window_size + 1) rows, row i being the extremum of rows [i, i + window_size)'''
+
+        number_of_rows, number_of_columns = values.shape
+        fill_value       = RelativeExtremaFinder._identity_value(values.dtype, ufunc)
+        number_of_blocks = -(-number_of_rows // window_size) # ceil
+        padded_values    = np.full((number_of_blocks * window_size, number_of_columns), fill_value, dtype = values.dtype)
+        padded_values[:number_of_rows] = values
+
+        blocks           = padded_values.reshape(number_of_blocks, window_size, number_of_columns)
+        block_prefix     = ufunc.accumulate(blocks, axis = 1).reshape(-1, number_of_columns)
+        block_suffix     = ufunc.accumulate(blocks[:, ::-1], axis = 1)[:, ::-1].reshape(-1, number_of_columns)
+
+        number_of_windows = number_of_rows - window_size + 1
+        return ufunc(block_suffix[:number_of_windows], block_prefix[window_size - 1:window_size - 1 + number_of_windows])
+
+
+    @staticmethod
+    def _identity_value(dtype, ufunc):
+        '''Value that never wins the comparison: -inf for a max, +inf for a min, or the smallest/largest integer'''
+
+        if np.issubdtype(dtype, np.floating):
+            return -np.inf if ufunc is np.maximum else np.inf
+        return np.iinfo(dtype).min if ufunc is np.maximum else np.iinfo(dtype).max
+
+
+    @staticmethod
+    def _pad(values_2d: np.ndarray, number_of_rows: int, ufunc) -> np.ndarray:
+        '''values_2d with number_of_rows rows of _identity_value before and after it'''
+
+        padding = np.full((number_of_rows, values_2d.shape[1]), RelativeExtremaFinder._identity_value(values_2d.dtype, ufunc), dtype = values_2d.dtype)
+        return np.vstack((padding, values_2d, padding))
+
+
+    @staticmethod
+    def find_relative_extrema(values: np.ndarray, comparison_order: int = 30, is_invalid: np.ndarray = None):
+        '''Relative minima and maxima of every column, in one pass, like argrelextrema(values, np.less/np.greater, order = comparison_order)
+        INPUT:
+            - values: 1-D or 2-D array (# of rows, # of channels) of floats or integers
+            - comparison_order: # of neighbors on each side of a point that it must be strictly smaller/greater than
+            - is_invalid: for integer values, mask of values that are not comparable (like NaT), they behave like NaN
+        OUTPUT: is_relative_min, is_relative_max: boolean arrays of the shape of values'''
+
+        if (int(comparison_order) != comparison_order) or (comparison_order < 1):
+            raise ValueError('Order must be an int >= 1')
+        comparison_order = int(comparison_order)
+
+        values           = np.asarray(values)
+        values_2d        = values[:, None] if values.ndim == 1 else values
+        number_of_rows   = values_2d.shape[0]
+        is_relative_min  = np.zeros(values_2d.shape, dtype = bool)
+        is_relative_max  = np.zeros(values_2d.shape, dtype = bool)
+        if number_of_rows < 3: # the endpoints are never extrema
+            return is_relative_min.reshape(values.shape), is_relative_max.reshape(values.shape)
+
+        # comparison_order padding rows on each side, so every point has a window on its left and one on its right
+        neighbors_max    = RelativeExtremaFinder.sliding_window_extremum(RelativeExtremaFinder._pad(values_2d, comparison_order, np.maximum),
+                                                                         comparison_order, np.maximum)
+        neighbors_min    = RelativeExtremaFinder.sliding_window_extremum(RelativeExtremaFinder._pad(values_2d, comparison_order, np.minimum),
+                                                                         comparison_order, np.minimum)
+
+        # window i of the padded values holds the left neighbors of row i, window i + comparison_order + 1 its right neighbors
+        left, right      = slice(0, number_of_rows), slice(comparison_order + 1, comparison_order + 1 + number_of_rows)
+        is_relative_max  = (values_2d > neighbors_max[left]) & (values_2d > neighbors_max[right])
+        is_relative_min  = (values_2d < neighbors_min[left]) & (values_2d < neighbors_min[right])
+
+        if is_invalid is not None:
+            is_invalid_2d = np.asarray(is_invalid).reshape(values_2d.shape).astype(np.int8)
+            invalid_near  = RelativeExtremaFinder.sliding_window_extremum(RelativeExtremaFinder._pad(is_invalid_2d, comparison_order, np.maximum),
+                                                                          2 * comparison_order + 1, np.maximum).astype(bool) # point and its neighbors
+            is_relative_max &= ~invalid_near
+            is_relative_min &= ~invalid_near
+
+        for is_relative_extremum in (is_relative_min, is_relative_max): # compared with themselves because of the clipping
+            is_relative_extremum[[0, -1]] = False
+
+        return is_relative_min.reshape(values.shape), is_relative_max.reshape(values.shape)
+
+
+    @staticmethod
+    def column_to_comparable_values(column: pd.core.series.Series):
+        '''Values of a dataframe column that can be compared as numbers: floats, or integers for datetime columns
+        OUTPUT: values, mask of values that are not comparable (NaT) or None. (None, None) for other columns, like strings'''
+
+        if pd.api.types.is_datetime64_any_dtype(column):
+            return column.to_numpy(dtype = 'datetime64[ns]').view(np.int64), column.isna().to_numpy()
+        if pd.api.types.is_timedelta64_dtype(column):
+            return column.to_numpy(dtype = 'timedelta64[ns]').view(np.int64), column.isna().to_numpy()
+        if pd.api.types.is_numeric_dtype(column):
+            return column.to_numpy(dtype = np.float64), None
+        return None, None
+
+
+    @staticmethod
+    def find_relative_extrema_idx_of_df(df: pd.core.frame.DataFrame, comparison_order: int = 30):
+        '''Same as argrelextrema(df.values, np.less/np.greater, order = comparison_order)[0] on a dataframe whose columns have
+        different types, like [time, T]: row # of the extrema of all columns, a row being repeated when several columns have an
+        extremum there. Datetime columns are compared as integers, NaT behaving like NaN
+        OUTPUT: relative_min_idx, relative_max_idx'''
+
+        list_of_min_masks, list_of_max_masks = [], []
+
+        for column_name in df.columns:
+            column                    = df[column_name]
+            column_values, is_invalid = RelativeExtremaFinder.column_to_comparable_values(column)
+            if column_values is None: # like strings, compared one by one as python objects
+                from scipy.signal import argrelextrema
+                column_values = column.to_numpy()
+                is_min        = np.zeros(len(column), dtype = bool)
+                is_max        = np.zeros(len(column), dtype = bool)
+                is_min[argrelextrema(column_values, np.less,    order = comparison_order)[0]] = True
+                is_max[argrelextrema(column_values, np.greater, order = comparison_order)[0]] = True
+                list_of_min_masks.append(is_min)
+                list_of_max_masks.append(is_max)
+                continue
+
+            is_min, is_max = RelativeExtremaFinder.find_relative_extrema(column_values, comparison_order, is_invalid)
+            list_of_min_masks.append(is_min)
+            list_of_max_masks.append(is_max)
+
+        relative_min_idx = np.nonzero(np.column_stack(list_of_min_masks))[0] # row-major, like argrelextrema on the 2-D array
+        relative_max_idx = np.nonzero(np.column_stack(list_of_max_masks))[0]
+
+        return relative_min_idx, relative_max_idx
@@ -4,39 +4,81 @@ import pandas as pd
 
 import config_info_obtainer as ci
 from csv_to_df import csvToDataframeMaker
-from data_cleaner import DataCleaner, DerivativeMaker
-from derivative_peaks_finder import FindDerivativePeaks
-from tempKPIs import TemperatureKPIObtainer
+from data_cleaner import DataCleaner, MatrixDataCleaner
+import instrumentation
+from signal_bundle import CycleSignalBundle
+from time_grid import TimeGrid
 
 
-location = ci.Constants.input_location
+def read_relevant_dataframe(filename, parse_cache = None):
+    '''Reads the relevant (time, T, C, F) columns of an input file
+    INPUT: filename, either a name in the input_location of the config file or a full path
+    If a ParsedCSVCache is given, the relevant columns are loaded from it instead of parsing the csv file. Data that are not logged
+    at one sample per second are put on a 1 s grid if regrid_to_1_s is set in the config file (see TimeGrid), since the windows of
+    the code are # of samples'''
 
-def run_data_cleaning_temperature_and_derivative_classes(filename):
-    '''Run the classes dealing with 1) cleaning code, 2) temperature-KPIs AND 3) derivative peaks'''
+    file_path       = os.path.join(ci.Constants.input_location, filename) # a full path in filename is kept as it is
+    csv_to_df_maker = csvToDataframeMaker(os.path.basename(file_path))
+    read_csv_file   = lambda: csv_to_df_maker.save_relevant_data_in_dataframe(os.path.dirname(file_path), time_format = None, engine = ci.Constants.csv_engine)
 
-    os.chdir(location)
-    csv_to_df_maker = csvToDataframeMaker(filename)
-    df              = csv_to_df_maker.save_data_in_dataframe(ci.Constants.input_location)
-    df_relevant     = csv_to_df_maker.make_dataframe_of_relevant_columns(df)
+    with instrumentation.span('parse'):
+        if parse_cache is not None:
+            df_relevant = parse_cache.get_or_parse(file_path, read_csv_file)
+        else:
+            df_relevant = read_csv_file()
+    instrumentation.count('rows read', len(df_relevant))
 
+    if ci.Constants.regrid_to_1_s:
+        with instrumentation.span('regrid'):
+            df_relevant = TimeGrid.regrid_if_off_grid(df_relevant, period_s = 1)
+
+    return df_relevant
+
+
+def run_data_cleaning_temperature_and_derivative_classes(filename, parse_cache = None):
+    '''Run the classes dealing with 1) cleaning code, 2) temperature-KPIs AND 3) derivative peaks
+    OUTPUT: CycleSignalBundle'''
+
+    df_relevant = read_relevant_dataframe(filename, parse_cache)
+    return run_data_cleaning_temperature_and_derivative_classes_on_df(df_relevant)
+
+
+def run_data_cleaning_temperature_and_derivative_classes_on_df(df_relevant, engine: str = None):
+    '''Same as run_data_cleaning_temperature_and_derivative_classes, for a dataframe of ONE cleaning cycle that is already read,
+    like one of the cycles found by CleaningCycleSegmenter
+    INPUT: engine: 'pandas' (DataCleaner), 'matrix' (MatrixDataCleaner) or 'fused' (FusedPreprocessor), if None the
+    data_cleaning_engine of the config file is used
+    OUTPUT: CycleSignalBundle, holding the cleaned data, its derivatives and extrema'''
+
+    engine              = engine or ci.Constants.data_cleaning_engine
     data_cleaner        = DataCleaner()
-    df_filled           = data_cleaner.fill_data_gaps(df_relevant)
-    df_smooth           = data_cleaner.smoothen_data(df_filled, window_size = 5)
-    df_removed_last_pt  = data_cleaner.remove_points_after_last_F_peak(df_smooth, points_after_last_F_peak_to_keep = 30, F_fraction_threshold = 40)
-    df_removed_first_pt = data_cleaner.remove_initial_points(df_removed_last_pt, points_before_first_peak_to_keep = 20, fraction_threshold = 30)
-
-    df_diff, df_diff2  = DerivativeMaker.make_derivatives(df_removed_first_pt, dx = 1)
-    df_diff_smooth     = data_cleaner.smoothen_data(df_diff, window_size = 5)
-    df_diff2_smooth    = data_cleaner.smoothen_data(df_diff2, window_size = 5)
-    df_diff_clipped    = DerivativeMaker.clip_derivatives(df_diff, criterion = 0.005)
-
-    tempKPI_Object      = TemperatureKPIObtainer(df_removed_first_pt)
-    df_temp_rel_extrema = tempKPI_Object.calculate_temperature_relative_extrema(comparison_order = 30)
-    temp_abs_extrema    = tempKPI_Object.calculate_temperature_absolute_extrema()
-
-    find_derivative_peaks= FindDerivativePeaks(df_removed_first_pt)
-    dY_absolute_extrema  = find_derivative_peaks.find_dY_absolute_extrema()
-    dY_relative_extrema  = find_derivative_peaks.find_dY_relative_extrema(comparison_order = 30)
-
-    return df_removed_first_pt, df_diff_smooth, df_diff2_smooth, df_diff_clipped, \
-           df_temp_rel_extrema, temp_abs_extrema, dY_absolute_extrema, dY_relative_extrema
+
+    if engine == 'fused':
+        from fused_preprocessing import FusedPreprocessor # imported here, numba is only needed for this engine
+        with instrumentation.span('fused preprocessing'):
+            signals = FusedPreprocessor.run(df_relevant, window_size = 5, dx = 1, clip_criterion = 0.005)
+        instrumentation.count('rows after trimming', len(signals.df_clean))
+        return CycleSignalBundle.from_signals(signals.df_clean, signals.df_diff, signals.df_diff2, signals.df_diff_smooth,
+                                              signals.df_diff2_smooth, signals.df_diff_clipped, comparison_order = 30)
+
+    with instrumentation.span('clean'):
+        if engine == 'matrix':
+            values, _ = MatrixDataCleaner.df_to_matrix(df_relevant)
+            with instrumentation.span('fill gaps'):
+                values_filled = MatrixDataCleaner.fill_data_gaps(values)
+            with instrumentation.span('smoothen'):
+                values_smooth = MatrixDataCleaner.smoothen_data(values_filled, window_size = 5)
+                df_smooth     = MatrixDataCleaner.matrix_to_df(df_relevant, values_smooth, window_size = 5)
+        else:
+            with instrumentation.span('fill gaps'):
+                df_filled = data_cleaner.fill_data_gaps(df_relevant)
+            with instrumentation.span('smoothen'):
+                df_smooth = data_cleaner.smoothen_data(df_filled, window_size = 5)
+
+        with instrumentation.span('trim'):
+            df_removed_last_pt  = data_cleaner.remove_points_after_last_F_peak(df_smooth, points_after_last_F_peak_to_keep = 30, F_fraction_threshold = 40)
+            df_removed_first_pt = data_cleaner.remove_initial_points(df_removed_last_pt, points_before_first_peak_to_keep = 20, fraction_threshold = 30)
+    instrumentation.count('rows after trimming', len(df_removed_first_pt))
+
+    signal_bundle       = CycleSignalBundle.from_clean_df(df_removed_first_pt, dx = 1, window_size = 5, clip_criterion = 0.005, comparison_order = 30, engine = engine)
+    return signal_bundle
@@ -0,0 +1,100 @@
+'''Module containing the signal bundle of ONE cleaning cycle: the cleaned T/C/F data, their derivatives (raw, smoothed, clipped) and the
+relative/absolute extrema of T and of the derivatives. Everything is computed once, when the bundle is made, and every later step
+(CycleSignals, the phase identifying classes, plotting) reads from the bundle instead of computing the derivatives again'''
+
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+from data_cleaner import DataCleaner, DerivativeMaker, MatrixDataCleaner
+from derivative_peaks_finder import FindDerivativePeaks
+import instrumentation
+from tempKPIs import TemperatureKPIObtainer
+
+
+@dataclass(frozen = True)
+class CycleSignalBundle:
+    '''Immutable bundle of the signals of one cleaning cycle. Its attributes cannot be reassigned, and code that changes values
+    (like EarlyCmaxHandler, which squashes an early C peak) works on a copy, see CycleSignals.replace
+    ATTRIBUTES:
+        - df_clean: cleaned dataframe [time, T, C, F], gaps filled, smoothed and trimmed
+        - df_diff, df_diff2: 1st and 2nd derivative of df_clean, same columns
+        - df_diff_smooth, df_diff2_smooth: smoothed derivatives
+        - df_diff_clipped: 1st derivative with small positive values flipped, see DerivativeMaker.clip_derivatives
+        - df_temp_rel_extrema, temp_abs_extrema: relative/absolute extrema of T, see TemperatureKPIObtainer
+        - dY_absolute_extrema, dY_relative_extrema: absolute/relative extrema of dT, dC, dF, see FindDerivativePeaks'''
+
+    df_clean           : pd.core.frame.DataFrame
+    df_diff            : pd.core.frame.DataFrame
+    df_diff2           : pd.core.frame.DataFrame
+    df_diff_smooth     : pd.core.frame.DataFrame
+    df_diff2_smooth    : pd.core.frame.DataFrame
+    df_diff_clipped    : pd.core.frame.DataFrame
+    df_temp_rel_extrema: pd.core.frame.DataFrame
+    temp_abs_extrema   : dict
+    dY_absolute_extrema: list
+    dY_relative_extrema: list
+
+
+    @staticmethod
+    def from_clean_df(df_clean: pd.core.frame.DataFrame, dx: int = 1, window_size: int = 5, clip_criterion: float = 0.005, comparison_order: int = 30,
+                      engine: str = 'pandas'):
+        '''Makes the bundle of a cleaned cycle, computing the derivatives exactly once
+        INPUT:
+            - df_clean: cleaned dataframe [time, T, C, F] of one cycle
+            - dx: spacing for differentiation
+            - window_size: smoothing window of the derivatives
+            - clip_criterion: see DerivativeMaker.clip_derivatives
+            - comparison_order: # of neighbors on each side of a relative min/max
+            - engine: 'pandas' (DataCleaner/DerivativeMaker) or 'matrix' (MatrixDataCleaner)
+        OUTPUT: CycleSignalBundle'''
+
+        with instrumentation.span('derivatives'):
+            if engine == 'matrix':
+                values, _                = MatrixDataCleaner.df_to_matrix(df_clean)
+                diff_values, diff2_values= MatrixDataCleaner.make_derivatives(values, dx = dx)
+                df_diff                  = MatrixDataCleaner.matrix_to_df(df_clean, diff_values)
+                df_diff2                 = MatrixDataCleaner.matrix_to_df(df_clean, diff2_values)
+                df_diff_smooth           = MatrixDataCleaner.matrix_to_df(df_clean, MatrixDataCleaner.smoothen_data(diff_values, window_size = window_size), window_size)
+                df_diff2_smooth          = MatrixDataCleaner.matrix_to_df(df_clean, MatrixDataCleaner.smoothen_data(diff2_values, window_size = window_size), window_size)
+                df_diff_clipped          = MatrixDataCleaner.matrix_to_df(df_clean, MatrixDataCleaner.clip_derivatives(diff_values, criterion = clip_criterion))
+            else:
+                df_diff, df_diff2  = DerivativeMaker.make_derivatives(df_clean, dx = dx)
+                df_diff_smooth     = DataCleaner.smoothen_data(df_diff, window_size = window_size)
+                df_diff2_smooth    = DataCleaner.smoothen_data(df_diff2, window_size = window_size)
+                df_diff_clipped    = DerivativeMaker.clip_derivatives(df_diff, criterion = clip_criterion)
+
+        return CycleSignalBundle.from_signals(df_clean, df_diff, df_diff2, df_diff_smooth, df_diff2_smooth, df_diff_clipped,
+                                              comparison_order = comparison_order)
+
+
+    @staticmethod
+    def from_signals(df_clean, df_diff, df_diff2, df_diff_smooth, df_diff2_smooth, df_diff_clipped, comparison_order: int = 30):
+        '''Makes the bundle of a cleaned cycle whose derivatives are already made, like by FusedPreprocessor. Only the extrema are computed
+        OUTPUT: CycleSignalBundle'''
+
+        with instrumentation.span('temperature extrema'):
+            tempKPI_Object      = TemperatureKPIObtainer(df_clean)
+            df_temp_rel_extrema = tempKPI_Object.calculate_temperature_relative_extrema(comparison_order = comparison_order)
+            temp_abs_extrema    = tempKPI_Object.calculate_temperature_absolute_extrema()
+
+        with instrumentation.span('derivative extrema'):
+            find_derivative_peaks= FindDerivativePeaks(df_clean, df_diff)
+            dY_absolute_extrema  = find_derivative_peaks.find_dY_absolute_extrema()
+            dY_relative_extrema  = find_derivative_peaks.find_dY_relative_extrema(comparison_order = comparison_order)
+
+        return CycleSignalBundle(df_clean, df_diff, df_diff2, df_diff_smooth, df_diff2_smooth, df_diff_clipped,
+                                 df_temp_rel_extrema, temp_abs_extrema, dY_absolute_extrema, dY_relative_extrema)
+
+
+    def with_comparison_order(self, comparison_order: int, temp_extrema_order_index, dY_extrema_order_index):
+        '''Copy of the bundle with the relative extrema of another comparison_order, read from extrema order indices instead of
+        being computed again. The data and derivatives are shared, not copied
+        INPUT: extrema order indices of T and of dT, dC, dF, see TemperatureKPIObtainer.make_temperature_extrema_order_index and
+        FindDerivativePeaks.make_dY_extrema_order_index
+        OUTPUT: CycleSignalBundle'''
+
+        df_temp_rel_extrema = TemperatureKPIObtainer(self.df_clean).calculate_temperature_relative_extrema(comparison_order, temp_extrema_order_index)
+        dY_relative_extrema = FindDerivativePeaks(self.df_clean, self.df_diff).find_dY_relative_extrema(comparison_order, dY_extrema_order_index)
+
+        return replace(self, df_temp_rel_extrema = df_temp_rel_extrema, dY_relative_extrema = dY_relative_extrema)
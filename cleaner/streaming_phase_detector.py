@@ -0,0 +1,871 @@
+'''Module containing the online phase detector, for cleaning runs that are still going on: the T/C/F samples are fed one by one (or
+in small batches) while the robot is cleaning, and phase transitions are reported as soon as they are known, so a bad cleaning can be
+flagged before the file is complete. The data cleaning is the same as offline: the gap filling holds a sample until its NaN values
+are back-filled, the smoothed value of a sample is the mean of the window_size samples ending at it (DataCleaner.smoothen_data shifts
+the time column too) and the derivative the shifted np.gradient of DerivativeMaker, so the derivative of a sample is known 5 samples
+later. The relative extrema of dT/dC/dF are confirmed comparison_order samples after that, with monotonic queues, like
+RelativeExtremaFinder. The phase rules are the offline rules of phase_identifier, run on the samples so far:
+    - T max, post-rinse and blowout are decided as soon as the samples after them settle the rule, 12 to 117 samples after T max
+    - the low-C zone mask needs values of the whole cycle (the C percentile, and the max std of dC, which comes from the derivative
+      rolled over the end of the cycle), so the low-C zone, and the hot rinse, pre-rinse and post-milk flush that depend on it, are
+      decided once the cycle is over: 30 samples after the 1st F peak after T max (DataCleaner.remove_points_after_last_F_peak),
+      33 to 117 samples after T max on the recorded files
+The work per sample is O(1) (amortized): the samples, extrema and F peaks are appended to growing numpy arrays, and the cycle end and
+blowout rules follow the F peaks as they are confirmed (StreamingPeakFinder) instead of running find_peaks on all F so far. The start
+of the cycle needs the T and C max of the whole cycle, so the samples are kept until the cycle is over (one pass over them then);
+the samples fed after it are counted but not kept. A detector that is never fed the end of a cycle keeps every sample, so feed one
+detector per cleaning cycle
+The replay check (benchmarks/streaming_replay_check.py) compares the online phases, low-C zone duration and blowout duration with
+those of process_file. They were equal to the second on 55 recorded cycles, which cover only some of the fallbacks of the offline code,
+and on 40 synthetic cycles (--random-cycles 40 --seed 0) that also take the default pre-rinse and the longest low-C zone. Other data
+can take rules that neither set covers, run the check on them'''
+
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+import config_info_obtainer as ci
+from constants import DfConstants
+from event_join import EventJoin
+from logging_maker import logger
+from phase_identifier import Blowout
+import pipeline
+from relative_extrema import RelativeExtremaFinder
+from time_grid import TimeGrid, TimeIndex
+
+
+@dataclass
+class PhaseEvent:
+    '''Phase transition (or alarm) reported by StreamingPhaseDetector'''
+
+    phase      : str            # one of StreamingPhaseDetector.PHASES, or 'alarm'
+    idx        : int            # sample # (in the order the samples were fed) where the transition happened
+    time       : pd.Timestamp   # wall-clock time of that sample
+    reported_at: int            # sample # at which the transition was reported, reported_at - idx is the delay in samples
+    value      : float = np.nan # value that goes with it, like T_max [C], the low-C zone duration [s] or the blowout duration [s]
+    message    : str   = ''
+
+
+
+class StreamingGapFiller:
+    '''Online DataCleaner.fill_data_gaps: a NaN takes the next valid value of its channel (back-fill), so a sample with a NaN is held
+    back until every channel had a valid value again. Each held value is filled once, so the work is O(1) per sample (amortized)
+    NOTE: a channel that stays NaN for a long stretch holds the samples back (and delays the phases) for as long'''
+
+    def __init__(self, number_of_channels: int = 3):
+        self.held_samples = deque() # (idx, values) in order
+        self.waiting      = [[] for _ in range(number_of_channels)] # values arrays of held samples still waiting for a channel
+        self.last_valid   = np.full(number_of_channels, np.nan)
+
+
+    def push(self, idx: int, values) -> list:
+        '''OUTPUT: list of (idx, values) of the samples that have no NaN any more, in order'''
+
+        values   = np.array(values, dtype = np.float64)
+        is_valid = ~np.isnan(values)
+
+        for channel in np.flatnonzero(is_valid):
+            for held_values in self.waiting[channel]:
+                held_values[channel] = values[channel]
+            self.waiting[channel].clear()
+        for channel in np.flatnonzero(~is_valid):
+            self.waiting[channel].append(values)
+        self.held_samples.append((idx, values))
+        self.last_valid = np.where(is_valid, values, self.last_valid)
+
+        complete_samples = []
+        while self.held_samples and not np.isnan(self.held_samples[0][1]).any():
+            complete_samples.append(self.held_samples.popleft())
+        return complete_samples
+
+
+    def flush(self) -> list:
+        '''Ends the stream: the held samples get the last valid value of their channels, like the last row in DataCleaner.fill_data_gaps
+        OUTPUT: list of (idx, values) of the held samples, in order'''
+
+        held_samples = [(idx, np.where(np.isnan(values), self.last_valid, values)) for idx, values in self.held_samples]
+        self.held_samples.clear()
+        self.waiting = [[] for _ in self.waiting]
+        return held_samples
+
+
+
+class StreamingRelativeExtremum:
+    '''Online RelativeExtremaFinder of one channel: sample c is a relative max when it is strictly greater than the comparison_order
+    samples on each side of it (only the ones that exist at the start), which is known comparison_order samples later. The max of
+    each side is kept in a monotonic queue, so every sample costs O(1) work (amortized). Relative minima are the maxima of -values
+    INPUT:
+        - comparison_order: # of neighbors on each side of a point that it must be strictly greater/smaller than
+        - is_max: True for relative maxima, False for relative minima'''
+
+    def __init__(self, comparison_order: int = 30, is_max: bool = True):
+        self.comparison_order = comparison_order
+        self.sign             = 1.0 if is_max else -1.0
+        self.recent_samples   = deque(maxlen = comparison_order + 1) # (idx, value) of the candidate and of the samples after it
+        self.left_max         = deque() # (idx, value) with decreasing values, of the samples before the candidate
+        self.right_max        = deque() # same, of the samples after the candidate
+
+
+    @staticmethod
+    def _push_max(monotonic_queue: deque, idx: int, value: float):
+        '''Appends a sample to a monotonic queue, dropping the samples that can no longer be the max of the window'''
+
+        while monotonic_queue and monotonic_queue[-1][1] <= value:
+            monotonic_queue.pop()
+        monotonic_queue.append((idx, value))
+
+
+    def push(self, idx: int, value: float):
+        '''Feeds the next sample, the idx must follow each other
+        OUTPUT: idx of the sample comparison_order samples back if it is a relative extremum, else None'''
+
+        value = self.sign * value
+        if len(self.recent_samples) == self.recent_samples.maxlen: # the last candidate becomes a left neighbor
+            self._push_max(self.left_max, *self.recent_samples[0])
+        self.recent_samples.append((idx, value))
+        self._push_max(self.right_max, idx, value)
+
+        if len(self.recent_samples) < self.recent_samples.maxlen:
+            return None
+
+        candidate_idx, candidate_value = self.recent_samples[0]
+        while self.right_max[0][0] <= candidate_idx:
+            self.right_max.popleft()
+        while self.left_max and self.left_max[0][0] < candidate_idx - self.comparison_order:
+            self.left_max.popleft()
+
+        if self.left_max and (candidate_value > self.left_max[0][1]) and (candidate_value > self.right_max[0][1]): # NaN never wins
+            return candidate_idx
+        return None
+
+
+
+class GrowingArray:
+    '''1-D numpy array that values are appended to one at a time: the buffer doubles when it is full, like a python list, so an append
+    is O(1) (amortized), and values is a view of the filled part, so slicing it does not copy or convert anything
+    INPUT: dtype of the values, capacity: initial # of values of the buffer'''
+
+    def __init__(self, dtype = np.float64, capacity: int = 1024):
+        self.buffer = np.empty(capacity, dtype = dtype)
+        self.size   = 0
+
+
+    def append(self, value):
+        if self.size == len(self.buffer):
+            self.buffer = np.concatenate((self.buffer, np.empty_like(self.buffer)))
+        self.buffer[self.size] = value
+        self.size += 1
+
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.buffer[:self.size]
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __getitem__(self, key):
+        return self.buffer[:self.size][key]
+
+
+
+class StreamingPeakFinder:
+    '''Online scipy.signal.find_peaks (without conditions) of one channel: a peak is a sample, or the middle of a flat top, with a
+    lower sample on both sides, known once the 1st lower sample after it comes in. NaN values are never part of a peak. Every sample
+    costs O(1) work. The peaks are kept in order, the callers filter them on height like the height argument of find_peaks'''
+
+    def __init__(self):
+        self.left_edges     = GrowingArray(np.int64)   # 1st sample of the (flat) top of every peak
+        self.peaks_idx      = GrowingArray(np.int64)   # middle of the top, the idx of find_peaks
+        self.peaks_values   = GrowingArray(np.float64)
+        self.previous_value = np.nan
+        self.top_start_idx  = None                     # 1st sample of the top going on, if the values rose to it
+        self.top_value      = np.nan
+
+
+    def push(self, idx: int, value: float):
+        '''Feeds the next sample, the idx must follow each other'''
+
+        if (self.top_start_idx is not None) and not (value == self.top_value): # the top ends
+            if value < self.top_value:
+                self.left_edges.append(self.top_start_idx)
+                self.peaks_idx.append((self.top_start_idx + idx - 1)//2)
+                self.peaks_values.append(self.top_value)
+            self.top_start_idx = None
+        if self.previous_value < value: # NaN never rises
+            self.top_start_idx, self.top_value = idx, value
+        self.previous_value = value
+
+
+
+class StreamingPhaseDetector:
+    '''Finds the phases of ONE cleaning cycle while its samples come in, with the offline rules of ResultingPhases. Every phase is
+    reported once its rule can be decided from the samples so far:
+        - T max: max of T, once T has dropped T_max_drop below it (and T rose T_max_min_rise above its 1st value). value = T_max [C].
+          An 'alarm' is reported too if T_max is below T_crit
+        - post-rinse: the later of the 1st dT min after T max and a dC min within 8 s, or the 1st dT min if that is more than 60 s
+          after T max, like find_post_rinse_start_time. Else T max, once the cycle is over
+        - blowout: Blowout.find_blowout_peak_idx and find_blowout_start_and_stop_idx on the F samples so far, once F stopped falling
+          after the peak. value = blowout duration [s], the one of Blowout.find_blowout_duration
+    The cycle is over 30 samples after the 1st F peak after T max (like DataCleaner.remove_points_after_last_F_peak), or when finish
+    is called. Its samples are then trimmed like DataCleaner.remove_initial_points, and the rules that need the values of the whole
+    cycle are decided (see _find_cycle_values):
+        - low-C zone: zones of the masks of LowCZoneMaskHandler, the best one like obtain_best_low_C_zone_candidate. value = duration [s]
+        - hot rinse: 1st dC max with a dT max within 3 s, after the low-C zone and before T max, like find_hot_rinse_time. Else 4 min
+          before T max
+        - pre-rinse: last dC min (else dF max) before the low-C zone, at most 200 samples before the hot rinse, like find_prerinse_time
+        - post-milk flush: 1st dC max above 1% of the C mean before the pre-rinse. With an early large C (EarlyCmaxHandler), the dF max
+          within 8 s of the 1st dC max before the low-C zone. Else 12 min before T max
+    A phase whose rule cannot be decided (like the low-C zone when the mask has no zone) is not reported. The times of the samples
+    must increase, and the samples after the end of the cycle are ignored: feed one detector per cleaning cycle
+    INPUT:
+        - window_size: # of samples of the moving mean, like DataCleaner.smoothen_data
+        - comparison_order: # of samples on each side of a relative extremum, like FindDerivativePeaks.find_dY_relative_extrema
+        - T_max_drop: T [C] below T_max at which T_max is confirmed
+        - T_max_min_rise: T [C] above the 1st T of the cycle that T_max must reach, so the cold start is not taken for T max
+        - blowout_threshold: F [L/min] of the blowout peak, like Blowout.find_blowout_peak_idx
+        - T_crit: hygienic temperature criterion [C], T_crit of the config file if None'''
+
+    PHASES = ('post-milk flush', 'low-C zone', 'pre-rinse', 'hot rinse', 'T max', 'post-rinse', 'blowout')
+
+    T_channel = 0
+    C_channel = 1
+    F_channel = 2
+
+    NS_PER_S        = TimeGrid.NS_PER_S
+    SECS_PER_MINUTE = 60
+    EXTREMA         = ('dT max', 'dT min', 'dC max', 'dC min', 'dF max') # relative extrema the rules use
+
+    # values of the offline rules, as ResultingPhases calls them
+    STD_ROLL_WINDOW_SIZE          = 3    # LowCZoneMaskHandler.apply_std_mask_on_dC
+    MAX_STD_THRESHOLD_FRACTION    = 0.1
+    C_PERCENTILE_CRIT             = 40   # LowCZoneMaskHandler.apply_C_percentile_mask_on_dC
+    LOW_C_ZONE_DURATION_THRESHOLD = 120  # LowCZoneAndHotrinseFinder.obtain_best_low_C_zone_candidate
+    LOW_C_ZONE_DURATION_DECREASE  = -10
+    HOT_RINSE_NEIGHBORS_S         = 3    # LowCZoneAndHotrinseFinder.find_hot_rinse_time
+    HOT_RINSE_T_CRIT_FRACTION     = 0.3
+    HOT_RINSE_C_CRIT_FRACTION     = 0.5
+    HOT_RINSE_BEFORE_T_MAX_MIN    = 4
+    PRERINSE_BEFORE_T_MAX_MIN     = 7    # PrerinsePostmilkflushFinder.find_prerinse_time
+    PRERINSE_HOTRINSE_LIMIT       = 200
+    POSTMILK_C_CRIT_FRACTION      = 0.01 # PrerinsePostmilkflushFinder.find_postmilk_flush_time_depending_on_early_sharp_C
+    POSTMILK_NEIGHBORS_S          = 8
+    POSTMILK_BEFORE_T_MAX_MIN     = 12
+    EARLY_C_TIME_FRACTION         = 0.25 # EarlyCmaxHandler.detect_if_early_C_max_exists
+    POSTRINSE_NEIGHBORS_S         = 8    # PostRinseFinder.find_post_rinse_start_time
+    POSTRINSE_TIMEOUT_S           = 60
+    POINTS_AFTER_LAST_F_PEAK      = 30   # DataCleaner.remove_points_after_last_F_peak
+    END_F_FRACTION_THRESHOLD      = 40
+    POINTS_BEFORE_FIRST_PEAK      = 20   # DataCleaner.remove_initial_points
+    START_FRACTION_THRESHOLD      = 30
+    BLOWOUT_F_FRACTION            = 30   # Blowout.find_blowout_peak_idx
+
+    def __init__(self, window_size: int = 5, comparison_order: int = 30, T_max_drop: float = 2.0, T_max_min_rise: float = 10.0,
+                 blowout_threshold: float = 50, T_crit: float = None):
+        self.window_size       = window_size
+        self.comparison_order  = comparison_order
+        self.T_max_drop        = T_max_drop
+        self.T_max_min_rise    = T_max_min_rise
+        self.blowout_threshold = blowout_threshold
+        self.T_crit            = T_crit if T_crit is not None else ci.Constants.T_crit
+
+        # fed samples of the cycle: wall-clock time, and integer time like TimeGrid.to_ns_since_start
+        self.number_of_samples = 0 # fed so far, the samples after the cycle too
+        self.times: list       = []
+        self.t_ns              = GrowingArray(np.int64)
+        self.has_time          = GrowingArray(bool)
+        self.start_time_ns     = None
+        self.events: list      = []
+
+        # online data cleaning, the smoothed values of the samples of the cycle
+        self.gap_filler       = StreamingGapFiller(number_of_channels = 3)
+        self.smoothing_window = deque(maxlen = window_size) # filled samples of the moving mean
+        self.T_values         = GrowingArray(np.float64)
+        self.C_values         = GrowingArray(np.float64)
+        self.F_values         = GrowingArray(np.float64)
+        self.relative_extremum= {extremum: StreamingRelativeExtremum(comparison_order, is_max = extremum.endswith('max')) for extremum in self.EXTREMA}
+        self.extrema_idx      = {extremum: GrowingArray(np.int64) for extremum in self.EXTREMA} # idx of the confirmed extrema, with a time
+        self.extrema_t_ns     = {extremum: GrowingArray(np.int64) for extremum in self.EXTREMA} # and their time
+        self.extrema_horizon  = -1 # the extrema of the samples up to this idx are known
+        self.F_peak_finder    = StreamingPeakFinder()
+
+        # running maxima of the samples so far
+        self.F_max        = -np.inf
+        self.T_max        = -np.inf
+        self.T_max_idx    = None
+
+        # F peaks after T max that the cycle end and blowout rules look at, the ones before are never high enough (see _find_cycle_end)
+        self.next_end_F_peak     = None # position in F_peak_finder of the next peak to check
+        self.next_blowout_F_peak = None
+        self.blowout_peak_idx    = None # 1st F peak after T max above blowout_threshold, before the cycle is over
+        self.blowout_stop_idx    = None # the steps of F from the blowout peak to this idx are falling
+
+        # values of the trimmed cycle (see _find_cycle_values), known once the cycle is over
+        self.cycle_start_idx       = None   # 1st sample of the cycle, see DataCleaner.remove_initial_points
+        self.cycle_end_idx         = None   # 1st sample after the cycle, see DataCleaner.remove_points_after_last_F_peak
+        self.is_there_early_large_C= False
+        self.cycle_C_values        = None   # C of the samples of the cycle, with the early C peak squashed like EarlyCmaxHandler
+        self.cycle_T_mean          = np.nan
+        self.cycle_C_mean          = np.nan # mean of cycle_C_values
+        self.cycle_edge_extrema    = None   # {extremum: idx} of the extrema near the start and end of the cycle
+        self.cycle_extrema         = None   # {extremum: (idx, t_ns)} of all extrema of the cycle, see _find_cycle_extrema
+
+        # state of the phase rules
+        self.phase_idx: dict     = {} # {phase: idx}, None for a phase that cannot be found
+        self.low_C_zone          = None # (start_idx, duration) of the low-C zone
+        self.is_T_max_confirmed  = False
+        self.is_finished         = False
+
+
+    def push(self, time, T, C, F) -> list:
+        '''Feeds the next sample of the cycle
+        INPUT: time: wall-clock time (like a pd.Timestamp), T/C/F: values, NaN if missing
+        OUTPUT: list of PhaseEvent reported because of this sample'''
+
+        idx = self.number_of_samples
+        self.number_of_samples += 1
+        if self.cycle_start_idx is not None: # the cycle is over and all its phases are decided, the samples after it are not kept
+            return []
+        self._record_time(time)
+
+        number_of_events = len(self.events)
+        for filled_idx, filled_values in self.gap_filler.push(idx, (T, C, F)):
+            self._process_filled_sample(filled_idx, filled_values, reported_at = idx)
+        return self.events[number_of_events:]
+
+
+    def push_batch(self, times, values) -> list:
+        '''Feeds a batch of samples, one after the other
+        INPUT: times: wall-clock times, values: 2-D array (# of samples, 3) of T/C/F
+        OUTPUT: list of PhaseEvent reported because of these samples'''
+
+        list_of_events = []
+        for time, (T, C, F) in zip(times, np.asarray(values, dtype = np.float64)):
+            list_of_events.extend(self.push(time, T, C, F))
+        return list_of_events
+
+
+    def push_df(self, df: pd.core.frame.DataFrame) -> list:
+        '''Feeds a dataframe of [time, T, C, F] samples, with the columns of csvToDataframeMaker
+        OUTPUT: list of PhaseEvent reported because of these samples'''
+
+        values = df[[DfConstants.df_temperature_column, DfConstants.df_conductivity_column, DfConstants.df_flow_column]].to_numpy(dtype = np.float64)
+        return self.push_batch(df[DfConstants.df_time_column], values)
+
+
+    def finish(self) -> list:
+        '''Ends the cycle after its last sample: the held samples are filled, T max is the max of T if it was not confirmed yet, and
+        the phases that were still waiting for later samples are decided with the samples of the cycle, like the offline rules
+        OUTPUT: list of PhaseEvent reported by finish'''
+
+        number_of_events = len(self.events)
+        reported_at      = self.number_of_samples - 1
+        if self.cycle_start_idx is None:
+            for filled_idx, filled_values in self.gap_filler.flush():
+                self._process_filled_sample(filled_idx, filled_values, reported_at)
+
+        self.is_finished = True
+        if not self.is_T_max_confirmed and self.T_max_idx is not None:
+            self._confirm_T_max(reported_at)
+        self._decide_phases(reported_at)
+
+        logger.info(f"Streaming: cycle finished, {len(self.events)} events, {len(self.events) - number_of_events} reported when finishing")
+        return self.events[number_of_events:]
+
+
+    def _record_time(self, time):
+        '''Keeps the wall-clock time of a sample and its time [ns] since the 1st valid time'''
+
+        self.times.append(time)
+        has_time = not pd.isna(time)
+        if has_time and self.start_time_ns is None:
+            self.start_time_ns = pd.Timestamp(time).value
+        self.t_ns.append(pd.Timestamp(time).value - self.start_time_ns if has_time else 0)
+        self.has_time.append(has_time)
+
+
+    def _process_filled_sample(self, idx: int, values: np.ndarray, reported_at: int):
+        '''Smoothing of a sample without NaN: the mean of the window is given to its last sample, like DataCleaner.smoothen_data,
+        which shifts the time column with the values. The 1st (window_size - 1) samples have no smoothed values (NaN)'''
+
+        self.smoothing_window.append(values)
+        if len(self.smoothing_window) < self.window_size:
+            self._append_smoothed_values(np.full(3, np.nan))
+            return
+
+        self._process_smoothed_sample(idx, np.mean(self.smoothing_window, axis = 0), reported_at)
+
+
+    def _append_smoothed_values(self, smoothed: np.ndarray):
+        self.F_peak_finder.push(len(self.F_values), smoothed[self.F_channel])
+        self.T_values.append(smoothed[self.T_channel])
+        self.C_values.append(smoothed[self.C_channel])
+        self.F_values.append(smoothed[self.F_channel])
+
+
+    def _process_smoothed_sample(self, idx: int, smoothed: np.ndarray, reported_at: int):
+        '''Running values, T max rule and derivative of a smoothed sample. DerivativeMaker rolls np.gradient back by 4 samples, so
+        sample # idx gives the derivative of sample # idx - 5: (smoothed[idx] - smoothed[idx - 2])/2'''
+
+        T, C, F = smoothed[self.T_channel], smoothed[self.C_channel], smoothed[self.F_channel]
+        self._append_smoothed_values(smoothed)
+
+        self.F_max = max(self.F_max, F)
+
+        self._apply_T_max_rule(idx, T, reported_at)
+
+        derivative_idx = idx - 5
+        if idx - 2 >= self.window_size - 1:
+            dT = (T - self.T_values[idx - 2])/2
+            dC = (C - self.C_values[idx - 2])/2
+            dF = (F - self.F_values[idx - 2])/2
+            self._process_derivative(derivative_idx, dT, dC, dF, reported_at)
+
+        self._decide_phases(reported_at)
+
+
+    def _apply_T_max_rule(self, idx: int, T: float, reported_at: int):
+        '''T max: the 1st max of T, confirmed once T dropped T_max_drop below it'''
+
+        if self.is_T_max_confirmed:
+            return
+        if T > self.T_max:
+            self.T_max, self.T_max_idx = T, idx
+        elif T < self.T_max - self.T_max_drop and self.T_max > self.T_values[self.window_size - 1] + self.T_max_min_rise:
+            self._confirm_T_max(reported_at)
+
+
+    def _confirm_T_max(self, reported_at: int):
+        self.is_T_max_confirmed = True
+        self._report('T max', self.T_max_idx, reported_at, value = self.T_max)
+        if self.T_max < self.T_crit:
+            self._report('alarm', self.T_max_idx, reported_at, value = self.T_max, message = f"T_max {self.T_max:.1f}C is below T_crit {self.T_crit}C")
+
+
+    def _process_derivative(self, idx: int, dT: float, dC: float, dF: float, reported_at: int):
+        '''Relative extrema of the derivative of sample # idx'''
+
+        derivative = {'dT': dT, 'dC': dC, 'dF': dF}
+        for extremum in self.EXTREMA:
+            extremum_idx = self.relative_extremum[extremum].push(idx, derivative[extremum[:2]])
+            if extremum_idx is not None and self.has_time[extremum_idx]:
+                self.extrema_idx[extremum].append(extremum_idx)
+                self.extrema_t_ns[extremum].append(self.t_ns[extremum_idx])
+        self.extrema_horizon = idx - self.comparison_order
+
+
+    def _find_cycle_values(self):
+        '''Trims the samples so far like DataCleaner.remove_initial_points (the end is already known, see _find_cycle_end): the cycle
+        starts POINTS_BEFORE_FIRST_PEAK samples before the 1st T (re-centered to its min) or C peak above 1/START_FRACTION_THRESHOLD
+        of its max. Then the values of the whole cycle that the rules use: the T/C means, C with the early C peak squashed and the
+        relative extrema near the edges of the cycle (see _find_cycle_edge_extrema)'''
+
+        first_smoothed_idx = self.window_size - 1 # the smoothed values start at this sample, like row 0 of DataCleaner.smoothen_data
+        self.cycle_end_idx = min(self.cycle_end_idx, len(self.C_values)) if self.cycle_end_idx is not None else len(self.C_values)
+        T_values           = self.T_values[first_smoothed_idx : self.cycle_end_idx]
+        C_values           = self.C_values[first_smoothed_idx : self.cycle_end_idx]
+
+        T_recentered   = T_values - np.nanmin(T_values)
+        T_peaks_idx, _ = find_peaks(T_recentered, height = np.nanmax(T_recentered)/self.START_FRACTION_THRESHOLD)
+        C_peaks_idx, _ = find_peaks(C_values, height = np.nanmax(C_values)/self.START_FRACTION_THRESHOLD)
+        first_peak_idx = min(T_peaks_idx[:1].tolist() + C_peaks_idx[:1].tolist(), default = 0)
+        self.cycle_start_idx = first_smoothed_idx + max(first_peak_idx - self.POINTS_BEFORE_FIRST_PEAK, 0)
+        logger.info(f"Streaming: the cycle starts at idx #{self.cycle_start_idx} and ends at idx #{self.cycle_end_idx}")
+
+        C_values                    = C_values[self.cycle_start_idx - first_smoothed_idx:]
+        self.cycle_T_mean           = np.mean(T_values[self.cycle_start_idx - first_smoothed_idx:])
+        self.is_there_early_large_C = int(np.argmax(C_values)) < int(len(C_values) * self.EARLY_C_TIME_FRACTION)
+        self.cycle_C_values         = self._squash_early_large_C(C_values) if self.is_there_early_large_C else C_values
+        self.cycle_C_mean           = np.mean(self.cycle_C_values)
+        self.cycle_edge_extrema     = self._find_cycle_edge_extrema()
+        self.cycle_extrema          = {extremum: self._find_cycle_extrema(extremum) for extremum in self.EXTREMA}
+
+
+    def _find_cycle_edge_extrema(self) -> dict:
+        '''Relative extrema of the derivative of the cycle like FindDerivativePeaks, where they differ from the streaming ones: within
+        comparison_order samples of the start (the samples before it are not compared) and of the last window_size samples (np.gradient
+        is one-sided at the ends and rolled back by window_size - 1 samples, so the last samples get the derivative of the 1st ones)
+        OUTPUT: dict of {extremum: idx of the extrema with a time}'''
+
+        cycle_samples  = slice(self.cycle_start_idx, self.cycle_end_idx)
+        values         = np.column_stack((self.T_values[cycle_samples], self.C_values[cycle_samples], self.F_values[cycle_samples]))
+        dY_values      = np.roll(np.gradient(values, axis = 0), 1 - self.window_size, axis = 0)
+        is_relative_min, is_relative_max = RelativeExtremaFinder.find_relative_extrema(dY_values, self.comparison_order)
+
+        local_idx      = np.arange(len(values))
+        is_near_edge   = (local_idx < self.comparison_order) | (local_idx >= len(values) - self.comparison_order - self.window_size)
+        has_time       = self.has_time[cycle_samples]
+        channel_of     = {'dT': self.T_channel, 'dC': self.C_channel, 'dF': self.F_channel}
+
+        cycle_edge_extrema = {}
+        for extremum in self.EXTREMA:
+            is_extremum = is_relative_max if extremum.endswith('max') else is_relative_min
+            cycle_edge_extrema[extremum] = self.cycle_start_idx + np.flatnonzero(is_extremum[:, channel_of[extremum[:2]]] & is_near_edge & has_time)
+        return cycle_edge_extrema
+
+
+    def _find_cycle_extrema(self, extremum: str) -> tuple:
+        '''The extrema of the cycle: the streaming ones away from its edges, and those of _find_cycle_edge_extrema near them
+        OUTPUT: idx and times [ns] (int64 arrays) of the extrema'''
+
+        extrema_idx = self.extrema_idx[extremum].values
+        is_inner    = (extrema_idx >= self.cycle_start_idx + self.comparison_order) \
+                      & (extrema_idx < self.cycle_end_idx - self.comparison_order - self.window_size)
+        extrema_idx = np.sort(np.concatenate((extrema_idx[is_inner], self.cycle_edge_extrema[extremum])))
+        return extrema_idx, self.t_ns[extrema_idx]
+
+
+    @staticmethod
+    def _squash_early_large_C(C_values: np.ndarray) -> np.ndarray:
+        '''EarlyCmaxHandler.smoothen_large_C_peak_values_if_it_exists on C: from the last sample <= C mean before C max to the 1st one
+        after it, C is scaled by C mean/C max, then smoothed by a rolling mean of 2 samples'''
+
+        C_max_idx   = int(np.argmax(C_values))
+        C_mean      = np.nanmean(C_values)
+        zone_start  = C_max_idx - int(np.argmax(C_values[C_max_idx::-1] <= C_mean))
+        zone_stop   = C_max_idx + int(np.argmax(C_values[C_max_idx:] <= C_mean))
+
+        squashed_C  = C_values[zone_start : zone_stop + 1] * C_mean/C_values[C_max_idx]
+        smoothed_C  = squashed_C.copy()
+        smoothed_C[1:] = (squashed_C[1:] + squashed_C[:-1])/2
+        C_values    = C_values.copy()
+        C_values[zone_start : zone_stop + 1] = smoothed_C
+        return C_values
+
+
+    def _make_low_C_mask(self) -> np.ndarray:
+        '''Masks of LowCZoneMaskHandler on the samples of the cycle: the rolling std of dC (np.gradient of C rolled back like
+        DerivativeMaker, so the last samples get the dC of the 1st ones) below MAX_STD_THRESHOLD_FRACTION of its max, not after T max,
+        and C STD_ROLL_WINDOW_SIZE - 1 samples later not above the C percentile. Sample # L of the mask is sample # cycle_start_idx + L
+        OUTPUT: boolean array, one item per sample of the cycle'''
+
+        C_values      = self.C_values[self.cycle_start_idx : self.cycle_end_idx] # before the early C peak is squashed
+        dC_values     = np.roll(np.gradient(C_values), 1 - self.window_size)
+        lag           = self.STD_ROLL_WINDOW_SIZE - 1
+        dC_std        = pd.Series(dC_values).rolling(self.STD_ROLL_WINDOW_SIZE).std().shift(-lag).to_numpy()
+        dC_std[:lag]  = np.nan # the single-cycle mask starts at label lag
+
+        C_ahead       = np.concatenate((C_values[lag:], np.full(lag, np.nan)))
+        low_C_mask    = (dC_std < self.MAX_STD_THRESHOLD_FRACTION * np.nanmax(dC_std)) \
+                        & ~(C_ahead > np.percentile(C_values, self.C_PERCENTILE_CRIT))
+        low_C_mask[self.T_max_idx - self.cycle_start_idx + 1:] = False # only before T_max
+        return low_C_mask
+
+
+    def _decide_low_C_zone(self, reported_at: int):
+        '''LowCZoneAndHotrinseFinder.obtain_best_low_C_zone_candidate on the zones of the mask (see _make_low_C_mask): the 1st zone
+        of the highest duration criterion it meets, else the 1st of the longest zones'''
+
+        mask_changes  = np.diff(np.concatenate(([False], self._make_low_C_mask(), [False])).astype(np.int8))
+        zone_starts   = np.flatnonzero(mask_changes == 1)
+        zone_durations= np.flatnonzero(mask_changes == -1) - zone_starts
+
+        if not zone_starts.size:
+            logger.warning("Streaming: the mask has no low-C zone, cannot find the low-C zone, hot rinse, pre-rinse and post-milk flush")
+            for phase in ['low-C zone', 'hot rinse', 'pre-rinse', 'post-milk flush']:
+                self.phase_idx[phase] = None
+            return
+
+        sorted_thresholds = np.sort(np.arange(self.LOW_C_ZONE_DURATION_THRESHOLD, 0, self.LOW_C_ZONE_DURATION_DECREASE))
+        criterion_ranks   = len(sorted_thresholds) - np.searchsorted(sorted_thresholds, zone_durations, side = 'right')
+        if np.min(criterion_ranks) < len(sorted_thresholds):
+            best_zone = int(np.argmin(criterion_ranks))
+        else:
+            logger.warning("Streaming: cannot find zone that meets duration threshold, using longest one instead")
+            best_zone = int(np.argmax(zone_durations))
+        self._report_low_C_zone(self.cycle_start_idx + int(zone_starts[best_zone]), int(zone_durations[best_zone]), reported_at)
+
+
+    def _report_low_C_zone(self, start_idx: int, duration: int, reported_at: int):
+        self.low_C_zone = (start_idx, duration)
+        self._report('low-C zone', start_idx, reported_at, value = duration)
+
+
+    def _is_cycle_over(self) -> bool:
+        '''True once the values of the cycle, and so the extrema of all its samples, are known'''
+        return self.is_finished or self.cycle_start_idx is not None
+
+
+    def _is_known_until(self, t_ns: int) -> bool:
+        '''True if the extrema of all samples up to time t_ns [ns] are known'''
+        return self._is_cycle_over() or (self.extrema_horizon >= 0 and self.t_ns[self.extrema_horizon] >= t_ns)
+
+
+    def _extrema_t_ns(self, extremum: str, before_idx: int = None, after_t_ns: int = None) -> tuple:
+        '''OUTPUT: idx and times [ns] (int64 arrays, views) of the confirmed extrema, of the samples before sample # before_idx and
+        after time after_t_ns if given, found with a binary search since both increase. Once the cycle is known, those of
+        _find_cycle_extrema'''
+
+        if self.cycle_extrema is not None:
+            extrema_idx, extrema_t_ns = self.cycle_extrema[extremum]
+        else:
+            extrema_idx, extrema_t_ns = self.extrema_idx[extremum].values, self.extrema_t_ns[extremum].values
+
+        first_position = np.searchsorted(extrema_t_ns, after_t_ns, side = 'right') if after_t_ns is not None else 0
+        stop_position  = np.searchsorted(extrema_idx, before_idx, side = 'left') if before_idx is not None else len(extrema_idx)
+        return extrema_idx[first_position : stop_position], extrema_t_ns[first_position : stop_position]
+
+
+    def _seconds_between(self, start_idx: int, stop_idx: int) -> float:
+        '''Time [s] from sample # start_idx to sample # stop_idx, NaN if one of them has no time, like Blowout.find_blowout_duration_s'''
+
+        if not (self.has_time[start_idx] and self.has_time[stop_idx]):
+            return np.nan
+        return (self.t_ns[stop_idx] - self.t_ns[start_idx])/self.NS_PER_S
+
+
+    def _nearest_idx_of_time(self, t_ns: int) -> int:
+        '''Index of the sample of the cycle closest to time t_ns, like TimeIndex.nearest_idx_of_time'''
+
+        cycle_samples = slice(self.cycle_start_idx, self.cycle_end_idx)
+        time_index    = TimeIndex(self.t_ns[cycle_samples], self.has_time[cycle_samples])
+        return self.cycle_start_idx + time_index.nearest_idx_of_time(t_ns)
+
+
+    def _decide_phases(self, reported_at: int):
+        '''Decides the phases whose rule can be decided with the samples so far. Post-rinse and blowout need T max. The low-C zone
+        needs the values of the whole cycle, so it is decided once the samples up to the end of the cycle are smoothed, then the
+        rules that depend on it: the hot rinse needs the low-C zone, the pre-rinse the hot rinse, the post-milk flush the pre-rinse'''
+
+        if not self.is_T_max_confirmed:
+            return
+        if self.cycle_end_idx is None:
+            self._find_cycle_end()
+        if self.cycle_start_idx is None and (self.is_finished or (self.cycle_end_idx is not None and len(self.C_values) >= self.cycle_end_idx)):
+            self._find_cycle_values()
+            self._decide_low_C_zone(reported_at)
+        if 'post-rinse' not in self.phase_idx:
+            self._decide_post_rinse(reported_at)
+        if 'blowout' not in self.phase_idx:
+            self._decide_blowout(reported_at)
+
+        if self.low_C_zone is not None and 'hot rinse' not in self.phase_idx:
+            self._decide_hot_rinse(reported_at)
+        if 'hot rinse' in self.phase_idx and 'pre-rinse' not in self.phase_idx:
+            self._decide_prerinse(reported_at)
+        if 'pre-rinse' in self.phase_idx and 'post-milk flush' not in self.phase_idx:
+            self._decide_post_milk_flush(reported_at)
+
+
+    def _decide_hot_rinse(self, reported_at: int):
+        '''LowCZoneAndHotrinseFinder.find_hot_rinse_time: the 1st dT max with a dC max within HOT_RINSE_NEIGHBORS_S, both after the
+        low-C zone and before T max, above a fraction of the T/C means of the cycle. Decided once the extrema around the dT max are known'''
+
+        low_C_zone_start_idx, zone_duration_s = self.low_C_zone
+        low_C_zone_end_t_ns = self.t_ns[low_C_zone_start_idx] + zone_duration_s * self.NS_PER_S
+        T_max_t_ns          = self.t_ns[self.T_max_idx]
+        neighbors_duration  = self.HOT_RINSE_NEIGHBORS_S * self.NS_PER_S
+
+        dT_peaks_idx, dT_peaks_t_ns = self._extrema_t_ns('dT max')
+        dC_peaks_idx, dC_peaks_t_ns = self._extrema_t_ns('dC max')
+        T_at_dT_peaks = self.T_values[dT_peaks_idx]
+        C_at_dC_peaks = self.cycle_C_values[dC_peaks_idx - self.cycle_start_idx]
+        dT_peaks_mask = (low_C_zone_end_t_ns < dT_peaks_t_ns) & (dT_peaks_t_ns < T_max_t_ns) \
+                        & (T_at_dT_peaks > self.cycle_T_mean * self.HOT_RINSE_T_CRIT_FRACTION)
+        dC_peaks_mask = (low_C_zone_end_t_ns < dC_peaks_t_ns) & (dC_peaks_t_ns < T_max_t_ns) \
+                        & (C_at_dC_peaks > self.cycle_C_mean * self.HOT_RINSE_C_CRIT_FRACTION)
+
+        matched_peaks = EventJoin.first_match(dT_peaks_t_ns, dC_peaks_t_ns, neighbors_duration, dT_peaks_mask, dC_peaks_mask)
+        if matched_peaks is not None:
+            if self._is_known_until(dT_peaks_t_ns[matched_peaks[0]] + neighbors_duration):
+                self._report('hot rinse', int(dC_peaks_idx[matched_peaks[1]]), reported_at)
+            return
+
+        if self._is_known_until(T_max_t_ns + neighbors_duration):
+            logger.warning(f"Streaming: could not find hot rinse, setting it {self.HOT_RINSE_BEFORE_T_MAX_MIN} min before T_max")
+            hot_rinse_t_ns = T_max_t_ns - self.HOT_RINSE_BEFORE_T_MAX_MIN * self.SECS_PER_MINUTE * self.NS_PER_S
+            self._report('hot rinse', self._nearest_idx_of_time(hot_rinse_t_ns), reported_at, message = 'default')
+
+
+    def _decide_prerinse(self, reported_at: int):
+        '''PrerinsePostmilkflushFinder.find_prerinse_time: the last dC min (else dF max) before the low-C zone starts, at most
+        PRERINSE_HOTRINSE_LIMIT samples before the hot rinse. If there is neither, PRERINSE_BEFORE_T_MAX_MIN before T max, which is
+        not limited by the hot rinse'''
+
+        low_C_zone_start_t_ns = self.t_ns[self.low_C_zone[0]]
+        hot_rinse_idx         = self.phase_idx['hot rinse']
+
+        dF_peaks_idx, dF_peaks_t_ns = self._extrema_t_ns('dF max')
+        dC_drops_idx, dC_drops_t_ns = self._extrema_t_ns('dC min')
+        dF_peaks_before_low_C = dF_peaks_idx[dF_peaks_t_ns <= low_C_zone_start_t_ns]
+        dC_drops_before_low_C = dC_drops_idx[dC_drops_t_ns <= low_C_zone_start_t_ns]
+
+        if (dC_drops_before_low_C.size == 0) and (dF_peaks_before_low_C.size == 0): # the default is not limited by the hot rinse
+            logger.warning(f"Streaming: could not find pre-rinse, setting it {self.PRERINSE_BEFORE_T_MAX_MIN} min before T_max")
+            prerinse_t_ns = self.t_ns[self.T_max_idx] - self.PRERINSE_BEFORE_T_MAX_MIN * self.SECS_PER_MINUTE * self.NS_PER_S
+            self._report('pre-rinse', self._nearest_idx_of_time(prerinse_t_ns), reported_at, message = 'default')
+            return
+
+        message = ''
+        if dC_drops_before_low_C.size:
+            prerinse_idx = int(dC_drops_before_low_C[-1])
+        else:
+            prerinse_idx = int(dF_peaks_before_low_C[-1])
+
+        if hot_rinse_idx - prerinse_idx > self.PRERINSE_HOTRINSE_LIMIT:
+            prerinse_idx = hot_rinse_idx - self.PRERINSE_HOTRINSE_LIMIT
+            message      = 'limited by hot rinse'
+        self._report('pre-rinse', prerinse_idx, reported_at, message = message)
+
+
+    def _decide_post_milk_flush(self, reported_at: int):
+        '''PrerinsePostmilkflushFinder.find_postmilk_flush_time_depending_on_early_sharp_C: the 1st dC max above a fraction of the C
+        mean of the cycle before the pre-rinse, or with an early large C (EarlyCmaxHandler, see _find_cycle_values) the dF max within
+        POSTMILK_NEIGHBORS_S of the 1st dC max before the low-C zone. Else POSTMILK_BEFORE_T_MAX_MIN before T max'''
+
+        C_threshold = self.cycle_C_mean * self.POSTMILK_C_CRIT_FRACTION
+        dC_peaks_idx, dC_peaks_t_ns = self._extrema_t_ns('dC max')
+
+        if self.is_there_early_large_C: # 1st dC max with a dF max within its neighbors, the dF max is the post-milk flush
+            low_C_zone_start_t_ns = self.t_ns[self.low_C_zone[0]]
+            dF_peaks_idx, dF_peaks_t_ns = self._extrema_t_ns('dF max')
+            dC_peaks_mask = (dC_peaks_t_ns < low_C_zone_start_t_ns) \
+                            & (self.cycle_C_values[dC_peaks_idx - self.cycle_start_idx] > C_threshold) \
+                            & (self.F_values[dC_peaks_idx] > C_threshold) # F is read at the C peak
+            matched_peaks = EventJoin.first_match(dC_peaks_t_ns, dF_peaks_t_ns, self.POSTMILK_NEIGHBORS_S * self.NS_PER_S,
+                                                  dC_peaks_mask, dF_peaks_t_ns < low_C_zone_start_t_ns)
+            if matched_peaks is not None:
+                self._report('post-milk flush', int(dF_peaks_idx[matched_peaks[1]]), reported_at, message = 'early large C')
+                return
+        else:
+            for dC_peak_idx in dC_peaks_idx[dC_peaks_idx < self.phase_idx['pre-rinse']]:
+                if self.cycle_C_values[dC_peak_idx - self.cycle_start_idx] > C_threshold:
+                    self._report('post-milk flush', int(dC_peak_idx), reported_at)
+                    return
+
+        logger.warning(f"Streaming: could not find post-milk flush, setting it {self.POSTMILK_BEFORE_T_MAX_MIN} min before T_max")
+        post_milk_flush_t_ns = self.t_ns[self.T_max_idx] - self.POSTMILK_BEFORE_T_MAX_MIN * self.SECS_PER_MINUTE * self.NS_PER_S
+        self._report('post-milk flush', self._nearest_idx_of_time(post_milk_flush_t_ns), reported_at, message = 'default')
+
+
+    def _find_cycle_end(self):
+        '''End of the cycle like DataCleaner.remove_points_after_last_F_peak: POINTS_AFTER_LAST_F_PEAK samples after the 1st F peak
+        after T max (find_peaks on the F after T max, so the top must start after it) above the F max so far/END_F_FRACTION_THRESHOLD.
+        The F max only grows, so a peak below the threshold never gets above it: every peak is checked once'''
+
+        F_peaks = self.F_peak_finder
+        if self.next_end_F_peak is None:
+            self.next_end_F_peak = int(np.searchsorted(F_peaks.left_edges.values, self.T_max_idx, side = 'right'))
+
+        F_threshold = self.F_max/self.END_F_FRACTION_THRESHOLD
+        while self.next_end_F_peak < len(F_peaks.peaks_idx):
+            if F_peaks.peaks_values[self.next_end_F_peak] >= F_threshold:
+                self.cycle_end_idx = int(F_peaks.peaks_idx[self.next_end_F_peak]) + self.POINTS_AFTER_LAST_F_PEAK
+                logger.info(f"Streaming: the cycle ends at idx #{self.cycle_end_idx}")
+                return
+            self.next_end_F_peak += 1
+
+
+    def _decide_post_rinse(self, reported_at: int):
+        '''PostRinseFinder.find_post_rinse_start_time: the 1st dT min after T max with a dC min within POSTRINSE_NEIGHBORS_S, the
+        later of the 2. Decided once the extrema around the dT min are known, else (no match) at T max once the cycle is over'''
+
+        T_max_t_ns         = self.t_ns[self.T_max_idx]
+        neighbors_duration = self.POSTRINSE_NEIGHBORS_S * self.NS_PER_S
+
+        # only the dT drops after T max, and the dC drops that can be their neighbors
+        dT_drops_idx, dT_drops_t_ns = self._extrema_t_ns('dT min', before_idx = self.cycle_end_idx, after_t_ns = T_max_t_ns)
+        dC_drops_idx, dC_drops_t_ns = self._extrema_t_ns('dC min', before_idx = self.cycle_end_idx, after_t_ns = T_max_t_ns - neighbors_duration)
+
+        matched_drops = EventJoin.first_match(dT_drops_t_ns, dC_drops_t_ns, neighbors_duration)
+        if matched_drops is not None:
+            if not self._is_known_until(dT_drops_t_ns[matched_drops[0]] + neighbors_duration):
+                return
+            postrinse_idx = int(max(dT_drops_idx[matched_drops[0]], dC_drops_idx[matched_drops[1]]))
+            if (self.t_ns[postrinse_idx] - T_max_t_ns)/self.NS_PER_S > self.POSTRINSE_TIMEOUT_S:
+                self._report('post-rinse', int(dT_drops_idx[0]), reported_at, message = '1st T drop after T max')
+            else:
+                self._report('post-rinse', postrinse_idx, reported_at)
+            return
+
+        if self._is_cycle_over():
+            logger.warning("Streaming: could not find post-rinse start, setting it to T_max")
+            self._report('post-rinse', self.T_max_idx, reported_at, message = 'default')
+
+
+    def _decide_blowout(self, reported_at: int):
+        '''Blowout.find_blowout_duration on the F samples so far: the 1st F peak after T max above blowout_threshold (else the 1st F
+        peak, once the cycle is over), from where F stops rising before it to where F stops falling after it. Before the cycle is
+        over, the peaks and the fall of F after the blowout peak are followed sample by sample, and Blowout runs once, when the fall
+        ends or the cycle is over'''
+
+        is_F_complete = self.is_finished or (self.cycle_end_idx is not None and len(self.F_values) >= self.cycle_end_idx)
+        F_values      = self.F_values[:self.cycle_end_idx] if self.cycle_end_idx is not None else self.F_values.values
+
+        if not is_F_complete:
+            if not self._is_blowout_fall_over():
+                return
+            blowout_peak_idx = self.blowout_peak_idx
+        else:
+            blowout_peak_idx = Blowout.find_blowout_peak_idx(F_values, self.T_max_idx, F_fraction = self.BLOWOUT_F_FRACTION, blowout_threshold = self.blowout_threshold)
+            if blowout_peak_idx is None:
+                logger.warning("Streaming: cannot find blowout peak")
+                self.phase_idx['blowout'] = None
+                return
+
+        blowout_start_idx, blowout_stop_idx = Blowout.find_blowout_start_and_stop_idx(F_values, blowout_peak_idx)
+        self._report('blowout', blowout_start_idx, reported_at, value = self._seconds_between(blowout_start_idx, blowout_stop_idx))
+
+
+    def _is_blowout_fall_over(self) -> bool:
+        '''Before the cycle is over, Blowout.find_blowout_peak_idx can only be decided by a peak above blowout_threshold: the 1st F
+        peak after T max above it and above the F max so far/BLOWOUT_F_FRACTION (the F max only grows and F falls after the peak,
+        so every peak is checked once). Then Blowout.find_blowout_start_and_stop_idx needs the 1st step of F from the peak on that
+        does not fall
+        OUTPUT: True once that step is there'''
+
+        F_peaks = self.F_peak_finder
+        if self.blowout_peak_idx is None:
+            if self.next_blowout_F_peak is None:
+                self.next_blowout_F_peak = int(np.searchsorted(F_peaks.peaks_idx.values, self.T_max_idx, side = 'right'))
+
+            F_threshold = self.F_max/self.BLOWOUT_F_FRACTION
+            while self.blowout_peak_idx is None and self.next_blowout_F_peak < len(F_peaks.peaks_idx):
+                F_peak_value = F_peaks.peaks_values[self.next_blowout_F_peak]
+                if F_peak_value > self.blowout_threshold and F_peak_value >= F_threshold:
+                    self.blowout_peak_idx = int(F_peaks.peaks_idx[self.next_blowout_F_peak])
+                    self.blowout_stop_idx = self.blowout_peak_idx
+                self.next_blowout_F_peak += 1
+            if self.blowout_peak_idx is None:
+                return False
+
+        while self.blowout_stop_idx + 1 < len(self.F_values):
+            if not (self.F_values[self.blowout_stop_idx + 1] < self.F_values[self.blowout_stop_idx]): # NaN steps stop the blowout too
+                return True
+            self.blowout_stop_idx += 1
+        return False
+
+
+    def _report(self, phase: str, idx: int, reported_at: int, value: float = np.nan, message: str = ''):
+        '''Adds the PhaseEvent of a phase (or an alarm)'''
+
+        if phase in self.PHASES:
+            self.phase_idx[phase] = idx
+
+        phase_event = PhaseEvent(phase, idx, self.times[idx], reported_at, value, message)
+        self.events.append(phase_event)
+        logger.info(f"Streaming: {phase} @ {phase_event.time}, idx #{idx}, reported at idx #{reported_at} {message}".rstrip())
+
+
+    @staticmethod
+    def replay_file(file_path, batch_size: int = 60, parse_cache = None, **detector_kwargs) -> list:
+        '''Feeds a recorded input file to StreamingPhaseDetector in batches of batch_size samples, like a robot logging every minute,
+        one detector per cleaning cycle (see pipeline.read_cycles), to compare the online phases with those of pipeline.process_file
+        OUTPUT: list of (cycle_name, list of PhaseEvent), one per cycle, in the order of process_file'''
+
+        _, list_of_named_cycles = pipeline.read_cycles(file_path, parse_cache = parse_cache)
+
+        list_of_replayed_cycles = []
+        for cycle_name, df_cycle in list_of_named_cycles:
+            detector = StreamingPhaseDetector(**detector_kwargs)
+            for batch_start in range(0, len(df_cycle), batch_size):
+                detector.push_df(df_cycle.iloc[batch_start : batch_start + batch_size])
+            detector.finish()
+            list_of_replayed_cycles.append((cycle_name, detector.events))
+
+        return list_of_replayed_cycles
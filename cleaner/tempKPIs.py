@@ -2,11 +2,12 @@
 
 import numpy as np
 import pandas as pd
-from scipy.signal import argrelextrema
 
-from config_info_obtainer import Constants
+import config_info_obtainer as ci
 from constants import DfConstants
 from logging_maker import logger
+from relative_extrema import RelativeExtremaFinder
+from time_grid import TimeGrid
 
 
 class TemperatureKPIObtainer():
@@ -37,14 +38,26 @@ class TemperatureKPIObtainer():
         return temp_df, temp_column_index
 
 
-    def calculate_temperature_relative_extrema(self, comparison_order: int = 30) -> pd.core.frame.DataFrame:
+    def make_temperature_extrema_order_index(self):
+        '''Extrema order index of the temperature df, to get the relative extrema of many comparison_order values at the cost of one
+        OUTPUT: ExtremaOrderIndex, see extrema_order_index'''
+
+        from extrema_order_index import ExtremaOrderIndex # imported here, it is only needed to try many comparison_order values
+        temp_df, _ = TemperatureKPIObtainer.make_temperature_df(self)
+        return ExtremaOrderIndex.from_df(temp_df)
+
+
+    def calculate_temperature_relative_extrema(self, comparison_order: int = 30, extrema_order_index = None) -> pd.core.frame.DataFrame:
         '''Calculates the extrema points of temperature, like local minima and maxima
+        INPUT: extrema_order_index: made by make_temperature_extrema_order_index, if given the extrema are read from it
         OUTPUT: df_temp_extrema, which is a DataFrame of Temperature extrema points'''
 
         temp_df, _           = TemperatureKPIObtainer.make_temperature_df(self)
 
-        relative_min_idx     = argrelextrema(temp_df.values, np.less,    order = comparison_order)[0]
-        relative_max_idx     = argrelextrema(temp_df.values, np.greater, order = comparison_order)[0]
+        if extrema_order_index is not None:
+            relative_min_idx, relative_max_idx = extrema_order_index.find_relative_extrema_idx(comparison_order)
+        else:
+            relative_min_idx, relative_max_idx = RelativeExtremaFinder.find_relative_extrema_idx_of_df(temp_df, comparison_order) # like argrelextrema on temp_df.values
         relative_min_time    = temp_df.iloc[relative_min_idx, self.time_column_idx]
         relative_max_time    = temp_df.iloc[relative_max_idx, self.time_column_idx]
         relative_min_values  = temp_df.iloc[relative_min_idx, -1] #temp is at last column
@@ -75,14 +88,22 @@ class TemperatureKPIObtainer():
         time_column_index = self.df.columns.get_loc(DfConstants.df_time_column)
         T_max_time        = temp_df.iloc[T_max_idx, time_column_index]
 
-        T_criterion           = Constants.T_crit # set in the config file
+        T_criterion           = ci.Constants.T_crit # set in the config file
         T_above_crit_idx      = np.where(temp_column > T_criterion)[0] # Temperature values above the crit
-        T_above_crit_duration = len(T_above_crit_idx)              # time [s] where T > T_criterion (set in config file)
+        time_interval_window  = ci.Constants.time_interval
+        time_values_s         = TimeGrid.time_to_seconds(temp_df.iloc[:, time_column_index])
+
+        if TimeGrid.is_on_grid(time_values_s): # one sample per second, a # of samples is a # of seconds
+            T_above_crit_duration = len(T_above_crit_idx)              # time [s] where T > T_criterion (set in config file)
 
-        # Get "avg. T of time interval with highest T [C]"
-        time_interval_window       = Constants.time_interval
-        T_moving_avg_time_interval = temp_column.rolling(time_interval_window).mean()
-        T_of_max_time_interval     = np.amax(T_moving_avg_time_interval)
+            # Get "avg. T of time interval with highest T [C]"
+            T_moving_avg_time_interval = temp_column.rolling(time_interval_window).mean()
+            T_of_max_time_interval     = np.amax(T_moving_avg_time_interval)
+        else: # weighted by the time every sample stands for, see TimeGrid
+            T_values                   = temp_column.to_numpy(dtype = np.float64)
+            T_above_crit_duration      = TimeGrid.durations_above_s(time_values_s, T_values, [T_criterion])[0]
+            T_window_means             = TimeGrid.window_means(time_values_s, T_values, time_interval_window)
+            T_of_max_time_interval     = np.nanmax(T_window_means) if not np.isnan(T_window_means).all() else np.nan
 
         max_temp_keypoints = {'T_max [C]':                          T_max_value,
                               'T_max idx [#]':                      T_max_idx,
@@ -92,3 +113,41 @@ class TemperatureKPIObtainer():
                               'T of max time interval [C]':         T_of_max_time_interval, }
 
         return max_temp_keypoints
+
+
+    def calculate_temperature_KPI_grid(self, list_of_T_crits: list, list_of_time_intervals: list) -> pd.core.frame.DataFrame:
+        '''Same "Duration for which T > T_crit" and "T of max time interval" as calculate_temperature_absolute_extrema, for every T_crit
+        and time interval of a grid instead of the ones of the config file. The T values are sorted once, so the duration above every
+        T_crit is a binary search, and summed once (prefix sums), so the mean of every window is a subtraction, with no rolling mean
+        per time interval (see TimeGrid). Both are weighted by the time every sample stands for, so they are in seconds whatever the
+        sample rate. Windows with a NaN value have no mean, like rolling().mean(). The means can differ from rolling().mean() in the
+        last digit of a float, the values being added in another order
+        INPUT:
+            - list_of_T_crits: temperature criteria [C]
+            - list_of_time_intervals: window lengths [s]
+        OUTPUT: DataFrame with one row per (T_crit, time interval)'''
+
+        temp_df, temp_column_index = TemperatureKPIObtainer.make_temperature_df(self)
+        time_column_index    = self.df.columns.get_loc(DfConstants.df_time_column)
+        time_values_s        = TimeGrid.time_to_seconds(temp_df.iloc[:, time_column_index])
+        T_values             = self.df.iloc[:, temp_column_index].to_numpy(dtype = np.float64)
+
+        T_crits               = np.asarray(list_of_T_crits, dtype = np.float64)
+        T_above_crit_durations= TimeGrid.durations_above_s(time_values_s, T_values, T_crits)
+
+        list_of_T_of_max_time_intervals = []
+        for time_interval in list_of_time_intervals:
+            if time_interval <= 0:
+                raise ValueError(f"Time interval must be > 0 s, not {time_interval}")
+            T_window_means = TimeGrid.window_means(time_values_s, T_values, time_interval)
+            list_of_T_of_max_time_intervals.append(np.nanmax(T_window_means) if not np.isnan(T_window_means).all() else np.nan)
+
+        T_crit_grid, time_interval_grid = np.meshgrid(T_crits, np.asarray(list_of_time_intervals), indexing = 'ij')
+        duration_grid, T_of_max_grid    = np.meshgrid(T_above_crit_durations, np.asarray(list_of_T_of_max_time_intervals, dtype = np.float64), indexing = 'ij')
+
+        df_KPI_grid = pd.DataFrame({'T_crit [C]':                         T_crit_grid.ravel(),
+                                    'Time interval [s]':                  time_interval_grid.ravel(),
+                                    'Duration for which T > T_crit [s]':  duration_grid.ravel(),
+                                    'T of max time interval [C]':         T_of_max_grid.ravel(),
+                                    'Max time interval above T_crit':     T_of_max_grid.ravel() > T_crit_grid.ravel(), })
+        return df_KPI_grid
@@ -0,0 +1,282 @@
+'''Module containing the time grid of the data. The code counts samples as seconds: the rolling windows (time_interval, t_cond_water,
+num_neighbors), the spacing dx of the derivatives and the durations. Input files logged at another rate (like every 0.5 s) or with
+dropped samples are put on a grid of one sample per second when they are read (see read_relevant_dataframe), in one vectorized pass
+per column, and the KPIs of data that may not be on the grid are weighted by the time every sample stands for. TimeIndex finds
+the sample at a time for the phase identifying code, without scanning all samples'''
+
+import numpy as np
+import pandas as pd
+
+from constants import DfConstants
+from logging_maker import logger
+
+
+class TimeGrid:
+    '''Class containing the functions to check, make and use the time grid'''
+
+    PERIOD_S = 1             # s, the code expects one sample per second
+    NS_PER_S = 1_000_000_000
+
+    @staticmethod
+    def time_to_seconds(time_column: pd.core.series.Series) -> np.ndarray:
+        '''OUTPUT: float array of the time of every sample in seconds, since the first valid time. NaT gives NaN'''
+
+        if pd.api.types.is_datetime64_any_dtype(time_column) or pd.api.types.is_timedelta64_dtype(time_column):
+            time_ns = time_column.to_numpy(dtype = 'datetime64[ns]' if pd.api.types.is_datetime64_any_dtype(time_column) else 'timedelta64[ns]').view(np.int64)
+            is_NaT  = time_column.isna().to_numpy()
+            if is_NaT.all():
+                return np.full(len(time_column), np.nan)
+            time_s  = (time_ns - time_ns[~is_NaT][0])/1e9 # difference of integers first, so the seconds keep their precision
+            return np.where(is_NaT, np.nan, time_s)
+
+        time_s = time_column.to_numpy(dtype = np.float64)
+        is_NaN = np.isnan(time_s)
+        return time_s - time_s[~is_NaN][0] if not is_NaN.all() else time_s
+
+
+    @staticmethod
+    def to_ns_since_start(time_column: pd.core.series.Series):
+        '''Integer time of one cycle, which the phase identifying code compares instead of pd.Timestamp objects
+        OUTPUT:
+            - start_time: 1st valid time of the column (pd.Timestamp for datetime columns)
+            - t_ns: contiguous int64 array of ns since start_time, 0 for samples without time
+            - has_time: mask of the samples with a time (not NaT)'''
+
+        has_time = time_column.notna().to_numpy()
+        if not has_time.any():
+            return pd.NaT, np.zeros(len(time_column), dtype = np.int64), has_time
+
+        start_time = time_column.iloc[np.argmax(has_time)]
+        if pd.api.types.is_datetime64_any_dtype(time_column) or pd.api.types.is_timedelta64_dtype(time_column):
+            time_ns = time_column.to_numpy(dtype = 'datetime64[ns]' if pd.api.types.is_datetime64_any_dtype(time_column) else 'timedelta64[ns]').view(np.int64)
+            t_ns    = time_ns - time_ns[np.argmax(has_time)]
+        else:
+            t_ns    = np.round((time_column.to_numpy(dtype = np.float64) - start_time) * TimeGrid.NS_PER_S)
+
+        return start_time, np.ascontiguousarray(np.where(has_time, t_ns, 0), dtype = np.int64), has_time
+
+
+    @staticmethod
+    def ns_to_time(start_time, t_ns):
+        '''Wall-clock time of t_ns [ns since start_time], see to_ns_since_start. Only used to output results'''
+
+        if isinstance(start_time, (pd.Timestamp, pd.Timedelta)):
+            return start_time + pd.Timedelta(int(t_ns), unit = 'ns')
+        return start_time + t_ns/TimeGrid.NS_PER_S
+
+
+    @staticmethod
+    def is_on_grid(time_s: np.ndarray, period_s: float = PERIOD_S) -> bool:
+        '''True if the valid times are exactly period_s apart, like 1 s data without dropped samples. NaN times are left out, the
+        smoothing shifts the time column and leaves some at the end'''
+
+        time_step_s = np.diff(time_s[~np.isnan(time_s)])
+        return bool(np.all(np.abs(time_step_s - period_s) <= 1e-6 * period_s))
+
+
+    @staticmethod
+    def regrid(df: pd.core.frame.DataFrame, period_s: float = PERIOD_S) -> pd.core.frame.DataFrame:
+        '''Puts the data on a grid of one sample every period_s seconds, from the first to the last sample. Every column after the time
+        column is linearly interpolated (np.interp) between the samples. NaN values are not interpolated over, the grid points next
+        to them are NaN and the data cleaning fills them like gaps of 1 s data. Samples without time are dropped, samples with the
+        same time are kept once
+        INPUT: dataframe containing [time, T, C, F] data
+        OUTPUT: dataframe with the same columns, on the grid'''
+
+        time_column_id = df.columns.get_loc(DfConstants.df_time_column)
+        time_column    = df.iloc[:, time_column_id]
+        time_s         = TimeGrid.time_to_seconds(time_column)
+
+        sample_order   = np.argsort(time_s, kind = 'stable')             # NaN times go last
+        sample_order   = sample_order[~np.isnan(time_s[sample_order])]
+        is_new_time    = np.concatenate(([True], np.diff(time_s[sample_order]) > 0))
+        sample_order   = sample_order[is_new_time]
+        sample_time_s  = time_s[sample_order]
+
+        number_of_grid_points = int(np.floor(sample_time_s[-1]/period_s + 1e-6)) + 1 if len(sample_time_s) > 0 else 0
+        grid_time_s    = np.arange(number_of_grid_points) * period_s
+
+        if pd.api.types.is_datetime64_any_dtype(time_column) or pd.api.types.is_timedelta64_dtype(time_column):
+            first_time = time_column.iloc[sample_order[0]] if len(sample_order) > 0 else pd.NaT
+            grid_time  = first_time + pd.to_timedelta(np.arange(number_of_grid_points) * int(round(period_s * 1e9)), unit = 'ns')
+        else:
+            grid_time  = (time_column.iloc[sample_order[0]] if len(sample_order) > 0 else 0.0) + grid_time_s
+
+        # grid points at the time of a sample take its value, others the line between the samples around them (NaN next to a NaN)
+        nearest_idx    = np.minimum(np.searchsorted(sample_time_s, grid_time_s), max(len(sample_time_s) - 1, 0))
+        is_on_sample   = np.abs(sample_time_s[nearest_idx] - grid_time_s) <= 1e-6 if len(sample_time_s) > 0 else np.zeros(0, dtype = bool)
+
+        df_grid        = pd.DataFrame({DfConstants.df_time_column: grid_time})
+        for column_name in df.columns[time_column_id + 1:]:
+            values      = df[column_name].to_numpy(dtype = np.float64)[sample_order]
+            grid_values = np.interp(grid_time_s, sample_time_s, values) if len(values) > 0 else np.zeros(0)
+            grid_values[is_on_sample] = values[nearest_idx[is_on_sample]]
+            df_grid[column_name] = grid_values
+
+        return df_grid
+
+
+    @staticmethod
+    def regrid_if_off_grid(df: pd.core.frame.DataFrame, period_s: float = PERIOD_S) -> pd.core.frame.DataFrame:
+        '''Same as regrid, but data that are already on the grid are returned as they are, not copied'''
+
+        time_s = TimeGrid.time_to_seconds(df[DfConstants.df_time_column])
+        if TimeGrid.is_on_grid(time_s, period_s) and not np.isnan(time_s).any():
+            return df
+
+        time_step_s = np.diff(time_s[~np.isnan(time_s)])
+        time_steps  = f"time steps of {np.min(time_step_s):g}-{np.max(time_step_s):g} s" if time_step_s.size else "fewer than 2 timed samples"
+        logger.info(f"Data not on a {period_s} s grid ({time_steps}), regridding {len(df)} samples")
+        return TimeGrid.regrid(df, period_s)
+
+
+    @staticmethod
+    def sample_durations_s(time_s: np.ndarray) -> np.ndarray:
+        '''Time every sample stands for: until the next sample, the last sample standing for as long as the one before it. Samples
+        without time stand for 0 s
+        OUTPUT: float array of durations [s]'''
+
+        durations_s = np.zeros(len(time_s))
+        has_time    = ~np.isnan(time_s)
+        if np.count_nonzero(has_time) < 2:
+            durations_s[has_time] = TimeGrid.PERIOD_S
+            return durations_s
+
+        timed_durations_s     = np.diff(time_s[has_time], append = np.nan)
+        timed_durations_s[-1] = timed_durations_s[-2]
+        durations_s[has_time] = timed_durations_s
+        return durations_s
+
+
+    @staticmethod
+    def durations_above_s(time_s: np.ndarray, values: np.ndarray, list_of_thresholds: list) -> np.ndarray:
+        '''Time [s] during which values > threshold, for every threshold. The values are sorted once and their durations summed
+        (prefix sums), so every threshold is one binary search. NaN values are left out
+        OUTPUT: float array, one duration per threshold'''
+
+        durations_s     = TimeGrid.sample_durations_s(time_s)
+        is_valid        = ~np.isnan(values)
+        sorted_order    = np.argsort(values[is_valid], kind = 'stable')
+        sorted_values   = values[is_valid][sorted_order]
+        duration_prefix = np.concatenate(([0.0], np.cumsum(durations_s[is_valid][sorted_order])))
+
+        number_not_above= np.searchsorted(sorted_values, np.asarray(list_of_thresholds, dtype = np.float64), side = 'right') # values <= threshold
+        return duration_prefix[-1] - duration_prefix[number_not_above]
+
+
+    @staticmethod
+    def window_means(time_s: np.ndarray, values: np.ndarray, window_s: float) -> np.ndarray:
+        '''Time-weighted mean of values over the window_s seconds starting at every sample, with prefix sums so the cost does not
+        depend on window_s. Windows that are not full (near the end) or hold a NaN value have no mean, like rolling().mean().
+        On a 1 s grid the windows are the rolling windows of window_s samples
+        OUTPUT: float array, one mean per sample, NaN for the windows without mean'''
+
+        durations_s    = TimeGrid.sample_durations_s(time_s)
+        is_valid       = ~np.isnan(values)
+        weighted_prefix= np.concatenate(([0.0], np.cumsum(np.where(is_valid, values * durations_s, 0.0))))
+        duration_prefix= np.concatenate(([0.0], np.cumsum(durations_s)))
+        NaN_prefix     = np.concatenate(([0],   np.cumsum(~is_valid)))
+
+        has_time       = ~np.isnan(time_s)
+        if not has_time.any():
+            return np.full(len(values), np.nan)
+        end_of_data_s  = time_s[has_time][-1] + durations_s[has_time][-1]
+
+        sample_idx     = np.arange(len(values))
+        window_ends    = np.searchsorted(time_s, time_s + window_s - 1e-6, side = 'left') # window i holds the samples [i, end), NaN times last
+        is_window_full = has_time & (time_s + window_s <= end_of_data_s + 1e-6)
+
+        window_durations = duration_prefix[window_ends] - duration_prefix[sample_idx]
+        is_window_valid  = is_window_full & ((NaN_prefix[window_ends] - NaN_prefix[sample_idx]) == 0) & (window_durations > 0)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            means        = (weighted_prefix[window_ends] - weighted_prefix[sample_idx])/window_durations
+
+        return np.where(is_window_valid, means, np.nan)
+
+
+class TimeIndex:
+    '''Time -> sample index lookups of one cycle, on the integer times of TimeGrid.to_ns_since_start. When the timed samples are the
+    first ones and one period apart (the usual case after regridding, the smoothing leaving samples without time at the end), the
+    index is computed with arithmetic in O(1). Otherwise the timed samples are sorted once and every lookup is a binary search
+    (searchsorted) in O(log n). Both give the same index as a scan over all samples: the 1st sample at a time, the 1st of the
+    closest samples for nearest lookups
+    ATTRIBUTES:
+        - t_ns, has_time: see TimeGrid.to_ns_since_start
+        - period_ns: time between samples if they are on a uniform grid, else None'''
+
+    def __init__(self, t_ns: np.ndarray, has_time: np.ndarray):
+        self.t_ns     = t_ns
+        self.has_time = has_time
+
+        number_of_timed = int(np.count_nonzero(has_time))
+        self.period_ns  = None
+        if (number_of_timed >= 2) and has_time[:number_of_timed].all():
+            period_ns = int(t_ns[1] - t_ns[0])
+            if (period_ns > 0) and np.array_equal(t_ns[:number_of_timed], np.arange(number_of_timed, dtype = np.int64) * period_ns):
+                self.period_ns = period_ns
+        self.number_of_timed = number_of_timed
+
+        if self.period_ns is None: # sorted times of the timed samples, and their index, the 1st sample first when times are equal
+            timed_idx       = np.flatnonzero(has_time)
+            sorted_order    = np.argsort(t_ns[timed_idx], kind = 'stable')
+            self.sorted_idx = timed_idx[sorted_order]
+            self.sorted_t_ns= t_ns[self.sorted_idx]
+
+
+    def find_idx(self, t_ns) -> np.ndarray:
+        '''Index of the 1st sample at every time of t_ns, -1 if no sample is at that time
+        INPUT: int time or array of int times [ns]
+        OUTPUT: int64 array of the shape of t_ns'''
+
+        t_ns = np.asarray(t_ns, dtype = np.int64)
+        if self.period_ns is not None:
+            idx      = t_ns // self.period_ns
+            is_found = (t_ns % self.period_ns == 0) & (idx >= 0) & (idx < self.number_of_timed)
+            return np.where(is_found, idx, -1)
+
+        position = np.minimum(np.searchsorted(self.sorted_t_ns, t_ns, side = 'left'), max(len(self.sorted_t_ns) - 1, 0))
+        if len(self.sorted_t_ns) == 0:
+            return np.full(t_ns.shape, -1, dtype = np.int64)
+        is_found = self.sorted_t_ns[position] == t_ns
+        return np.where(is_found, self.sorted_idx[position], -1)
+
+
+    def find_nearest_idx(self, t_ns) -> np.ndarray:
+        '''Index of the sample closest to every time of t_ns, samples without time left out. If 2 samples are as close, the 1st one
+        INPUT: int time or array of int times [ns]
+        OUTPUT: int64 array of the shape of t_ns'''
+
+        t_ns = np.asarray(t_ns, dtype = np.int64)
+        if self.number_of_timed == 0:
+            raise ValueError("No sample has a time, cannot find the nearest sample")
+
+        if self.period_ns is not None:
+            idx_below = np.clip(t_ns // self.period_ns, 0, self.number_of_timed - 1)
+            idx_above = np.minimum(idx_below + 1, self.number_of_timed - 1)
+            is_above_closer = np.abs(idx_above * self.period_ns - t_ns) < np.abs(t_ns - idx_below * self.period_ns)
+            return np.where(is_above_closer, idx_above, idx_below)
+
+        position_above = np.minimum(np.searchsorted(self.sorted_t_ns, t_ns, side = 'left'), len(self.sorted_t_ns) - 1)
+        position_below = np.maximum(np.searchsorted(self.sorted_t_ns, t_ns, side = 'right') - 1, 0)
+        position_below = np.searchsorted(self.sorted_t_ns, self.sorted_t_ns[position_below], side = 'left') # 1st sample of that time
+        distance_above = np.abs(self.sorted_t_ns[position_above] - t_ns)
+        distance_below = np.abs(t_ns - self.sorted_t_ns[position_below])
+        idx_above      = self.sorted_idx[position_above]
+        idx_below      = self.sorted_idx[position_below]
+        is_above_closer= (distance_above < distance_below) | ((distance_above == distance_below) & (idx_above < idx_below))
+        return np.where(is_above_closer, idx_above, idx_below)
+
+
+    def idx_of_time(self, t_ns) -> int:
+        '''Index of the 1st sample at time t_ns, like np.where(t_values == time)[0][0], IndexError if no sample is at that time'''
+
+        idx = int(self.find_idx(t_ns))
+        if idx < 0:
+            raise IndexError(f"No sample at {t_ns} ns since the start of the cycle")
+        return idx
+
+
+    def nearest_idx_of_time(self, t_ns) -> int:
+        '''Index of the sample closest to time t_ns, like np.argmin(np.abs(t_values - time))'''
+
+        return int(self.find_nearest_idx(t_ns))
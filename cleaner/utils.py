@@ -1,8 +1,31 @@
+import hashlib
+import json
+import logging
+import os
 
 import numpy as np
 from constants import DfConstants
 
 
+def optional_njit(function = None, **njit_options):
+    '''Decorator that compiles a function with numba.njit if numba is installed, cached on disk by default so that the next runs (and
+    the worker processes) do not compile it again. Without numba, the plain python function is returned, which gives the same
+    results but runs much slower. Use as @optional_njit or @optional_njit(cache = False)'''
+
+    try:
+        import numba # imported here, so only modules with compiled functions pay for the import
+        logging.getLogger('numba').setLevel(logging.WARNING) # the root logger is at DEBUG, see logging_maker
+    except ImportError:
+        numba = None
+
+    def decorator(function):
+        if numba is None:
+            return function
+        return numba.njit(**{'cache': True, **njit_options})(function)
+
+    return decorator if function is None else decorator(function)
+
+
 class ColumnFinder:
     '''Class containing reusable function to find the USABLE column names, like T-C-F'''
 
@@ -21,3 +44,39 @@ class ColumnFinder:
         usable_columns_indices = [temp_column_index, cond_column_index, flow_column_index]
 
         return time_column_index, usable_columns_indices
+
+
+class FileFingerprint:
+    '''Class containing reusable functions that tell whether a file (or a set of settings) changed since the last time we saw it'''
+
+    HASH_BLOCK_SIZE = 1024 * 1024 # bytes read at once when hashing a file
+
+    def get_size_and_mtime(file_path):
+        '''Cheap identity of a file, without reading it
+        INPUT: path of the file
+        OUTPUT: (size in bytes, modification time in ns)'''
+
+        file_stats = os.stat(file_path)
+        return file_stats.st_size, file_stats.st_mtime_ns
+
+
+    def get_content_hash(file_path):
+        '''Expensive but exact identity of a file, reads the whole file
+        INPUT: path of the file
+        OUTPUT: sha256 hex digest of the file contents'''
+
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(FileFingerprint.HASH_BLOCK_SIZE), b''):
+                file_hash.update(block)
+
+        return file_hash.hexdigest()
+
+
+    def get_dict_hash(dictionary):
+        '''Identity of a group of settings, like the column mapping or the config file contents
+        INPUT: dict with json-serializable values (other values are turned into strings)
+        OUTPUT: sha256 hex digest of the dict'''
+
+        dict_as_str = json.dumps(dictionary, sort_keys = True, default = str)
+        return hashlib.sha256(dict_as_str.encode('utf-8')).hexdigest()
@@ -0,0 +1,236 @@
+'''Module containing the watch-folder daemon: it keeps running, watches the input location for new csv files (like files of robots
+that just finished cleaning) and processes each file as soon as it is completely written, on a pool of worker processes that is
+started (and has imported everything) before the first file arrives. Queue depth and latency are logged and written to a status file'''
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import json
+import os
+import time
+
+import numpy as np
+
+import config_info_obtainer as ci
+import instrumentation
+import multi_file_maker as mfm
+from logging_maker import logger
+
+
+class InputFolderWatcher:
+    '''Class that polls a folder with os.scandir (one directory read per poll, no file is opened) and reports the files that are
+    completely written. A file counts as complete when its size and mtime did not change for settle_time_s, so files that are still
+    being copied/logged are not read half-way
+    INPUT:
+        - input_location: folder to watch
+        - settle_time_s: # of seconds the size and mtime of a file must be stable
+        - extension: only files with this extension are watched'''
+
+
+    def __init__(self, input_location, settle_time_s: float = 5.0, extension = '.csv'):
+        self.input_location     = input_location
+        self.settle_time_s      = settle_time_s
+        self.extension          = extension
+        self.pending_files: dict= {} # {file name: ((size, mtime), time since which it is stable)}
+        self.complete_files:dict= {} # {file name: (size, mtime)} of files already reported
+
+
+    def find_complete_files(self) -> list:
+        '''Polls the folder once
+        OUTPUT: sorted list of names of files that became complete since the last poll, a file that changes later is reported again'''
+
+        now                   = time.monotonic()
+        list_of_names_in_dir  = []
+        list_of_complete_names= []
+
+        with os.scandir(self.input_location) as dir_entries:
+            for dir_entry in dir_entries:
+                if not (dir_entry.name.endswith(self.extension) and dir_entry.is_file()):
+                    continue
+                list_of_names_in_dir.append(dir_entry.name)
+
+                file_stats    = dir_entry.stat()
+                file_identity = (file_stats.st_size, file_stats.st_mtime_ns)
+                if self.complete_files.get(dir_entry.name) == file_identity:
+                    continue
+
+                pending_file = self.pending_files.get(dir_entry.name)
+                if (pending_file is None) or (pending_file[0] != file_identity): # new, or still being written
+                    self.pending_files[dir_entry.name] = (file_identity, now)
+                elif (now - pending_file[1] >= self.settle_time_s) and (file_stats.st_size > 0):
+                    del self.pending_files[dir_entry.name]
+                    self.complete_files[dir_entry.name] = file_identity
+                    list_of_complete_names.append(dir_entry.name)
+
+        for file_name in set(self.pending_files) - set(list_of_names_in_dir): # removed before it was complete
+            del self.pending_files[file_name]
+
+        return sorted(list_of_complete_names)
+
+
+class DaemonStats:
+    '''Class that keeps the numbers needed to size the worker pool: queue depth (files waiting or being processed) and the latency
+    of every file, from the moment it was complete until its rows were written
+    INPUT: max_latencies_kept: the latency percentiles are of the last max_latencies_kept files'''
+
+
+    def __init__(self, max_latencies_kept: int = 1000):
+        self.start_time     = time.time()
+        self.latencies_s    = deque(maxlen = max_latencies_kept)
+        self.queue_depth    = 0
+        self.max_queue_depth= 0
+        self.processed_files= 0
+        self.failed_files   = 0
+
+
+    def set_queue_depth(self, queue_depth: int):
+        self.queue_depth     = queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+
+    def record_file(self, latency_s: float, failed: bool = False):
+        self.latencies_s.append(latency_s)
+        if failed:
+            self.failed_files    += 1
+        else:
+            self.processed_files += 1
+
+
+    def as_dict(self) -> dict:
+        '''OUTPUT: dict of the stats, json-serializable'''
+
+        stats = {'uptime [s]':        round(time.time() - self.start_time, 1),
+                 'queue depth':       self.queue_depth,
+                 'max queue depth':   self.max_queue_depth,
+                 'processed files':   self.processed_files,
+                 'failed files':      self.failed_files, }
+
+        if self.latencies_s:
+            latencies_s = np.array(self.latencies_s)
+            stats.update({'latency mean [s]': round(float(latencies_s.mean()), 3),
+                          'latency p50 [s]':  round(float(np.percentile(latencies_s, 50)), 3),
+                          'latency p95 [s]':  round(float(np.percentile(latencies_s, 95)), 3),
+                          'latency max [s]':  round(float(latencies_s.max()), 3), })
+
+        return stats
+
+
+def _warm_up_worker():
+    return os.getpid()
+
+
+def write_status_file(status_file_path, stats: DaemonStats):
+    '''Writes the stats to a temporary file that replaces the old one, so readers never see a half-written file'''
+
+    temp_file_path = f"{status_file_path}.tmp"
+    with open(temp_file_path, 'w') as file:
+        json.dump(stats.as_dict(), file, indent = 1)
+    os.replace(temp_file_path, status_file_path)
+
+
+def write_finished_files(running_files: dict, manifest, stats: DaemonStats, output_file_name = 'output.csv'):
+    '''Writes the rows of the files whose processing finished, removes them from running_files and saves the manifest once for all of them
+    INPUT: running_files: dict of {future: (input_filename, time the file was complete)}'''
+
+    finished_futures = [future for future in running_files if future.done()]
+    for future in finished_futures:
+        input_filename, complete_time = running_files.pop(future)
+        try:
+            list_of_cycle_results = mfm.get_worker_result(future)
+            with instrumentation.recording(input_filename, kind = 'output'):
+                mfm.write_file_results(input_filename, list_of_cycle_results, manifest, output_file_name)
+            failed = False
+        except Exception as error:
+            logger.error(f"Failed to process '{input_filename}': {type(error).__name__}: {error}")
+            failed = True
+
+        latency_s = time.monotonic() - complete_time
+        stats.record_file(latency_s, failed)
+        logger.info(f"'{input_filename}' done in {latency_s:.2f}s, {len(running_files)} file(s) in queue")
+
+    if finished_futures: # once per poll, for all the files that finished since the last one
+        manifest.save()
+
+
+def flush_timings(timings_file_path, run_settings: dict, wall_s: float, failed_files: int):
+    '''Appends the instrumentation records made since the last flush, and their batch stats, to the timings file. The daemon does
+    not end like a batch, so every flush is a run of its own in the JSONL file (see instrumentation.write_jsonl)
+    INPUT: wall_s, failed_files: time since the last flush and # of files that failed in it'''
+
+    list_of_records = instrumentation.take_records()
+    if not list_of_records:
+        return
+
+    run_info = {'run_wall_s':  wall_s,
+                **(run_settings or {}),
+                'failed_files':failed_files,
+                'watch':       True, }
+    instrumentation.write_jsonl(timings_file_path, list_of_records, run_info)
+    logger.info(f"Timings of {len(list_of_records)} record(s) written to '{timings_file_path}'")
+
+
+def run_daemon(jobs: int = 1, poll_interval_s: float = 2.0, settle_time_s: float = 5.0, output_file_name = 'output.csv',
+               status_file_name = 'daemon_status.json', max_polls: int = None, timings_file_path = None, run_settings: dict = None,
+               timings_flush_interval_s: float = 60.0):
+    '''Watches the input location and processes new/changed csv files until stopped (Ctrl+C). Files that were processed before
+    (see batch_manifest) are skipped, so restarting the daemon does not process the whole folder again
+    INPUT:
+        - jobs: # of worker processes, started once and kept warm
+        - poll_interval_s: max # of seconds between polls of the input location
+        - settle_time_s: # of seconds the size and mtime of a file must be stable before it is processed
+        - output_file_name: name of the csv file in the output location
+        - status_file_name: name of the json file in the output location with the stats (queue depth, latency...)
+        - max_polls: stop after this # of polls, None runs until stopped
+        - timings_file_path: if set (and the instrumentation is enabled), the timings of the processed files are appended to this
+          JSONL file every timings_flush_interval_s seconds and when the daemon stops, with run_settings in their batch line
+    OUTPUT: DaemonStats'''
+
+    manifest         = mfm.make_manifest(output_file_name)
+    watcher          = InputFolderWatcher(ci.Constants.input_location, settle_time_s)
+    stats            = DaemonStats()
+    status_file_path = os.path.join(ci.Constants.output_location, status_file_name)
+    running_files    = {} # {future: (input_filename, time the file was complete)}
+    last_flush_time  = time.monotonic()
+    failed_files_at_last_flush = 0
+
+    with ProcessPoolExecutor(max_workers = jobs, initializer = mfm.initialize_worker, initargs = (ci.config_info, instrumentation.is_enabled())) as executor:
+        wait([executor.submit(_warm_up_worker) for _ in range(jobs)]) # starts the workers now instead of when the first file arrives
+        logger.info(f"Watching '{ci.Constants.input_location}' with {jobs} warm worker(s), status in '{status_file_path}'")
+
+        poll_number = 0
+        try:
+            while (max_polls is None) or (poll_number < max_polls):
+                for input_filename in watcher.find_complete_files():
+                    if manifest.is_up_to_date(mfm.get_input_file_path(input_filename)):
+                        continue
+                    future                = executor.submit(mfm.process_input_file_in_worker, input_filename)
+                    running_files[future] = (input_filename, time.monotonic())
+
+                write_finished_files(running_files, manifest, stats, output_file_name)
+                stats.set_queue_depth(len(running_files))
+                write_status_file(status_file_path, stats)
+                poll_number += 1
+
+                if (timings_file_path is not None) and (time.monotonic() - last_flush_time >= timings_flush_interval_s):
+                    flush_timings(timings_file_path, run_settings, time.monotonic() - last_flush_time, stats.failed_files - failed_files_at_last_flush)
+                    last_flush_time            = time.monotonic()
+                    failed_files_at_last_flush = stats.failed_files
+
+                if running_files: # wakes up as soon as a file is done, so its rows are written right away
+                    wait(running_files, timeout = poll_interval_s, return_when = FIRST_COMPLETED)
+                else:
+                    time.sleep(poll_interval_s)
+
+            wait(running_files) # max_polls reached, the files in queue are finished first
+            write_finished_files(running_files, manifest, stats, output_file_name)
+
+        except KeyboardInterrupt:
+            logger.info(f"Stopping, {len(running_files)} file(s) in queue are not processed")
+            for future in running_files:
+                future.cancel()
+
+        finally:
+            if timings_file_path is not None:
+                flush_timings(timings_file_path, run_settings, time.monotonic() - last_flush_time, stats.failed_files - failed_files_at_last_flush)
+
+    logger.info(f"Daemon stats: {stats.as_dict()}")
+    return stats